@@ -0,0 +1,259 @@
+"""Catálogo de los agentes configurados en el backend, con recarga en caliente por versión.
+
+Los turnos no leen la configuración de la base de datos: el catálogo guarda en
+memoria la configuración de cada agente activo y su versión (`agents.version`,
+que el backend incrementa en cada PUT, activación o desactivación). Un hilo
+consulta cada `refresh_interval` segundos solo los IDs y versiones de los
+agentes activos y carga la configuración de los que cambiaron; si un agente ya
+estaba compilado, compila la nueva versión antes de publicarla y la sustituye
+de forma atómica. Los turnos en curso terminan con la versión anterior.
+
+Uso con el runtime de procesos: `agent_runtime.submit(agent_catalog.config(agent_id), ...)`;
+cada worker sustituye su instancia del agente cuando recibe una configuración nueva.
+"""
+
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional
+
+from config import (
+    AGENT_CATALOG_DATABASE_URL,
+    AGENT_CATALOG_REFRESH_INTERVAL,
+    AGENT_ROUTER_DEFAULT_TEMPLATE,
+    AGENT_TEMPLATES,
+    AGENT_TOOLS
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Claves de agents.configuration que reemplazan a las de la plantilla
+_AGENT_OVERRIDES = ("system_prompt", "model_name", "temperature")
+
+
+class _Entry:
+    """Versión de un agente: su configuración y, si ya se usó, el agente compilado."""
+
+    __slots__ = ("version", "config", "agent")
+
+    def __init__(self, version: int, config: Dict[str, Any], agent: Any = None):
+        self.version = version
+        self.config = config
+        self.agent = agent
+
+
+def agent_config_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Configuración de agente (ver agent_runtime.create_agent_from_config) para una fila de la tabla agents
+
+    Args:
+        row: Dict con id, name, description y configuration
+
+    Returns:
+        Dict con type, agent_id, name, description, system_prompt y tools
+    """
+    configuration = row.get("configuration") or {}
+    if isinstance(configuration, str):
+        configuration = json.loads(configuration)
+
+    template = configuration.get("template") or configuration.get("agent_type")
+    if template not in AGENT_TEMPLATES:
+        template = AGENT_ROUTER_DEFAULT_TEMPLATE
+    spec = AGENT_TEMPLATES[template]
+    config = {
+        "type": "credit_sales" if template == "credit_sales" else "base",
+        "agent_id": str(row["id"]),
+        "name": row.get("name") or spec["name"],
+        "description": row.get("description") or spec["description"],
+        "system_prompt": spec["system_prompt"],
+        "tools": [{"id": tool, **AGENT_TOOLS.get(tool, {})} for tool in configuration.get("tools", spec.get("tools", []))]
+    }
+    config.update({key: configuration[key] for key in _AGENT_OVERRIDES if key in configuration})
+    return config
+
+
+def create_agent_from_config(config: Dict[str, Any]):
+    """Crea un agente a partir de su configuración (ver agent_runtime.create_agent_from_config)."""
+    from agent_runtime import create_agent_from_config as create
+    return create(config)
+
+
+class AgentCatalog:
+    """Configuración y agentes compilados de los agentes activos, por versión."""
+
+    def __init__(
+        self,
+        database_url: Optional[str] = AGENT_CATALOG_DATABASE_URL,
+        refresh_interval: float = AGENT_CATALOG_REFRESH_INTERVAL,
+        agent_factory: Callable[[Dict[str, Any]], Any] = create_agent_from_config
+    ):
+        """Inicializa el catálogo (la carga se hace en el primer uso o con `start`)
+
+        Args:
+            database_url: URL de la base de datos del backend (tabla agents)
+            refresh_interval: Segundos entre comprobaciones de versiones (0 = sin hilo)
+            agent_factory: Función que crea un agente a partir de su configuración
+        """
+        self.database_url = database_url
+        self.refresh_interval = refresh_interval
+        self.agent_factory = agent_factory
+
+        self._engine = None
+        self._snapshot: Optional[Dict[int, _Entry]] = None
+        self._refresh_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._reloads = 0
+        self._builds = 0
+        self._checked_at: Optional[float] = None
+
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def config(self, agent_id: int) -> Optional[Dict[str, Any]]:
+        """Configuración de la versión actual de un agente (None si no existe o está inactivo)."""
+        entry = self._ensure_loaded().get(int(agent_id))
+        return entry.config if entry else None
+
+    def version(self, agent_id: int) -> Optional[int]:
+        """Versión actual de un agente (None si no existe o está inactivo)."""
+        entry = self._ensure_loaded().get(int(agent_id))
+        return entry.version if entry else None
+
+    def agent(self, agent_id: int):
+        """Agente compilado de la versión actual (se compila en el primer uso de cada versión)
+
+        Args:
+            agent_id: ID del agente en el backend
+
+        Returns:
+            Instancia del agente, o None si no existe o está inactivo
+        """
+        entry = self._ensure_loaded().get(int(agent_id))
+        if entry is None:
+            return None
+        if entry.agent is None:
+            with self._build_lock:
+                if entry.agent is None:
+                    entry.agent = self._build(entry.config)
+        return entry.agent
+
+    def refresh(self) -> List[int]:
+        """Comprueba las versiones de los agentes activos y recarga los que cambiaron
+
+        Returns:
+            IDs de los agentes nuevos, modificados o retirados
+        """
+        with self._refresh_lock:
+            versions = self._versions()
+            current = self._snapshot or {}
+            changed = [agent_id for agent_id, version in versions.items()
+                       if agent_id not in current or current[agent_id].version != version]
+            removed = [agent_id for agent_id in current if agent_id not in versions]
+            self._checked_at = time.time()
+            if not changed and not removed and self._snapshot is not None:
+                return []
+
+            snapshot = {agent_id: entry for agent_id, entry in current.items() if agent_id in versions}
+            for row in self._load(changed):
+                config = agent_config_from_row(row)
+                previous = current.get(row["id"])
+                # Los agentes en uso se compilan antes de publicar la nueva versión
+                agent = self._build(config) if previous is not None and previous.agent is not None else None
+                snapshot[row["id"]] = _Entry(row["version"], config, agent)
+
+            self._snapshot = snapshot
+            self._reloads += 1
+            if current:
+                logger.info(f"Catálogo de agentes actualizado: {len(changed)} nuevos o modificados, {len(removed)} retirados")
+            return changed + removed
+
+    def start(self) -> None:
+        """Carga el catálogo e inicia la comprobación periódica de versiones."""
+        self._ensure_loaded()
+        self._start_refresh_thread()
+
+    def stop(self) -> None:
+        """Detiene la comprobación periódica."""
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=1.0)
+            self._refresh_thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Agentes en el catálogo, compilados, recargas y última comprobación."""
+        snapshot = self._snapshot or {}
+        return {
+            "agents": len(snapshot),
+            "compiled": sum(1 for entry in snapshot.values() if entry.agent is not None),
+            "versions": {agent_id: entry.version for agent_id, entry in snapshot.items()},
+            "reloads": self._reloads,
+            "builds": self._builds,
+            "checked_at": self._checked_at
+        }
+
+    def _ensure_loaded(self) -> Dict[int, _Entry]:
+        if self._snapshot is None:
+            self.refresh()
+            self._start_refresh_thread()
+        return self._snapshot
+
+    def _build(self, config: Dict[str, Any]):
+        agent = self.agent_factory(config)
+        self._builds += 1
+        return agent
+
+    def _start_refresh_thread(self) -> None:
+        with self._refresh_lock:
+            if self.refresh_interval <= 0 or self._refresh_thread is not None:
+                return
+            self._stop_event.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="agent-catalog-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error al actualizar el catálogo de agentes: {str(e)}")
+
+    def _connect(self):
+        from sqlalchemy import create_engine
+
+        if not self.database_url:
+            raise ValueError("Se requiere AGENT_CATALOG_DATABASE_URL o DATABASE_URL para el catálogo de agentes")
+        if self._engine is None:
+            self._engine = create_engine(
+                self.database_url,
+                pool_pre_ping=True,
+                connect_args={"check_same_thread": False} if self.database_url.startswith("sqlite") else {}
+            )
+        return self._engine.connect()
+
+    def _versions(self) -> Dict[int, int]:
+        """IDs y versiones de los agentes activos (consulta ligera, sin la configuración)."""
+        from sqlalchemy import text
+
+        with self._connect() as connection:
+            rows = connection.execute(text("SELECT id, version FROM agents WHERE status = 'ACTIVE'")).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def _load(self, agent_ids: List[int]) -> List[Dict[str, Any]]:
+        """Configuración completa de los agentes indicados."""
+        if not agent_ids:
+            return []
+
+        from sqlalchemy import text, bindparam
+
+        query = text(
+            "SELECT id, name, description, configuration, version FROM agents WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        with self._connect() as connection:
+            rows = connection.execute(query, {"ids": list(agent_ids)}).mappings().all()
+        return [dict(row) for row in rows]
+
+
+# Catálogo compartido por el proceso
+agent_catalog = AgentCatalog()
@@ -0,0 +1,109 @@
+"""Pool de runtimes compilados de agentes compartidos entre conversaciones."""
+
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable
+
+from config import AGENT_POOL_MAX_SIZE
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """Caché LRU de runtimes de agentes (modelo, prompts, cadena y ejecutor).
+
+    Construir un agente implica crear el cliente del modelo, las plantillas de
+    prompt, la cadena y el ejecutor con sus herramientas. Todo ello depende solo
+    de la configuración del agente (plantilla, modelo, temperatura, herramientas),
+    así que se construye una vez por configuración y se reutiliza en todas las
+    conversaciones; la memoria de cada conversación se inyecta al procesar el
+    mensaje. Cuando el pool se llena se descarta el runtime usado hace más tiempo.
+    """
+
+    def __init__(self, max_size: int = AGENT_POOL_MAX_SIZE):
+        """Inicializa el pool
+
+        Args:
+            max_size: Número máximo de runtimes en memoria
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(**config) -> str:
+        """Construye la clave del pool a partir de la configuración del agente."""
+        payload = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, builder: Callable[[], Any]) -> Any:
+        """Obtiene el runtime de una configuración, construyéndolo si no existe
+
+        Args:
+            key: Clave de la configuración (ver make_key)
+            builder: Función que construye el runtime
+
+        Returns:
+            El runtime compartido para esa configuración
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Un solo hilo construye cada configuración; el resto espera su resultado
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return self._entries[key]
+                self._misses += 1
+
+            runtime = builder()
+
+            with self._lock:
+                self._entries[key] = runtime
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+                    self._evictions += 1
+                    logger.info(f"Runtime de agente {evicted[:12]} descartado del pool")
+                self._build_locks.pop(key, None)
+
+        return runtime
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del pool: aciertos, construcciones, descartes y tamaño."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self) -> None:
+        """Descarta todos los runtimes del pool."""
+        with self._lock:
+            self._entries.clear()
+            self._build_locks.clear()
+
+
+# Pool compartido por el proceso
+agent_pool = AgentPool()
@@ -0,0 +1,349 @@
+"""Enrutamiento de mensajes entrantes a las plantillas de agente con un clasificador local (sin LLM)."""
+
+import json
+import time
+import zlib
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from fast_path import normalize_text
+from config import (
+    AGENT_TEMPLATES,
+    AGENT_TOOLS,
+    AGENT_ROUTER_DIMENSIONS,
+    AGENT_ROUTER_MIN_CONFIDENCE,
+    AGENT_ROUTER_DEFAULT_TEMPLATE,
+    AGENT_ROUTER_TRAINING_PATH,
+    AGENT_ROUTER_LOG_PATH
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CREDIT_SALES = "credit_sales"
+CUSTOMER_SUPPORT = "customer_support"
+
+# Transcripciones etiquetadas de partida (se amplían con las interacciones registradas)
+SEED_TRANSCRIPTS: List[Tuple[str, str]] = [
+    ("hola quiero informacion sobre sus creditos", CREDIT_SALES),
+    ("me interesa un prestamo personal", CREDIT_SALES),
+    ("quiero un credito para mi negocio", CREDIT_SALES),
+    ("cuales son los requisitos para un credito", CREDIT_SALES),
+    ("cuanto me pueden prestar si gano 15000 al mes", CREDIT_SALES),
+    ("cuanto pagaria al mes por 50000 a 24 meses", CREDIT_SALES),
+    ("que tasas de interes manejan", CREDIT_SALES),
+    ("que plazos tienen disponibles", CREDIT_SALES),
+    ("necesito dinero para remodelar mi casa", CREDIT_SALES),
+    ("quiero solicitar un credito", CREDIT_SALES),
+    ("puedo pedir un prestamo si tengo mal historial", CREDIT_SALES),
+    ("que documentos necesito para solicitar", CREDIT_SALES),
+    ("me llego su mensaje de la promocion y me interesa", CREDIT_SALES),
+    ("simula un credito de 30 mil a 12 meses", CREDIT_SALES),
+    ("cual es el monto maximo que prestan", CREDIT_SALES),
+    ("quiero comparar opciones de credito", CREDIT_SALES),
+    ("cual es el estado de mi solicitud APP123456", CUSTOMER_SUPPORT),
+    ("como va mi solicitud", CUSTOMER_SUPPORT),
+    ("ya aprobaron mi credito", CUSTOMER_SUPPORT),
+    ("envie mis documentos y no me han respondido", CUSTOMER_SUPPORT),
+    ("tengo dudas sobre mi contrato", CUSTOMER_SUPPORT),
+    ("me cobraron una comision que no entiendo", CUSTOMER_SUPPORT),
+    ("no me ha llegado el deposito del credito", CUSTOMER_SUPPORT),
+    ("quiero hablar con un asesor sobre mi solicitud", CUSTOMER_SUPPORT),
+    ("como puedo pagar mi mensualidad", CUSTOMER_SUPPORT),
+    ("me rechazaron la solicitud por que", CUSTOMER_SUPPORT),
+    ("necesito actualizar mis datos de contacto", CUSTOMER_SUPPORT),
+    ("me pidieron un comprobante de domicilio adicional", CUSTOMER_SUPPORT),
+    ("quiero cancelar mi solicitud", CUSTOMER_SUPPORT),
+    ("tengo un problema con mi pago", CUSTOMER_SUPPORT),
+    ("cuando depositan el dinero de mi credito aprobado", CUSTOMER_SUPPORT),
+    ("seguimiento de mi solicitud numero APP987654", CUSTOMER_SUPPORT),
+]
+
+
+def _features(text: str) -> List[str]:
+    """Palabras, bigramas y trigramas de caracteres del texto (los números se reemplazan por marcadores)."""
+    words = []
+    for word in normalize_text(text).split():
+        word = "".join(ch for ch in word if ch.isalnum() or ch == "%")
+        if not word:
+            continue
+        if word.startswith("app") and word[3:].isdigit():
+            word = "<app_id>"
+        elif any(ch.isdigit() for ch in word):
+            word = "<num>"
+        words.append(word)
+    features = words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        if len(word) > 3 and not word.startswith("<"):
+            padded = f"#{word}#"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def embed(text: str, dimensions: int = AGENT_ROUTER_DIMENSIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Vector disperso normalizado de un texto con el hashing trick
+
+    Cada rasgo se asigna a una posición con CRC32 (estable entre procesos) y un
+    signo derivado del mismo hash, para que las colisiones tiendan a cancelarse.
+
+    Returns:
+        Tupla (índices, valores) del vector L2-normalizado
+    """
+    weights: Dict[int, float] = defaultdict(float)
+    for feature in _features(text):
+        digest = zlib.crc32(feature.encode("utf-8"))
+        weights[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+    if not weights:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    norm = np.linalg.norm(values)
+    return indices, values / norm if norm else values
+
+
+def load_examples(path: str, min_confidence: Optional[float] = None) -> List[Tuple[str, str]]:
+    """Lee ejemplos etiquetados de un archivo JSON Lines
+
+    Se usan las líneas con `message` y `label` (corrección manual). Las decisiones
+    registradas por el enrutador sin `label` solo se usan si se indica
+    `min_confidence`, y nunca las que acabaron en la plantilla por defecto: entrenar
+    con sus propias decisiones dudosas reforzaría los errores del enrutador. Se
+    ignoran las plantillas desconocidas.
+
+    Args:
+        path: Ruta del archivo
+        min_confidence: Confianza mínima para usar una decisión sin etiquetar (None = solo etiquetados)
+
+    Returns:
+        Lista de pares (mensaje, plantilla)
+    """
+    examples = []
+    with open(path, encoding="utf-8") as examples_file:
+        for line in examples_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            template = record.get("label")
+            if template is None and min_confidence is not None and _is_confident_decision(record, min_confidence):
+                template = record.get("template")
+            if record.get("message") and template in AGENT_TEMPLATES:
+                examples.append((record["message"], template))
+    return examples
+
+
+def _is_confident_decision(record: Dict[str, Any], min_confidence: float) -> bool:
+    """Decisión registrada por `route` que no usó la plantilla por defecto y supera la confianza mínima."""
+    return (
+        not record.get("fallback")
+        and record.get("template") == record.get("predicted")
+        and record.get("confidence", 0.0) >= min_confidence
+    )
+
+
+class AgentRouter:
+    """Decide qué plantilla de agente (`AGENT_TEMPLATES`) atiende cada mensaje entrante.
+
+    Clasificador de centroides más cercanos sobre vectores con hashing trick:
+    el centroide de cada plantilla es la media normalizada de sus ejemplos y un
+    mensaje se asigna a la plantilla con mayor similitud coseno. La confianza es
+    el softmax de las similitudes; por debajo de `min_confidence` se usa la
+    plantilla por defecto. Enrutar un mensaje no sale del proceso y tarda
+    del orden de 0,1 ms.
+
+    Con `log_path`, cada decisión se registra en JSON Lines; esos registros,
+    revisados y etiquetados con `label`, sirven para reentrenar con `retrain` o al
+    arrancar mediante AGENT_ROUTER_TRAINING_PATH.
+    """
+
+    _TEMPERATURE = 0.1  # escala de las similitudes para el softmax
+
+    def __init__(
+        self,
+        examples: Optional[Iterable[Tuple[str, str]]] = None,
+        dimensions: int = AGENT_ROUTER_DIMENSIONS,
+        min_confidence: float = AGENT_ROUTER_MIN_CONFIDENCE,
+        default_template: str = AGENT_ROUTER_DEFAULT_TEMPLATE,
+        log_path: Optional[str] = AGENT_ROUTER_LOG_PATH
+    ):
+        """Inicializa y entrena el enrutador
+
+        Args:
+            examples: Pares (mensaje, plantilla); por defecto, SEED_TRANSCRIPTS
+            dimensions: Tamaño del vector con hashing trick
+            min_confidence: Confianza mínima para no usar la plantilla por defecto
+            default_template: Plantilla para los mensajes ambiguos
+            log_path: Archivo JSON Lines donde registrar las decisiones (None = sin registro)
+        """
+        self.dimensions = dimensions
+        self.min_confidence = min_confidence
+        self.default_template = default_template
+        self.log_path = log_path
+        self._model: Tuple[Tuple[str, ...], np.ndarray] = ((), np.empty((0, dimensions), dtype=np.float32))
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._routed: Counter = Counter()
+        self._fallbacks = 0
+        self._total_seconds = 0.0
+        self.train(SEED_TRANSCRIPTS if examples is None else examples)
+
+    def train(self, examples: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """Entrena los centroides y reemplaza el modelo en uso de forma atómica
+
+        Args:
+            examples: Pares (mensaje, plantilla)
+
+        Returns:
+            Número de ejemplos por plantilla
+        """
+        sums: Dict[str, np.ndarray] = {}
+        counts: Counter = Counter()
+        for message, template in examples:
+            indices, values = embed(message, self.dimensions)
+            if template not in sums:
+                sums[template] = np.zeros(self.dimensions, dtype=np.float32)
+            np.add.at(sums[template], indices, values)
+            counts[template] += 1
+        if not sums:
+            raise ValueError("El enrutador necesita al menos un ejemplo etiquetado")
+
+        templates = tuple(sorted(sums))
+        centroids = np.stack([sums[template] / counts[template] for template in templates])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self._model = (templates, centroids / np.where(norms == 0, 1, norms))
+        logger.info(f"Enrutador de agentes entrenado: {dict(counts)}")
+        return dict(counts)
+
+    def retrain(self, examples: Iterable[Tuple[str, str]], include_seed: bool = True) -> Dict[str, int]:
+        """Reentrena con interacciones registradas
+
+        Args:
+            examples: Pares (mensaje, plantilla), por ejemplo de `load_examples`
+            include_seed: Conservar también las transcripciones de partida
+
+        Returns:
+            Número de ejemplos por plantilla
+        """
+        examples = list(examples)
+        return self.train((list(SEED_TRANSCRIPTS) if include_seed else []) + examples)
+
+    def predict(self, message: str) -> Tuple[str, float, Dict[str, float]]:
+        """Clasifica un mensaje
+
+        Returns:
+            Tupla (plantilla más cercana, confianza, similitud coseno por plantilla)
+        """
+        templates, centroids = self._model
+        indices, values = embed(message, self.dimensions)
+        if not indices.size:
+            return self.default_template, 0.0, {}
+        similarities = centroids[:, indices] @ values
+        scaled = np.exp((similarities - similarities.max()) / self._TEMPERATURE)
+        best = int(similarities.argmax())
+        confidence = float(scaled[best] / scaled.sum())
+        return templates[best], confidence, {t: round(float(s), 4) for t, s in zip(templates, similarities)}
+
+    def route(self, message: str) -> Dict[str, Any]:
+        """Elige la plantilla de agente para un mensaje entrante
+
+        Args:
+            message: Mensaje del cliente
+
+        Returns:
+            Dict con template, confidence y fallback (True si se usó la plantilla por defecto)
+        """
+        start = time.perf_counter()
+        predicted, confidence, similarities = self.predict(message)
+        fallback = confidence < self.min_confidence
+        template = self.default_template if fallback else predicted
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._routed[template] += 1
+            self._fallbacks += int(fallback)
+            self._total_seconds += elapsed
+
+        if self.log_path:
+            self._log(message, template, predicted, confidence, fallback)
+        return {"template": template, "confidence": round(confidence, 4), "fallback": fallback, "similarities": similarities}
+
+    def dispatch(self, message: str, **overrides) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Enruta un mensaje y construye la configuración del agente que lo atiende
+
+        Args:
+            message: Mensaje del cliente
+            **overrides: Argumentos del constructor del agente que reemplazan a los de la plantilla
+
+        Returns:
+            Tupla (decisión de `route`, configuración para AgentRuntime.submit / create_agent_from_config)
+        """
+        decision = self.route(message)
+        return decision, agent_config_for(decision["template"], **overrides)
+
+    def stats(self) -> Dict[str, Any]:
+        """Mensajes enrutados por plantilla, proporción de fallback y tiempo medio."""
+        with self._lock:
+            total = sum(self._routed.values())
+            return {
+                "routed": total,
+                "by_template": dict(self._routed),
+                "fallback_share": round(self._fallbacks / total, 4) if total else 0.0,
+                "avg_us": round(self._total_seconds / total * 1e6, 2) if total else 0.0,
+                "templates": list(self._model[0])
+            }
+
+    def _log(self, message: str, template: str, predicted: str, confidence: float, fallback: bool) -> None:
+        record = {
+            "ts": time.time(),
+            "message": message,
+            "template": template,
+            "predicted": predicted,
+            "confidence": round(confidence, 4),
+            "fallback": fallback
+        }
+        try:
+            with self._log_lock, open(self.log_path, "a", encoding="utf-8") as log_file:
+                log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudo registrar la decisión del enrutador: {str(e)}")
+
+
+def agent_config_for(template: str, **overrides) -> Dict[str, Any]:
+    """Configuración de agente (ver agent_runtime.create_agent_from_config) para una plantilla
+
+    Args:
+        template: Clave de AGENT_TEMPLATES
+        **overrides: Argumentos del constructor que reemplazan a los de la plantilla
+
+    Returns:
+        Dict con type, agent_id, name, description, system_prompt y tools
+    """
+    spec = AGENT_TEMPLATES[template]
+    return {
+        "type": "credit_sales" if template == CREDIT_SALES else "base",
+        "agent_id": template,
+        "name": spec["name"],
+        "description": spec["description"],
+        "system_prompt": spec["system_prompt"],
+        "tools": [{"id": tool, **AGENT_TOOLS.get(tool, {})} for tool in spec.get("tools", [])],
+        **overrides
+    }
+
+
+def create_agent_router() -> AgentRouter:
+    """Crea el enrutador con las transcripciones de partida y, si existe, el archivo de entrenamiento configurado."""
+    examples = list(SEED_TRANSCRIPTS)
+    if AGENT_ROUTER_TRAINING_PATH:
+        try:
+            examples += load_examples(AGENT_ROUTER_TRAINING_PATH)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudieron cargar los ejemplos de {AGENT_ROUTER_TRAINING_PATH}: {str(e)}")
+    return AgentRouter(examples)
+
+
+# Enrutador compartido por el proceso
+agent_router = create_agent_router()
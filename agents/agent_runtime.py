@@ -0,0 +1,395 @@
+"""Runtime de agentes en procesos dedicados, separado de los workers de la API."""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import zlib
+import multiprocessing
+from multiprocessing.connection import wait as wait_connections
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional
+
+from config import (
+    AGENT_RUNTIME_WORKERS,
+    AGENT_RUNTIME_CONCURRENCY,
+    AGENT_RUNTIME_MAX_AGENTS,
+    AGENT_RUNTIME_START_METHOD,
+    AGENT_TURN_TIMEOUT
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_ERROR_RESPONSE = "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde."
+
+
+def create_agent_from_config(config: Dict[str, Any]):
+    """Crea un agente a partir de su configuración (se ejecuta dentro del worker)
+
+    Args:
+        config: Dict con `type` ("credit_sales" o "base") y los argumentos del constructor del agente
+
+    Returns:
+        Instancia de CreditSalesAgent o BaseAgent
+    """
+    config = dict(config)
+    agent_type = config.pop("type", "credit_sales")
+    if agent_type == "credit_sales":
+        from credit_sales_agent import CreditSalesAgent
+        return CreditSalesAgent(**config)
+    from base_agent import BaseAgent
+    return BaseAgent(**config)
+
+
+def worker_for(client_id: str, agent_id: str, workers: int) -> int:
+    """Worker asignado a una conversación (estable entre reinicios y entre procesos)."""
+    return zlib.crc32(f"{client_id}\x1f{agent_id}".encode("utf-8")) % workers
+
+
+class _AgentWorker:
+    """Lado del proceso worker: mantiene las instancias de agentes y atiende los turnos de forma asíncrona.
+
+    Cada turno se procesa con `aprocess_message`, hasta `concurrency` a la vez;
+    los turnos de una misma conversación se atienden en orden de llegada. Los
+    eventos se envían por una tubería propia del worker (`results`), de modo que
+    si el proceso muere a mitad de un envío no bloquea los resultados de los demás.
+    """
+
+    def __init__(self, index: int, inbox, results, agent_factory: Callable, concurrency: int, max_agents: int):
+        self.index = index
+        self.inbox = inbox
+        self.results = results
+        self.agent_factory = agent_factory
+        self.concurrency = concurrency
+        self.max_agents = max_agents
+        self._agents: "OrderedDict[str, Any]" = OrderedDict()
+        self._conversation_locks: Dict[Any, List[Any]] = {}  # clave -> [lock, turnos que lo usan]
+
+    def run(self) -> None:
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        logger.info(f"Worker de agentes {self.index} iniciado (pid {os.getpid()})")
+        while True:
+            turn = await loop.run_in_executor(None, self.inbox.get)
+            if turn is None:
+                break
+            await semaphore.acquire()
+            task = asyncio.create_task(self._handle(turn))
+            tasks.add(task)
+            task.add_done_callback(lambda done: (tasks.discard(done), semaphore.release()))
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle(self, turn: Dict[str, Any]) -> None:
+        turn_id = turn["turn_id"]
+        key = (turn["client_id"], turn["agent_config"].get("agent_id"))
+        entry = self._conversation_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        lock = entry[0]
+        try:
+            async with lock:
+                self.results.send({"turn_id": turn_id, "event": "started", "worker": self.index})
+                agent = self._get_agent(turn["agent_config"])
+                memory = agent.conversation_memory(turn["client_id"])
+                result = await agent.aprocess_message(
+                    turn["message"],
+                    context=turn.get("context"),
+                    memory=memory,
+                    timeout=turn.get("timeout")
+                )
+            self.results.send({"turn_id": turn_id, "event": "result", "result": result})
+        except Exception as e:
+            logger.error(f"Error en el worker {self.index} al procesar el turno {turn_id}: {str(e)}")
+            self.results.send({"turn_id": turn_id, "event": "error", "error": str(e)})
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._conversation_locks[key]
+
+    def _get_agent(self, agent_config: Dict[str, Any]):
+        """Instancia del agente para una configuración (LRU de `max_agents` por worker).
+
+        Las instancias se guardan por agent_id: una configuración distinta para el
+        mismo agente (una nueva versión del catálogo) crea una instancia nueva que
+        sustituye a la anterior; los turnos en curso terminan con la anterior.
+        """
+        agent_id = agent_config.get("agent_id")
+        config_key = repr(sorted(agent_config.items()))
+        entry = self._agents.get(agent_id)
+        if entry is None or entry[0] != config_key:
+            entry = (config_key, self.agent_factory(agent_config))
+            self._agents[agent_id] = entry
+            self._agents.move_to_end(agent_id)
+            while len(self._agents) > self.max_agents:
+                self._agents.popitem(last=False)
+        else:
+            self._agents.move_to_end(agent_id)
+        return entry[1]
+
+
+def _worker_main(index: int, inbox, results, agent_factory: Callable, concurrency: int, max_agents: int) -> None:
+    _AgentWorker(index, inbox, results, agent_factory, concurrency, max_agents).run()
+
+
+class AgentRuntime:
+    """Pool de procesos que ejecutan los agentes fuera de los workers de la API.
+
+    Cada worker es un proceso con sus propias instancias de agentes y su propia
+    cola de entrada; las conversaciones tienen afinidad con un worker (hash de
+    cliente y agente), de modo que la memoria con resumen, la caché de
+    herramientas y el runtime compilado de cada conversación viven en un único
+    proceso. La capa de API solo encola turnos y espera (`submit`/`asubmit`) o
+    recibe por eventos (`astream`) los resultados; no necesita importar LangChain,
+    así que la capacidad de los agentes escala con `workers` independientemente
+    del número de workers HTTP. Si un worker muere, sus turnos pendientes fallan
+    y se reinicia.
+
+    Uso típico en la aplicación que atiende las peticiones:
+
+        runtime = AgentRuntime(workers=4)
+        runtime.start()
+        result = await runtime.asubmit({"type": "credit_sales", ...}, client_id, message)
+    """
+
+    _LIVENESS_INTERVAL = 0.5  # segundos entre comprobaciones de que los workers siguen vivos
+
+    def __init__(
+        self,
+        workers: int = AGENT_RUNTIME_WORKERS,
+        agent_factory: Callable[[Dict[str, Any]], Any] = create_agent_from_config,
+        concurrency: int = AGENT_RUNTIME_CONCURRENCY,
+        max_agents: int = AGENT_RUNTIME_MAX_AGENTS,
+        start_method: str = AGENT_RUNTIME_START_METHOD
+    ):
+        """Inicializa el runtime (los procesos se crean con `start`)
+
+        Args:
+            workers: Número de procesos worker
+            agent_factory: Función de nivel de módulo que crea un agente a partir de su configuración
+            concurrency: Turnos simultáneos por worker
+            max_agents: Instancias de agentes en memoria por worker
+            start_method: Método de arranque de multiprocessing ("spawn", "forkserver" o "fork")
+        """
+        self.workers = workers
+        self.agent_factory = agent_factory
+        self.concurrency = concurrency
+        self.max_agents = max_agents
+        self._context = multiprocessing.get_context(start_method)
+        self._results: List[Any] = []
+        self._inboxes: List[Any] = []
+        self._processes: List[Any] = []
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._running = False
+        self._restarts = 0
+
+    def start(self) -> None:
+        """Inicia los procesos worker y el hilo que recoge los resultados."""
+        if self._running:
+            return
+        self._results = [None] * self.workers
+        self._inboxes = [self._context.Queue() for _ in range(self.workers)]
+        self._processes = [self._spawn(index) for index in range(self.workers)]
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="agent-runtime-results", daemon=True)
+        self._collector.start()
+        logger.info(f"Runtime de agentes iniciado con {self.workers} workers")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene los workers después de terminar los turnos en curso."""
+        if not self._running:
+            return
+        self._running = False
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._collector is not None:
+            self._collector.join(timeout=2)
+        self._fail_pending(lambda turn: True, "El runtime de agentes se detuvo")
+
+    def submit(
+        self,
+        agent_config: Dict[str, Any],
+        client_id: str,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = AGENT_TURN_TIMEOUT
+    ) -> Future:
+        """Encola un turno en el worker de la conversación
+
+        Args:
+            agent_config: Configuración del agente (ver create_agent_from_config); debe incluir agent_id
+            client_id: ID del cliente
+            message: Mensaje del cliente
+            context: Contexto adicional del turno
+            timeout: Tiempo máximo del turno dentro del worker
+
+        Returns:
+            Future con el dict de respuesta de `process_message`
+        """
+        return self._enqueue(agent_config, client_id, message, context, timeout, events=None)
+
+    async def asubmit(
+        self,
+        agent_config: Dict[str, Any],
+        client_id: str,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = AGENT_TURN_TIMEOUT
+    ) -> Dict[str, Any]:
+        """Versión asíncrona de `submit`: espera la respuesta sin bloquear el event loop."""
+        return await asyncio.wrap_future(self.submit(agent_config, client_id, message, context, timeout))
+
+    async def astream(
+        self,
+        agent_config: Dict[str, Any],
+        client_id: str,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = AGENT_TURN_TIMEOUT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Encola un turno y emite sus eventos: queued, started (con el worker) y result o error."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def publish(event: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        future = self._enqueue(agent_config, client_id, message, context, timeout, events=publish)
+        yield {"event": "queued", "worker": worker_for(client_id, agent_config.get("agent_id"), self.workers)}
+        while True:
+            event = await events.get()
+            yield event
+            if event["event"] in ("result", "error"):
+                break
+        await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = [turn["worker"] for turn in self._pending.values()]
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for process in self._processes if process.is_alive()),
+            "pending_turns": len(pending),
+            "pending_by_worker": [pending.count(index) for index in range(self.workers)],
+            "restarts": self._restarts
+        }
+
+    def _spawn(self, index: int):
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._inboxes[index], writer, self.agent_factory, self.concurrency, self.max_agents),
+            name=f"agent-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        # Solo el worker conserva el extremo de escritura: si muere, la lectura recibe EOF
+        writer.close()
+        self._results[index] = reader
+        return process
+
+    def _enqueue(self, agent_config, client_id, message, context, timeout, events) -> Future:
+        if not self._running:
+            raise RuntimeError("El runtime de agentes no está iniciado")
+        if not agent_config.get("agent_id"):
+            raise ValueError("agent_config debe incluir agent_id")
+
+        turn_id = uuid.uuid4().hex
+        index = worker_for(client_id, agent_config["agent_id"], self.workers)
+        future: Future = Future()
+        with self._lock:
+            self._pending[turn_id] = {"future": future, "worker": index, "events": events, "submitted_at": time.time()}
+        self._inboxes[index].put({
+            "turn_id": turn_id,
+            "agent_config": agent_config,
+            "client_id": client_id,
+            "message": message,
+            "context": context,
+            "timeout": timeout
+        })
+        return future
+
+    def _collect(self) -> None:
+        """Recoge los eventos de los workers y vigila que sigan vivos.
+
+        La vigilancia se hace cada `_LIVENESS_INTERVAL` segundos aunque lleguen
+        resultados sin pausa de otros workers, para que los turnos de un worker
+        caído no queden pendientes para siempre.
+        """
+        next_check = time.monotonic() + self._LIVENESS_INTERVAL
+        while self._running or self._pending:
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self._LIVENESS_INTERVAL
+            readers = [reader for reader in self._results if reader is not None]
+            ready = wait_connections(readers, timeout=max(0.0, next_check - time.monotonic()))
+            if not ready:
+                if not self._running:
+                    return
+                continue
+
+            for reader in ready:
+                try:
+                    event = reader.recv()
+                except (EOFError, OSError):
+                    # El worker terminó: se reinicia en la próxima comprobación
+                    self._results[self._results.index(reader)] = None
+                    next_check = min(next_check, time.monotonic() + 0.05)
+                    continue
+                self._dispatch(event)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        """Entrega un evento de un worker al turno pendiente correspondiente."""
+        with self._lock:
+            turn = self._pending.get(event["turn_id"])
+            if turn is not None and event["event"] != "started":
+                del self._pending[event["turn_id"]]
+        if turn is None:
+            return
+        if turn["events"] is not None:
+            turn["events"](event)
+        if event["event"] == "result":
+            turn["future"].set_result(event["result"])
+        elif event["event"] == "error":
+            turn["future"].set_result({"response": _ERROR_RESPONSE, "success": False, "error": event["error"]})
+
+    def _check_workers(self) -> None:
+        if not self._running:
+            return
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            logger.error(f"El worker de agentes {index} terminó (código {process.exitcode}); reiniciándolo")
+            # Cola y tubería nuevas antes de dar por fallidos los pendientes: un turno encolado
+            # en la cola anterior ya está registrado y falla a continuación, y los siguientes van a la nueva
+            if self._results[index] is not None:
+                self._results[index].close()
+            self._inboxes[index] = self._context.Queue()
+            self._processes[index] = self._spawn(index)
+            self._restarts += 1
+            self._fail_pending(lambda turn: turn["worker"] == index, f"El worker de agentes {index} terminó inesperadamente")
+
+    def _fail_pending(self, predicate: Callable[[Dict[str, Any]], bool], error: str) -> None:
+        with self._lock:
+            failed = {turn_id: turn for turn_id, turn in self._pending.items() if predicate(turn)}
+            for turn_id in failed:
+                del self._pending[turn_id]
+        for turn_id, turn in failed.items():
+            event = {"turn_id": turn_id, "event": "error", "error": error}
+            if turn["events"] is not None:
+                turn["events"](event)
+            turn["future"].set_result({"response": _ERROR_RESPONSE, "success": False, "error": error})
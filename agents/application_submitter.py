@@ -0,0 +1,656 @@
+"""Envío asíncrono de solicitudes de crédito a la API externa, con reintentos, idempotencia y aviso al cliente."""
+
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from project_paths import INTEGRATIONS_DIR, ensure_importable
+from config import (
+    CREDIT_SUBMISSION_BACKEND,
+    CREDIT_SUBMISSION_DATABASE_URL,
+    CREDIT_SUBMISSION_WORKERS,
+    CREDIT_SUBMISSION_MAX_ATTEMPTS,
+    CREDIT_SUBMISSION_BACKOFF_BASE,
+    CREDIT_SUBMISSION_BACKOFF_MAX,
+    CREDIT_SUBMISSION_POLL_INTERVAL,
+    CREDIT_SUBMISSION_LEASE,
+    CREDIT_SUBMISSION_NOTIFY
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Estados de un envío
+QUEUED = "queued"
+SUBMITTING = "submitting"
+SUBMITTED = "submitted"
+FAILED = "failed"
+
+# Estado devuelto por la API externa -> ApplicationStatus del backend (se guarda por nombre)
+_APPLICATION_STATUS = {
+    "pending": "PENDING",
+    "review": "REVIEW",
+    "in_review": "REVIEW",
+    "under_review": "REVIEW",
+    "approved": "APPROVED",
+    "rejected": "REJECTED"
+}
+
+# Códigos HTTP que se reintentan (además de los errores de conexión y los 5xx)
+_RETRYABLE_STATUS = {408, 409, 425, 429}
+
+# Errores de CreditAPIClient que no se resuelven reintentando
+_PERMANENT_ERRORS = {"API no configurada"}
+
+
+def idempotency_key_for(application_data: Dict[str, Any], client_ref: Optional[str] = None) -> str:
+    """Clave de idempotencia de una solicitud: el mismo cliente con los mismos datos produce la misma clave."""
+    canonical = json.dumps({"client": client_ref, "application": application_data}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SubmissionStore:
+    """Interfaz del almacén de envíos pendientes."""
+
+    def add(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda un envío nuevo; si ya existe uno con la misma clave de idempotencia lo devuelve (reencolado si había fallado)."""
+        raise NotImplementedError
+
+    def claim(self, limit: int, lease: float) -> List[Dict[str, Any]]:
+        """Reserva hasta `limit` envíos pendientes durante `lease` segundos e incrementa sus intentos."""
+        raise NotImplementedError
+
+    def complete(self, job: Dict[str, Any], external_application_id: Optional[str], application_status: str) -> None:
+        """Marca un envío como enviado y actualiza la solicitud con el ID externo y su estado."""
+        raise NotImplementedError
+
+    def retry(self, job: Dict[str, Any], error: str, delay: float) -> None:
+        """Devuelve un envío a la cola para reintentarlo dentro de `delay` segundos."""
+        raise NotImplementedError
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        """Marca un envío como fallido definitivamente."""
+        raise NotImplementedError
+
+    def mark_notified(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """Número de envíos por estado."""
+        raise NotImplementedError
+
+
+class InMemorySubmissionStore(SubmissionStore):
+    """Envíos en memoria del proceso (desarrollo y pruebas; se pierden al reiniciar)."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(job["idempotency_key"]))
+            if existing is not None:
+                if existing["status"] == FAILED:
+                    existing.update(status=QUEUED, attempts=0, next_attempt_at=time.time(), last_error=None)
+                return {**existing, "duplicate": True}
+            stored = {**job, "next_attempt_at": time.time(), "locked_until": None, "application_id": None}
+            self._jobs[job["tracking_id"]] = stored
+            self._by_key[job["idempotency_key"]] = job["tracking_id"]
+            return dict(stored)
+
+    def claim(self, limit: int, lease: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda job: job["next_attempt_at"]):
+                if len(claimed) >= limit:
+                    break
+                due = job["status"] == QUEUED and job["next_attempt_at"] <= now
+                expired = job["status"] == SUBMITTING and job["locked_until"] < now
+                if due or expired:
+                    job.update(status=SUBMITTING, locked_until=now + lease, attempts=job["attempts"] + 1)
+                    claimed.append(dict(job))
+        return claimed
+
+    def complete(self, job: Dict[str, Any], external_application_id: Optional[str], application_status: str) -> None:
+        self._update(job, status=SUBMITTED, external_application_id=external_application_id,
+                     application_status=application_status, locked_until=None, last_error=None)
+
+    def retry(self, job: Dict[str, Any], error: str, delay: float) -> None:
+        self._update(job, status=QUEUED, next_attempt_at=time.time() + delay, locked_until=None, last_error=error)
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        self._update(job, status=FAILED, locked_until=None, last_error=error)
+
+    def mark_notified(self, job: Dict[str, Any]) -> None:
+        self._update(job, notified=True)
+
+    def get(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(tracking_id)
+            return dict(job) if job else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+    def _update(self, job: Dict[str, Any], **values) -> None:
+        with self._lock:
+            self._jobs[job["tracking_id"]].update(values)
+
+
+class DatabaseSubmissionStore(SubmissionStore):
+    """Envíos en la tabla `credit_application_submissions`, compartidos por todos los procesos.
+
+    Al encolar se crea también la fila de `credit_applications` (estado
+    pendiente, vinculada al cliente por email si existe). Los workers reservan
+    cada envío con un UPDATE condicional y un plazo (`lease`), de modo que un
+    envío solo lo procesa un worker a la vez y, si ese worker muere, otro lo
+    retoma al vencer el plazo.
+    """
+
+    def __init__(self, database_url: str = CREDIT_SUBMISSION_DATABASE_URL, create_tables: bool = False):
+        """Inicializa el almacén
+
+        Args:
+            database_url: URL de la base de datos del backend
+            create_tables: Crear las tablas si no existen (en producción la de envíos la crea la migración 004 del backend)
+        """
+        from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, Text, DateTime, Boolean, JSON, ForeignKey
+        from sqlalchemy.sql import func
+
+        if not database_url:
+            raise ValueError("Se requiere CREDIT_SUBMISSION_DATABASE_URL o DATABASE_URL para la cola de envíos en base de datos")
+
+        self.engine = create_engine(
+            database_url,
+            pool_pre_ping=True,
+            connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {}
+        )
+        metadata = MetaData()
+        # Solo las columnas que usa la cola (las tablas completas las define backend/models.py)
+        self.clients = Table(
+            "clients",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("email", String)
+        )
+        self.applications = Table(
+            "credit_applications",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("client_id", Integer, ForeignKey("clients.id")),
+            Column("amount", Float),
+            Column("term", Integer),
+            Column("purpose", String),
+            Column("status", String),
+            Column("external_application_id", String),
+            Column("application_data", JSON),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Column("updated_at", DateTime(timezone=True))
+        )
+        self.submissions = Table(
+            "credit_application_submissions",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("tracking_id", String(32), unique=True, nullable=False),
+            Column("idempotency_key", String(64), unique=True, nullable=False),
+            Column("application_id", Integer, ForeignKey("credit_applications.id")),
+            Column("client_ref", String),
+            Column("payload", JSON, nullable=False),
+            Column("status", String(16), nullable=False),
+            Column("attempts", Integer, default=0),
+            Column("next_attempt_at", DateTime(timezone=True)),
+            Column("locked_until", DateTime(timezone=True)),
+            Column("last_error", Text),
+            Column("external_application_id", String),
+            Column("notified", Boolean, default=False),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Column("updated_at", DateTime(timezone=True))
+        )
+        if create_tables:
+            metadata.create_all(self.engine)
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def add(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        from sqlalchemy import select
+        from sqlalchemy.exc import IntegrityError
+
+        existing = self._get_by_key(job["idempotency_key"])
+        if existing is not None:
+            return self._requeue_failed(existing)
+
+        payload = job["payload"]
+        try:
+            with self.engine.begin() as connection:
+                client_id = None
+                if payload.get("email"):
+                    client_id = connection.execute(
+                        select(self.clients.c.id).where(self.clients.c.email == payload["email"])
+                    ).scalar()
+                application_id = connection.execute(
+                    self.applications.insert().values(
+                        client_id=client_id,
+                        amount=payload.get("amount"),
+                        term=payload.get("term"),
+                        purpose=payload.get("purpose"),
+                        status="PENDING",
+                        application_data=payload
+                    )
+                ).inserted_primary_key[0]
+                connection.execute(
+                    self.submissions.insert().values(
+                        tracking_id=job["tracking_id"],
+                        idempotency_key=job["idempotency_key"],
+                        application_id=application_id,
+                        client_ref=job.get("client_ref"),
+                        payload=payload,
+                        status=QUEUED,
+                        attempts=0,
+                        next_attempt_at=self._now(),
+                        notified=False
+                    )
+                )
+        except IntegrityError:
+            # Otro proceso encoló la misma solicitud al mismo tiempo
+            existing = self._get_by_key(job["idempotency_key"])
+            if existing is None:
+                raise
+            return self._requeue_failed(existing)
+        return self.get(job["tracking_id"])
+
+    def claim(self, limit: int, lease: float) -> List[Dict[str, Any]]:
+        from sqlalchemy import select, and_, or_
+
+        now = self._now()
+        table = self.submissions
+        due = or_(
+            and_(table.c.status == QUEUED, table.c.next_attempt_at <= now),
+            and_(table.c.status == SUBMITTING, table.c.locked_until < now)
+        )
+        claimed = []
+        with self.engine.begin() as connection:
+            candidates = connection.execute(
+                select(table.c.id).where(due).order_by(table.c.next_attempt_at).limit(limit)
+            ).scalars().all()
+            for submission_id in candidates:
+                result = connection.execute(
+                    table.update()
+                    .where(and_(table.c.id == submission_id, due))
+                    .values(status=SUBMITTING, locked_until=now + timedelta(seconds=lease),
+                            attempts=table.c.attempts + 1, updated_at=now)
+                )
+                if result.rowcount == 1:
+                    claimed.append(submission_id)
+            rows = connection.execute(select(table).where(table.c.id.in_(claimed))).mappings().all() if claimed else []
+        return [dict(row) for row in rows]
+
+    def complete(self, job: Dict[str, Any], external_application_id: Optional[str], application_status: str) -> None:
+        now = self._now()
+        with self.engine.begin() as connection:
+            connection.execute(
+                self.submissions.update()
+                .where(self.submissions.c.tracking_id == job["tracking_id"])
+                .values(status=SUBMITTED, external_application_id=external_application_id,
+                        locked_until=None, last_error=None, updated_at=now)
+            )
+            if job.get("application_id") is not None:
+                connection.execute(
+                    self.applications.update()
+                    .where(self.applications.c.id == job["application_id"])
+                    .values(external_application_id=external_application_id, status=application_status, updated_at=now)
+                )
+
+    def retry(self, job: Dict[str, Any], error: str, delay: float) -> None:
+        now = self._now()
+        self._update(job, status=QUEUED, next_attempt_at=now + timedelta(seconds=delay), locked_until=None,
+                     last_error=error, updated_at=now)
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        self._update(job, status=FAILED, locked_until=None, last_error=error, updated_at=self._now())
+
+    def mark_notified(self, job: Dict[str, Any]) -> None:
+        self._update(job, notified=True)
+
+    def get(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(self.submissions).where(self.submissions.c.tracking_id == tracking_id)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        from sqlalchemy import select, func
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(self.submissions.c.status, func.count()).group_by(self.submissions.c.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+    def _get_by_key(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(self.submissions).where(self.submissions.c.idempotency_key == idempotency_key)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def _requeue_failed(self, existing: Dict[str, Any]) -> Dict[str, Any]:
+        if existing["status"] == FAILED:
+            self._update(existing, status=QUEUED, attempts=0, next_attempt_at=self._now(), last_error=None)
+            existing = self.get(existing["tracking_id"])
+        return {**existing, "duplicate": True}
+
+    def _update(self, job: Dict[str, Any], **values) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                self.submissions.update().where(self.submissions.c.tracking_id == job["tracking_id"]).values(**values)
+            )
+
+
+def create_submission_store(backend: str = CREDIT_SUBMISSION_BACKEND) -> SubmissionStore:
+    """Crea el almacén de envíos configurado
+
+    Args:
+        backend: "memory" o "database"
+
+    Returns:
+        El almacén de envíos
+    """
+    if backend == "database":
+        return DatabaseSubmissionStore()
+    if backend != "memory":
+        logger.warning(f"Backend de envíos desconocido '{backend}', usando memoria local")
+    return InMemorySubmissionStore()
+
+
+class ApplicationSubmitter:
+    """Cola de envíos de solicitudes de crédito a la API externa.
+
+    `enqueue` guarda la solicitud y devuelve un ID de seguimiento sin esperar a
+    la API, así el turno del agente no se bloquea. Unos hilos en segundo plano
+    envían cada solicitud con `CreditAPIClient.submit_credit_application` y una
+    clave de idempotencia (la misma en todos los reintentos, para que la API no
+    cree duplicados). Los errores de conexión, 5xx, 408, 409, 425 y 429 se reintentan
+    con espera exponencial y jitter hasta `max_attempts`; los errores de
+    configuración (cliente no disponible, API sin URL) y los demás 4xx fallan
+    sin reintentos. Al terminar se guarda
+    el ID externo y el estado en la solicitud y se avisa al cliente por
+    WhatsApp, SMS o email.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SubmissionStore] = None,
+        client_factory=None,
+        notifier_factory=None,
+        workers: int = CREDIT_SUBMISSION_WORKERS,
+        max_attempts: int = CREDIT_SUBMISSION_MAX_ATTEMPTS,
+        backoff_base: float = CREDIT_SUBMISSION_BACKOFF_BASE,
+        backoff_max: float = CREDIT_SUBMISSION_BACKOFF_MAX,
+        poll_interval: float = CREDIT_SUBMISSION_POLL_INTERVAL,
+        lease: float = CREDIT_SUBMISSION_LEASE,
+        notify: bool = CREDIT_SUBMISSION_NOTIFY
+    ):
+        """Inicializa la cola (los hilos se inician con `start` o en el primer `enqueue`)
+
+        Args:
+            store: Almacén de envíos (por defecto, el de CREDIT_SUBMISSION_BACKEND)
+            client_factory: Función que crea el cliente de la API de créditos (por defecto, CreditAPIClient)
+            notifier_factory: Función que crea el gestor de comunicaciones (por defecto, CommunicationManager)
+            workers: Hilos que envían solicitudes en paralelo
+            max_attempts: Intentos máximos por solicitud
+            backoff_base: Espera antes del primer reintento en segundos (se duplica en cada intento)
+            backoff_max: Espera máxima entre reintentos en segundos
+            poll_interval: Segundos entre comprobaciones de la cola cuando está vacía
+            lease: Segundos que un worker reserva un envío
+            notify: Avisar al cliente al terminar
+        """
+        self.store = store if store is not None else create_submission_store()
+        self._client_factory = client_factory or self._default_client
+        self._notifier_factory = notifier_factory or self._default_notifier
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.notify = notify
+
+        self._client = None
+        self._notifier = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._submitted = 0
+        self._retried = 0
+        self._failed = 0
+        self._notifications = 0
+
+    @staticmethod
+    def _default_client():
+        ensure_importable(INTEGRATIONS_DIR)
+        from credit_api_client import CreditAPIClient
+        return CreditAPIClient()
+
+    @staticmethod
+    def _default_notifier():
+        ensure_importable(INTEGRATIONS_DIR)
+        from communication_manager import CommunicationManager
+        return CommunicationManager()
+
+    def enqueue(self, application_data: Dict[str, Any], client_ref: Optional[str] = None) -> Dict[str, Any]:
+        """Encola una solicitud para enviarla en segundo plano
+
+        Args:
+            application_data: Datos de la solicitud (full_name, email, phone, amount, term, purpose...)
+            client_ref: Cliente de la conversación (forma parte de la clave de idempotencia)
+
+        Returns:
+            Dict con tracking_id, status y duplicate (True si la solicitud ya estaba encolada)
+        """
+        job = self.store.add({
+            "tracking_id": uuid.uuid4().hex,
+            "idempotency_key": idempotency_key_for(application_data, client_ref),
+            "client_ref": client_ref,
+            "payload": application_data,
+            "status": QUEUED,
+            "attempts": 0,
+            "last_error": None,
+            "external_application_id": None,
+            "notified": False
+        })
+        self.start()
+        self._wake.set()
+        return {
+            "tracking_id": job["tracking_id"],
+            "status": job["status"],
+            "external_application_id": job.get("external_application_id"),
+            "duplicate": bool(job.get("duplicate"))
+        }
+
+    def status(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de un envío por su ID de seguimiento (None si no existe)."""
+        job = self.store.get(tracking_id)
+        if job is None:
+            return None
+        return {
+            "tracking_id": tracking_id,
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "external_application_id": job.get("external_application_id"),
+            "last_error": job.get("last_error")
+        }
+
+    def start(self) -> None:
+        """Inicia los hilos de envío (si no están en marcha)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop_event.clear()
+            for index in range(max(1, self.workers)):
+                thread = threading.Thread(target=self._run, name=f"credit-submitter-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Detiene los hilos de envío; los envíos pendientes siguen en el almacén."""
+        self._stop_event.set()
+        self._wake.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def process_due(self, limit: int = 1) -> int:
+        """Envía los envíos pendientes cuyo turno ha llegado
+
+        Args:
+            limit: Envíos a reservar en esta llamada
+
+        Returns:
+            Número de envíos procesados
+        """
+        jobs = self.store.claim(limit, self.lease)
+        for job in jobs:
+            self._submit(job)
+        return len(jobs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Envíos por estado y contadores del proceso."""
+        with self._lock:
+            counters = {
+                "submitted": self._submitted,
+                "retried": self._retried,
+                "failed": self._failed,
+                "notifications": self._notifications
+            }
+        return {"queue": self.store.counts(), "process": counters, "workers": len(self._threads)}
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                processed = self.process_due()
+            except Exception as e:
+                logger.error(f"Error en la cola de envíos de solicitudes: {str(e)}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _submit(self, job: Dict[str, Any]) -> None:
+        try:
+            client = self._get_client()
+        except Exception as e:
+            # Sin cliente (módulo no importable o mal configurado) los reintentos fallarían igual
+            client = None
+            result = {"success": False, "error": "Cliente de la API de créditos no disponible", "message": str(e), "permanent": True}
+        if client is not None:
+            try:
+                result = client.submit_credit_application(job["payload"], idempotency_key=job["idempotency_key"])
+            except Exception as e:
+                result = {"success": False, "error": "Error de conexión", "message": str(e)}
+
+        if result.get("success"):
+            data = result.get("data") or {}
+            external_id = data.get("application_id") or data.get("id")
+            external_id = str(external_id) if external_id is not None else None
+            application_status = _APPLICATION_STATUS.get(str(data.get("status", "pending")).lower(), "PENDING")
+            self.store.complete(job, external_id, application_status)
+            with self._lock:
+                self._submitted += 1
+            logger.info(f"Solicitud {job['tracking_id']} enviada (ID externo {external_id}, intento {job['attempts']})")
+            self._notify(job, success=True, external_id=external_id, application_status=application_status)
+            return
+
+        error = " - ".join(str(part) for part in (result.get("error"), result.get("message")) if part) or "Error desconocido"
+        status_code = result.get("status_code")
+        permanent = result.get("permanent") or result.get("error") in _PERMANENT_ERRORS
+        retryable = not permanent and (status_code is None or status_code >= 500 or status_code in _RETRYABLE_STATUS)
+        if retryable and job["attempts"] < self.max_attempts:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (job["attempts"] - 1)) * random.uniform(0.5, 1.0)
+            self.store.retry(job, error, delay)
+            with self._lock:
+                self._retried += 1
+            logger.warning(f"Solicitud {job['tracking_id']} no enviada ({error}); reintento en {delay:.1f}s")
+            return
+
+        self.store.fail(job, error)
+        with self._lock:
+            self._failed += 1
+        logger.error(f"Solicitud {job['tracking_id']} fallida tras {job['attempts']} intentos: {error}")
+        self._notify(job, success=False)
+
+    def _notify(self, job: Dict[str, Any], success: bool, external_id: Optional[str] = None, application_status: Optional[str] = None) -> None:
+        if not self.notify:
+            return
+        payload = job["payload"]
+        greeting = f"Hola {payload.get('full_name', '').split(' ')[0]}".strip()
+        if success:
+            message = (
+                f"{greeting}, tu solicitud de crédito fue registrada con el número {external_id or job['tracking_id']} "
+                f"(estado: {(application_status or 'PENDING').lower()}). Te avisaremos cuando haya una resolución."
+            )
+        else:
+            message = (
+                f"{greeting}, no pudimos registrar tu solicitud de crédito (seguimiento {job['tracking_id']}). "
+                "Un asesor se pondrá en contacto contigo para completarla."
+            )
+
+        try:
+            notifier = self._get_notifier()
+            channel = payload.get("channel") or ("whatsapp" if payload.get("phone") else "email")
+            if channel == "email" and payload.get("email"):
+                result = notifier.send_email(payload["email"], "Tu solicitud de crédito", message)
+            elif channel == "sms" and payload.get("phone"):
+                result = notifier.send_sms(payload["phone"], message)
+            elif payload.get("phone"):
+                result = notifier.send_whatsapp(payload["phone"], message)
+            else:
+                logger.warning(f"La solicitud {job['tracking_id']} no tiene datos de contacto para avisar al cliente")
+                return
+        except Exception as e:
+            logger.error(f"Error al avisar al cliente de la solicitud {job['tracking_id']}: {str(e)}")
+            return
+
+        if (result or {}).get("success"):
+            self.store.mark_notified(job)
+            with self._lock:
+                self._notifications += 1
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _get_notifier(self):
+        if self._notifier is None:
+            self._notifier = self._notifier_factory()
+        return self._notifier
+
+
+# Cola compartida por el proceso
+application_submitter = ApplicationSubmitter()
@@ -1,22 +1,82 @@
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from typing import List, Dict, Any, Optional
-import json
+"""Agente conversacional base sobre una cadena de LangChain.
+
+LangChain, el cliente de OpenAI y la memoria de conversación se importan al
+construir el primer runtime, no al importar el módulo, para que arrancar un
+worker, los tests o la CLI no paguen su carga si no llegan a crear un agente.
+"""
+
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
-import os
 
-# Importar cliente LLM unificado
-from gpt_oss_client import get_llm_client
-from config import DEFAULT_LLM_MODEL, USE_OPENAI_FALLBACK
+from agent_pool import agent_pool
+from prompt_registry import prompt_registry
+from tracing import tracer, trace_callbacks
+from config import (
+    DEFAULT_LLM_MODEL,
+    USE_OPENAI_FALLBACK,
+    AGENT_POOL_ENABLED,
+    AGENT_MEMORY_STRATEGY,
+    AGENT_TURN_TIMEOUT,
+    SEMANTIC_CACHE_ENABLED
+)
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=None)
+def _gpt_oss_available() -> bool:
+    """Indica si el módulo gpt-oss-20b se puede importar (se comprueba una sola vez por proceso)."""
+    try:
+        import gpt_oss_20b
+        return True
+    except ImportError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def _response_cache():
+    """Caché semántica de respuestas y el índice de políticas del que toma la versión
+    
+    Se importan en el primer uso (solo con SEMANTIC_CACHE_ENABLED). La caché se
+    vacía en cuanto el índice detecta un cambio en las políticas activas.
+    """
+    from semantic_cache import semantic_cache
+    from policy_index import policy_index
+    
+    policy_index.add_listener(lambda version: semantic_cache.invalidate())
+    policy_index.start()
+    return semantic_cache, policy_index
+
+
+def resolve_model_name(model_name: str, agent_id: str) -> str:
+    """Determina qué modelo usar para un agente
+
+    Args:
+        model_name: Modelo configurado en el agente
+        agent_id: ID del agente (para los logs)
+
+    Returns:
+        El modelo configurado o el modelo de fallback de OpenAI si gpt-oss-20b no está disponible
+    """
+    if model_name != "gpt-oss-20b" and model_name != DEFAULT_LLM_MODEL:
+        return model_name
+
+    if _gpt_oss_available():
+        logger.info(f"Usando modelo gpt-oss-20b para el agente {agent_id}")
+        return model_name
+
+    if USE_OPENAI_FALLBACK:
+        logger.warning(f"No se pudo cargar gpt-oss-20b, usando fallback a OpenAI para el agente {agent_id}")
+        return "gpt-3.5-turbo"
+
+    logger.error(f"No se pudo cargar gpt-oss-20b y el fallback está desactivado para el agente {agent_id}")
+    raise ImportError("No se pudo cargar gpt-oss-20b y el fallback está desactivado")
+
+
 class BaseAgent:
     def __init__(
         self,
@@ -29,7 +89,9 @@ class BaseAgent:
         temperature: float = 0.7,
         streaming: bool = False,
         api_key: Optional[str] = None,
-        memory_key: str = "chat_history"
+        memory_key: str = "chat_history",
+        use_pool: bool = AGENT_POOL_ENABLED,
+        memory_strategy: str = AGENT_MEMORY_STRATEGY
     ):
         self.agent_id = agent_id
         self.name = name
@@ -41,35 +103,90 @@ class BaseAgent:
         self.streaming = streaming
         self.api_key = api_key
         self.memory_key = memory_key
+        self.use_pool = use_pool
+        self.memory_strategy = memory_strategy
         
         # Inicializar componentes
         self._initialize_components()
     
     def _initialize_components(self):
-        """Inicializa los componentes del agente"""
+        """Inicializa los componentes del agente
+        
+        El modelo, los prompts y la cadena se obtienen del pool de agentes cuando
+        está habilitado, de modo que solo se construyen una vez por configuración.
+        La memoria de conversación es propia de cada instancia.
+        """
+        if self.use_pool:
+            key = agent_pool.make_key(**self._runtime_config())
+            runtime = agent_pool.get(key, self._build_runtime)
+        else:
+            runtime = self._build_runtime()
+        
+        for attribute, component in runtime.items():
+            setattr(self, attribute, component)
+        
+        # Inicializar la memoria de conversación por defecto de esta instancia
+        self.memory = self._create_memory()
+    
+    def _create_memory(self, chat_memory=None, conversation_key=None):
+        """Crea la memoria de conversación según la estrategia configurada
+        
+        Args:
+            chat_memory: Historial de mensajes (por defecto, uno en memoria)
+            conversation_key: Clave de la conversación para compartir su resumen
+            
+        Returns:
+            ConversationBufferMemory ("buffer") o RollingSummaryMemory ("summary")
+        """
+        if self.memory_strategy == "summary":
+            from context_memory import RollingSummaryMemory
+            
+            return RollingSummaryMemory(
+                summarize=self.llm.predict,
+                chat_memory=chat_memory,
+                conversation_key=conversation_key,
+                memory_key=self.memory_key,
+                reserved_tokens=self.prompt.system_tokens
+            )
+        
+        from langchain.memory import ConversationBufferMemory
+        
+        if chat_memory is not None:
+            return ConversationBufferMemory(chat_memory=chat_memory, memory_key=self.memory_key, return_messages=True)
+        return ConversationBufferMemory(memory_key=self.memory_key, return_messages=True)
+    
+    def _runtime_config(self) -> Dict[str, Any]:
+        """Configuración que determina el runtime compilado del agente (clave del pool)"""
+        return {
+            "class": type(self).__name__,
+            "system_prompt": self.system_prompt,
+            "tools": self.tools,
+            "model_name": self.model_name,
+            "temperature": self.temperature,
+            "streaming": self.streaming,
+            "api_key": self.api_key,
+            "memory_key": self.memory_key
+        }
+    
+    def _create_llm(self):
+        """Crea el modelo de lenguaje del agente
+        
+        Returns:
+            ChatOpenAI configurado para el modelo del agente (las subclases pueden sustituirlo, por ejemplo, por un modelo simulado)
+        """
+        from langchain.chat_models import ChatOpenAI
+        from langchain.callbacks.manager import CallbackManager
+        from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+        
         # Configurar callbacks para streaming si está habilitado
         callback_manager = None
         if self.streaming:
             callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
         
         # Determinar qué modelo usar
-        use_model = self.model_name
-        if self.model_name == "gpt-oss-20b" or self.model_name == DEFAULT_LLM_MODEL:
-            # Intentar usar gpt-oss-20b
-            try:
-                # Verificar si podemos importar el módulo gpt-oss-20b
-                import gpt_oss_20b
-                logger.info(f"Usando modelo gpt-oss-20b para el agente {self.agent_id}")
-            except ImportError:
-                if USE_OPENAI_FALLBACK:
-                    logger.warning(f"No se pudo cargar gpt-oss-20b, usando fallback a OpenAI para el agente {self.agent_id}")
-                    use_model = "gpt-3.5-turbo"
-                else:
-                    logger.error(f"No se pudo cargar gpt-oss-20b y el fallback está desactivado para el agente {self.agent_id}")
-                    raise ImportError("No se pudo cargar gpt-oss-20b y el fallback está desactivado")
+        use_model = resolve_model_name(self.model_name, self.agent_id)
         
-        # Inicializar el modelo de lenguaje
-        self.llm = ChatOpenAI(
+        return ChatOpenAI(
             model_name=use_model,
             temperature=self.temperature,
             streaming=self.streaming,
@@ -77,60 +194,258 @@ class BaseAgent:
             openai_api_key=self.api_key,
             verbose=True
         )
+    
+    def _build_runtime(self) -> Dict[str, Any]:
+        """Construye el modelo, los prompts y la cadena del agente
+        
+        Returns:
+            Dict con los componentes, que se asignan como atributos del agente
+        """
+        from langchain.chains import LLMChain
         
-        # Inicializar la memoria de conversación
-        self.memory = ConversationBufferMemory(memory_key=self.memory_key, return_messages=True)
+        # Inicializar el modelo de lenguaje
+        llm = self._create_llm()
         
-        # Crear el prompt del sistema
-        system_message_prompt = SystemMessagePromptTemplate.from_template(self.system_prompt)
-        human_message_prompt = HumanMessagePromptTemplate.from_template("{input}")
-        chat_prompt = ChatPromptTemplate.from_messages([system_message_prompt, human_message_prompt])
+        # Plantilla compilada: las variables del system prompt y el historial se inyectan en cada llamada
+        prompt = prompt_registry.get(self.system_prompt, self.memory_key)
         
-        # Crear la cadena de LLM
-        self.chain = LLMChain(
-            llm=self.llm,
-            prompt=chat_prompt,
-            memory=self.memory,
+        # Crear la cadena de LLM (sin memoria propia, para poder compartirla entre conversaciones)
+        chain = LLMChain(
+            llm=llm,
+            prompt=prompt.template,
             verbose=True
         )
+        
+        return {"llm": llm, "chain": chain, "prompt": prompt}
     
-    def process_message(self, message: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    def process_message(self, message: str, context: Dict[str, Any] = None, memory=None) -> Dict[str, Any]:
         """Procesa un mensaje del usuario y genera una respuesta
         
         Args:
             message: El mensaje del usuario
             context: Contexto adicional para el procesamiento
+            memory: Memoria de la conversación, ConversationBufferMemory o RollingSummaryMemory (por defecto, la de esta instancia)
             
         Returns:
             Dict con la respuesta del agente y metadatos
         """
-        try:
-            # Preparar el contexto
-            context = context or {}
-            input_data = {"input": message, **context}
-            
-            # Registrar la entrada
-            logger.info(f"Agent {self.agent_id} received message: {message}")
+        with tracer.span("agent.process_message", **self._span_attributes()) as span:
+            try:
+                # Preparar el contexto
+                context = context or {}
+                memory = memory if memory is not None else self.memory
+                with tracer.span("memory.load"):
+                    history = memory.load_memory_variables({"input": message})[self.memory_key]
+                input_data = {"input": message, **context, self.memory_key: history}
+                prompt_tokens = self.prompt.count_tokens(message, history, context)
+                span.set_attribute("prompt.tokens", prompt_tokens)
+                
+                # Registrar la entrada
+                logger.info(f"Agent {self.agent_id} received message: {message}")
+                
+                with tracer.span("semantic_cache") as cache_span:
+                    cache_args, cached = self._semantic_cache_lookup(message, history, context)
+                    cache_span.set_attribute("semantic_cache.hit", cached is not None)
+                if cached is not None:
+                    return self._cached_reply(message, cached["response"], memory)
+                
+                # Procesar con la cadena de LLM (equivalente a chain.run, separando el render del prompt de la llamada al LLM)
+                with tracer.span("prompt.render"):
+                    prompts, stop = self.chain.prep_prompts([input_data])
+                result = self.chain.llm.generate_prompt(prompts, stop, callbacks=trace_callbacks(span), **self.chain.llm_kwargs)
+                response = self.chain.create_outputs(result)[0][self.chain.output_key]
+                self._semantic_cache_store(response, cache_args)
+                with tracer.span("memory.save"):
+                    memory.save_context({"input": message}, {"output": response})
+                
+                # Registrar la respuesta
+                logger.info(f"Agent {self.agent_id} response: {response}")
+                
+                return {
+                    "agent_id": self.agent_id,
+                    "response": response,
+                    "success": True,
+                    "prompt_tokens": prompt_tokens
+                }
+            except Exception as e:
+                span.set_error(e)
+                logger.error(f"Error processing message with agent {self.agent_id}: {str(e)}")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    async def aprocess_message(
+        self,
+        message: str,
+        context: Dict[str, Any] = None,
+        memory=None,
+        timeout: Optional[float] = AGENT_TURN_TIMEOUT
+    ) -> Dict[str, Any]:
+        """Versión asíncrona de process_message
+        
+        La llamada al LLM usa la API asíncrona del modelo y la carga y el guardado
+        de la memoria se ejecutan en el pool de hilos, de modo que un worker puede
+        atender muchas conversaciones a la vez. Si el turno se cancela o supera el
+        tiempo máximo, no se guarda en la memoria.
+        
+        Args:
+            message: El mensaje del usuario
+            context: Contexto adicional para el procesamiento
+            memory: Memoria de la conversación (por defecto, la de esta instancia)
+            timeout: Tiempo máximo del turno en segundos (None o 0 = sin límite)
             
-            # Procesar con la cadena de LLM
-            response = self.chain.run(**input_data)
+        Returns:
+            Dict con la respuesta del agente y metadatos
+        """
+        with tracer.span("agent.aprocess_message", **self._span_attributes()) as span:
+            try:
+                # Preparar el contexto
+                context = context or {}
+                memory = memory if memory is not None else self.memory
+                loop = asyncio.get_running_loop()
+                with tracer.span("memory.load"):
+                    variables = await loop.run_in_executor(None, memory.load_memory_variables, {"input": message})
+                input_data = {"input": message, **context, self.memory_key: variables[self.memory_key]}
+                prompt_tokens = self.prompt.count_tokens(message, variables[self.memory_key], context)
+                span.set_attribute("prompt.tokens", prompt_tokens)
+                
+                # Registrar la entrada
+                logger.info(f"Agent {self.agent_id} received message: {message}")
+                
+                with tracer.span("semantic_cache") as cache_span:
+                    cache_args, cached = await loop.run_in_executor(
+                        None, self._semantic_cache_lookup, message, variables[self.memory_key], context
+                    )
+                    cache_span.set_attribute("semantic_cache.hit", cached is not None)
+                if cached is not None:
+                    return await loop.run_in_executor(None, self._cached_reply, message, cached["response"], memory)
+                
+                # Procesar con la cadena de LLM
+                with tracer.span("prompt.render"):
+                    prompts, stop = await self.chain.aprep_prompts([input_data])
+                result = await asyncio.wait_for(
+                    self.chain.llm.agenerate_prompt(prompts, stop, callbacks=trace_callbacks(span), **self.chain.llm_kwargs),
+                    timeout=timeout or None
+                )
+                response = self.chain.create_outputs(result)[0][self.chain.output_key]
+                self._semantic_cache_store(response, cache_args)
+                with tracer.span("memory.save"):
+                    await loop.run_in_executor(None, memory.save_context, {"input": message}, {"output": response})
+                
+                # Registrar la respuesta
+                logger.info(f"Agent {self.agent_id} response: {response}")
+                
+                return {
+                    "agent_id": self.agent_id,
+                    "response": response,
+                    "success": True,
+                    "prompt_tokens": prompt_tokens
+                }
+            except asyncio.TimeoutError:
+                span.set_error("timeout")
+                logger.warning(f"Agent {self.agent_id} excedió el tiempo máximo del turno ({timeout}s)")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, la respuesta está tardando más de lo esperado. Por favor, inténtalo de nuevo en unos momentos.",
+                    "success": False,
+                    "error": "timeout"
+                }
+            except asyncio.CancelledError:
+                logger.info(f"Turno cancelado para el agente {self.agent_id}")
+                raise
+            except Exception as e:
+                span.set_error(e)
+                logger.error(f"Error processing message with agent {self.agent_id}: {str(e)}")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    def _semantic_cache_args(self, message: str, history, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Argumentos de la caché semántica para un turno, o None si el turno no se puede cachear
+        
+        Solo se cachean los primeros mensajes de una conversación, sin contexto
+        adicional y sin cifras (montos, plazos), porque la respuesta depende
+        únicamente del mensaje y de la configuración del agente. Sin una versión
+        de políticas conocida tampoco se cachea, ya que no se podría invalidar.
+        
+        Args:
+            message: El mensaje del usuario
+            history: Historial de la conversación
+            context: Contexto adicional del turno
             
-            # Registrar la respuesta
-            logger.info(f"Agent {self.agent_id} response: {response}")
+        Returns:
+            Dict para `semantic_cache.lookup` y `semantic_cache.store` (incluye el embedding del mensaje)
+        """
+        if not SEMANTIC_CACHE_ENABLED or history or context or any(char.isdigit() for char in message):
+            return None
+        
+        cache, index = _response_cache()
+        if not index.loaded:
+            return None
+        return {
+            "text": message,
+            "agent_id": self.agent_id,
+            "policy_version": index.version,
+            "params": {
+                "class": type(self).__name__,
+                "model": self.model_name,
+                "temperature": self.temperature,
+                "system_prompt": self.system_prompt,
+                "tools": self.tools
+            },
+            "vector": cache.embed(message)
+        }
+    
+    def _semantic_cache_lookup(self, message: str, history, context: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Busca la respuesta de un turno en la caché semántica
+        
+        Returns:
+            Tupla (argumentos para guardar la respuesta o None si el turno no se cachea, respuesta almacenada o None)
+        """
+        cache_args = self._semantic_cache_args(message, history, context)
+        if cache_args is None:
+            return None, None
+        return cache_args, _response_cache()[0].lookup(**cache_args)
+    
+    def _semantic_cache_store(self, response: str, cache_args: Optional[Dict[str, Any]]) -> None:
+        """Guarda la respuesta de un turno cacheable en la caché semántica"""
+        if cache_args is not None:
+            _response_cache()[0].store(response={"response": response}, **cache_args)
+    
+    def _cached_reply(self, message: str, response: str, memory) -> Dict[str, Any]:
+        """Guarda en la memoria una respuesta servida desde la caché semántica y la devuelve"""
+        memory.save_context({"input": message}, {"output": response})
+        logger.info(f"Agent {self.agent_id} respondió desde la caché semántica")
+        return {
+            "agent_id": self.agent_id,
+            "response": response,
+            "success": True,
+            "semantic_cache": True
+        }
+    
+    def _span_attributes(self) -> Dict[str, Any]:
+        """Atributos comunes de los intervalos de traza de un turno"""
+        return {"agent.id": str(self.agent_id), "agent.class": type(self).__name__, "agent.model": self.model_name}
+    
+    def conversation_memory(self, client_id: str):
+        """Obtiene la memoria de la conversación con un cliente desde el almacén compartido
+        
+        Args:
+            client_id: ID del cliente
             
-            return {
-                "agent_id": self.agent_id,
-                "response": response,
-                "success": True
-            }
-        except Exception as e:
-            logger.error(f"Error processing message with agent {self.agent_id}: {str(e)}")
-            return {
-                "agent_id": self.agent_id,
-                "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
-                "success": False,
-                "error": str(e)
-            }
+        Returns:
+            Memoria para pasar a `process_message`; cualquier worker puede atender el siguiente turno
+        """
+        from conversation_store import conversation_store
+        
+        history = conversation_store.memory(client_id, self.agent_id, memory_key=self.memory_key).chat_memory
+        return self._create_memory(chat_memory=history, conversation_key=(client_id, self.agent_id))
     
     def get_memory(self) -> List[Dict[str, Any]]:
         """Obtiene el historial de conversación"""
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Script para comprobar el tiempo de importación en frío de los módulos de entrada.
+
+Importa cada módulo en un intérprete nuevo (sin módulos en caché), mide el
+tiempo de la importación y comprueba que no se hayan cargado las dependencias
+pesadas (LangChain, ChromaDB, OpenAI), que deben importarse al crear el primer
+agente o la base de conocimiento. Termina con código 1 si algún módulo supera
+el presupuesto o carga una dependencia pesada.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from project_paths import AGENTS_DIR, KNOWLEDGE_DIR
+from config import IMPORT_TIME_BUDGET_MS
+
+# Módulo de entrada -> directorio desde el que se importa
+ENTRY_POINTS = {
+    "base_agent": AGENTS_DIR,
+    "credit_sales_agent": AGENTS_DIR,
+    "agent_runtime": AGENTS_DIR,
+    "policy_knowledge_base": KNOWLEDGE_DIR
+}
+
+# Dependencias que no deben cargarse al importar un módulo de entrada
+HEAVY_MODULES = ["langchain", "langchain_core", "chromadb", "openai", "tiktoken"]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str, directory: str, runs: int) -> dict:
+    """Mide la importación en frío de un módulo
+
+    Args:
+        module: Nombre del módulo
+        directory: Directorio desde el que se importa
+        runs: Número de intérpretes nuevos (se toma el menor tiempo)
+
+    Returns:
+        Dict con ms (mejor tiempo), heavy (dependencias pesadas cargadas) y error
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+        )
+        if result.returncode != 0:
+            return {"ms": None, "heavy": [], "error": (result.stderr.strip().splitlines() or ["error"])[-1]}
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or sample["ms"] < best["ms"]:
+            best = sample
+    return {**best, "error": None}
+
+
+def main():
+    """Función principal para comprobar los tiempos de importación."""
+    parser = argparse.ArgumentParser(description="Comprueba el tiempo de importación en frío de los módulos de entrada")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS, help="Tiempo máximo por módulo en milisegundos")
+    parser.add_argument("--runs", type=int, default=3, help="Intérpretes nuevos por módulo (se toma el menor tiempo)")
+    parser.add_argument("modules", nargs="*", help="Módulos a comprobar (por defecto, todos los de entrada)")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or ENTRY_POINTS:
+        result = measure(module, ENTRY_POINTS.get(module, AGENTS_DIR), args.runs)
+        if result["error"]:
+            status = f"ERROR ({result['error']})"
+        elif result["heavy"]:
+            status = f"FALLO (carga {', '.join(result['heavy'])})"
+        elif result["ms"] > args.budget_ms:
+            status = f"FALLO (supera {args.budget_ms:.0f} ms)"
+        else:
+            status = "OK"
+        if status != "OK":
+            failures += 1
+        elapsed = f"{result['ms']:.1f} ms" if result["ms"] is not None else "-"
+        print(f"{module:<24} {elapsed:>10}  {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
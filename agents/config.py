@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -18,6 +19,125 @@ GPT_OSS_TOP_K = int(os.getenv("GPT_OSS_TOP_K", "40"))
 USE_OPENAI_FALLBACK = os.getenv("USE_OPENAI_FALLBACK", "true").lower() == "true"
 DEFAULT_LLM_MODEL = os.getenv("DEFAULT_LLM_MODEL", "gpt-oss-20b")
 
+# Intervalo (segundos) de los health checks en segundo plano del registro de clientes LLM (0 = desactivado)
+LLM_HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "30"))
+
+# Failover entre gpt-oss-20b y OpenAI basado en latencia y errores (circuit breaker por backend)
+LLM_FAILOVER_ENABLED = os.getenv("LLM_FAILOVER_ENABLED", "true").lower() == "true"
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-3.5-turbo")
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "50"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_THRESHOLD = float(os.getenv("LLM_BREAKER_ERROR_THRESHOLD", "0.5"))
+LLM_BREAKER_LATENCY_THRESHOLD = float(os.getenv("LLM_BREAKER_LATENCY_THRESHOLD", "20"))  # p95 en segundos
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+# Solicitudes "hedged": si el backend principal supera su p95, se lanza una segunda solicitud al fallback
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_DEFAULT_DEADLINE = float(os.getenv("LLM_HEDGE_DEFAULT_DEADLINE", "5"))  # segundos, sin historial suficiente
+LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "8"))
+
+# Coalescencia de prompts idénticos en curso (una sola llamada upstream por grupo)
+LLM_COALESCING_ENABLED = os.getenv("LLM_COALESCING_ENABLED", "true").lower() == "true"
+
+# Caché semántica de respuestas por agente y versión de políticas
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # similitud coseno mínima
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # segundos
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))  # por agente y versión
+
+# Pool de runtimes de agentes compartidos entre conversaciones (por hash de configuración)
+AGENT_POOL_ENABLED = os.getenv("AGENT_POOL_ENABLED", "true").lower() == "true"
+AGENT_POOL_MAX_SIZE = int(os.getenv("AGENT_POOL_MAX_SIZE", "32"))
+
+# Registro de plantillas de prompt compiladas (por system prompt)
+PROMPT_REGISTRY_MAX_SIZE = int(os.getenv("PROMPT_REGISTRY_MAX_SIZE", "128"))
+
+# Catálogo de agentes del backend con recarga en caliente por versión
+AGENT_CATALOG_DATABASE_URL = os.getenv("AGENT_CATALOG_DATABASE_URL", os.getenv("DATABASE_URL"))
+AGENT_CATALOG_REFRESH_INTERVAL = float(os.getenv("AGENT_CATALOG_REFRESH_INTERVAL", "5"))  # segundos entre comprobaciones de versiones
+
+# Almacén de conversaciones compartido entre workers ("memory" para desarrollo y pruebas, "postgres" en producción)
+CONVERSATION_STORE_BACKEND = os.getenv("CONVERSATION_STORE_BACKEND", "memory").lower()
+CONVERSATION_STORE_DATABASE_URL = os.getenv("CONVERSATION_STORE_DATABASE_URL", os.getenv("DATABASE_URL"))
+CONVERSATION_HISTORY_WINDOW = int(os.getenv("CONVERSATION_HISTORY_WINDOW", "20"))  # mensajes leídos por turno
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "200"))  # por conversación, solo backend "memory"
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.5"))  # segundos
+CONVERSATION_FLUSH_MAX_PENDING = int(os.getenv("CONVERSATION_FLUSH_MAX_PENDING", "200"))  # mensajes en memoria
+
+# Estrategia de memoria de los agentes: "buffer" (historial completo) o "summary" (últimos turnos + resumen)
+AGENT_MEMORY_STRATEGY = os.getenv("AGENT_MEMORY_STRATEGY", "buffer").lower()
+CONTEXT_VERBATIM_TURNS = int(os.getenv("CONTEXT_VERBATIM_TURNS", "4"))  # turnos (pregunta + respuesta) literales
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # tokens del prompt completo
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "300"))
+CONTEXT_SUMMARY_WORKERS = int(os.getenv("CONTEXT_SUMMARY_WORKERS", "2"))
+CONTEXT_SUMMARY_CACHE_SIZE = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "10000"))  # conversaciones con resumen en memoria
+
+# Tiempo máximo (segundos) de un turno asíncrono de un agente (0 = sin límite)
+AGENT_TURN_TIMEOUT = float(os.getenv("AGENT_TURN_TIMEOUT", "60"))
+
+# Ruta rápida sin LLM para cálculos de préstamos, preguntas de políticas y estado de solicitudes
+# (desactivada por defecto: activarla solo tras validar el clasificador con conversaciones reales)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "false").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.95"))
+
+# Índice en memoria de las políticas activas para credit_policy_lookup
+POLICY_INDEX_ENABLED = os.getenv("POLICY_INDEX_ENABLED", "true").lower() == "true"
+POLICY_INDEX_DATABASE_URL = os.getenv("POLICY_INDEX_DATABASE_URL", os.getenv("DATABASE_URL"))  # para leer las políticas activas
+POLICY_INDEX_REFRESH_INTERVAL = float(os.getenv("POLICY_INDEX_REFRESH_INTERVAL", "30"))  # segundos entre comprobaciones
+POLICY_INDEX_TOP_K = int(os.getenv("POLICY_INDEX_TOP_K", "3"))
+POLICY_INDEX_MIN_SCORE = float(os.getenv("POLICY_INDEX_MIN_SCORE", "0.75"))  # similitud coseno mínima
+POLICY_INDEX_QUERY_CACHE_SIZE = int(os.getenv("POLICY_INDEX_QUERY_CACHE_SIZE", "1024"))  # embeddings de consultas
+
+# Capa de ejecución de herramientas: caché de resultados por conversación y ejecución en paralelo
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "300"))  # segundos
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000"))
+TOOL_PARALLEL_MAX_WORKERS = int(os.getenv("TOOL_PARALLEL_MAX_WORKERS", "8"))
+
+# Trazas por etapa (OTLP/JSON en archivo local); las trazas con error o lentas se exportan siempre
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))  # fracción de las demás trazas
+TRACING_SLOW_THRESHOLD = float(os.getenv("TRACING_SLOW_THRESHOLD", "5"))  # segundos
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", os.path.join(tempfile.gettempdir(), "credit-agents", "agent_traces.jsonl"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "credit-agents")
+
+# Runtime de agentes en procesos dedicados (separado de los workers HTTP)
+AGENT_RUNTIME_WORKERS = int(os.getenv("AGENT_RUNTIME_WORKERS", "2"))
+AGENT_RUNTIME_CONCURRENCY = int(os.getenv("AGENT_RUNTIME_CONCURRENCY", "32"))  # turnos simultáneos por worker
+AGENT_RUNTIME_MAX_AGENTS = int(os.getenv("AGENT_RUNTIME_MAX_AGENTS", "64"))  # instancias de agentes por worker
+AGENT_RUNTIME_START_METHOD = os.getenv("AGENT_RUNTIME_START_METHOD", "spawn")
+
+# Presupuesto de tiempo de importación en frío de los módulos de entrada (check_import_time.py)
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "300"))
+
+# p95 máximo de la sobrecarga por turno de la capa de agentes en replay_benchmark.py (0 = sin límite)
+REPLAY_MAX_OVERHEAD_MS = float(os.getenv("REPLAY_MAX_OVERHEAD_MS", "50"))
+
+# Evaluación offline de cambios de prompts y políticas (eval_runner.py)
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", str(os.cpu_count() or 2)))  # procesos
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "16"))  # conversaciones simultáneas por proceso
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", "./eval_cache.sqlite")  # respuestas del LLM por hash del prompt
+EVAL_PRICE_PROMPT_PER_1K = float(os.getenv("EVAL_PRICE_PROMPT_PER_1K", "0.0005"))  # USD por 1000 tokens de prompt
+EVAL_PRICE_COMPLETION_PER_1K = float(os.getenv("EVAL_PRICE_COMPLETION_PER_1K", "0.0015"))  # USD por 1000 tokens generados
+
+# Enrutador de mensajes entrantes a plantillas de agente (clasificador local, sin LLM)
+AGENT_ROUTER_DIMENSIONS = int(os.getenv("AGENT_ROUTER_DIMENSIONS", "4096"))  # tamaño del vector con hashing trick
+AGENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("AGENT_ROUTER_MIN_CONFIDENCE", "0.6"))
+AGENT_ROUTER_DEFAULT_TEMPLATE = os.getenv("AGENT_ROUTER_DEFAULT_TEMPLATE", "credit_sales")
+AGENT_ROUTER_TRAINING_PATH = os.getenv("AGENT_ROUTER_TRAINING_PATH")  # JSON Lines con message y label (solo ejemplos etiquetados)
+AGENT_ROUTER_LOG_PATH = os.getenv("AGENT_ROUTER_LOG_PATH")  # decisiones registradas para reentrenar
+
+# Envío asíncrono de solicitudes de crédito a la API externa (cola con reintentos e idempotencia)
+CREDIT_SUBMISSION_BACKEND = os.getenv("CREDIT_SUBMISSION_BACKEND", "memory").lower()  # "memory" o "database"
+CREDIT_SUBMISSION_DATABASE_URL = os.getenv("CREDIT_SUBMISSION_DATABASE_URL", os.getenv("DATABASE_URL"))
+CREDIT_SUBMISSION_WORKERS = int(os.getenv("CREDIT_SUBMISSION_WORKERS", "2"))
+CREDIT_SUBMISSION_MAX_ATTEMPTS = int(os.getenv("CREDIT_SUBMISSION_MAX_ATTEMPTS", "6"))
+CREDIT_SUBMISSION_BACKOFF_BASE = float(os.getenv("CREDIT_SUBMISSION_BACKOFF_BASE", "2"))  # segundos, se duplica por intento
+CREDIT_SUBMISSION_BACKOFF_MAX = float(os.getenv("CREDIT_SUBMISSION_BACKOFF_MAX", "300"))  # segundos
+CREDIT_SUBMISSION_POLL_INTERVAL = float(os.getenv("CREDIT_SUBMISSION_POLL_INTERVAL", "1"))  # segundos
+CREDIT_SUBMISSION_LEASE = float(os.getenv("CREDIT_SUBMISSION_LEASE", "60"))  # segundos que un worker reserva un envío
+CREDIT_SUBMISSION_NOTIFY = os.getenv("CREDIT_SUBMISSION_NOTIFY", "true").lower() == "true"
+
 # Configuración de Twilio para WhatsApp y SMS
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -0,0 +1,287 @@
+"""Memoria de conversación con resumen incremental y presupuesto de tokens."""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from langchain.memory import ChatMessageHistory
+from langchain.schema import BaseChatMessageHistory, BaseMessage, SystemMessage
+
+from config import (
+    CONTEXT_VERBATIM_TURNS,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_SUMMARY_MAX_TOKENS,
+    CONTEXT_SUMMARY_WORKERS,
+    CONTEXT_SUMMARY_CACHE_SIZE
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_CHARS_PER_TOKEN = 4  # Aproximación cuando tiktoken no está instalado
+
+
+def count_tokens(text: str) -> int:
+    """Cuenta los tokens de un texto
+
+    Usa tiktoken (cl100k_base) si está instalado; si no, una aproximación de
+    4 caracteres por token.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // _CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: List[BaseMessage]) -> int:
+    """Cuenta los tokens de una lista de mensajes (4 tokens de formato por mensaje)."""
+    return sum(count_tokens(message.content) + 4 for message in messages)
+
+
+def default_summary_prompt(summary: str, messages: List[BaseMessage]) -> str:
+    """Construye el prompt para incorporar mensajes antiguos al resumen de la conversación."""
+    transcript = "\n".join(
+        f"{'Cliente' if message.type == 'human' else 'Agente'}: {message.content}" for message in messages
+    )
+    return (
+        "Resume de forma concisa la conversación entre un cliente y un agente de créditos, "
+        "conservando montos, plazos, datos del cliente, compromisos y dudas pendientes. "
+        f"Máximo {CONTEXT_SUMMARY_MAX_TOKENS} tokens.\n\n"
+        f"Resumen actual:\n{summary or '(vacío)'}\n\n"
+        f"Nuevos mensajes:\n{transcript}\n\n"
+        "Resumen actualizado:"
+    )
+
+
+class _SummaryState:
+    """Resumen de una conversación y huella del último mensaje incorporado."""
+
+    __slots__ = ("summary", "last_folded", "refreshing")
+
+    def __init__(self):
+        self.summary = ""
+        self.last_folded: Optional[str] = None
+        self.refreshing = False
+
+
+class ContextSavings:
+    """Contador de tokens de historial ahorrados por el ensamblado de contexto."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._full_tokens = 0
+        self._assembled_tokens = 0
+
+    def record(self, full_tokens: int, assembled_tokens: int) -> None:
+        with self._lock:
+            self._turns += 1
+            self._full_tokens += full_tokens
+            self._assembled_tokens += assembled_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Tokens de historial con el historial completo frente al contexto ensamblado."""
+        with self._lock:
+            saved = self._full_tokens - self._assembled_tokens
+            return {
+                "turns": self._turns,
+                "full_history_tokens": self._full_tokens,
+                "assembled_tokens": self._assembled_tokens,
+                "tokens_saved": saved,
+                "savings_ratio": round(saved / self._full_tokens, 4) if self._full_tokens else 0.0
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._turns = 0
+            self._full_tokens = 0
+            self._assembled_tokens = 0
+
+
+# Resúmenes por conversación (LRU) y ejecutor compartidos por el proceso
+_summaries: "OrderedDict[Any, _SummaryState]" = OrderedDict()
+_summaries_lock = threading.Lock()
+_summary_executor = ThreadPoolExecutor(max_workers=CONTEXT_SUMMARY_WORKERS, thread_name_prefix="context-summary")
+context_savings = ContextSavings()
+
+
+class RollingSummaryMemory:
+    """Memoria que envía los últimos turnos literales y un resumen de los anteriores.
+
+    Los mensajes que salen de la ventana de `verbatim_turns` turnos se incorporan
+    a un resumen en segundo plano, fuera del camino de la respuesta; mientras el
+    resumen se actualiza, esos mensajes se envían literales si caben en el
+    presupuesto. El historial ensamblado se recorta (empezando por los mensajes
+    más antiguos) para que el prompt completo no supere `token_budget` tokens.
+
+    Es compatible con `process_message` (`load_memory_variables`/`save_context`)
+    y puede envolver cualquier historial de LangChain, incluido el del almacén de
+    conversaciones. Los resúmenes se guardan por `conversation_key` en una caché
+    del proceso.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str], str],
+        chat_memory: Optional[BaseChatMessageHistory] = None,
+        conversation_key: Any = None,
+        memory_key: str = "chat_history",
+        verbatim_turns: int = CONTEXT_VERBATIM_TURNS,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        reserved_tokens: int = 0,
+        summary_prompt: Callable[[str, List[BaseMessage]], str] = default_summary_prompt
+    ):
+        """Inicializa la memoria
+
+        Args:
+            summarize: Función que recibe un prompt y devuelve el texto generado (el LLM del agente)
+            chat_memory: Historial de mensajes (por defecto, uno en memoria)
+            conversation_key: Clave de la conversación para compartir el resumen entre instancias
+            memory_key: Clave de la memoria en el prompt del agente
+            verbatim_turns: Turnos recientes que se envían literales
+            token_budget: Tokens máximos del prompt completo
+            reserved_tokens: Tokens fijos del prompt ajenos al historial (prompt del sistema)
+            summary_prompt: Función que construye el prompt de resumen
+        """
+        self.summarize = summarize
+        self.chat_memory = chat_memory if chat_memory is not None else ChatMessageHistory()
+        self.conversation_key = conversation_key if conversation_key is not None else id(self)
+        self.memory_key = memory_key
+        self.verbatim_turns = verbatim_turns
+        self.token_budget = token_budget
+        self.reserved_tokens = reserved_tokens
+        self.summary_prompt = summary_prompt
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def summary(self) -> str:
+        """Resumen actual de los mensajes anteriores a la ventana literal."""
+        return self._state().summary
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Ensambla el historial para el siguiente turno dentro del presupuesto de tokens
+
+        Args:
+            inputs: Entradas del turno; se descuentan los tokens de `input` del presupuesto
+
+        Returns:
+            Dict con el historial ensamblado bajo `memory_key`
+        """
+        messages = self.chat_memory.messages
+        older, recent = self._split(messages)
+
+        state = self._state()
+        unfolded = self._unfolded(older, state)
+        if unfolded:
+            self._schedule_refresh(state)
+
+        budget = self.token_budget - self.reserved_tokens - count_tokens(str(inputs.get("input", "")))
+        assembled = self._fit_budget(state.summary, unfolded + recent, budget)
+
+        context_savings.record(count_message_tokens(messages), count_message_tokens(assembled))
+        return {self.memory_key: assembled}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """Guarda el turno en el historial y programa la actualización del resumen."""
+        self.chat_memory.add_user_message(inputs["input"])
+        self.chat_memory.add_ai_message(outputs["output"])
+        self._schedule_refresh(self._state())
+
+    def clear(self) -> None:
+        """Limpia el historial y el resumen de la conversación."""
+        self.chat_memory.clear()
+        with _summaries_lock:
+            _summaries.pop(self.conversation_key, None)
+
+    def _state(self) -> _SummaryState:
+        with _summaries_lock:
+            state = _summaries.get(self.conversation_key)
+            if state is None:
+                state = _SummaryState()
+                _summaries[self.conversation_key] = state
+                while len(_summaries) > CONTEXT_SUMMARY_CACHE_SIZE:
+                    _summaries.popitem(last=False)
+            else:
+                _summaries.move_to_end(self.conversation_key)
+            return state
+
+    @staticmethod
+    def _fingerprint(messages: List[BaseMessage], index: int) -> str:
+        """Huella de un mensaje y su predecesor, para localizarlo en ventanas posteriores."""
+        parts = [f"{m.type}:{m.content}" for m in messages[max(0, index - 1):index + 1]]
+        return hashlib.sha1("\x1e".join(parts).encode("utf-8")).hexdigest()
+
+    def _unfolded(self, older: List[BaseMessage], state: _SummaryState) -> List[BaseMessage]:
+        """Mensajes fuera de la ventana literal que aún no están en el resumen."""
+        if state.last_folded is None:
+            return older
+        for index in range(len(older) - 1, -1, -1):
+            if self._fingerprint(older, index) == state.last_folded:
+                return older[index + 1:]
+        # El último mensaje resumido ya no está en la ventana leída: todo lo visible es nuevo
+        return older
+
+    def _split(self, messages: List[BaseMessage]):
+        """Separa los mensajes anteriores a la ventana literal de los recientes."""
+        split = max(0, len(messages) - 2 * self.verbatim_turns)
+        return messages[:split], messages[split:]
+
+    def _schedule_refresh(self, state: _SummaryState) -> None:
+        with _summaries_lock:
+            if state.refreshing:
+                return
+            state.refreshing = True
+        _summary_executor.submit(self._refresh, state)
+
+    def _refresh(self, state: _SummaryState) -> None:
+        """Incorpora al resumen los mensajes que salieron de la ventana literal (en segundo plano)."""
+        try:
+            older, _ = self._split(self.chat_memory.messages)
+            messages = self._unfolded(older, state)
+            if not messages:
+                return
+            summary = self.summarize(self.summary_prompt(state.summary, messages)).strip()
+            with _summaries_lock:
+                state.summary = summary
+                # Huella sobre `older`, la lista en la que la busca `_unfolded` (con su predecesor real)
+                state.last_folded = self._fingerprint(older, len(older) - 1)
+        except Exception as e:
+            logger.error(f"Error al actualizar el resumen de la conversación {self.conversation_key}: {str(e)}")
+        finally:
+            with _summaries_lock:
+                state.refreshing = False
+
+    @staticmethod
+    def _fit_budget(summary: str, messages: List[BaseMessage], budget: int) -> List[BaseMessage]:
+        """Recorta el historial (primero los mensajes más antiguos, luego el resumen) hasta el presupuesto."""
+        summary_messages = []
+        if summary:
+            summary_messages = [SystemMessage(content=f"Resumen de la conversación anterior: {summary}")]
+
+        messages = list(messages)
+        while messages and count_message_tokens(summary_messages + messages) > budget:
+            messages.pop(0)
+
+        if summary_messages and count_message_tokens(summary_messages) > budget:
+            # Ni siquiera el resumen cabe: truncarlo de forma proporcional
+            content = summary_messages[0].content
+            keep = max(0, int(len(content) * budget / count_message_tokens(summary_messages)))
+            summary_messages = [SystemMessage(content=content[:keep])] if keep else []
+
+        return summary_messages + messages
@@ -0,0 +1,395 @@
+"""Almacén del historial de conversación de los agentes compartido entre workers."""
+
+import uuid
+import logging
+import threading
+from collections import deque, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from langchain.memory import ConversationBufferMemory
+from langchain.schema import BaseChatMessageHistory, BaseMessage, HumanMessage, AIMessage, SystemMessage
+
+from config import (
+    CONVERSATION_STORE_BACKEND,
+    CONVERSATION_STORE_DATABASE_URL,
+    CONVERSATION_HISTORY_WINDOW,
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_FLUSH_INTERVAL,
+    CONVERSATION_FLUSH_MAX_PENDING
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+ConversationKey = Tuple[str, str]  # (cliente, agente)
+
+
+class ConversationStore:
+    """Interfaz común de los almacenes de conversaciones.
+
+    Los mensajes se guardan por (cliente, agente) como dicts con `message_id`,
+    `role` y `content`. Las lecturas devuelven como mucho los últimos `window`
+    mensajes, de modo que el contexto que se envía al modelo está acotado.
+    """
+
+    def __init__(self, window: int = CONVERSATION_HISTORY_WINDOW):
+        self.window = window
+
+    def append(self, client_id: str, agent_id: str, role: str, content: str) -> None:
+        """Añade un mensaje a una conversación
+
+        Args:
+            client_id: ID del cliente
+            agent_id: ID del agente
+            role: "human", "ai" o "system"
+            content: Texto del mensaje
+        """
+        raise NotImplementedError
+
+    def append_turn(self, client_id: str, agent_id: str, messages: List[Tuple[str, str]]) -> None:
+        """Añade de una vez los mensajes de un turno (pregunta del cliente y respuesta del agente)
+
+        Args:
+            client_id: ID del cliente
+            agent_id: ID del agente
+            messages: Pares (rol, contenido) en orden
+        """
+        for role, content in messages:
+            self.append(client_id, agent_id, role, content)
+
+    def get_messages(self, client_id: str, agent_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Obtiene los últimos mensajes de una conversación, del más antiguo al más reciente
+
+        Args:
+            client_id: ID del cliente
+            agent_id: ID del agente
+            limit: Número máximo de mensajes (por defecto, la ventana del almacén)
+
+        Returns:
+            Lista de mensajes
+        """
+        raise NotImplementedError
+
+    def clear(self, client_id: str, agent_id: str) -> None:
+        """Elimina el historial de una conversación."""
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        """Persiste las escrituras pendientes. Devuelve el número de mensajes escritos."""
+        return 0
+
+    def start(self) -> None:
+        """Inicia las tareas en segundo plano del almacén, si las tiene."""
+
+    def stop(self) -> None:
+        """Detiene las tareas en segundo plano y persiste lo pendiente."""
+        self.flush()
+
+    def memory(self, client_id: str, agent_id: str, memory_key: str = "chat_history") -> ConversationBufferMemory:
+        """Crea una memoria de LangChain respaldada por este almacén
+
+        Args:
+            client_id: ID del cliente
+            agent_id: ID del agente
+            memory_key: Clave de la memoria en el prompt del agente
+
+        Returns:
+            Memoria lista para pasar a `process_message`
+        """
+        return ConversationBufferMemory(
+            chat_memory=StoredChatMessageHistory(self, client_id, agent_id),
+            memory_key=memory_key,
+            return_messages=True
+        )
+
+    @staticmethod
+    def _new_message(role: str, content: str) -> Dict[str, Any]:
+        if role not in _MESSAGE_TYPES:
+            raise ValueError(f"Rol de mensaje no válido: {role}")
+        return {"message_id": uuid.uuid4().hex, "role": role, "content": content}
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Almacén en memoria del proceso, para desarrollo local y pruebas.
+
+    Cada conversación conserva como mucho `max_messages` mensajes; no se comparte
+    entre workers.
+    """
+
+    def __init__(self, window: int = CONVERSATION_HISTORY_WINDOW, max_messages: int = CONVERSATION_MAX_MESSAGES):
+        super().__init__(window=window)
+        self.max_messages = max_messages
+        self._conversations: Dict[ConversationKey, deque] = {}
+        self._lock = threading.Lock()
+
+    def append(self, client_id: str, agent_id: str, role: str, content: str) -> None:
+        message = self._new_message(role, content)
+        with self._lock:
+            conversation = self._conversations.get((client_id, agent_id))
+            if conversation is None:
+                conversation = deque(maxlen=self.max_messages)
+                self._conversations[(client_id, agent_id)] = conversation
+            conversation.append(message)
+
+    def get_messages(self, client_id: str, agent_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = limit or self.window
+        with self._lock:
+            conversation = self._conversations.get((client_id, agent_id), ())
+            return [dict(message) for message in list(conversation)[-limit:]]
+
+    def clear(self, client_id: str, agent_id: str) -> None:
+        with self._lock:
+            self._conversations.pop((client_id, agent_id), None)
+
+
+class PostgresConversationStore(ConversationStore):
+    """Almacén en la tabla `conversation_messages`, compartido por todos los workers.
+
+    Los turnos de la conversación (`append_turn`, que usa la memoria de los
+    agentes) se escriben en el momento con un único INSERT, de modo que cualquier
+    worker ve la respuesta en cuanto se devuelve. Los mensajes sueltos de `append`
+    (cargas masivas en segundo plano) se acumulan en memoria y se insertan por lotes
+    cada `flush_interval` segundos (o al superar `max_pending` mensajes); las
+    lecturas los combinan con la ventana persistida, por lo que un worker siempre
+    ve sus propios mensajes.
+    """
+
+    def __init__(
+        self,
+        database_url: str = CONVERSATION_STORE_DATABASE_URL,
+        window: int = CONVERSATION_HISTORY_WINDOW,
+        flush_interval: float = CONVERSATION_FLUSH_INTERVAL,
+        max_pending: int = CONVERSATION_FLUSH_MAX_PENDING,
+        create_tables: bool = False
+    ):
+        """Inicializa el almacén
+
+        Args:
+            database_url: URL de la base de datos
+            window: Número de mensajes leídos por turno
+            flush_interval: Intervalo de escritura por lotes de `append` en segundos
+            max_pending: Mensajes pendientes que fuerzan una escritura inmediata
+            create_tables: Crear la tabla si no existe (en producción la crea la migración 003 del backend)
+        """
+        super().__init__(window=window)
+        from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Text, DateTime, Index
+        from sqlalchemy.sql import func
+
+        if not database_url:
+            raise ValueError("Se requiere CONVERSATION_STORE_DATABASE_URL o DATABASE_URL para el almacén en Postgres")
+
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.engine = create_engine(
+            database_url,
+            pool_pre_ping=True,
+            connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {}
+        )
+        metadata = MetaData()
+        self.table = Table(
+            "conversation_messages",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("message_id", String(32), unique=True, nullable=False),
+            Column("client_id", String, nullable=False),
+            Column("agent_id", String, nullable=False),
+            Column("role", String(16), nullable=False),
+            Column("content", Text, nullable=False),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Index("ix_conversation_messages_conversation", "client_id", "agent_id", "id")
+        )
+        if create_tables:
+            metadata.create_all(self.engine)
+
+        # Mensajes aún no persistidos, por conversación y en orden de llegada
+        self._pending: "OrderedDict[ConversationKey, List[Dict[str, Any]]]" = OrderedDict()
+        # Mensajes del lote que se está escribiendo (visibles hasta que termine la escritura)
+        self._in_flight: Dict[ConversationKey, List[Dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def append(self, client_id: str, agent_id: str, role: str, content: str) -> None:
+        message = self._new_message(role, content)
+        with self._lock:
+            self._pending.setdefault((client_id, agent_id), []).append(message)
+            self._pending_count += 1
+            should_flush = self._pending_count >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+    def append_turn(self, client_id: str, agent_id: str, messages: List[Tuple[str, str]]) -> None:
+        key = (client_id, agent_id)
+        turn = [self._new_message(role, content) for role, content in messages]
+        with self._lock:
+            # Los mensajes de la conversación aún pendientes van delante en el mismo INSERT
+            earlier = self._pending.pop(key, [])
+            self._pending_count -= len(earlier)
+            in_flight = key in self._in_flight
+        if in_flight:
+            # Esperar a que termine el lote en curso para no adelantar sus mensajes
+            with self._flush_lock:
+                pass
+
+        rows = [{"client_id": client_id, "agent_id": agent_id, **message} for message in earlier + turn]
+        if not rows:
+            return
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(self.table.insert(), rows)
+        except Exception as e:
+            logger.error(f"Error al persistir el turno de la conversación, se reintentará por lotes: {str(e)}")
+            with self._lock:
+                self._pending[key] = earlier + turn + self._pending.get(key, [])
+                self._pending_count += len(rows)
+
+    def get_messages(self, client_id: str, agent_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        limit = limit or self.window
+        key = (client_id, agent_id)
+
+        # Tomar primero los mensajes locales: lo que se persista entre esta copia y la
+        # consulta aparecerá en ambos lados y se descarta por message_id.
+        with self._lock:
+            local = list(self._in_flight.get(key, ())) + list(self._pending.get(key, ()))
+
+        table = self.table
+        query = (
+            select(table.c.message_id, table.c.role, table.c.content)
+            .where(table.c.client_id == client_id, table.c.agent_id == agent_id)
+            .order_by(table.c.id.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).fetchall()
+
+        persisted = [{"message_id": row.message_id, "role": row.role, "content": row.content} for row in reversed(rows)]
+        persisted_ids = {message["message_id"] for message in persisted}
+        messages = persisted + [dict(message) for message in local if message["message_id"] not in persisted_ids]
+        return messages[-limit:]
+
+    def clear(self, client_id: str, agent_id: str) -> None:
+        key = (client_id, agent_id)
+        with self._lock:
+            discarded = self._pending.pop(key, [])
+            self._pending_count -= len(discarded)
+
+        table = self.table
+        with self._flush_lock, self.engine.begin() as connection:
+            connection.execute(
+                table.delete().where(table.c.client_id == client_id, table.c.agent_id == agent_id)
+            )
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, OrderedDict()
+                self._pending_count = 0
+                self._in_flight = dict(batch)
+
+            rows = [
+                {"client_id": client_id, "agent_id": agent_id, **message}
+                for (client_id, agent_id), messages in batch.items()
+                for message in messages
+            ]
+            if not rows:
+                return 0
+
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(self.table.insert(), rows)
+            except Exception as e:
+                logger.error(f"Error al persistir el historial de conversaciones: {str(e)}")
+                # Devolver el lote a pendientes, por delante de los mensajes más recientes
+                with self._lock:
+                    for key, messages in batch.items():
+                        self._pending[key] = messages + self._pending.get(key, [])
+                        self._pending.move_to_end(key, last=False)
+                    self._pending_count += len(rows)
+                    self._in_flight = {}
+                return 0
+
+            with self._lock:
+                self._in_flight = {}
+            return len(rows)
+
+    def start(self) -> None:
+        if self.flush_interval <= 0 or self._flush_thread is not None:
+            return
+        self._stop_event.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="conversation-flush", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=max(self.flush_interval, 1.0))
+            self._flush_thread = None
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+
+class StoredChatMessageHistory(BaseChatMessageHistory):
+    """Historial de LangChain que lee y escribe en un ConversationStore.
+
+    La memoria guarda cada turno como un mensaje del cliente seguido de la
+    respuesta del agente; los mensajes del cliente se retienen hasta que llega la
+    respuesta y el turno completo se escribe con una sola llamada a `append_turn`.
+    """
+
+    def __init__(self, store: ConversationStore, client_id: str, agent_id: str):
+        self.store = store
+        self.client_id = client_id
+        self.agent_id = agent_id
+        self._open_turn: List[Tuple[str, str]] = []
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Últimos mensajes de la conversación (ventana del almacén y turno en curso)."""
+        stored = [(message["role"], message["content"]) for message in self.store.get_messages(self.client_id, self.agent_id)]
+        return [
+            _MESSAGE_TYPES[role](content=content)
+            for role, content in (stored + self._open_turn)[-self.store.window:]
+        ]
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._open_turn.append((message.type, message.content))
+        if message.type != "human":
+            turn, self._open_turn = self._open_turn, []
+            self.store.append_turn(self.client_id, self.agent_id, turn)
+
+    def clear(self) -> None:
+        self._open_turn = []
+        self.store.clear(self.client_id, self.agent_id)
+
+
+def create_conversation_store(backend: str = CONVERSATION_STORE_BACKEND) -> ConversationStore:
+    """Crea el almacén de conversaciones configurado
+
+    Args:
+        backend: "memory" o "postgres"
+
+    Returns:
+        El almacén de conversaciones
+    """
+    if backend == "postgres":
+        store = PostgresConversationStore()
+        store.start()
+        return store
+    if backend != "memory":
+        logger.warning(f"Backend de conversaciones desconocido '{backend}', usando memoria local")
+    return InMemoryConversationStore()
+
+
+# Almacén compartido por el proceso
+conversation_store = create_conversation_store()
@@ -1,17 +1,24 @@
-from typing import Dict, Any, List, Optional
-import requests
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+import asyncio
 import json
 import logging
-import os
-from langchain.tools import Tool
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain.chat_models import ChatOpenAI
 
 from base_agent import BaseAgent
-from config import CREDIT_API_URL, CREDIT_API_KEY, DEFAULT_LLM_MODEL, USE_OPENAI_FALLBACK
-from gpt_oss_client import get_llm_client
+from fast_path import fast_path_router
+from policy_index import policy_index
+from prompt_registry import prompt_registry
+from tool_executor import instrument_tool, tool_conversation, conversation_key_for, current_conversation
+from application_submitter import application_submitter
+from tracing import tracer, trace_callbacks
+from project_paths import BACKEND_DIR, ensure_importable
+from config import CREDIT_API_URL, CREDIT_API_KEY, AGENT_POOL_ENABLED, AGENT_TURN_TIMEOUT, FAST_PATH_ENABLED, POLICY_INDEX_ENABLED
+
+# El motor de cálculo de préstamos es el mismo módulo que usa el backend
+ensure_importable(BACKEND_DIR)
+from loan_engine import STANDARD_TERMS, offer_grid, best_offers, rate_range
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -29,8 +36,13 @@ class CreditSalesAgent(BaseAgent):
         temperature: float = 0.7,
         api_key: Optional[str] = None,
         credit_api_url: str = CREDIT_API_URL,
-        credit_api_key: str = CREDIT_API_KEY
+        credit_api_key: str = CREDIT_API_KEY,
+        use_pool: bool = AGENT_POOL_ENABLED
     ):
+        # Las herramientas dependen de la API de créditos, así que se asignan antes de construir el runtime
+        self.credit_api_url = credit_api_url
+        self.credit_api_key = credit_api_key
+        
         super().__init__(
             agent_id=agent_id,
             name=name,
@@ -39,73 +51,78 @@ class CreditSalesAgent(BaseAgent):
             tools=tools,
             model_name=model_name,
             temperature=temperature,
-            api_key=api_key
+            api_key=api_key,
+            use_pool=use_pool
         )
-        self.credit_api_url = credit_api_url
-        self.credit_api_key = credit_api_key
+    
+    def _runtime_config(self) -> Dict[str, Any]:
+        """Configuración del runtime, incluyendo la API de créditos que usan las herramientas"""
+        return {
+            **super()._runtime_config(),
+            "credit_api_url": self.credit_api_url,
+            "credit_api_key": self.credit_api_key
+        }
+    
+    def _build_runtime(self) -> Dict[str, Any]:
+        """Construye el runtime base y el ejecutor con las herramientas de ventas de créditos"""
+        runtime = super()._build_runtime()
+        runtime["agent_executor"] = self._initialize_credit_tools(runtime["llm"])
         
-        # Inicializar herramientas específicas para ventas de créditos
-        self._initialize_credit_tools()
+        # Precargar el índice de políticas para que la primera consulta no pague la carga
+        if POLICY_INDEX_ENABLED:
+            policy_index.start()
+        return runtime
     
-    def _initialize_credit_tools(self):
-        """Inicializa las herramientas específicas para ventas de créditos"""
-        # Definir las herramientas
+    def _initialize_credit_tools(self, llm) -> "AgentExecutor":
+        """Inicializa las herramientas específicas para ventas de créditos
+        
+        Args:
+            llm: Modelo de lenguaje del agente
+            
+        Returns:
+            El ejecutor del agente con las herramientas de créditos
+        """
+        from langchain.agents import create_openai_functions_agent
+        from tool_executor import ParallelToolAgentExecutor
+        
+        # Definir las herramientas (las puras se memorizan por conversación; todas registran su latencia)
         tools = [
-            Tool(
+            instrument_tool(
                 name="credit_policy_lookup",
                 func=self._credit_policy_lookup,
-                description="Consulta las políticas de crédito para verificar requisitos y condiciones"
+                description="Consulta las políticas de crédito para verificar requisitos y condiciones",
+                cacheable=True
             ),
-            Tool(
+            instrument_tool(
                 name="credit_application",
                 func=self._submit_credit_application,
                 description="Envía una solicitud de crédito a la API externa"
             ),
-            Tool(
+            instrument_tool(
                 name="calculate_loan",
                 func=self._calculate_loan,
-                description="Calcula las cuotas y el costo total de un préstamo"
+                description="Calcula las cuotas y el costo total de un préstamo",
+                cacheable=True
+            ),
+            instrument_tool(
+                name="loan_offer_grid",
+                func=self._loan_offer_grid,
+                description="Compara todas las combinaciones de plazos y tasas para uno o varios montos y devuelve las mejores opciones. "
+                            "Recibe un JSON con amounts (lista de montos) y opcionalmente terms, rates, max_monthly_payment, sort_by y limit",
+                cacheable=True
             )
         ]
         
-        # Crear el prompt para el agente
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", self.system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
-        
-        # Determinar qué modelo usar
-        use_model = self.model_name
-        if self.model_name == "gpt-oss-20b" or self.model_name == DEFAULT_LLM_MODEL:
-            # Intentar usar gpt-oss-20b
-            try:
-                # Verificar si podemos importar el módulo gpt-oss-20b
-                import gpt_oss_20b
-                logger.info(f"Usando modelo gpt-oss-20b para el agente {self.agent_id}")
-            except ImportError:
-                if USE_OPENAI_FALLBACK:
-                    logger.warning(f"No se pudo cargar gpt-oss-20b, usando fallback a OpenAI para el agente {self.agent_id}")
-                    use_model = "gpt-3.5-turbo"
-                else:
-                    logger.error(f"No se pudo cargar gpt-oss-20b y el fallback está desactivado para el agente {self.agent_id}")
-                    raise ImportError("No se pudo cargar gpt-oss-20b y el fallback está desactivado")
-        
-        # Crear el modelo de lenguaje
-        llm = ChatOpenAI(model_name=use_model, temperature=self.temperature, openai_api_key=self.api_key)
-        
-        # Crear la memoria
-        memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        # Plantilla compilada del agente (compartida por los agentes con el mismo system prompt)
+        prompt = prompt_registry.get(self.system_prompt, "chat_history", scratchpad=True)
         
         # Crear el agente
-        agent = create_openai_functions_agent(llm, tools, prompt)
+        agent = create_openai_functions_agent(llm, tools, prompt.template)
         
-        # Crear el ejecutor del agente
-        self.agent_executor = AgentExecutor(
+        # Crear el ejecutor del agente (sin memoria propia: el historial se inyecta en cada llamada)
+        return ParallelToolAgentExecutor(
             agent=agent,
             tools=tools,
-            memory=memory,
             verbose=True,
             handle_parsing_errors=True
         )
@@ -113,8 +130,16 @@ class CreditSalesAgent(BaseAgent):
     def _credit_policy_lookup(self, query: str) -> str:
         """Consulta las políticas de crédito"""
         try:
-            # Aquí se implementaría la consulta a la base de conocimiento de políticas
-            # Por ahora, devolvemos información estática
+            # Búsqueda en memoria sobre los chunks de las políticas activas de la base de conocimiento
+            if POLICY_INDEX_ENABLED:
+                results = policy_index.search(query)
+                if results:
+                    return "\n\n".join(
+                        f"[{result['policy_name'] or 'Política ' + str(result['policy_id'])}] {result['text']}"
+                        for result in results
+                    ) + "\n\n"
+            
+            # Sin índice o sin resultados relevantes, se usa la información general de políticas
             policies = {
                 "requisitos": "Para solicitar un crédito, el cliente debe tener: 1) Edad entre 18 y 70 años, 2) Ingresos mínimos de $5,000 mensuales, 3) Antigüedad laboral mínima de 6 meses, 4) Buen historial crediticio.",
                 "montos": "Los montos de crédito van desde $5,000 hasta $500,000, dependiendo del perfil del cliente.",
@@ -138,7 +163,7 @@ class CreditSalesAgent(BaseAgent):
             return "Error al consultar las políticas de crédito. Por favor, inténtalo de nuevo más tarde."
     
     def _submit_credit_application(self, application_data: str) -> str:
-        """Envía una solicitud de crédito a la API externa"""
+        """Encola una solicitud de crédito para enviarla a la API externa y devuelve su ID de seguimiento"""
         try:
             # Convertir los datos de la aplicación de string a diccionario
             try:
@@ -153,18 +178,19 @@ class CreditSalesAgent(BaseAgent):
             if missing_fields:
                 return f"Error: Faltan los siguientes campos requeridos: {', '.join(missing_fields)}"
             
-            # En un entorno real, aquí se enviaría la solicitud a la API externa
-            # Por ahora, simulamos una respuesta
+            # Encolar el envío: la API externa se llama en segundo plano con reintentos
+            conversation = current_conversation()
+            client_ref = conversation[0] if isinstance(conversation, tuple) else conversation
+            job = application_submitter.enqueue(data, client_ref=str(client_ref) if client_ref is not None else None)
+            logger.info(f"Solicitud de crédito encolada con seguimiento {job['tracking_id']}")
             
-            # Simular envío a API externa
-            logger.info(f"Enviando solicitud de crédito: {data}")
-            
-            # Simular respuesta
             response = {
-                "application_id": "APP123456",
-                "status": "pending",
-                "message": "Solicitud recibida correctamente. En breve recibirás una respuesta."
+                "tracking_id": job["tracking_id"],
+                "status": job["status"],
+                "message": "Solicitud recibida correctamente. Te avisaremos con el número de solicitud en cuanto quede registrada."
             }
+            if job["external_application_id"]:
+                response["application_id"] = job["external_application_id"]
             
             return json.dumps(response)
         except Exception as e:
@@ -224,31 +250,202 @@ class CreditSalesAgent(BaseAgent):
             logger.error(f"Error en calculate_loan: {str(e)}")
             return "Error al calcular el préstamo. Por favor, verifica los datos e inténtalo de nuevo."
     
-    def process_message(self, message: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Procesa un mensaje del usuario utilizando el agente de ventas de créditos"""
+    def _loan_offer_grid(self, params: str) -> str:
+        """Calcula las mejores opciones de préstamo sobre una rejilla de montos, plazos y tasas"""
         try:
-            # Preparar el contexto
-            context = context or {}
-            
-            # Registrar la entrada
-            logger.info(f"CreditSalesAgent {self.agent_id} received message: {message}")
+            # Convertir los parámetros de string a diccionario
+            try:
+                data = json.loads(params)
+            except json.JSONDecodeError:
+                return "Error: Los parámetros no tienen un formato válido. Debe ser un JSON válido."
             
-            # Procesar con el ejecutor del agente
-            response = self.agent_executor.run(input=message, **context)
+            amounts = data.get("amounts") or ([data["amount"]] if "amount" in data else None)
+            if not amounts:
+                return "Error: Falta el campo requerido amounts (lista de montos)"
             
-            # Registrar la respuesta
-            logger.info(f"CreditSalesAgent {self.agent_id} response: {response}")
+            try:
+                # offer_grid aplica los mismos límites que el endpoint (plazos, tasas y tamaño de la rejilla)
+                grid = offer_grid(
+                    amounts,
+                    data.get("terms") or STANDARD_TERMS,
+                    data.get("rates") or rate_range()
+                )
+                offers = best_offers(
+                    grid,
+                    max_monthly_payment=data.get("max_monthly_payment"),
+                    sort_by=data.get("sort_by", "total_interest"),
+                    limit=int(data.get("limit", 5))
+                )
+            except ValueError as e:
+                return f"Error: {str(e)}"
             
-            return {
-                "agent_id": self.agent_id,
-                "response": response,
-                "success": True
-            }
+            if not offers:
+                return "No hay opciones que cumplan con la cuota máxima indicada. Considera un monto menor o un plazo mayor."
+            return json.dumps({"scenarios": int(grid["monthly_payment"].size), "offers": offers})
         except Exception as e:
-            logger.error(f"Error processing message with CreditSalesAgent {self.agent_id}: {str(e)}")
-            return {
-                "agent_id": self.agent_id,
-                "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
-                "success": False,
-                "error": str(e)
-            }
\ No newline at end of file
+            logger.error(f"Error en loan_offer_grid: {str(e)}")
+            return "Error al calcular las opciones de préstamo. Por favor, verifica los datos e inténtalo de nuevo."
+    
+    def _try_fast_path(self, message: str, memory) -> Optional[Dict[str, Any]]:
+        """Responde el mensaje con la ruta rápida (sin LLM) si es posible
+        
+        Args:
+            message: El mensaje del usuario
+            memory: Memoria de la conversación, donde se guarda el turno respondido
+            
+        Returns:
+            Dict con la respuesta del agente o None si el turno requiere el agente completo
+        """
+        if not FAST_PATH_ENABLED:
+            return None
+        
+        result = fast_path_router.route(message, self)
+        if result is None:
+            return None
+        
+        memory.save_context({"input": message}, {"output": result["response"]})
+        logger.info(f"CreditSalesAgent {self.agent_id} respondió por la ruta rápida ({result['intent']})")
+        return {
+            "agent_id": self.agent_id,
+            "response": result["response"],
+            "success": True,
+            "fast_path": result["intent"]
+        }
+    
+    def process_message(self, message: str, context: Dict[str, Any] = None, memory=None) -> Dict[str, Any]:
+        """Procesa un mensaje del usuario utilizando el agente de ventas de créditos"""
+        with tracer.span("agent.process_message", **self._span_attributes()) as span:
+            try:
+                # Preparar el contexto
+                context = context or {}
+                memory = memory if memory is not None else self.memory
+                
+                # Registrar la entrada
+                logger.info(f"CreditSalesAgent {self.agent_id} received message: {message}")
+                
+                # Responder sin LLM cuando la intención es determinista
+                with tracer.span("fast_path") as fast_span:
+                    fast_response = self._try_fast_path(message, memory)
+                    fast_span.set_attribute("fast_path.intent", (fast_response or {}).get("fast_path"))
+                if fast_response is not None:
+                    return fast_response
+                
+                with tracer.span("memory.load"):
+                    history = memory.load_memory_variables({"input": message})[self.memory_key]
+                
+                with tracer.span("semantic_cache") as cache_span:
+                    cache_args, cached = self._semantic_cache_lookup(message, history, context)
+                    cache_span.set_attribute("semantic_cache.hit", cached is not None)
+                if cached is not None:
+                    return self._cached_reply(message, cached["response"], memory)
+                
+                # Procesar con el ejecutor del agente (prompts, llamadas al LLM y herramientas quedan en la traza)
+                with tool_conversation(conversation_key_for(memory)):
+                    response = self.agent_executor.run(
+                        input=message,
+                        chat_history=history,
+                        callbacks=trace_callbacks(span),
+                        **context
+                    )
+                self._semantic_cache_store(response, cache_args)
+                with tracer.span("memory.save"):
+                    memory.save_context({"input": message}, {"output": response})
+                
+                # Registrar la respuesta
+                logger.info(f"CreditSalesAgent {self.agent_id} response: {response}")
+                
+                return {
+                    "agent_id": self.agent_id,
+                    "response": response,
+                    "success": True
+                }
+            except Exception as e:
+                span.set_error(e)
+                logger.error(f"Error processing message with CreditSalesAgent {self.agent_id}: {str(e)}")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    async def aprocess_message(
+        self,
+        message: str,
+        context: Dict[str, Any] = None,
+        memory=None,
+        timeout: Optional[float] = AGENT_TURN_TIMEOUT
+    ) -> Dict[str, Any]:
+        """Versión asíncrona de process_message basada en la API asíncrona del ejecutor del agente"""
+        with tracer.span("agent.aprocess_message", **self._span_attributes()) as span:
+            try:
+                # Preparar el contexto
+                context = context or {}
+                memory = memory if memory is not None else self.memory
+                loop = asyncio.get_running_loop()
+                
+                # Registrar la entrada
+                logger.info(f"CreditSalesAgent {self.agent_id} received message: {message}")
+                
+                # Responder sin LLM cuando la intención es determinista
+                with tracer.span("fast_path") as fast_span:
+                    fast_response = await loop.run_in_executor(None, self._try_fast_path, message, memory)
+                    fast_span.set_attribute("fast_path.intent", (fast_response or {}).get("fast_path"))
+                if fast_response is not None:
+                    return fast_response
+                
+                with tracer.span("memory.load"):
+                    variables = await loop.run_in_executor(None, memory.load_memory_variables, {"input": message})
+                
+                with tracer.span("semantic_cache") as cache_span:
+                    cache_args, cached = await loop.run_in_executor(
+                        None, self._semantic_cache_lookup, message, variables[self.memory_key], context
+                    )
+                    cache_span.set_attribute("semantic_cache.hit", cached is not None)
+                if cached is not None:
+                    return await loop.run_in_executor(None, self._cached_reply, message, cached["response"], memory)
+                
+                # Procesar con el ejecutor del agente (las herramientas síncronas se ejecutan en el pool de hilos)
+                with tool_conversation(conversation_key_for(memory)):
+                    response = await asyncio.wait_for(
+                        self.agent_executor.arun(
+                            input=message,
+                            chat_history=variables[self.memory_key],
+                            callbacks=trace_callbacks(span),
+                            **context
+                        ),
+                        timeout=timeout or None
+                    )
+                self._semantic_cache_store(response, cache_args)
+                with tracer.span("memory.save"):
+                    await loop.run_in_executor(None, memory.save_context, {"input": message}, {"output": response})
+                
+                # Registrar la respuesta
+                logger.info(f"CreditSalesAgent {self.agent_id} response: {response}")
+                
+                return {
+                    "agent_id": self.agent_id,
+                    "response": response,
+                    "success": True
+                }
+            except asyncio.TimeoutError:
+                span.set_error("timeout")
+                logger.warning(f"CreditSalesAgent {self.agent_id} excedió el tiempo máximo del turno ({timeout}s)")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, la respuesta está tardando más de lo esperado. Por favor, inténtalo de nuevo en unos momentos.",
+                    "success": False,
+                    "error": "timeout"
+                }
+            except asyncio.CancelledError:
+                logger.info(f"Turno cancelado para CreditSalesAgent {self.agent_id}")
+                raise
+            except Exception as e:
+                span.set_error(e)
+                logger.error(f"Error processing message with CreditSalesAgent {self.agent_id}: {str(e)}")
+                return {
+                    "agent_id": self.agent_id,
+                    "response": "Lo siento, ha ocurrido un error al procesar tu mensaje. Por favor, inténtalo de nuevo más tarde.",
+                    "success": False,
+                    "error": str(e)
+                }
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+"""
+Evaluación offline de los agentes para cambios de prompts y políticas.
+
+Ejecuta un conjunto de diálogos de prueba (eval_cases.jsonl, un caso por línea
+con `case_id`, `template` y `turns`) contra los agentes de config.AGENT_TEMPLATES,
+opcionalmente con un system prompt candidato (--system-prompt). Cada turno
+puede declarar expectativas sobre la respuesta:
+
+  - contains_any: la respuesta menciona al menos uno de los textos;
+  - contains_all: la respuesta menciona todos los textos;
+  - not_contains: la respuesta no menciona ninguno de los textos;
+  - tool: el agente llama a esa herramienta en el turno;
+  - max_chars: longitud máxima de la respuesta.
+
+Los casos se reparten entre un pool de procesos y, dentro de cada proceso, se
+ejecutan de forma concurrente con `aprocess_message` (llamadas asíncronas al
+LLM). Las respuestas del LLM se guardan en una caché SQLite compartida por los
+procesos, por hash del prompt (mensajes, funciones y parámetros del modelo):
+al repetir la evaluación solo se pagan los prompts que cambiaron.
+
+Por cada caso se emite la latencia, las llamadas al LLM (y cuántas salieron de
+la caché), los tokens y su coste junto con las comprobaciones de calidad. Los
+turnos que terminan en error (excepción, tiempo máximo) se informan aparte y no
+cuentan como comprobaciones fallidas.
+Termina con código 1 si la tasa de casos superados es menor que --min-pass-rate.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import argparse
+import contextlib
+import contextvars
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import ChatGeneration, ChatResult, messages_from_dict, messages_to_dict
+
+from agent_router import agent_config_for
+from context_memory import count_tokens
+from fast_path import normalize_text
+from config import (
+    AGENT_TEMPLATES,
+    EVAL_WORKERS,
+    EVAL_CONCURRENCY,
+    EVAL_CACHE_PATH,
+    EVAL_PRICE_PROMPT_PER_1K,
+    EVAL_PRICE_COMPLETION_PER_1K
+)
+
+DEFAULT_CASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_cases.jsonl")
+
+# Llamadas al LLM del turno en curso
+_llm_calls: contextvars.ContextVar = contextvars.ContextVar("eval_llm_calls", default=None)
+
+
+class LLMResponseCache:
+    """Respuestas del LLM en SQLite por hash del prompt (segura entre procesos)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses (key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT result FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        connection = self._connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, result, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(result, ensure_ascii=False), time.time())
+        )
+        connection.commit()
+
+
+class CachedChatModel(BaseChatModel):
+    """Modelo de chat que guarda las respuestas de otro modelo por hash del prompt.
+
+    La clave incluye los mensajes, las funciones, las secuencias de parada y los
+    parámetros que identifican al modelo (nombre, temperatura...), así que
+    cambiar el system prompt, una política recuperada o el modelo invalida solo
+    los prompts afectados. Registra cada llamada (caché, latencia y tokens) en el
+    turno en curso.
+    """
+
+    inner: BaseChatModel
+    response_cache: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.inner._llm_type}"
+
+    def _key(self, messages, stop, kwargs) -> str:
+        payload = {
+            "model": {"type": self.inner._llm_type, **self.inner._identifying_params},
+            "messages": messages_to_dict(messages),
+            "stop": stop,
+            "kwargs": kwargs
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return self._record(messages, self._from_cache(cached), 0.0, cached=True)
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self.response_cache.set(key, self._to_cache(result))
+        return self._record(messages, result, time.perf_counter() - start, cached=False)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return self._record(messages, self._from_cache(cached), 0.0, cached=True)
+        start = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self.response_cache.set(key, self._to_cache(result))
+        return self._record(messages, result, time.perf_counter() - start, cached=False)
+
+    @staticmethod
+    def _to_cache(result: ChatResult) -> Dict[str, Any]:
+        return {
+            "messages": messages_to_dict([generation.message for generation in result.generations]),
+            "llm_output": result.llm_output or {}
+        }
+
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any]) -> ChatResult:
+        generations = [ChatGeneration(message=message) for message in messages_from_dict(cached["messages"])]
+        return ChatResult(generations=generations, llm_output=cached["llm_output"])
+
+    @staticmethod
+    def _record(messages, result: ChatResult, seconds: float, cached: bool) -> ChatResult:
+        calls = _llm_calls.get()
+        if calls is not None:
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            message = result.generations[0].message
+            function_call = message.additional_kwargs.get("function_call") or {}
+            calls.append({
+                "cached": cached,
+                "ms": seconds * 1000,
+                # Sin consumo informado por el modelo, se estima con el tokenizador de context_memory
+                "prompt_tokens": usage.get("prompt_tokens") or sum(count_tokens(str(m.content)) + 4 for m in messages),
+                "completion_tokens": usage.get("completion_tokens") or count_tokens(str(message.content)),
+                "tool": function_call.get("name")
+            })
+        return result
+
+
+def load_cases(path: str) -> List[Dict[str, Any]]:
+    """Lee los casos de evaluación (JSON Lines con case_id, template y turns)."""
+    with open(path, encoding="utf-8") as cases_file:
+        cases = [json.loads(line) for line in cases_file if line.strip()]
+    if not cases:
+        raise ValueError(f"El archivo {path} no tiene casos")
+    for case in cases:
+        case["turns"] = [turn if isinstance(turn, dict) else {"message": turn} for turn in case["turns"]]
+    return cases
+
+
+def check_turn(response: str, tools: List[str], expect: Dict[str, Any]) -> List[str]:
+    """Comprueba las expectativas de un turno
+
+    Args:
+        response: Respuesta del agente
+        tools: Herramientas llamadas en el turno
+        expect: Expectativas del turno (ver docstring del módulo)
+
+    Returns:
+        Lista de comprobaciones fallidas (vacía si el turno las supera todas)
+    """
+    text = normalize_text(response)
+    failures = []
+    if expect.get("contains_any") and not any(normalize_text(value) in text for value in expect["contains_any"]):
+        failures.append(f"no menciona ninguno de {expect['contains_any']}")
+    for value in expect.get("contains_all", []):
+        if normalize_text(value) not in text:
+            failures.append(f"no menciona '{value}'")
+    for value in expect.get("not_contains", []):
+        if normalize_text(value) in text:
+            failures.append(f"menciona '{value}'")
+    if expect.get("tool") and expect["tool"] not in tools:
+        failures.append(f"no llama a {expect['tool']}")
+    if expect.get("max_chars") and len(response) > expect["max_chars"]:
+        failures.append(f"respuesta de {len(response)} caracteres (máx. {expect['max_chars']})")
+    return failures
+
+
+def _count_checks(expect: Dict[str, Any]) -> int:
+    return (
+        bool(expect.get("contains_any")) + len(expect.get("contains_all", [])) + len(expect.get("not_contains", []))
+        + bool(expect.get("tool")) + bool(expect.get("max_chars"))
+    )
+
+
+def build_agent(template: str, options: Dict[str, Any], cache: LLMResponseCache):
+    """Crea el agente de una plantilla con el modelo envuelto en la caché de respuestas
+
+    Args:
+        template: Clave de AGENT_TEMPLATES
+        options: Opciones de la evaluación (system_prompt, model_name, fake_latency)
+        cache: Caché de respuestas del LLM
+
+    Returns:
+        Instancia de CreditSalesAgent o BaseAgent
+    """
+    from base_agent import BaseAgent
+    from credit_sales_agent import CreditSalesAgent
+
+    overrides = {"agent_id": f"eval-{template}"}
+    if options.get("system_prompt"):
+        overrides["system_prompt"] = options["system_prompt"]
+    if options.get("model_name"):
+        overrides["model_name"] = options["model_name"]
+    config = agent_config_for(template, **overrides)
+    agent_class = CreditSalesAgent if config.pop("type") == "credit_sales" else BaseAgent
+
+    def create_llm(agent):
+        if options.get("fake_latency") is not None:
+            from replay_benchmark import FakeChatModel
+            inner = FakeChatModel(latency=options["fake_latency"])
+        else:
+            inner = agent_class._create_llm(agent)
+        return CachedChatModel(inner=inner, response_cache=cache)
+
+    eval_class = type(f"Eval{agent_class.__name__}", (agent_class,), {"_create_llm": create_llm})
+    return eval_class(**config)
+
+
+async def run_case(agent, case: Dict[str, Any], run_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Ejecuta un caso turno a turno y devuelve su resultado con latencia, tokens, coste y comprobaciones."""
+    memory = agent.conversation_memory(f"{run_id}-{case['case_id']}")
+    calls: List[Dict[str, Any]] = []
+    turn_ms: List[float] = []
+    failures: List[str] = []
+    errors: List[str] = []
+    checks = 0
+    start = time.perf_counter()
+    for index, turn in enumerate(case["turns"]):
+        turn_calls: List[Dict[str, Any]] = []
+        _llm_calls.set(turn_calls)
+        turn_start = time.perf_counter()
+        result = await agent.aprocess_message(turn["message"], memory=memory, timeout=options.get("timeout"))
+        turn_ms.append((time.perf_counter() - turn_start) * 1000)
+        calls.extend(turn_calls)
+        if not result.get("success"):
+            # Un turno con error no evalúa sus comprobaciones; se informa aparte
+            errors.append(f"turno {index + 1}: {result.get('error')}")
+            continue
+        expect = turn.get("expect") or {}
+        checks += _count_checks(expect)
+        tools = [call["tool"] for call in turn_calls if call["tool"]]
+        failures.extend(f"turno {index + 1}: {failure}" for failure in check_turn(result["response"], tools, expect))
+
+    prompt_tokens = sum(call["prompt_tokens"] for call in calls)
+    completion_tokens = sum(call["completion_tokens"] for call in calls)
+    billed = [call for call in calls if not call["cached"]]
+    return {
+        "case_id": case["case_id"],
+        "template": case.get("template", "credit_sales"),
+        "passed": not failures and not errors,
+        "checks": checks,
+        "failed_checks": len(failures),
+        "failures": failures,
+        "errors": len(errors),
+        "error_messages": errors,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        "turn_ms_max": round(max(turn_ms), 2) if turn_ms else 0.0,
+        "llm_ms": round(sum(call["ms"] for call in calls), 2),
+        "llm_calls": len(calls),
+        "cache_hits": len(calls) - len(billed),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": round(_cost(prompt_tokens, completion_tokens, options), 6),
+        "billed_cost_usd": round(_cost(
+            sum(call["prompt_tokens"] for call in billed),
+            sum(call["completion_tokens"] for call in billed),
+            options
+        ), 6)
+    }
+
+
+def _cost(prompt_tokens: int, completion_tokens: int, options: Dict[str, Any]) -> float:
+    return prompt_tokens / 1000 * options["price_prompt"] + completion_tokens / 1000 * options["price_completion"]
+
+
+async def _run_cases(cases: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    cache = LLMResponseCache(options["cache_path"])
+    agents: Dict[str, Any] = {}
+    semaphore = asyncio.Semaphore(options["concurrency"])
+    run_id = f"eval-{os.getpid()}-{int(time.time())}"
+
+    async def run(case):
+        template = case.get("template", "credit_sales")
+        try:
+            if template not in agents:
+                agents[template] = build_agent(template, options, cache)
+            async with semaphore:
+                return await run_case(agents[template], case, run_id, options)
+        except Exception as e:
+            return {"case_id": case["case_id"], "template": template, "passed": False, "errors": 1,
+                    "error_messages": [f"{type(e).__name__}: {e}"], "failures": []}
+
+    return await asyncio.gather(*(run(case) for case in cases))
+
+
+def run_worker(cases: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ejecuta un lote de casos en un proceso del pool."""
+    if not options.get("verbose"):
+        logging.getLogger().setLevel(logging.WARNING)
+    # La salida verbose de LangChain se descarta salvo con --verbose
+    with contextlib.redirect_stdout(sys.stdout if options.get("verbose") else io.StringIO()):
+        return asyncio.run(_run_cases(cases, options))
+
+
+def run_evaluation(cases: List[Dict[str, Any]], options: Dict[str, Any], workers: int) -> List[Dict[str, Any]]:
+    """Reparte los casos entre `workers` procesos y devuelve los resultados en el orden de los casos."""
+    workers = max(1, min(workers, len(cases)))
+    if workers == 1:
+        return run_worker(cases, options)
+    batches = [cases[index::workers] for index in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [result for batch in pool.map(run_worker, batches, [options] * workers) for result in batch]
+    order = {case["case_id"]: index for index, case in enumerate(cases)}
+    return sorted(results, key=lambda result: order.get(result["case_id"], 0))
+
+
+def summarize(results: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    """Resumen de la evaluación: calidad, latencia, caché, tokens y coste."""
+    latencies = sorted(result.get("latency_ms", 0.0) for result in results)
+    calls = sum(result.get("llm_calls", 0) for result in results)
+    hits = sum(result.get("cache_hits", 0) for result in results)
+    passed = sum(1 for result in results if result["passed"])
+    return {
+        "cases": len(results),
+        "passed": passed,
+        "pass_rate": round(passed / len(results), 4) if results else 0.0,
+        "checks": sum(result.get("checks", 0) for result in results),
+        "failed_checks": sum(result.get("failed_checks", 0) for result in results),
+        "errors": sum(result.get("errors", 0) for result in results),
+        "wall_seconds": round(seconds, 2),
+        "case_latency_ms": {
+            "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        },
+        "llm_calls": calls,
+        "cache_hit_rate": round(hits / calls, 4) if calls else 0.0,
+        "prompt_tokens": sum(result.get("prompt_tokens", 0) for result in results),
+        "completion_tokens": sum(result.get("completion_tokens", 0) for result in results),
+        "cost_usd": round(sum(result.get("cost_usd", 0.0) for result in results), 6),
+        "billed_cost_usd": round(sum(result.get("billed_cost_usd", 0.0) for result in results), 6)
+    }
+
+
+def _print_report(results: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
+    for result in results:
+        status = "OK   " if result["passed"] else "FALLO"
+        print(
+            f"{status} {result['case_id']:<12} {result['template']:<18} "
+            f"{result.get('latency_ms', 0.0):>9.1f} ms  {result.get('llm_calls', 0):>3} llamadas "
+            f"({result.get('cache_hits', 0)} en caché)  {result.get('prompt_tokens', 0) + result.get('completion_tokens', 0):>6} tokens  "
+            f"${result.get('billed_cost_usd', 0.0):.4f}"
+        )
+        for error in result.get("error_messages", []):
+            print(f"      ! error {error}")
+        for failure in result.get("failures", []):
+            print(f"      - {failure}")
+    print(
+        f"\n{summary['passed']}/{summary['cases']} casos superados ({summary['pass_rate']:.0%}) en {summary['wall_seconds']:.1f} s; "
+        f"latencia por caso p50 {summary['case_latency_ms']['p50']:.0f} ms, p95 {summary['case_latency_ms']['p95']:.0f} ms"
+    )
+    print(f"{summary['failed_checks']}/{summary['checks']} comprobaciones fallidas; {summary['errors']} turnos con error")
+    print(
+        f"{summary['llm_calls']} llamadas al LLM ({summary['cache_hit_rate']:.0%} en caché), "
+        f"{summary['prompt_tokens'] + summary['completion_tokens']} tokens, "
+        f"coste ${summary['cost_usd']:.4f} (pagado en esta ejecución ${summary['billed_cost_usd']:.4f})"
+    )
+
+
+def main():
+    """Función principal de la evaluación."""
+    parser = argparse.ArgumentParser(description="Evalúa los agentes con diálogos de prueba en paralelo")
+    parser.add_argument("--cases", default=DEFAULT_CASES, help="Casos de evaluación (JSON Lines)")
+    parser.add_argument("--templates", help="Plantillas a evaluar, separadas por comas (por defecto, todas las de los casos)")
+    parser.add_argument("--system-prompt", help="Archivo con el system prompt candidato (sustituye al de la plantilla)")
+    parser.add_argument("--model", help="Modelo a evaluar (por defecto, el de los agentes)")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="Procesos del pool")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY, help="Conversaciones simultáneas por proceso")
+    parser.add_argument("--cache", default=EVAL_CACHE_PATH, help="Caché de respuestas del LLM (SQLite)")
+    parser.add_argument("--timeout", type=float, default=120, help="Tiempo máximo por turno en segundos")
+    parser.add_argument("--fake-latency", type=float, help="Usar el LLM simulado de replay_benchmark con esta latencia (segundos)")
+    parser.add_argument("--min-pass-rate", type=float, default=0.0, help="Tasa mínima de casos superados (0-1)")
+    parser.add_argument("--output", help="Archivo JSON Lines con el resultado de cada caso")
+    parser.add_argument("--verbose", action="store_true", help="Mantener los logs INFO y la salida de LangChain")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    if args.templates:
+        templates = {value.strip() for value in args.templates.split(",") if value.strip()}
+        cases = [case for case in cases if case.get("template", "credit_sales") in templates]
+    unknown = {case.get("template", "credit_sales") for case in cases} - set(AGENT_TEMPLATES)
+    if unknown:
+        parser.error(f"Plantillas desconocidas: {', '.join(sorted(unknown))}")
+    if not cases:
+        parser.error("No hay casos que evaluar")
+
+    options = {
+        "system_prompt": open(args.system_prompt, encoding="utf-8").read() if args.system_prompt else None,
+        "model_name": args.model,
+        "concurrency": args.concurrency,
+        "cache_path": args.cache,
+        "timeout": args.timeout,
+        "fake_latency": args.fake_latency,
+        "price_prompt": EVAL_PRICE_PROMPT_PER_1K,
+        "price_completion": EVAL_PRICE_COMPLETION_PER_1K,
+        "verbose": args.verbose
+    }
+
+    start = time.perf_counter()
+    results = run_evaluation(cases, options, args.workers)
+    summary = summarize(results, time.perf_counter() - start)
+    _print_report(results, summary)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            for result in results:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if summary["pass_rate"] < args.min_pass_rate:
+        print(f"FALLO tasa de casos superados {summary['pass_rate']:.0%} menor que {args.min_pass_rate:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
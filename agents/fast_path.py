@@ -0,0 +1,307 @@
+"""Respuestas directas (sin LLM) para intenciones deterministas del agente de créditos."""
+
+import re
+import json
+import math
+import logging
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from project_paths import INTEGRATIONS_DIR, ensure_importable
+from config import FAST_PATH_MIN_CONFIDENCE
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LOAN_CALCULATION = "loan_calculation"
+POLICY_FAQ = "policy_faq"
+APPLICATION_STATUS = "application_status"
+OTHER = "other"
+
+# Ejemplos semilla del clasificador de intenciones (se puede reentrenar con interacciones registradas)
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("cuanto pagaria al mes por 50000 a 24 meses con tasa de 18%", LOAN_CALCULATION),
+    ("calcula la cuota de un prestamo de 100000 a 36 meses al 20%", LOAN_CALCULATION),
+    ("cual seria la mensualidad de 30 mil a 12 meses con 15 por ciento", LOAN_CALCULATION),
+    ("si pido 80000 a 48 meses con interes del 22% cuanto pago", LOAN_CALCULATION),
+    ("simula un credito de 25000 a 18 meses tasa 16%", LOAN_CALCULATION),
+    ("cuanto es el pago mensual de 200000 a 60 meses al 12%", LOAN_CALCULATION),
+    ("cuales son los requisitos para un credito", POLICY_FAQ),
+    ("que documentos necesito", POLICY_FAQ),
+    ("que plazos manejan", POLICY_FAQ),
+    ("cual es la tasa de interes", POLICY_FAQ),
+    ("cuanto es el monto maximo que prestan", POLICY_FAQ),
+    ("que requisitos piden", POLICY_FAQ),
+    ("cuales son los montos disponibles", POLICY_FAQ),
+    ("que tasas tienen", POLICY_FAQ),
+    ("cual es el estado de mi solicitud APP123456", APPLICATION_STATUS),
+    ("como va mi solicitud APP987654", APPLICATION_STATUS),
+    ("quiero saber el estatus de la solicitud APP555111", APPLICATION_STATUS),
+    ("ya aprobaron mi solicitud APP246810", APPLICATION_STATUS),
+    ("seguimiento de mi solicitud numero APP135790", APPLICATION_STATUS),
+    ("hola buenos dias", OTHER),
+    ("quiero un credito para mi negocio", OTHER),
+    ("me interesa pedir un prestamo pero tengo mal historial", OTHER),
+    ("gana 12000 al mes y trabajo desde hace 2 años", OTHER),
+    ("no estoy seguro de que me conviene", OTHER),
+    ("gracias por la informacion", OTHER),
+    ("quiero hablar con un asesor", OTHER),
+    ("tengo dudas sobre mi contrato", OTHER),
+    ("quiero cancelar mi credito", OTHER),
+    ("necesito el documento de mi contrato firmado", OTHER),
+    ("no me conviene esa tasa, que otra opcion hay", OTHER),
+]
+
+_WORD_RE = re.compile(r"[a-z0-9%]+")
+_RATE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:%|por\s*ciento)")
+_TERM_RE = re.compile(r"(\d{1,3})\s*(meses|mes|anos|ano)\b")
+_AMOUNT_RE = re.compile(r"\$?\s*(\d{1,3}(?:[.,]\d{3})+|\d+(?:\.\d+)?)\s*(mil\b|k\b)?")
+_APPLICATION_ID_RE = re.compile(r"\b(app[-_]?\d{4,})\b")
+# Negaciones y alternativas: el cliente rechaza o compara condiciones, no pide un dato concreto
+_NEGATION_WORDS = {"no", "ni", "nunca", "tampoco", "otra", "otro", "otras", "otros", "alternativa", "alternativas"}
+# Temas fuera del alcance de la ruta rápida (gestión de un crédito existente, reclamos, contratos...)
+_OUT_OF_SCOPE_STEMS = (
+    "cancel", "liquid", "adelant", "prepag", "reestructur", "refinanc", "contrato", "firmad",
+    "reclam", "queja", "aclaracion", "cobr", "fraude", "asesor", "humano"
+)
+_POLICY_TOPICS = {
+    "requisitos": ("requisito",),
+    "montos": ("monto", "maximo", "minimo"),
+    "plazos": ("plazo",),
+    "tasas": ("tasa", "interes"),
+    "documentos": ("documento", "papeles")
+}
+
+
+def normalize_text(text: str) -> str:
+    """Pasa a minúsculas y elimina acentos."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _features(text: str) -> List[str]:
+    """Palabras y bigramas del texto, con los números reemplazados por marcadores."""
+    words = []
+    for word in _WORD_RE.findall(normalize_text(text)):
+        if word.startswith("app") and word[3:].isdigit():
+            word = "<app_id>"
+        elif word.endswith("%"):
+            word = "<pct>"
+        elif word.isdigit():
+            word = "<num>"
+        words.append(word)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class IntentClassifier:
+    """Clasificador Naive Bayes multinomial de intenciones, en Python puro y sin dependencias."""
+
+    def __init__(self, examples: Iterable[Tuple[str, str]] = SEED_EXAMPLES):
+        self.train(examples)
+
+    def train(self, examples: Iterable[Tuple[str, str]]) -> None:
+        """Entrena el clasificador
+
+        Args:
+            examples: Pares (mensaje, intención)
+        """
+        class_counts: Counter = Counter()
+        feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, intent in examples:
+            class_counts[intent] += 1
+            feature_counts[intent].update(_features(text))
+
+        vocabulary = {feature for counts in feature_counts.values() for feature in counts}
+        total = sum(class_counts.values())
+        self._priors = {intent: math.log(count / total) for intent, count in class_counts.items()}
+        self._log_likelihoods = {}
+        self._unknown = {}
+        for intent, counts in feature_counts.items():
+            denominator = sum(counts.values()) + len(vocabulary) + 1
+            self._log_likelihoods[intent] = {f: math.log((c + 1) / denominator) for f, c in counts.items()}
+            self._unknown[intent] = math.log(1 / denominator)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Predice la intención de un mensaje
+
+        Returns:
+            Tupla (intención, probabilidad)
+        """
+        features = _features(text)
+        scores = {}
+        for intent, prior in self._priors.items():
+            likelihoods = self._log_likelihoods[intent]
+            unknown = self._unknown[intent]
+            scores[intent] = prior + sum(likelihoods.get(f, unknown) for f in features)
+
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / normalizer
+
+
+class FastPathRouter:
+    """Responde sin LLM los turnos de cálculo de préstamos, preguntas de políticas y estado de solicitudes.
+
+    El clasificador decide la intención y unas expresiones regulares extraen los
+    datos necesarios (monto, plazo y tasa; temas de política; ID de solicitud).
+    Solo se responde directamente si la intención supera `min_confidence`, el
+    mensaje no tiene negaciones ni temas fuera de alcance (`needs_agent`) y los
+    datos están completos; en cualquier otro caso el turno sigue al agente completo.
+    """
+
+    def __init__(self, classifier: Optional[IntentClassifier] = None, min_confidence: float = FAST_PATH_MIN_CONFIDENCE):
+        self.classifier = classifier or IntentClassifier()
+        self.min_confidence = min_confidence
+        self._credit_api = None
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._served: Counter = Counter()
+
+    def route(self, message: str, agent) -> Optional[Dict[str, Any]]:
+        """Intenta responder un mensaje sin LLM
+
+        Args:
+            message: Mensaje del cliente
+            agent: CreditSalesAgent cuyas herramientas se usan para responder
+
+        Returns:
+            Dict con `intent` y `response`, o None si el turno necesita el agente completo
+        """
+        intent, confidence = self.classifier.predict(message)
+        answer = None
+        if intent != OTHER and confidence >= self.min_confidence and not needs_agent(message):
+            try:
+                if intent == LOAN_CALCULATION:
+                    answer = self._answer_loan_calculation(message, agent)
+                elif intent == POLICY_FAQ:
+                    answer = self._answer_policy_faq(message, agent)
+                elif intent == APPLICATION_STATUS:
+                    answer = self._answer_application_status(message)
+            except Exception as e:
+                logger.warning(f"Error en la ruta rápida ({intent}), usando el agente completo: {str(e)}")
+                answer = None
+
+        with self._lock:
+            self._turns += 1
+            if answer is not None:
+                self._served[intent] += 1
+
+        if answer is None:
+            return None
+        return {"intent": intent, "confidence": round(confidence, 4), "response": answer}
+
+    def stats(self) -> Dict[str, Any]:
+        """Proporción de turnos atendidos sin LLM, en total y por intención."""
+        with self._lock:
+            served = sum(self._served.values())
+            return {
+                "turns": self._turns,
+                "fast_path_turns": served,
+                "fast_path_share": round(served / self._turns, 4) if self._turns else 0.0,
+                "by_intent": dict(self._served)
+            }
+
+    def _answer_loan_calculation(self, message: str, agent) -> Optional[str]:
+        params = extract_loan_parameters(message)
+        if params is None:
+            return None
+        result = json.loads(agent._calculate_loan(json.dumps(params)))
+        return (
+            f"Para un crédito de ${result['loan_amount']:,.2f} a {result['term_months']} meses "
+            f"con una tasa anual del {result['annual_interest_rate']}%, la cuota mensual sería de "
+            f"${result['monthly_payment']:,.2f}. Pagarías en total ${result['total_payment']:,.2f}, "
+            f"de los cuales ${result['total_interest']:,.2f} son intereses. "
+            "La tasa final depende de la evaluación de tu perfil."
+        )
+
+    def _answer_policy_faq(self, message: str, agent) -> Optional[str]:
+        normalized = normalize_text(message)
+        topics = [topic for topic, words in _POLICY_TOPICS.items() if any(word in normalized for word in words)]
+        if not topics:
+            return None
+        return agent._credit_policy_lookup(" ".join(topics)).strip()
+
+    def _answer_application_status(self, message: str) -> Optional[str]:
+        match = _APPLICATION_ID_RE.search(normalize_text(message))
+        if not match:
+            return None
+        credit_api = self._get_credit_api()
+        if credit_api is None:
+            return None
+
+        application_id = match.group(1).upper().replace("-", "").replace("_", "")
+        result = credit_api.get_application_status(application_id)
+        if not result.get("success"):
+            return None
+        data = result.get("data", {})
+        status = data.get("status", "en revisión")
+        detail = f" {data['message']}" if data.get("message") else ""
+        return f"Tu solicitud {application_id} se encuentra en estado: {status}.{detail}"
+
+    def _get_credit_api(self):
+        """Cliente de la API de créditos (integrations/credit_api_client.py), si está disponible."""
+        if self._credit_api is None:
+            try:
+                ensure_importable(INTEGRATIONS_DIR)
+                from credit_api_client import CreditAPIClient
+            except ImportError:
+                logger.warning("credit_api_client no disponible; las consultas de estado usarán el agente completo")
+                self._credit_api = False
+                return None
+            self._credit_api = CreditAPIClient()
+        return self._credit_api or None
+
+
+def needs_agent(message: str) -> bool:
+    """Indica si un mensaje debe ir al agente completo aunque el clasificador le asigne una intención
+
+    Un mensaje con negaciones o alternativas ("no quiero esa tasa, ¿qué otra
+    opción hay?") o sobre temas fuera del alcance de la ruta rápida (cancelar
+    un crédito, contratos, reclamos) no se responde con una respuesta fija.
+    """
+    words = _WORD_RE.findall(normalize_text(message))
+    if any(word in _NEGATION_WORDS for word in words):
+        return True
+    return any(word.startswith(_OUT_OF_SCOPE_STEMS) for word in words)
+
+
+def extract_loan_parameters(message: str) -> Optional[Dict[str, float]]:
+    """Extrae monto, plazo (meses) y tasa anual (%) de un mensaje
+
+    Returns:
+        Dict con amount, term y rate, o None si falta alguno
+    """
+    text = normalize_text(message)
+
+    rate_match = _RATE_RE.search(text)
+    term_match = _TERM_RE.search(text)
+    if not rate_match or not term_match:
+        return None
+
+    rate = float(rate_match.group(1).replace(",", "."))
+    term = int(term_match.group(1)) * (12 if term_match.group(2).startswith("ano") else 1)
+
+    # El monto es el primer número que no forma parte de la tasa ni del plazo
+    taken = [rate_match.span(), term_match.span()]
+    amount = None
+    for match in _AMOUNT_RE.finditer(text):
+        start, end = match.span(1)
+        if any(start < t_end and end > t_start for t_start, t_end in taken):
+            continue
+        raw = match.group(1)
+        value = float(re.sub(r"[.,](?=\d{3}\b)", "", raw))
+        if match.group(2):
+            value *= 1000
+        amount = value
+        break
+
+    if amount is None:
+        return None
+    return {"amount": amount, "term": term, "rate": rate}
+
+
+# Router compartido por el proceso
+fast_path_router = FastPathRouter()
@@ -1,8 +1,11 @@
 """Cliente para la integración con gpt-oss-20b."""
 
 import os
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Union, Iterator, AsyncIterator, Callable
 from dotenv import load_dotenv
 
 # Configurar logging
@@ -21,8 +24,67 @@ from config import (
     GPT_OSS_TOP_K,
     USE_OPENAI_FALLBACK,
     OPENAI_API_KEY,
-    DEFAULT_LLM_MODEL
+    DEFAULT_LLM_MODEL,
+    LLM_HEALTH_CHECK_INTERVAL,
+    LLM_FAILOVER_ENABLED,
+    LLM_FALLBACK_MODEL,
+    LLM_COALESCING_ENABLED,
+    SEMANTIC_CACHE_ENABLED
 )
+from llm_failover import FailoverLLMClient
+from request_coalescer import request_coalescer
+from semantic_cache import semantic_cache
+
+
+@dataclass
+class LLMChunk:
+    """Fragmento de una respuesta en streaming, uniforme para todos los backends."""
+    text: str
+    model: str
+    finish_reason: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+
+
+async def _iterate_in_thread(factory: Callable[[], Iterator[LLMChunk]]) -> AsyncIterator[LLMChunk]:
+    """Consume un iterador bloqueante en un hilo y entrega sus elementos de forma asíncrona.
+    
+    Si el consumidor cancela la iteración, el hilo productor se detiene en el
+    siguiente fragmento.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop_event = threading.Event()
+    done = object()
+    
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # El event loop ya se cerró
+            stop_event.set()
+    
+    def produce():
+        try:
+            for item in factory():
+                if stop_event.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(e)
+        finally:
+            put(done)
+    
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
 
 
 class GPTOSSClient:
@@ -64,6 +126,14 @@ class GPTOSSClient:
             logger.warning("No se pudo importar gpt-oss-20b")
             self.model = None
     
+    def health_check(self) -> bool:
+        """Verifica que el modelo siga cargado y disponible en disco.
+        
+        Returns:
+            True si el modelo está disponible, False en caso contrario
+        """
+        return self.model is not None and os.path.exists(self.model_path)
+    
     def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Genera texto usando el modelo gpt-oss-20b.
         
@@ -104,11 +174,45 @@ class GPTOSSClient:
             }
         }
 
+    
+    def stream(self, prompt: str, **kwargs) -> Iterator[LLMChunk]:
+        """Genera texto en streaming usando el modelo gpt-oss-20b.
+        
+        Si el modelo no ofrece generación incremental, se entrega la respuesta
+        completa como un único fragmento.
+        
+        Args:
+            prompt: El prompt para generar texto
+            **kwargs: Parámetros adicionales para la generación
+            
+        Yields:
+            Fragmentos LLMChunk con el texto incremental
+        """
+        if self.model is None:
+            raise ValueError("El modelo gpt-oss-20b no está disponible")
+        
+        if not hasattr(self.model, "stream"):
+            response = self.generate(prompt, **kwargs)
+            yield LLMChunk(text=response["text"], model="gpt-oss-20b", finish_reason="stop", usage=response["usage"])
+            return
+        
+        logger.info(f"Generando texto en streaming con gpt-oss-20b: {prompt[:50]}...")
+        for piece in self.model.stream(
+            prompt=prompt,
+            max_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", self.top_p),
+            top_k=kwargs.get("top_k", self.top_k)
+        ):
+            yield LLMChunk(text=getattr(piece, "text", "") or "", model="gpt-oss-20b")
+        yield LLMChunk(text="", model="gpt-oss-20b", finish_reason="stop")
+
 
 class LLMClient:
     """Cliente unificado para interactuar con modelos de lenguaje."""
     
     def __init__(self, model_name: str = DEFAULT_LLM_MODEL):
+        self.requested_model = model_name
         self.model_name = model_name
         self.client = None
         
@@ -120,6 +224,8 @@ class LLMClient:
         if self.model_name == "gpt-oss-20b":
             try:
                 self.client = GPTOSSClient()
+                if self.client.model is None:
+                    raise ValueError("El modelo gpt-oss-20b no está disponible")
                 logger.info("Cliente gpt-oss-20b inicializado correctamente")
             except Exception as e:
                 logger.error(f"Error al inicializar cliente gpt-oss-20b: {str(e)}")
@@ -145,16 +251,74 @@ class LLMClient:
             logger.error(f"Error al inicializar cliente OpenAI: {str(e)}")
             raise
     
-    def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
+    @property
+    def backend(self) -> str:
+        """Backend efectivamente seleccionado ("gpt-oss-20b" u "openai")."""
+        return "gpt-oss-20b" if isinstance(self.client, GPTOSSClient) else "openai"
+    
+    def health_check(self) -> bool:
+        """Verifica si el backend seleccionado sigue disponible.
+        
+        Returns:
+            True si el backend está disponible, False en caso contrario
+        """
+        if isinstance(self.client, GPTOSSClient):
+            return self.client.health_check()
+        return self.client is not None
+    
+    def generate(
+        self,
+        prompt: str,
+        agent_id: Optional[Any] = None,
+        policy_version: Optional[Any] = None,
+        cache_text: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
         """Genera texto usando el modelo de lenguaje configurado.
         
+        Las llamadas concurrentes con el mismo prompt normalizado y los mismos
+        parámetros comparten una única llamada upstream (ver RequestCoalescer).
+        Si se indica agent_id y la caché semántica está habilitada, se devuelve
+        una respuesta almacenada cuando la pregunta es similar a una anterior del
+        mismo agente con la misma versión de políticas y los mismos parámetros de
+        generación.
+        
         Args:
             prompt: El prompt para generar texto
+            agent_id: ID del agente, para la caché semántica
+            policy_version: Versión de las políticas de crédito activas, para la caché semántica
+            cache_text: Texto a comparar en la caché semántica (por defecto, el prompt)
             **kwargs: Parámetros adicionales para la generación
             
         Returns:
             Dict con el texto generado y metadatos
         """
+        use_cache = SEMANTIC_CACHE_ENABLED and agent_id is not None
+        if use_cache:
+            # El embedding de la consulta se reutiliza al almacenar la respuesta
+            cache_args = {
+                "text": cache_text or prompt,
+                "agent_id": agent_id,
+                "policy_version": policy_version,
+                "params": {"model": self.model_name, "backend": self.backend, **kwargs},
+            }
+            cache_args["vector"] = semantic_cache.embed(cache_args["text"])
+            cached = semantic_cache.lookup(**cache_args)
+            if cached is not None:
+                return {**cached, "cached": True}
+        
+        if LLM_COALESCING_ENABLED:
+            key = request_coalescer.make_key(prompt, model=self.model_name, backend=self.backend, **kwargs)
+            response = request_coalescer.run(key, lambda: self._generate(prompt, **kwargs))
+        else:
+            response = self._generate(prompt, **kwargs)
+        
+        if use_cache and not response.get("coalesced"):
+            semantic_cache.store(response=response, **cache_args)
+        return response
+    
+    def _generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Realiza la llamada upstream al backend configurado."""
         if self.client is None:
             raise ValueError("No se ha inicializado ningún cliente LLM")
         
@@ -186,14 +350,197 @@ class LLMClient:
                 }
             }
 
+    
+    def stream(self, prompt: str, **kwargs) -> Iterator[LLMChunk]:
+        """Genera texto en streaming con el modelo de lenguaje configurado.
+        
+        Args:
+            prompt: El prompt para generar texto
+            **kwargs: Parámetros adicionales para la generación
+            
+        Yields:
+            Fragmentos LLMChunk con el texto incremental; el último incluye finish_reason
+        """
+        if self.client is None:
+            raise ValueError("No se ha inicializado ningún cliente LLM")
+        
+        if isinstance(self.client, GPTOSSClient):
+            yield from self.client.stream(prompt, **kwargs)
+            return
+        
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": "Eres un asistente útil y preciso."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=kwargs.get("max_tokens", GPT_OSS_MAX_TOKENS),
+            temperature=kwargs.get("temperature", GPT_OSS_TEMPERATURE),
+            stream=True,
+        )
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            yield LLMChunk(
+                text=choice.delta.content or "",
+                model=self.model_name,
+                finish_reason=choice.finish_reason
+            )
+    
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[LLMChunk]:
+        """Versión asíncrona de stream().
+        
+        Args:
+            prompt: El prompt para generar texto
+            **kwargs: Parámetros adicionales para la generación
+            
+        Yields:
+            Fragmentos LLMChunk con el texto incremental
+        """
+        async for chunk in _iterate_in_thread(lambda: self.stream(prompt, **kwargs)):
+            yield chunk
+
 
-def get_llm_client(model_name: str = DEFAULT_LLM_MODEL) -> LLMClient:
+class LLMClientRegistry:
+    """Registro de clientes LLM compartidos por todo el proceso.
+    
+    Los clientes se crean de forma perezosa la primera vez que se solicitan y se
+    reutilizan en las llamadas siguientes, de modo que el camino crítico no repite
+    importaciones, verificaciones de disco ni construcción de clientes. Un hilo en
+    segundo plano revisa periódicamente la salud de cada cliente y lo reemplaza de
+    forma atómica cuando el backend disponible cambia (por ejemplo, cuando
+    gpt-oss-20b vuelve a estar disponible tras un fallback a OpenAI).
+    
+    Con LLM_FAILOVER_ENABLED, el cliente de gpt-oss-20b se envuelve en un
+    FailoverLLMClient que desvía las solicitudes a OpenAI cuando el modelo local
+    está lento o fallando.
+    """
+    
+    def __init__(self, health_check_interval: float = LLM_HEALTH_CHECK_INTERVAL):
+        self.health_check_interval = health_check_interval
+        self._clients: Dict[str, Union[LLMClient, FailoverLLMClient]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+    
+    def get(self, model_name: str = DEFAULT_LLM_MODEL) -> Union[LLMClient, FailoverLLMClient]:
+        """Obtiene el cliente compartido para un modelo, creándolo si no existe.
+        
+        Args:
+            model_name: El nombre del modelo a utilizar
+            
+        Returns:
+            El cliente LLM compartido para ese modelo
+        """
+        client = self._clients.get(model_name)
+        if client is not None:
+            return client
+        
+        with self._lock:
+            client = self._clients.get(model_name)
+            if client is None:
+                client = self._create_client(model_name)
+                self._clients[model_name] = client
+                logger.info(f"Cliente LLM registrado para {model_name} (backend: {client.backend})")
+                self._ensure_health_checks()
+        return client
+    
+    def selected_backend(self, model_name: str = DEFAULT_LLM_MODEL) -> Optional[str]:
+        """Devuelve el backend seleccionado para un modelo, o None si aún no se ha creado."""
+        client = self._clients.get(model_name)
+        return client.backend if client is not None else None
+    
+    def backends(self) -> Dict[str, str]:
+        """Devuelve el backend seleccionado para cada modelo registrado."""
+        return {name: client.backend for name, client in list(self._clients.items())}
+    
+    def run_health_checks(self) -> None:
+        """Revisa la salud de los clientes registrados y los reemplaza si es necesario."""
+        for model_name, client in list(self._clients.items()):
+            try:
+                healthy = client.health_check()
+                # Un cliente en fallback se reintenta para volver al modelo local
+                degraded = client.requested_model == "gpt-oss-20b" and client.backend != "gpt-oss-20b"
+                if healthy and not degraded:
+                    continue
+                
+                replacement = self._create_client(model_name)
+                if replacement.backend == client.backend and healthy:
+                    continue
+                
+                with self._lock:
+                    self._clients[model_name] = replacement
+                logger.info(
+                    f"Cliente LLM para {model_name} reemplazado: {client.backend} -> {replacement.backend}"
+                )
+            except Exception as e:
+                logger.error(f"Error en health check del cliente LLM {model_name}: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de failover de los clientes que las exponen."""
+        return {
+            name: client.stats()
+            for name, client in list(self._clients.items())
+            if isinstance(client, FailoverLLMClient)
+        }
+    
+    def _create_client(self, model_name: str) -> Union[LLMClient, FailoverLLMClient]:
+        """Crea el cliente para un modelo, con failover a OpenAI si corresponde."""
+        client = LLMClient(model_name=model_name)
+        if not (LLM_FAILOVER_ENABLED and USE_OPENAI_FALLBACK and OPENAI_API_KEY):
+            return client
+        if client.backend != "gpt-oss-20b":
+            return client
+        
+        try:
+            fallback = LLMClient(model_name=LLM_FALLBACK_MODEL)
+        except Exception as e:
+            logger.warning(f"No se pudo crear el cliente de fallback para {model_name}: {str(e)}")
+            return client
+        return FailoverLLMClient(primary=client, fallback=fallback)
+    
+    def reset(self) -> None:
+        """Elimina todos los clientes registrados y detiene los health checks."""
+        self._stop_event.set()
+        with self._lock:
+            self._clients.clear()
+            self._health_thread = None
+        self._stop_event = threading.Event()
+    
+    def _ensure_health_checks(self) -> None:
+        """Inicia el hilo de health checks si está habilitado y no está en ejecución."""
+        if self.health_check_interval <= 0 or self._health_thread is not None:
+            return
+        
+        self._health_thread = threading.Thread(
+            target=self._health_loop,
+            args=(self._stop_event,),
+            name="llm-health-checks",
+            daemon=True
+        )
+        self._health_thread.start()
+    
+    def _health_loop(self, stop_event: threading.Event) -> None:
+        """Bucle de health checks en segundo plano."""
+        while not stop_event.wait(self.health_check_interval):
+            self.run_health_checks()
+
+
+# Registro compartido por el proceso
+llm_client_registry = LLMClientRegistry()
+
+
+def get_llm_client(model_name: str = DEFAULT_LLM_MODEL) -> Union[LLMClient, FailoverLLMClient]:
     """Obtiene un cliente LLM configurado.
     
+    El cliente se obtiene del registro compartido del proceso, por lo que las
+    llamadas sucesivas con el mismo modelo no realizan trabajo de inicialización.
+    
     Args:
         model_name: El nombre del modelo a utilizar
         
     Returns:
         Un cliente LLM configurado
     """
-    return LLMClient(model_name=model_name)
\ No newline at end of file
+    return llm_client_registry.get(model_name)
@@ -0,0 +1,386 @@
+"""Failover entre backends LLM con circuit breakers y solicitudes hedged."""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+
+from config import (
+    LLM_BREAKER_WINDOW,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_ERROR_THRESHOLD,
+    LLM_BREAKER_LATENCY_THRESHOLD,
+    LLM_BREAKER_OPEN_SECONDS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_DEFAULT_DEADLINE,
+    LLM_HEDGE_MAX_WORKERS
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Circuit breaker con ventana móvil de latencias y errores para un backend.
+
+    El circuito se abre cuando, con al menos `min_calls` llamadas en la ventana, la
+    tasa de errores supera `error_threshold` o el p95 de latencia supera
+    `latency_threshold`. Tras `open_seconds` pasa a semiabierto y deja pasar una
+    llamada de prueba: si tiene éxito se cierra, si falla se vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        error_threshold: float = LLM_BREAKER_ERROR_THRESHOLD,
+        latency_threshold: Optional[float] = LLM_BREAKER_LATENCY_THRESHOLD,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.latency_threshold = latency_threshold
+        self.open_seconds = open_seconds
+
+        self._window: deque = deque(maxlen=window_size)  # (latencia, éxito)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Estado actual del circuito."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Indica si se puede enviar una solicitud a este backend."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """Registra una llamada exitosa."""
+        with self._lock:
+            self._window.append((latency, True))
+            if self._state == self.HALF_OPEN:
+                logger.info(f"Circuit breaker {self.name} cerrado tras llamada de prueba exitosa")
+                self._state = self.CLOSED
+                self._trial_in_flight = False
+                self._window.clear()
+                self._window.append((latency, True))
+                return
+            self._evaluate()
+
+    def record_failure(self, latency: float) -> None:
+        """Registra una llamada fallida."""
+        with self._lock:
+            self._window.append((latency, False))
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            self._evaluate()
+
+    def release_trial(self) -> None:
+        """Libera la llamada de prueba sin registrar resultado (por ejemplo, si se abandonó un stream)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def error_rate(self) -> float:
+        """Tasa de errores en la ventana actual."""
+        with self._lock:
+            return self._error_rate()
+
+    def p95_latency(self) -> Optional[float]:
+        """Percentil 95 de latencia de las llamadas exitosas, o None sin historial suficiente."""
+        with self._lock:
+            return self._p95_latency()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumen del estado del circuito para métricas."""
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "calls": len(self._window),
+                "error_rate": round(self._error_rate(), 4),
+                "p95_latency": self._p95_latency()
+            }
+
+    def _error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        failures = sum(1 for _, ok in self._window if not ok)
+        return failures / len(self._window)
+
+    def _p95_latency(self) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self._window if ok)
+        if len(latencies) < self.min_calls:
+            return None
+        index = min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def _evaluate(self) -> None:
+        if self._state != self.CLOSED or len(self._window) < self.min_calls:
+            return
+
+        if self._error_rate() > self.error_threshold:
+            logger.warning(f"Circuit breaker {self.name} abierto por tasa de errores ({self._error_rate():.0%})")
+            self._open()
+            return
+
+        p95 = self._p95_latency()
+        if self.latency_threshold and p95 is not None and p95 > self.latency_threshold:
+            logger.warning(f"Circuit breaker {self.name} abierto por latencia (p95 {p95:.2f}s)")
+            self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+
+class FailoverLLMClient:
+    """Cliente LLM que reparte las solicitudes entre un backend principal y uno de fallback.
+
+    Cada backend tiene su propio circuit breaker; cuando el principal está lento o
+    fallando las solicitudes van directamente al fallback. Con `hedge=True`, si el
+    principal no responde dentro de su p95 se envía una segunda solicitud al
+    fallback y se usa la primera respuesta que llegue.
+
+    Expone la misma interfaz que `LLMClient` (`generate`, `stream`, `astream`,
+    `backend`, `health_check`).
+    """
+
+    def __init__(
+        self,
+        primary,
+        fallback,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        hedge_default_deadline: float = LLM_HEDGE_DEFAULT_DEADLINE,
+        max_workers: int = LLM_HEDGE_MAX_WORKERS
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.hedge = hedge
+        self.hedge_default_deadline = hedge_default_deadline
+        self.requested_model = primary.requested_model
+        self.model_name = primary.model_name
+
+        self.breakers = {
+            primary.backend: CircuitBreaker(primary.backend),
+            fallback.backend: CircuitBreaker(fallback.backend)
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "wins": {primary.backend: 0, fallback.backend: 0},
+            "hedged_requests": 0,
+            "hedge_wins": {primary.backend: 0, fallback.backend: 0},
+            "failovers": 0,
+            "breaker_bypasses": 0
+        }
+
+    @property
+    def backend(self) -> str:
+        """Backend principal de este cliente."""
+        return self.primary.backend
+
+    def health_check(self) -> bool:
+        """El cliente está sano mientras el backend principal esté disponible."""
+        return self.primary.health_check()
+
+    def generate(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Genera texto usando el backend más adecuado según el estado de los circuitos.
+
+        Args:
+            prompt: El prompt para generar texto
+            **kwargs: Parámetros adicionales para la generación
+
+        Returns:
+            Dict con el texto generado y metadatos
+        """
+        self._increment("requests")
+        primary_breaker = self.breakers[self.primary.backend]
+        fallback_breaker = self.breakers[self.fallback.backend]
+
+        if not primary_breaker.allow_request():
+            self._increment("breaker_bypasses")
+            return self._generate_with_failover(self.fallback, self.primary, prompt, kwargs)
+
+        if self.hedge and fallback_breaker.state == CircuitBreaker.CLOSED:
+            return self._hedged_generate(prompt, kwargs)
+
+        return self._generate_with_failover(self.primary, self.fallback, prompt, kwargs)
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[Any]:
+        """Genera texto en streaming con el backend disponible.
+
+        Si el backend elegido falla antes de entregar el primer fragmento, la
+        solicitud se repite en el otro backend. Las solicitudes en streaming no
+        se duplican (no hay hedging).
+        """
+        first, second, holds_trial = self._streaming_order()
+        breaker = self.breakers[first.backend]
+        start = time.monotonic()
+        started = False
+        recorded = False
+        try:
+            try:
+                for chunk in first.stream(prompt, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                breaker.record_failure(time.monotonic() - start)
+                recorded = True
+                if started:
+                    raise
+                logger.warning(f"Error en streaming con {first.backend}, usando {second.backend}: {str(e)}")
+                self._increment("failovers")
+                yield from second.stream(prompt, **kwargs)
+                self._record_win(second.backend)
+                return
+            breaker.record_success(time.monotonic() - start)
+            recorded = True
+            self._record_win(first.backend)
+        finally:
+            # Stream abandonado (GeneratorExit) o cancelado: la llamada de prueba no debe quedar ocupada
+            if holds_trial and not recorded:
+                breaker.release_trial()
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[Any]:
+        """Versión asíncrona de stream()."""
+        first, second, holds_trial = self._streaming_order()
+        breaker = self.breakers[first.backend]
+        start = time.monotonic()
+        started = False
+        recorded = False
+        try:
+            try:
+                async for chunk in first.astream(prompt, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                breaker.record_failure(time.monotonic() - start)
+                recorded = True
+                if started:
+                    raise
+                logger.warning(f"Error en streaming con {first.backend}, usando {second.backend}: {str(e)}")
+                self._increment("failovers")
+                async for chunk in second.astream(prompt, **kwargs):
+                    yield chunk
+                self._record_win(second.backend)
+                return
+            breaker.record_success(time.monotonic() - start)
+            recorded = True
+            self._record_win(first.backend)
+        finally:
+            # Stream abandonado (GeneratorExit) o cancelado: la llamada de prueba no debe quedar ocupada
+            if holds_trial and not recorded:
+                breaker.release_trial()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de cada backend y estado de los circuitos."""
+        with self._stats_lock:
+            stats = {
+                key: dict(value) if isinstance(value, dict) else value
+                for key, value in self._stats.items()
+            }
+        stats["breakers"] = {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+        return stats
+
+    def _streaming_order(self) -> Tuple[Any, Any, bool]:
+        """Orden de backends para una solicitud en streaming según el estado de los circuitos.
+
+        Returns:
+            Tupla (primero, segundo, si la solicitud ocupa la llamada de prueba del circuito semiabierto del primero)
+        """
+        self._increment("requests")
+        breaker = self.breakers[self.primary.backend]
+        if breaker.allow_request():
+            return self.primary, self.fallback, breaker.state == CircuitBreaker.HALF_OPEN
+        self._increment("breaker_bypasses")
+        return self.fallback, self.primary, False
+
+    def _generate_with_failover(self, first, second, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = self._timed_generate(first, prompt, kwargs)
+            self._record_win(first.backend)
+            return response
+        except Exception as e:
+            logger.warning(f"Error en backend {first.backend}, usando {second.backend}: {str(e)}")
+            self._increment("failovers")
+            response = self._timed_generate(second, prompt, kwargs)
+            self._record_win(second.backend)
+            return response
+
+    def _hedged_generate(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        deadline = self.breakers[self.primary.backend].p95_latency() or self.hedge_default_deadline
+        primary_future = self._executor.submit(self._timed_generate, self.primary, prompt, kwargs)
+
+        done, _ = wait([primary_future], timeout=deadline)
+        if done and primary_future.exception() is None:
+            self._record_win(self.primary.backend)
+            return primary_future.result()
+
+        # El principal superó el deadline o falló: lanzar la solicitud al fallback
+        self._increment("hedged_requests")
+        fallback_future = self._executor.submit(self._timed_generate, self.fallback, prompt, kwargs)
+        futures = {primary_future: self.primary.backend, fallback_future: self.fallback.backend}
+
+        pending = set(futures)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = futures[future]
+                    self._record_win(winner, hedged=True)
+                    return future.result()
+                last_error = future.exception()
+
+        raise last_error
+
+    def _timed_generate(self, client, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        breaker = self.breakers[client.backend]
+        start = time.monotonic()
+        try:
+            response = client.generate(prompt, **kwargs)
+        except Exception:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return response
+
+    def _record_win(self, backend: str, hedged: bool = False) -> None:
+        with self._stats_lock:
+            self._stats["wins"][backend] += 1
+            if hedged:
+                self._stats["hedge_wins"][backend] += 1
+
+    def _increment(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
@@ -0,0 +1,319 @@
+"""Índice en memoria de las políticas de crédito activas para las consultas del agente."""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from project_paths import KNOWLEDGE_DIR, ensure_importable
+from config import (
+    CHROMA_DB_PATH,
+    POLICY_INDEX_DATABASE_URL,
+    POLICY_INDEX_REFRESH_INTERVAL,
+    POLICY_INDEX_TOP_K,
+    POLICY_INDEX_MIN_SCORE,
+    POLICY_INDEX_QUERY_CACHE_SIZE
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """Chunks de las políticas activas y sus embeddings normalizados (inmutable una vez creado)."""
+
+    __slots__ = ("vectors", "chunks", "version", "loaded_at")
+
+    def __init__(self, vectors: np.ndarray, chunks: List[Dict[str, Any]], version: Any):
+        self.vectors = vectors
+        self.chunks = chunks
+        self.version = version
+        self.loaded_at = time.time()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class PolicyHotIndex:
+    """Caché por proceso de los chunks de políticas activas de `PolicyKnowledgeBase`.
+
+    Al cargarse lee de ChromaDB los chunks de las políticas activas junto con los
+    embeddings ya almacenados (no se recalculan) y los guarda en una matriz
+    normalizada; cada búsqueda es un producto matriz-vector y una selección top-k
+    en memoria. Los embeddings de las consultas se guardan en una caché LRU, así
+    que una consulta repetida no sale del proceso.
+
+    La versión de las políticas se lee de la tabla `credit_policies` (IDs activos
+    y `updated_at`); un hilo en segundo plano la comprueba cada
+    `refresh_interval` segundos y recarga el índice cuando una política se activa,
+    se desactiva o se actualiza. Sin base de datos se indexan todos los chunks y
+    solo se recarga con `refresh(force=True)`.
+    """
+
+    def __init__(
+        self,
+        knowledge_base_factory: Optional[Callable[[], Any]] = None,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        database_url: Optional[str] = POLICY_INDEX_DATABASE_URL,
+        refresh_interval: float = POLICY_INDEX_REFRESH_INTERVAL,
+        top_k: int = POLICY_INDEX_TOP_K,
+        min_score: float = POLICY_INDEX_MIN_SCORE,
+        query_cache_size: int = POLICY_INDEX_QUERY_CACHE_SIZE
+    ):
+        """Inicializa el índice (la carga se hace en la primera búsqueda o con `start`)
+
+        Args:
+            knowledge_base_factory: Función que crea la base de conocimiento (por defecto, PolicyKnowledgeBase en CHROMA_DB_PATH)
+            embed_fn: Función que calcula el embedding de una consulta (por defecto, la de la base de conocimiento)
+            database_url: URL de la base de datos con la tabla credit_policies
+            refresh_interval: Segundos entre comprobaciones de la versión de políticas (0 = sin hilo)
+            top_k: Número de chunks devueltos por defecto
+            min_score: Similitud coseno mínima de un resultado
+            query_cache_size: Embeddings de consultas guardados en memoria
+        """
+        self._knowledge_base_factory = knowledge_base_factory or self._default_knowledge_base
+        self._embed_fn = embed_fn
+        self.database_url = database_url
+        self.refresh_interval = refresh_interval
+        self.top_k = top_k
+        self.min_score = min_score
+        self.query_cache_size = query_cache_size
+
+        self._knowledge_base = None
+        self._engine = None
+        self._snapshot: Optional[_Snapshot] = None
+        self._load_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._searches = 0
+        self._query_cache_hits = 0
+        self._reloads = 0
+        self._retry_at = 0.0
+
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Any], None]] = []
+
+    @staticmethod
+    def _default_knowledge_base():
+        ensure_importable(KNOWLEDGE_DIR)
+        from policy_knowledge_base import PolicyKnowledgeBase
+        return PolicyKnowledgeBase(persist_directory=CHROMA_DB_PATH)
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Busca los chunks de políticas activas más similares a una consulta
+
+        Args:
+            query: Consulta de búsqueda
+            k: Número máximo de resultados (por defecto, top_k)
+
+        Returns:
+            Lista de dicts con text, policy_id, policy_name y score, de mayor a menor similitud
+        """
+        snapshot = self._snapshot or self._ensure_loaded()
+        if snapshot is None or not snapshot.chunks or not query.strip():
+            return []
+
+        vector = self._query_vector(query)
+        if vector is None:
+            return []
+        if vector.shape[0] != snapshot.vectors.shape[1]:
+            logger.warning("El embedding de la consulta no coincide con la dimensión del índice de políticas")
+            return []
+
+        k = min(k or self.top_k, len(snapshot.chunks))
+        scores = snapshot.vectors @ vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for index in top:
+            score = float(scores[index])
+            if score < self.min_score:
+                break
+            chunk = snapshot.chunks[index]
+            results.append({**chunk, "score": round(score, 4)})
+        return results
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recarga el índice si cambió la versión de las políticas
+
+        Args:
+            force: Recargar aunque la versión no haya cambiado
+
+        Returns:
+            True si se recargó el índice
+        """
+        with self._load_lock:
+            version, active_ids = self._policy_state()
+            current = self._snapshot
+            if current is not None and not force and version == current.version:
+                return False
+
+            knowledge_base = self._get_knowledge_base()
+            chunks = knowledge_base.get_chunks(policy_ids=active_ids)
+            chunks = [chunk for chunk in chunks if chunk.get("embedding") is not None]
+            if chunks:
+                vectors = _normalize(np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32))
+            else:
+                vectors = np.empty((0, 0), dtype=np.float32)
+
+            entries = [
+                {
+                    "text": chunk["text"],
+                    "policy_id": chunk["metadata"].get("policy_id"),
+                    "policy_name": chunk["metadata"].get("policy_name")
+                }
+                for chunk in chunks
+            ]
+            self._snapshot = _Snapshot(vectors, entries, version)
+            self._reloads += 1
+            if current is not None and version != current.version:
+                self._notify_listeners(version)
+            if entries:
+                logger.info(f"Índice de políticas cargado: {len(entries)} chunks (versión {version})")
+            else:
+                # Sin chunks, credit_policy_lookup solo puede responder con la información general
+                logger.error(f"El índice de políticas está vacío (versión {version}): la base de conocimiento no tiene chunks de políticas activas")
+            return True
+
+    @property
+    def loaded(self) -> bool:
+        """Indica si el índice ya está cargado (y, por tanto, si `version` es conocida)."""
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> Any:
+        """Versión de las políticas del índice cargado (None si aún no se cargó)."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    def add_listener(self, callback: Callable[[Any], None]) -> None:
+        """Registra una función que se llama con la nueva versión cuando cambian las políticas activas
+
+        Args:
+            callback: Función que recibe la nueva versión de las políticas
+        """
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        """Carga el índice e inicia la comprobación periódica de la versión de políticas."""
+        self._ensure_loaded()
+        self._start_refresh_thread()
+
+    def stop(self) -> None:
+        """Detiene la comprobación periódica."""
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=1.0)
+            self._refresh_thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del índice y de la caché de embeddings de consultas."""
+        snapshot = self._snapshot
+        with self._cache_lock:
+            return {
+                "loaded": snapshot is not None,
+                "chunks": len(snapshot.chunks) if snapshot else 0,
+                "policies": len({chunk["policy_id"] for chunk in snapshot.chunks}) if snapshot else 0,
+                "version": snapshot.version if snapshot else None,
+                "loaded_at": snapshot.loaded_at if snapshot else None,
+                "reloads": self._reloads,
+                "searches": self._searches,
+                "query_cache_hits": self._query_cache_hits,
+                "query_cache_size": len(self._query_cache)
+            }
+
+    def _ensure_loaded(self) -> Optional[_Snapshot]:
+        """Carga el índice en el primer uso; si falla, se reintenta tras refresh_interval segundos."""
+        if self._snapshot is None and time.time() >= self._retry_at:
+            try:
+                self.refresh()
+            except Exception as e:
+                self._retry_at = time.time() + max(self.refresh_interval, 1.0)
+                logger.error(f"No se pudo cargar el índice de políticas: {str(e)}")
+            if self._snapshot is not None:
+                self._start_refresh_thread()
+        return self._snapshot
+
+    def _notify_listeners(self, version: Any) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(version)
+            except Exception as e:
+                logger.error(f"Error al notificar el cambio de políticas: {str(e)}")
+
+    def _start_refresh_thread(self) -> None:
+        with self._load_lock:
+            if self.refresh_interval <= 0 or self._refresh_thread is not None:
+                return
+            self._stop_event.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="policy-index-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error al actualizar el índice de políticas: {str(e)}")
+
+    def _query_vector(self, query: str) -> Optional[np.ndarray]:
+        key = " ".join(query.lower().split())
+        with self._cache_lock:
+            self._searches += 1
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                self._query_cache.move_to_end(key)
+                self._query_cache_hits += 1
+                return vector
+
+        try:
+            embed_fn = self._embed_fn or self._get_knowledge_base().embed_query
+            vector = _normalize(np.asarray(embed_fn(query), dtype=np.float32))
+        except Exception as e:
+            logger.error(f"Error al calcular el embedding de la consulta de políticas: {str(e)}")
+            return None
+
+        with self._cache_lock:
+            self._query_cache[key] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def _get_knowledge_base(self):
+        if self._knowledge_base is None:
+            self._knowledge_base = self._knowledge_base_factory()
+        return self._knowledge_base
+
+    def _policy_state(self) -> Tuple[Any, Optional[List[str]]]:
+        """Versión de las políticas (IDs activos y última actualización) y lista de IDs activos."""
+        if not self.database_url:
+            return None, None
+
+        from sqlalchemy import create_engine, text
+
+        if self._engine is None:
+            self._engine = create_engine(
+                self.database_url,
+                pool_pre_ping=True,
+                connect_args={"check_same_thread": False} if self.database_url.startswith("sqlite") else {}
+            )
+        with self._engine.connect() as connection:
+            rows = connection.execute(
+                text("SELECT id, is_active, created_at, updated_at FROM credit_policies ORDER BY id")
+            ).fetchall()
+
+        active_ids = [str(row[0]) for row in rows if row[1]]
+        version = (tuple(active_ids), max((str(row[3] or row[2]) for row in rows), default=None))
+        return version, active_ids
+
+
+# Índice compartido por el proceso
+policy_index = PolicyHotIndex()
@@ -0,0 +1,27 @@
+"""Rutas de los paquetes hermanos del proyecto que usan los agentes (integrations/, knowledge/ y backend/).
+
+Los módulos de esos directorios se importan como módulos planos (igual que los
+de agents/), así que su directorio se añade a sys.path antes de importarlos.
+Se añade al final para que nunca oculten a un módulo de agents/ con el mismo
+nombre. De backend/ solo se importa loan_engine, que comparten el endpoint de
+ofertas y la herramienta del agente de ventas.
+"""
+
+import os
+import sys
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(AGENTS_DIR)
+INTEGRATIONS_DIR = os.path.join(PROJECT_ROOT, "integrations")
+KNOWLEDGE_DIR = os.path.join(PROJECT_ROOT, "knowledge")
+BACKEND_DIR = os.path.join(PROJECT_ROOT, "backend")
+
+
+def ensure_importable(directory: str) -> None:
+    """Permite importar los módulos de un directorio del proyecto
+
+    Args:
+        directory: Directorio con módulos planos (INTEGRATIONS_DIR, KNOWLEDGE_DIR o BACKEND_DIR)
+    """
+    if directory not in sys.path:
+        sys.path.append(directory)
@@ -0,0 +1,133 @@
+"""Registro de plantillas de prompt compiladas con el recuento de tokens de su parte fija."""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import PROMPT_REGISTRY_MAX_SIZE
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_MESSAGE_OVERHEAD_TOKENS = 4  # tokens de formato por mensaje de chat
+
+
+class CompiledPrompt:
+    """Plantilla de chat compilada para un system prompt.
+
+    El system prompt se analiza como plantilla una sola vez al compilar; en cada
+    turno solo se sustituyen sus variables (`system_variables`, que llegan en el
+    contexto de `process_message`) y se añaden el historial y el mensaje del
+    cliente. Los tokens de la parte fija se cuentan una sola vez al compilar.
+    """
+
+    def __init__(self, template, system_tokens: int, system_variables: Optional[List[str]] = None):
+        self.template = template
+        self.system_tokens = system_tokens
+        self.system_variables = system_variables or []
+
+    def count_tokens(self, message: str, history: Optional[List[Any]] = None, context: Optional[Dict[str, Any]] = None) -> int:
+        """Tokens del prompt de un turno sin volver a tokenizar la parte fija del system prompt
+
+        Args:
+            message: Mensaje del cliente
+            history: Mensajes del historial que se inyectan en el prompt
+            context: Variables del turno que se sustituyen en el system prompt
+
+        Returns:
+            Tokens de la parte fija (cacheados) más los de las variables, el historial y el mensaje
+        """
+        from context_memory import count_tokens, count_message_tokens
+
+        context = context or {}
+        variable_tokens = sum(count_tokens(str(context.get(variable, ""))) for variable in self.system_variables)
+        history_tokens = count_message_tokens(history) if isinstance(history, list) else 0
+        return self.system_tokens + variable_tokens + history_tokens + count_tokens(message) + _MESSAGE_OVERHEAD_TOKENS
+
+
+class PromptRegistry:
+    """Caché LRU de plantillas de prompt compiladas por system prompt y estructura.
+
+    Varios agentes con el mismo system prompt (por ejemplo, los de una misma
+    plantilla de config.AGENT_TEMPLATES) comparten la plantilla compilada y su
+    recuento de tokens.
+    """
+
+    def __init__(self, max_size: int = PROMPT_REGISTRY_MAX_SIZE):
+        """Inicializa el registro
+
+        Args:
+            max_size: Número máximo de plantillas compiladas en memoria
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str, bool], CompiledPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, system_prompt: str, memory_key: str = "chat_history", scratchpad: bool = False) -> CompiledPrompt:
+        """Obtiene la plantilla compilada de un system prompt, compilándola si no existe
+
+        Args:
+            system_prompt: Instrucciones del agente
+            memory_key: Variable del historial de la conversación
+            scratchpad: Añadir el espacio de trabajo de un agente con herramientas (agent_scratchpad)
+
+        Returns:
+            La plantilla compilada
+        """
+        key = (hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(), memory_key, scratchpad)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return compiled
+            self._misses += 1
+
+        # Compilar dos veces la misma plantilla en una carrera es inofensivo
+        compiled = self._compile(system_prompt, memory_key, scratchpad)
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    @staticmethod
+    def _compile(system_prompt: str, memory_key: str, scratchpad: bool) -> CompiledPrompt:
+        from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate
+        from context_memory import count_tokens
+
+        system_template = SystemMessagePromptTemplate.from_template(system_prompt)
+        system_variables = list(system_template.input_variables)
+        messages = [
+            system_template,
+            MessagesPlaceholder(variable_name=memory_key),
+            ("human", "{input}")
+        ]
+        if scratchpad:
+            messages.append(MessagesPlaceholder(variable_name="agent_scratchpad"))
+        template = ChatPromptTemplate.from_messages(messages)
+        # Parte fija: el system prompt con sus variables vacías
+        static_text = system_template.prompt.format(**{variable: "" for variable in system_variables})
+        system_tokens = count_tokens(static_text) + _MESSAGE_OVERHEAD_TOKENS
+        logger.info(f"Plantilla de prompt compilada ({system_tokens} tokens fijos, variables: {system_variables})")
+        return CompiledPrompt(template, system_tokens, system_variables)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del registro: aciertos, compilaciones y tamaño."""
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+    def clear(self) -> None:
+        """Descarta todas las plantillas compiladas."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Registro compartido por el proceso
+prompt_registry = PromptRegistry()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+"""
+Benchmark de repetición de conversaciones de los agentes con un LLM simulado.
+
+Repite un corpus de conversaciones de clientes (replay_corpus.jsonl, una
+conversación por línea con `conversation_id` y `turns`) a través de `BaseAgent`
+y `CreditSalesAgent`, sustituyendo el modelo por `FakeChatModel`: respuestas
+deterministas con latencia configurable. Así el tiempo de cada turno se separa
+en el del modelo simulado y el de la capa de agentes (prompts, memoria,
+herramientas, ruta rápida, trazas), que es lo que mide el benchmark.
+
+Informa de:
+  - sobrecarga por turno de la capa de agentes (turno - LLM), en serie;
+  - crecimiento de memoria por conversación (tracemalloc, en serie);
+  - throughput con N conversaciones simultáneas (API asíncrona).
+
+Termina con código 1 si algún turno falla o si el p95 de la sobrecarga por
+turno supera `REPLAY_MAX_OVERHEAD_MS` (0 = sin límite), para detectar
+regresiones en ejecuciones tipo CI.
+"""
+
+import io
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import contextlib
+import contextvars
+import tracemalloc
+from typing import Dict, Any, Callable, List, Optional
+
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, ChatGeneration, ChatResult
+
+from base_agent import BaseAgent
+from credit_sales_agent import CreditSalesAgent
+from fast_path import extract_loan_parameters, normalize_text
+from config import REPLAY_MAX_OVERHEAD_MS
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_corpus.jsonl")
+
+AGENT_CLASSES = {
+    "base": BaseAgent,
+    "credit_sales": CreditSalesAgent
+}
+
+SYSTEM_PROMPT = (
+    "Eres un asesor de créditos. Responde en español, de forma breve y clara, "
+    "y usa las herramientas disponibles para calcular cuotas y consultar políticas."
+)
+
+_POLICY_WORDS = ("requisito", "documento", "plazo", "tasa", "interes", "monto")
+
+# Tiempos del modelo simulado en el turno en curso
+_llm_times: contextvars.ContextVar = contextvars.ContextVar("replay_llm_times", default=None)
+
+
+class FakeChatModel(BaseChatModel):
+    """Modelo de chat determinista con latencia configurable.
+
+    Sin funciones responde con un texto derivado del último mensaje. Con
+    funciones (agente con herramientas) pide `calculate_loan` si el mensaje trae
+    monto, plazo y tasa, `credit_policy_lookup` si pregunta por políticas, y
+    responde con el resultado cuando recibe la salida de la herramienta.
+    """
+
+    latency: float = 0.05
+    response_chars: int = 400
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        result = self._result(messages, kwargs.get("functions"))
+        _record_llm_time(time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = self._result(messages, kwargs.get("functions"))
+        _record_llm_time(time.perf_counter() - start)
+        return result
+
+    def _result(self, messages, functions: Optional[List[Dict[str, Any]]]) -> ChatResult:
+        message = self._respond(messages[-1], {function["name"] for function in functions or []})
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(str(message.content).split())
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "model_name": self._llm_type,
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+        )
+
+    def _respond(self, last, tools: set) -> AIMessage:
+        content = str(last.content)
+        if last.type == "function":
+            return AIMessage(content=self._text(f"Según {last.name}: {content}"))
+
+        if tools:
+            params = extract_loan_parameters(content)
+            if params and "calculate_loan" in tools:
+                return self._function_call("calculate_loan", json.dumps(params))
+            if "credit_policy_lookup" in tools and any(word in normalize_text(content) for word in _POLICY_WORDS):
+                return self._function_call("credit_policy_lookup", content)
+        return AIMessage(content=self._text(content))
+
+    def _text(self, seed: str) -> str:
+        digest = hashlib.sha1(seed.encode("utf-8")).hexdigest()[:8]
+        text = f"[{digest}] Respuesta simulada a: {seed} "
+        return (text * (self.response_chars // len(text) + 1))[:self.response_chars]
+
+    @staticmethod
+    def _function_call(name: str, argument: str) -> AIMessage:
+        return AIMessage(
+            content="",
+            additional_kwargs={"function_call": {"name": name, "arguments": json.dumps({"__arg1": argument})}}
+        )
+
+
+def _record_llm_time(seconds: float) -> None:
+    times = _llm_times.get()
+    if times is not None:
+        times.append(seconds)
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """Lee el corpus de conversaciones (JSON Lines con conversation_id y turns)."""
+    with open(path, encoding="utf-8") as corpus_file:
+        conversations = [json.loads(line) for line in corpus_file if line.strip()]
+    if not conversations:
+        raise ValueError(f"El corpus {path} no tiene conversaciones")
+    return conversations
+
+
+def build_agent(agent_class, llm_factory: Callable[[], BaseChatModel]) -> BaseAgent:
+    """Crea un agente de la clase indicada cuyo modelo es el simulado
+
+    Args:
+        agent_class: BaseAgent o una subclase
+        llm_factory: Función que crea el modelo simulado
+
+    Returns:
+        Instancia del agente (su runtime queda en el pool de agentes con una clave propia)
+    """
+    replay_class = type(f"Replay{agent_class.__name__}", (agent_class,), {"_create_llm": lambda self: llm_factory()})
+    return replay_class(
+        agent_id=f"replay-{agent_class.__name__}",
+        name=f"Replay {agent_class.__name__}",
+        description="Agente del benchmark de repetición",
+        system_prompt=SYSTEM_PROMPT
+    )
+
+
+def _turn_sample(result: Dict[str, Any], seconds: float, llm_times: List[float]) -> Dict[str, Any]:
+    llm_seconds = sum(llm_times)
+    return {
+        "ms": seconds * 1000,
+        "llm_ms": llm_seconds * 1000,
+        "overhead_ms": (seconds - llm_seconds) * 1000,
+        "llm_calls": len(llm_times),
+        "success": bool(result.get("success")),
+        "fast_path": "fast_path" in result
+    }
+
+
+def run_conversation(agent: BaseAgent, client_id: str, turns: List[str]) -> List[Dict[str, Any]]:
+    """Repite una conversación con `process_message` y devuelve una muestra por turno."""
+    memory = agent.conversation_memory(client_id)
+    samples = []
+    for message in turns:
+        llm_times: List[float] = []
+        token = _llm_times.set(llm_times)
+        start = time.perf_counter()
+        try:
+            result = agent.process_message(message, memory=memory)
+        finally:
+            _llm_times.reset(token)
+        samples.append(_turn_sample(result, time.perf_counter() - start, llm_times))
+    return samples
+
+
+async def arun_conversation(agent: BaseAgent, client_id: str, turns: List[str]) -> List[Dict[str, Any]]:
+    """Repite una conversación con `aprocess_message` y devuelve una muestra por turno."""
+    memory = agent.conversation_memory(client_id)
+    samples = []
+    for message in turns:
+        llm_times: List[float] = []
+        _llm_times.set(llm_times)
+        start = time.perf_counter()
+        result = await agent.aprocess_message(message, memory=memory)
+        samples.append(_turn_sample(result, time.perf_counter() - start, llm_times))
+    return samples
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _summary(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    overhead = [sample["overhead_ms"] for sample in samples]
+    latency = [sample["ms"] for sample in samples]
+    return {
+        "turns": len(samples),
+        "errors": sum(1 for sample in samples if not sample["success"]),
+        "fast_path_turns": sum(1 for sample in samples if sample["fast_path"]),
+        "llm_calls": sum(sample["llm_calls"] for sample in samples),
+        "overhead_ms": {
+            "mean": round(sum(overhead) / len(overhead), 3) if overhead else 0.0,
+            "p50": round(_percentile(overhead, 0.5), 3),
+            "p95": round(_percentile(overhead, 0.95), 3),
+            "max": round(max(overhead), 3) if overhead else 0.0
+        },
+        "latency_ms": {
+            "p50": round(_percentile(latency, 0.5), 3),
+            "p95": round(_percentile(latency, 0.95), 3)
+        }
+    }
+
+
+def measure_overhead(agent: BaseAgent, corpus: List[Dict[str, Any]], rounds: int, prefix: str) -> Dict[str, Any]:
+    """Sobrecarga por turno repitiendo el corpus en serie `rounds` veces."""
+    samples = []
+    for round_index in range(rounds):
+        for conversation in corpus:
+            client_id = f"{prefix}-overhead-{round_index}-{conversation['conversation_id']}"
+            samples.extend(run_conversation(agent, client_id, conversation["turns"]))
+    return _summary(samples)
+
+
+def measure_memory(agent: BaseAgent, corpus: List[Dict[str, Any]], prefix: str) -> Dict[str, Any]:
+    """Memoria retenida por conversación (tracemalloc), repitiendo el corpus en serie."""
+    growth = []
+    turns = 0
+    tracemalloc.start()
+    try:
+        for conversation in corpus:
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            run_conversation(agent, f"{prefix}-memory-{conversation['conversation_id']}", conversation["turns"])
+            gc.collect()
+            growth.append(tracemalloc.get_traced_memory()[0] - before)
+            turns += len(conversation["turns"])
+    finally:
+        tracemalloc.stop()
+    return {
+        "conversations": len(growth),
+        "kb_per_conversation": round(sum(growth) / len(growth) / 1024, 2),
+        "kb_per_turn": round(sum(growth) / turns / 1024, 2),
+        "max_kb_per_conversation": round(max(growth) / 1024, 2)
+    }
+
+
+async def measure_throughput(agent: BaseAgent, corpus: List[Dict[str, Any]], concurrency: int, prefix: str) -> Dict[str, Any]:
+    """Throughput con `concurrency` conversaciones simultáneas (al menos una por conversación del corpus)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    total = max(concurrency, len(corpus))
+
+    async def replay(index: int) -> List[Dict[str, Any]]:
+        conversation = corpus[index % len(corpus)]
+        async with semaphore:
+            return await arun_conversation(agent, f"{prefix}-c{concurrency}-{index}", conversation["turns"])
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(replay(index) for index in range(total)))
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for conversation in results for sample in conversation]
+    return {
+        "concurrency": concurrency,
+        "conversations": total,
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(len(samples) / elapsed, 2),
+        **_summary(samples)
+    }
+
+
+def benchmark_agent(name: str, agent_class, corpus: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Ejecuta las tres mediciones para una clase de agente."""
+    agent = build_agent(agent_class, lambda: FakeChatModel(latency=args.latency, response_chars=args.response_chars))
+    prefix = f"replay-{name}-{int(time.time())}"
+
+    # Calentamiento: importaciones diferidas, runtime del pool y primeras asignaciones
+    run_conversation(agent, f"{prefix}-warmup", corpus[0]["turns"])
+
+    result = {"agent": agent_class.__name__, "overhead": measure_overhead(agent, corpus, args.rounds, prefix)}
+    if not args.skip_memory:
+        result["memory"] = measure_memory(agent, corpus, prefix)
+    result["throughput"] = [
+        asyncio.run(measure_throughput(agent, corpus, concurrency, prefix))
+        for concurrency in args.concurrency
+    ]
+    return result
+
+
+def _print_report(results: Dict[str, Any], latency: float) -> None:
+    print(f"LLM simulado: {latency * 1000:.0f} ms por llamada")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"\n{name}: ERROR ({result['error']})")
+            continue
+        overhead = result["overhead"]
+        print(f"\n{result['agent']}")
+        print(
+            f"  sobrecarga por turno: media {overhead['overhead_ms']['mean']:.2f} ms, "
+            f"p50 {overhead['overhead_ms']['p50']:.2f} ms, p95 {overhead['overhead_ms']['p95']:.2f} ms "
+            f"({overhead['turns']} turnos, {overhead['fast_path_turns']} por la ruta rápida, {overhead['errors']} errores)"
+        )
+        if "memory" in result:
+            memory = result["memory"]
+            print(
+                f"  memoria: {memory['kb_per_conversation']:.1f} KB por conversación, "
+                f"{memory['kb_per_turn']:.1f} KB por turno (máx. {memory['max_kb_per_conversation']:.1f} KB)"
+            )
+        for run in result["throughput"]:
+            print(
+                f"  {run['concurrency']:>4} simultáneas: {run['turns_per_second']:>8.1f} turnos/s, "
+                f"latencia p95 {run['latency_ms']['p95']:.1f} ms, sobrecarga p95 {run['overhead_ms']['p95']:.2f} ms, "
+                f"{run['errors']} errores"
+            )
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description="Repite conversaciones grabadas a través de los agentes con un LLM simulado")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Corpus de conversaciones (JSON Lines)")
+    parser.add_argument("--agents", default=",".join(AGENT_CLASSES), help="Agentes a medir, separados por comas (base, credit_sales)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia del LLM simulado por llamada, en segundos")
+    parser.add_argument("--response-chars", type=int, default=400, help="Longitud de las respuestas del LLM simulado")
+    parser.add_argument("--rounds", type=int, default=3, help="Repeticiones del corpus para medir la sobrecarga")
+    parser.add_argument("--concurrency", default="1,8,32", help="Conversaciones simultáneas para el throughput, separadas por comas")
+    parser.add_argument("--max-overhead-ms", type=float, default=REPLAY_MAX_OVERHEAD_MS, help="p95 máximo de la sobrecarga por turno (0 = sin límite)")
+    parser.add_argument("--skip-memory", action="store_true", help="No medir el crecimiento de memoria")
+    parser.add_argument("--json", help="Archivo donde guardar los resultados en JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mantener los logs INFO y la salida de LangChain")
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    corpus = load_corpus(args.corpus)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    for name in [value.strip() for value in args.agents.split(",") if value.strip()]:
+        try:
+            # La salida verbose de LangChain se descarta salvo con --verbose (se sigue generando)
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                results[name] = benchmark_agent(name, AGENT_CLASSES[name], corpus, args)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    _print_report(results, args.latency)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump({"latency": args.latency, "corpus": args.corpus, "results": results}, output, indent=2)
+
+    failures = []
+    for name, result in results.items():
+        if "error" in result:
+            failures.append(f"{name}: {result['error']}")
+            continue
+        errors = result["overhead"]["errors"] + sum(run["errors"] for run in result["throughput"])
+        if errors:
+            failures.append(f"{name}: {errors} turnos con error")
+        p95 = result["overhead"]["overhead_ms"]["p95"]
+        if args.max_overhead_ms and p95 > args.max_overhead_ms:
+            failures.append(f"{name}: sobrecarga p95 {p95:.2f} ms supera {args.max_overhead_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FALLO {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
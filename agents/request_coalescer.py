@@ -0,0 +1,120 @@
+"""Coalescencia de solicitudes LLM idénticas en curso (single-flight)."""
+
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, Callable
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class _InFlightCall:
+    """Llamada en curso compartida entre el líder y los seguidores."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Agrupa llamadas concurrentes con la misma clave en una sola llamada upstream.
+
+    La primera llamada con una clave (el líder) ejecuta la función; las llamadas
+    concurrentes con la misma clave esperan y reciben el mismo resultado (o la
+    misma excepción). Las respuestas compartidas se marcan con `coalesced=True`
+    para que el consumo de tokens no se contabilice más de una vez.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlightCall] = {}
+        self._calls = 0
+        self._upstream_calls = 0
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Normaliza un prompt para que variaciones triviales compartan clave."""
+        normalized = unicodedata.normalize("NFKC", prompt)
+        return _WHITESPACE_RE.sub(" ", normalized).strip().casefold()
+
+    @classmethod
+    def make_key(cls, prompt: str, **params) -> str:
+        """Construye la clave de coalescencia a partir del prompt y los parámetros."""
+        payload = json.dumps(
+            {"prompt": cls.normalize_prompt(prompt), "params": params},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def run(self, key: str, func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Ejecuta `func` o espera el resultado de una llamada idéntica en curso.
+
+        Args:
+            key: Clave de coalescencia (ver make_key)
+            func: Función que realiza la llamada upstream
+
+        Returns:
+            El resultado de la llamada upstream
+        """
+        with self._lock:
+            self._calls += 1
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+                self._upstream_calls += 1
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return {**call.result, "coalesced": True}
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de coalescencia: llamadas, llamadas upstream y ratio de deduplicación."""
+        with self._lock:
+            calls = self._calls
+            upstream_calls = self._upstream_calls
+            in_flight = len(self._in_flight)
+
+        coalesced = calls - upstream_calls
+        return {
+            "calls": calls,
+            "upstream_calls": upstream_calls,
+            "coalesced_calls": coalesced,
+            "dedup_ratio": round(coalesced / calls, 4) if calls else 0.0,
+            "in_flight": in_flight
+        }
+
+    def reset_stats(self) -> None:
+        """Reinicia los contadores de métricas."""
+        with self._lock:
+            self._calls = 0
+            self._upstream_calls = 0
+
+
+# Coalescedor compartido por el proceso
+request_coalescer = RequestCoalescer()
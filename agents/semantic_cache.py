@@ -0,0 +1,233 @@
+"""Caché semántica de respuestas para preguntas frecuentes de los clientes."""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    OPENAI_API_KEY,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_ENTRIES
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class _Namespace:
+    """Índice vectorial de las respuestas de un agente para una versión de políticas."""
+
+    def __init__(self, dimension: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.entries: List[Tuple[str, Dict[str, Any], float]] = []  # (texto, respuesta, expira_en)
+
+    def purge_expired(self, now: float) -> None:
+        keep = [i for i, (_, _, expires_at) in enumerate(self.entries) if expires_at > now]
+        if len(keep) != len(self.entries):
+            self.vectors = self.vectors[keep]
+            self.entries = [self.entries[i] for i in keep]
+
+
+def _params_key(params: Optional[Dict[str, Any]]) -> Tuple:
+    """Clave hashable de los parámetros de generación."""
+    return tuple(sorted((name, repr(value)) for name, value in (params or {}).items()))
+
+
+class SemanticCache:
+    """Caché de respuestas LLM indexada por similitud de embeddings.
+
+    Las entradas se agrupan por (agente, versión de políticas, parámetros de
+    generación): una pregunta solo reutiliza respuestas del mismo agente generadas
+    con la misma versión de las políticas de crédito activas y los mismos
+    parámetros (modelo, temperatura, prompt de sistema...). Cuando se observa una
+    nueva versión de políticas para un agente, las entradas de versiones
+    anteriores se descartan.
+
+    Para no calcular dos embeddings por cada fallo, el vector de `embed` se puede
+    pasar a `lookup` y después a `store`.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        """Inicializa la caché semántica
+
+        Args:
+            embed_fn: Función que convierte un texto en su embedding. Por defecto usa OpenAIEmbeddings.
+            threshold: Similitud coseno mínima para considerar un acierto
+            ttl: Tiempo de vida de las entradas en segundos
+            max_entries: Número máximo de entradas por agente y versión de políticas
+        """
+        self._embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._namespaces: Dict[Tuple[Any, Any, Tuple], _Namespace] = {}
+        self._policy_versions: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        """Calcula el embedding normalizado de un texto
+
+        Args:
+            text: Texto de la pregunta
+
+        Returns:
+            Vector para pasar a `lookup` y `store`
+        """
+        return self._embed(text)
+
+    def lookup(
+        self,
+        text: str,
+        agent_id: Any,
+        policy_version: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        vector: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Busca una respuesta almacenada para un texto similar
+
+        Args:
+            text: Texto de la pregunta (normalmente el mensaje del cliente)
+            agent_id: ID del agente
+            policy_version: Versión de las políticas de crédito activas
+            params: Parámetros de generación de la respuesta
+            vector: Embedding del texto ya calculado con `embed`
+
+        Returns:
+            La respuesta almacenada o None si no hay un texto suficientemente similar
+        """
+        self._observe_policy_version(agent_id, policy_version)
+        if vector is None:
+            vector = self._embed(text)
+
+        with self._lock:
+            self._lookups += 1
+            namespace = self._namespaces.get((agent_id, policy_version, _params_key(params)))
+            if namespace is None or not namespace.entries:
+                return None
+
+            namespace.purge_expired(time.time())
+            if not namespace.entries:
+                return None
+
+            similarities = namespace.vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            self._hits += 1
+            _, response, _ = namespace.entries[best]
+            return dict(response)
+
+    def store(
+        self,
+        text: str,
+        response: Dict[str, Any],
+        agent_id: Any,
+        policy_version: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        vector: Optional[np.ndarray] = None
+    ) -> None:
+        """Almacena una respuesta en la caché
+
+        Args:
+            text: Texto de la pregunta
+            response: Respuesta generada por el LLM
+            agent_id: ID del agente
+            policy_version: Versión de las políticas de crédito activas
+            params: Parámetros de generación de la respuesta
+            vector: Embedding del texto ya calculado (el mismo que se pasó a `lookup`)
+        """
+        self._observe_policy_version(agent_id, policy_version)
+        if vector is None:
+            vector = self._embed(text)
+
+        with self._lock:
+            key = (agent_id, policy_version, _params_key(params))
+            namespace = self._namespaces.get(key)
+            if namespace is None:
+                namespace = _Namespace(dimension=vector.shape[0])
+                self._namespaces[key] = namespace
+
+            namespace.purge_expired(time.time())
+            if len(namespace.entries) >= self.max_entries:
+                # Descartar la entrada más antigua
+                namespace.vectors = namespace.vectors[1:]
+                namespace.entries = namespace.entries[1:]
+
+            namespace.vectors = np.vstack([namespace.vectors, vector[np.newaxis, :]])
+            namespace.entries.append((text, dict(response), time.time() + self.ttl))
+
+    def invalidate(self, agent_id: Any = None, policy_version: Any = None) -> int:
+        """Elimina entradas de la caché
+
+        Args:
+            agent_id: Si se indica, solo se eliminan las entradas de ese agente
+            policy_version: Si se indica, solo se eliminan las entradas de esa versión
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [
+                key for key in self._namespaces
+                if (agent_id is None or key[0] == agent_id)
+                and (policy_version is None or key[1] == policy_version)
+            ]
+            removed = sum(len(self._namespaces[key].entries) for key in keys)
+            for key in keys:
+                del self._namespaces[key]
+        if removed:
+            logger.info(f"Caché semántica invalidada ({removed} entradas)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la caché: consultas, aciertos, tasa de aciertos y entradas."""
+        with self._lock:
+            return {
+                "lookups": self._lookups,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+                "entries": sum(len(ns.entries) for ns in self._namespaces.values()),
+                "namespaces": len(self._namespaces)
+            }
+
+    def _observe_policy_version(self, agent_id: Any, policy_version: Any) -> None:
+        """Descarta las entradas de un agente si cambió la versión de políticas activas."""
+        with self._lock:
+            previous = self._policy_versions.get(agent_id)
+            if previous == policy_version:
+                return
+            self._policy_versions[agent_id] = policy_version
+            stale = [key for key in self._namespaces if key[0] == agent_id and key[1] != policy_version]
+            for key in stale:
+                del self._namespaces[key]
+        if stale:
+            logger.info(f"Caché semántica del agente {agent_id} invalidada por cambio de políticas")
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Calcula el embedding normalizado de un texto."""
+        if self._embed_fn is None:
+            from langchain.embeddings.openai import OpenAIEmbeddings
+            self._embed_fn = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY).embed_query
+
+        vector = np.asarray(self._embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Caché compartida por el proceso
+semantic_cache = SemanticCache()
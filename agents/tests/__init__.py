@@ -0,0 +1 @@
+# Este archivo permite que Python trate el directorio como un paquete
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import threading
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base_agent
+from agent_pool import AgentPool
+from credit_sales_agent import CreditSalesAgent
+
+# Pruebas para el pool de runtimes de agentes
+
+def test_least_recently_used_runtime_is_evicted_at_capacity():
+    """Prueba que al llenarse el pool se descarta el runtime usado hace más tiempo"""
+    pool = AgentPool(max_size=2)
+    builds = []
+
+    def builder(name):
+        return lambda: builds.append(name) or f"runtime-{name}"
+
+    pool.get("a", builder("a"))
+    pool.get("b", builder("b"))
+    assert pool.get("a", builder("a")) == "runtime-a"  # "a" pasa a ser el más reciente
+    pool.get("c", builder("c"))
+
+    assert pool.stats()["size"] == 2
+    assert pool.stats()["evictions"] == 1
+    assert pool.get("a", builder("a")) == "runtime-a"
+    pool.get("b", builder("b"))
+    assert builds == ["a", "b", "c", "b"]
+
+def test_concurrent_gets_build_each_key_once():
+    """Prueba que varios hilos que piden la misma clave esperan a una única construcción"""
+    pool = AgentPool(max_size=4)
+    building, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow_builder():
+        builds.append("a")
+        building.set()
+        release.wait(2)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get("a", slow_builder))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    assert building.wait(2)
+
+    # Otra clave no espera a la construcción en curso
+    start = time.monotonic()
+    assert pool.get("b", lambda: "runtime-b") == "runtime-b"
+    assert time.monotonic() - start < 1
+
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert builds == ["a"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert pool.stats()["misses"] == 2
+
+def test_agent_configurations_get_distinct_runtimes(monkeypatch):
+    """Prueba que configuraciones distintas (API de créditos, temperatura) no comparten runtime"""
+    pool = AgentPool(max_size=10)
+    monkeypatch.setattr(base_agent, "agent_pool", pool)
+    agent_class = type("PooledSalesAgent", (CreditSalesAgent,), {"_build_runtime": lambda self: {"runtime": object()}})
+
+    def make_agent(**kwargs):
+        return agent_class(agent_id="ventas", name="Ventas", description="Agente de ventas",
+                           system_prompt="Eres un asesor de créditos.", use_pool=True, **kwargs)
+
+    first = make_agent(credit_api_url="https://creditos-a.example.com")
+    same = make_agent(credit_api_url="https://creditos-a.example.com")
+    other_api = make_agent(credit_api_url="https://creditos-b.example.com")
+    other_temperature = make_agent(credit_api_url="https://creditos-a.example.com", temperature=0.2)
+
+    assert same.runtime is first.runtime
+    assert other_api.runtime is not first.runtime
+    assert other_temperature.runtime is not first.runtime
+    assert pool.stats()["size"] == 3
+    assert AgentPool.make_key(a=1, b=2) == AgentPool.make_key(b=2, a=1)
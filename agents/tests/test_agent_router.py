@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agent_router import AgentRouter, load_examples, CREDIT_SALES, CUSTOMER_SUPPORT
+
+# Pruebas para el enrutador de mensajes a plantillas de agente
+
+def write_records(path, records):
+    with open(path, "w", encoding="utf-8") as records_file:
+        for record in records:
+            records_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def test_routes_seed_messages():
+    """Prueba que el enrutador asigna mensajes típicos a su plantilla"""
+    router = AgentRouter(log_path=None)
+
+    assert router.route("quiero un prestamo personal")["template"] == CREDIT_SALES
+    assert router.route("como va mi solicitud APP123456")["template"] == CUSTOMER_SUPPORT
+
+def test_load_examples_uses_only_labelled_records(tmp_path):
+    """Prueba que las decisiones registradas sin etiqueta no se usan para entrenar"""
+    path = tmp_path / "router.jsonl"
+    write_records(path, [
+        {"message": "quiero pagar mi credito", "label": CUSTOMER_SUPPORT, "template": CREDIT_SALES},
+        {"message": "hola buenas tardes", "template": CREDIT_SALES, "predicted": CREDIT_SALES, "confidence": 0.99, "fallback": False},
+        {"message": "tengo una duda", "label": "desconocida"}
+    ])
+
+    assert load_examples(str(path)) == [("quiero pagar mi credito", CUSTOMER_SUPPORT)]
+
+def test_load_examples_skips_fallback_and_low_confidence_decisions(tmp_path):
+    """Prueba que con min_confidence solo se usan decisiones seguras que no fueron fallback"""
+    path = tmp_path / "router.jsonl"
+    router = AgentRouter(log_path=str(path), min_confidence=0.99)
+    router.route("hola")
+    write_records(tmp_path / "decisions.jsonl", [
+        {"message": "simula un credito", "template": CREDIT_SALES, "predicted": CREDIT_SALES, "confidence": 0.95, "fallback": False},
+        {"message": "como va mi tramite", "template": CUSTOMER_SUPPORT, "predicted": CUSTOMER_SUPPORT, "confidence": 0.6, "fallback": False}
+    ])
+
+    fallback_record = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+    assert fallback_record["fallback"] is True
+    assert load_examples(str(path), min_confidence=0.0) == []
+    assert load_examples(str(tmp_path / "decisions.jsonl"), min_confidence=0.9) == [("simula un credito", CREDIT_SALES)]
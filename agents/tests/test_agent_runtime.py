@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agent_runtime import AgentRuntime, worker_for
+
+# Pruebas para el runtime de agentes en procesos dedicados
+
+class FakeAgent:
+    """Agente falso que registra el orden de los turnos de cada conversación en su proceso.
+
+    Mensajes especiales: "sleep:<segundos>" tarda ese tiempo en responder y
+    "crash" termina el proceso worker.
+    """
+
+    def __init__(self, config):
+        self.agent_id = config["agent_id"]
+        self.seen = {}
+
+    def conversation_memory(self, client_id):
+        return client_id
+
+    async def aprocess_message(self, message, context=None, memory=None, timeout=None):
+        if message == "crash":
+            os._exit(1)
+        if message.startswith("sleep:"):
+            await asyncio.sleep(float(message.split(":")[1]))
+        seen = self.seen.setdefault(memory, [])
+        seen.append(message)
+        return {"agent_id": self.agent_id, "response": message, "success": True, "pid": os.getpid(), "seen": list(seen)}
+
+
+def fake_agent_factory(config):
+    """Fábrica de nivel de módulo, para que los workers arrancados con spawn puedan importarla."""
+    return FakeAgent(config)
+
+
+AGENT = {"type": "fake", "agent_id": "agente-1"}
+
+
+def client_for_worker(index, workers):
+    """Primer ID de cliente cuya conversación con AGENT va al worker indicado."""
+    return next(f"cliente-{i}" for i in range(1000) if worker_for(f"cliente-{i}", AGENT["agent_id"], workers) == index)
+
+
+@pytest.fixture
+def runtime():
+    runtime = AgentRuntime(workers=2, agent_factory=fake_agent_factory, concurrency=4, max_agents=4, start_method="spawn")
+    runtime.start()
+    yield runtime
+    runtime.stop(timeout=5)
+
+
+def test_conversations_have_worker_affinity(runtime):
+    """Prueba que los turnos de una conversación van siempre al mismo proceso y cada worker es un proceso distinto"""
+    first, second = client_for_worker(0, 2), client_for_worker(1, 2)
+
+    pids_first = {runtime.submit(AGENT, first, f"hola {i}").result(timeout=30)["pid"] for i in range(3)}
+    pids_second = {runtime.submit(AGENT, second, f"hola {i}").result(timeout=30)["pid"] for i in range(3)}
+
+    assert len(pids_first) == 1 and len(pids_second) == 1
+    assert pids_first != pids_second
+    assert os.getpid() not in pids_first | pids_second
+
+
+def test_turns_of_a_conversation_run_in_order(runtime):
+    """Prueba que los turnos de una conversación se atienden en orden aunque el primero sea el más lento"""
+    client_id = client_for_worker(0, 2)
+    messages = ["sleep:0.3", "sleep:0.1", "tres", "cuatro"]
+
+    futures = [runtime.submit(AGENT, client_id, message) for message in messages]
+    results = [future.result(timeout=30) for future in futures]
+
+    assert [result["seen"] for result in results] == [messages[:i + 1] for i in range(len(messages))]
+
+
+def test_asubmit_returns_the_turn_result(runtime):
+    """Prueba que la versión asíncrona devuelve la respuesta del worker"""
+    result = asyncio.run(runtime.asubmit(AGENT, "cliente-async", "hola"))
+
+    assert result["response"] == "hola" and result["success"]
+
+
+def test_crashed_worker_fails_pending_and_restarts(runtime):
+    """Prueba que los turnos de un worker caído fallan y el worker se reinicia"""
+    client_id = client_for_worker(0, 2)
+    runtime.submit(AGENT, client_id, "hola").result(timeout=30)
+
+    result = runtime.submit(AGENT, client_id, "crash").result(timeout=10)
+
+    assert result["success"] is False and "terminó" in result["error"]
+    assert runtime.stats()["restarts"] == 1
+    assert runtime.submit(AGENT, client_id, "de nuevo").result(timeout=30)["success"]
+
+
+def test_crash_is_detected_while_other_workers_keep_answering(runtime):
+    """Prueba que la caída de un worker se detecta aunque otro worker envíe resultados sin pausa"""
+    busy_client, crashing_client = client_for_worker(1, 2), client_for_worker(0, 2)
+    runtime.submit(AGENT, crashing_client, "hola").result(timeout=30)
+    runtime.submit(AGENT, busy_client, "hola").result(timeout=30)
+    stop = threading.Event()
+
+    def keep_busy():
+        while not stop.is_set():
+            runtime.submit(AGENT, busy_client, "sleep:0.05").result(timeout=30)
+
+    busy = threading.Thread(target=keep_busy)
+    busy.start()
+    try:
+        time.sleep(0.2)
+        result = runtime.submit(AGENT, crashing_client, "crash").result(timeout=5)
+    finally:
+        stop.set()
+        busy.join()
+
+    assert result["success"] is False
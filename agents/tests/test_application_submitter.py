@@ -0,0 +1,144 @@
+import os
+import sys
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from application_submitter import ApplicationSubmitter, InMemorySubmissionStore, QUEUED, SUBMITTED, FAILED
+
+# Pruebas para la cola de envíos de solicitudes de crédito
+
+APPLICATION = {
+    "full_name": "Ana Pérez",
+    "email": "ana@example.com",
+    "phone": "+5215512345678",
+    "amount": 50000,
+    "term": 24,
+    "purpose": "remodelación"
+}
+
+class FakeCreditAPI:
+    """Cliente de la API de créditos que devuelve respuestas programadas"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def submit_credit_application(self, application_data, idempotency_key=None):
+        self.calls.append(idempotency_key)
+        return self.responses.pop(0)
+
+class FakeNotifier:
+    """Gestor de comunicaciones que guarda los mensajes enviados"""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_whatsapp(self, to, message):
+        self.messages.append(("whatsapp", to, message))
+        return {"success": True}
+
+    def send_sms(self, to, message):
+        self.messages.append(("sms", to, message))
+        return {"success": True}
+
+    def send_email(self, to, subject, content):
+        self.messages.append(("email", to, content))
+        return {"success": True}
+
+def make_submitter(client_factory, notifier):
+    submitter = ApplicationSubmitter(
+        store=InMemorySubmissionStore(),
+        client_factory=client_factory,
+        notifier_factory=lambda: notifier,
+        max_attempts=3,
+        backoff_base=0,
+        backoff_max=0
+    )
+    # Las pruebas procesan la cola con process_due, sin hilos en segundo plano
+    submitter.start = lambda: None
+    return submitter
+
+def test_enqueue_and_submit():
+    """Prueba que un envío encolado se manda a la API y se avisa al cliente"""
+    client = FakeCreditAPI({"success": True, "status_code": 201, "data": {"application_id": "EXT-1", "status": "in_review"}})
+    notifier = FakeNotifier()
+    submitter = make_submitter(lambda: client, notifier)
+
+    job = submitter.enqueue(APPLICATION, client_ref="conv-1")
+    assert job["status"] == QUEUED
+
+    assert submitter.process_due() == 1
+    status = submitter.status(job["tracking_id"])
+    assert status["status"] == SUBMITTED
+    assert status["external_application_id"] == "EXT-1"
+    assert client.calls == [submitter.store.get(job["tracking_id"])["idempotency_key"]]
+    assert notifier.messages[0][0] == "whatsapp"
+    assert "EXT-1" in notifier.messages[0][2]
+
+def test_duplicate_enqueue_reuses_job():
+    """Prueba que la misma solicitud del mismo cliente no se encola dos veces"""
+    submitter = make_submitter(lambda: FakeCreditAPI(), FakeNotifier())
+
+    first = submitter.enqueue(APPLICATION, client_ref="conv-1")
+    second = submitter.enqueue(dict(APPLICATION), client_ref="conv-1")
+
+    assert second["duplicate"] is True
+    assert second["tracking_id"] == first["tracking_id"]
+
+def test_transient_errors_are_retried_with_same_key():
+    """Prueba que los 5xx se reintentan con la misma clave de idempotencia"""
+    client = FakeCreditAPI(
+        {"success": False, "status_code": 503, "error": "No disponible"},
+        {"success": True, "status_code": 201, "data": {"id": 7}}
+    )
+    submitter = make_submitter(lambda: client, FakeNotifier())
+
+    job = submitter.enqueue(APPLICATION)
+    submitter.process_due()
+    assert submitter.status(job["tracking_id"])["status"] == QUEUED
+
+    submitter.process_due()
+    status = submitter.status(job["tracking_id"])
+    assert status["status"] == SUBMITTED
+    assert status["attempts"] == 2
+    assert len(set(client.calls)) == 1
+
+def test_client_errors_fail_without_retry():
+    """Prueba que un 4xx no se reintenta y se avisa al cliente del fallo"""
+    client = FakeCreditAPI({"success": False, "status_code": 422, "error": "Datos inválidos"})
+    notifier = FakeNotifier()
+    submitter = make_submitter(lambda: client, notifier)
+
+    job = submitter.enqueue(APPLICATION)
+    submitter.process_due()
+
+    status = submitter.status(job["tracking_id"])
+    assert status["status"] == FAILED
+    assert status["attempts"] == 1
+    assert "no pudimos registrar" in notifier.messages[0][2]
+
+@pytest.mark.parametrize("client_factory", [
+    pytest.param(lambda: (_ for _ in ()).throw(ModuleNotFoundError("No module named 'credit_api_client'")), id="import"),
+    pytest.param(lambda: FakeCreditAPI({"success": False, "error": "API no configurada"}), id="config")
+])
+def test_configuration_errors_are_permanent(client_factory):
+    """Prueba que los errores de importación o configuración no se reintentan"""
+    notifier = FakeNotifier()
+    submitter = make_submitter(client_factory, notifier)
+
+    job = submitter.enqueue(APPLICATION)
+    submitter.process_due()
+
+    status = submitter.status(job["tracking_id"])
+    assert status["status"] == FAILED
+    assert status["attempts"] == 1
+    assert submitter.stats()["process"]["retried"] == 0
+    assert len(notifier.messages) == 1
+
+def test_default_client_is_importable():
+    """Prueba que el cliente por defecto se importa desde integrations/"""
+    client = ApplicationSubmitter._default_client()
+
+    assert hasattr(client, "submit_credit_application")
@@ -0,0 +1,82 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base_agent
+from base_agent import BaseAgent
+from policy_index import PolicyHotIndex
+from semantic_cache import SemanticCache
+from replay_benchmark import FakeChatModel
+
+# Pruebas para el procesamiento asíncrono de mensajes del agente base
+
+LLM_CALLS = []
+
+class CountingChatModel(FakeChatModel):
+    """Modelo simulado que registra en LLM_CALLS los mensajes que llegan al LLM"""
+
+    def _result(self, messages, functions):
+        LLM_CALLS.append(messages[-1].content)
+        return super()._result(messages, functions)
+
+class FakeKnowledgeBase:
+    def get_chunks(self, policy_ids=None):
+        return [{"text": "Política", "metadata": {"policy_id": "1", "policy_name": "General"}, "embedding": [1.0, 0.0]}]
+
+def make_agent(class_name, latency=0.0, model_class=FakeChatModel):
+    """Crea un agente con el modelo simulado (cada clase tiene su propia entrada en el pool de agentes)"""
+    agent_class = type(class_name, (BaseAgent,), {"_create_llm": lambda self: model_class(latency=latency)})
+    return agent_class(agent_id=class_name, name=class_name, description="Agente de prueba", system_prompt="Eres un asesor de créditos.")
+
+def test_timeout_does_not_save_turn():
+    """Prueba que un turno que supera el tiempo máximo devuelve un error y no se guarda en la memoria"""
+    agent = make_agent("SlowTimeoutAgent", latency=1.0)
+    memory = agent._create_memory()
+
+    result = asyncio.run(agent.aprocess_message("hola", memory=memory, timeout=0.05))
+
+    assert result["success"] is False
+    assert result["error"] == "timeout"
+    assert memory.chat_memory.messages == []
+
+def test_cancelled_turn_is_not_saved():
+    """Prueba que un turno cancelado propaga la cancelación y no se guarda en la memoria"""
+    agent = make_agent("SlowCancelAgent", latency=1.0)
+    memory = agent._create_memory()
+
+    async def run():
+        task = asyncio.create_task(agent.aprocess_message("hola", memory=memory, timeout=None))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+    assert memory.chat_memory.messages == []
+
+def test_semantic_cache_hit_skips_llm(monkeypatch):
+    """Prueba que un acierto de la caché semántica responde sin llamar al LLM y guarda el turno"""
+    vectors = {"requisitos": [1.0, 0.0]}
+    cache = SemanticCache(embed_fn=lambda text: vectors[text.split()[0]], threshold=0.9, ttl=60, max_entries=10)
+    index = PolicyHotIndex(knowledge_base_factory=FakeKnowledgeBase, database_url=None, refresh_interval=0)
+    index.start()
+    monkeypatch.setattr(base_agent, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(base_agent, "_response_cache", lambda: (cache, index))
+    LLM_CALLS.clear()
+    agent = make_agent("CachedReplyAgent", model_class=CountingChatModel)
+
+    async def run():
+        first = await agent.aprocess_message("requisitos para un crédito", memory=agent._create_memory())
+        memory = agent._create_memory()
+        second = await agent.aprocess_message("requisitos de un préstamo", memory=memory)
+        return first, second, memory
+
+    first, second, memory = asyncio.run(run())
+
+    assert len(LLM_CALLS) == 1
+    assert second["semantic_cache"] is True and second["response"] == first["response"]
+    assert [message.content for message in memory.chat_memory.messages] == ["requisitos de un préstamo", first["response"]]
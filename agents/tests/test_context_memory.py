@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import threading
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain.schema import HumanMessage, AIMessage, SystemMessage
+from context_memory import RollingSummaryMemory, count_tokens, count_message_tokens
+
+# Pruebas para la memoria con resumen incremental y presupuesto de tokens
+
+class RecordingSummarizer:
+    """Resumidor falso que guarda los prompts que recibe"""
+
+    def __init__(self, summary="El cliente pidió 50000 a 24 meses"):
+        self.summary = summary
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.release.wait(timeout=2)
+        return self.summary
+
+def make_memory(summarizer=None, turns=0, **kwargs):
+    memory = RollingSummaryMemory(summarize=summarizer or RecordingSummarizer(), **kwargs)
+    for turn in range(turns):
+        memory.chat_memory.add_user_message(f"pregunta número {turn} sobre el crédito")
+        memory.chat_memory.add_ai_message(f"respuesta número {turn} del agente de créditos")
+    return memory
+
+def wait_for_summary(memory, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = memory._state()
+        if state.summary and not state.refreshing:
+            return state.summary
+        time.sleep(0.01)
+    raise AssertionError("El resumen no se actualizó a tiempo")
+
+def test_fit_budget_drops_oldest_messages_first():
+    """Prueba que el recorte descarta primero los mensajes más antiguos y conserva el resumen"""
+    messages = [HumanMessage(content=f"mensaje {i} " * 5) for i in range(6)]
+    budget = count_message_tokens([SystemMessage(content="Resumen de la conversación anterior: previo")] + messages[-2:])
+
+    assembled = RollingSummaryMemory._fit_budget("previo", messages, budget)
+
+    assert assembled[0].content == "Resumen de la conversación anterior: previo"
+    assert assembled[1:] == messages[-2:]
+    assert count_message_tokens(assembled) <= budget
+
+def test_fit_budget_truncates_summary_that_does_not_fit():
+    """Prueba que un resumen mayor que el presupuesto se trunca y se descartan los mensajes"""
+    assembled = RollingSummaryMemory._fit_budget("detalle " * 200, [HumanMessage(content="hola")], 50)
+
+    assert len(assembled) == 1 and isinstance(assembled[0], SystemMessage)
+    assert count_tokens(assembled[0].content) < 50
+
+def test_fit_budget_without_room_returns_nothing():
+    """Prueba que con presupuesto nulo no se envía historial"""
+    assert RollingSummaryMemory._fit_budget("", [HumanMessage(content="hola")], 0) == []
+
+def test_load_discounts_reserved_and_input_tokens():
+    """Prueba que el historial ensamblado cabe en el presupuesto menos el system prompt y el mensaje"""
+    memory = make_memory(turns=3, verbatim_turns=3, token_budget=120, reserved_tokens=40)
+    message = "quiero saber el costo total del crédito"
+
+    history = memory.load_memory_variables({"input": message})["chat_history"]
+
+    assert count_message_tokens(history) <= 120 - 40 - count_tokens(message)
+    assert history[-1].content == "respuesta número 2 del agente de créditos"
+    assert len(history) < 6
+
+def test_older_turns_are_summarized_in_background():
+    """Prueba que los turnos fuera de la ventana literal se incorporan al resumen y no se vuelven a resumir"""
+    summarizer = RecordingSummarizer()
+    summarizer.release.clear()
+    memory = make_memory(summarizer, turns=4, verbatim_turns=2, token_budget=10000)
+
+    first = memory.load_memory_variables({"input": "hola"})["chat_history"]
+    assert len(first) == 8  # mientras se resume, los turnos antiguos van literales
+    summarizer.release.set()
+
+    assert wait_for_summary(memory) == "El cliente pidió 50000 a 24 meses"
+    assert "pregunta número 0" in summarizer.prompts[0] and "pregunta número 2" not in summarizer.prompts[0]
+
+    second = memory.load_memory_variables({"input": "hola"})["chat_history"]
+    assert second[0].content == "Resumen de la conversación anterior: El cliente pidió 50000 a 24 meses"
+    assert [message.content for message in second[1:]] == [message.content for message in first[4:]]
+    assert len(summarizer.prompts) == 1
+
+def test_save_context_appends_turn():
+    """Prueba que save_context guarda el mensaje del cliente y la respuesta en el historial"""
+    memory = make_memory(verbatim_turns=2)
+
+    memory.save_context({"input": "hola"}, {"output": "buenas"})
+
+    assert [type(message) for message in memory.chat_memory.messages] == [HumanMessage, AIMessage]
+
+def test_single_message_folds_are_not_summarized_again():
+    """Prueba que un tramo de un solo mensaje se marca como resumido respecto al historial completo"""
+    summarizer = RecordingSummarizer()
+    memory = make_memory(summarizer, verbatim_turns=1, token_budget=10000)
+
+    def fold(message, folds):
+        memory.chat_memory.add_user_message(message)
+        memory.load_memory_variables({"input": "hola"})
+        deadline = time.time() + 2
+        while len(summarizer.prompts) < folds or memory._state().refreshing:
+            assert time.time() < deadline, "El resumen no se actualizó a tiempo"
+            time.sleep(0.01)
+
+    for index in range(3):
+        memory.chat_memory.add_user_message(f"mensaje {index}")
+    fold("mensaje 3", 1)  # resume "mensaje 0" y "mensaje 1"
+    fold("mensaje 4", 2)  # resume solo "mensaje 2"
+    assert "mensaje 2" in summarizer.prompts[1] and "mensaje 1" not in summarizer.prompts[1]
+
+    history = memory.load_memory_variables({"input": "hola"})["chat_history"]
+    time.sleep(0.05)
+    assert len(summarizer.prompts) == 2
+    assert [message.content for message in history[1:]] == ["mensaje 3", "mensaje 4"]
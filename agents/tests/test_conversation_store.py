@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from conversation_store import PostgresConversationStore, InMemoryConversationStore
+
+# Pruebas para el almacén de conversaciones compartido entre workers
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'conversations.db'}"
+
+@pytest.fixture
+def store(database_url):
+    store = PostgresConversationStore(database_url=database_url, flush_interval=0, create_tables=True)
+    yield store
+    store.stop()
+
+def count_inserts(store):
+    inserts = []
+
+    @event.listens_for(store.engine, "before_cursor_execute")
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    return inserts
+
+def test_turn_is_visible_to_other_workers_immediately(store, database_url):
+    """Prueba que otro worker ve el turno en cuanto la memoria lo guarda, sin esperar al flush"""
+    other_worker = PostgresConversationStore(database_url=database_url, flush_interval=0)
+    inserts = count_inserts(store)
+
+    memory = store.memory("cliente-1", "agente-1")
+    memory.save_context({"input": "Hola"}, {"output": "¿En qué puedo ayudarte?"})
+
+    assert [message["content"] for message in other_worker.get_messages("cliente-1", "agente-1")] == ["Hola", "¿En qué puedo ayudarte?"]
+    assert len(inserts) == 1
+    assert store.flush() == 0
+
+def test_turn_keeps_order_after_buffered_messages(store):
+    """Prueba que los mensajes acumulados por append se escriben delante del turno"""
+    store.append("cliente-1", "agente-1", "system", "Conversación importada")
+    inserts = count_inserts(store)
+
+    store.memory("cliente-1", "agente-1").save_context({"input": "Hola"}, {"output": "Buenas"})
+
+    assert [message["role"] for message in store.get_messages("cliente-1", "agente-1")] == ["system", "human", "ai"]
+    assert len(inserts) == 1
+    assert store.flush() == 0
+
+def test_bulk_appends_are_batched(store, database_url):
+    """Prueba que append acumula los mensajes hasta el flush por lotes"""
+    other_worker = PostgresConversationStore(database_url=database_url, flush_interval=0)
+    for i in range(3):
+        store.append("cliente-1", "agente-1", "human", f"mensaje {i}")
+
+    assert other_worker.get_messages("cliente-1", "agente-1") == []
+    assert len(store.get_messages("cliente-1", "agente-1")) == 3
+    assert store.flush() == 3
+    assert len(other_worker.get_messages("cliente-1", "agente-1")) == 3
+
+def test_failed_turn_write_is_retried_by_flush(store, monkeypatch):
+    """Prueba que un turno que no se pudo escribir queda pendiente y lo persiste el flush"""
+    engine = store.engine
+
+    class BrokenEngine:
+        def begin(self):
+            raise RuntimeError("base de datos no disponible")
+
+        def __getattr__(self, name):
+            return getattr(engine, name)
+
+    monkeypatch.setattr(store, "engine", BrokenEngine())
+    store.memory("cliente-1", "agente-1").save_context({"input": "Hola"}, {"output": "Buenas"})
+    monkeypatch.setattr(store, "engine", engine)
+
+    assert len(store.get_messages("cliente-1", "agente-1")) == 2
+    assert store.flush() == 2
+
+def test_pending_user_message_is_readable_before_reply():
+    """Prueba que el mensaje del cliente retenido hasta la respuesta aparece en el historial"""
+    store = InMemoryConversationStore()
+    history = store.memory("cliente-1", "agente-1").chat_memory
+
+    history.add_user_message("Hola")
+    assert [message.content for message in history.messages] == ["Hola"]
+    assert store.get_messages("cliente-1", "agente-1") == []
+
+    history.add_ai_message("Buenas")
+    assert [message["content"] for message in store.get_messages("cliente-1", "agente-1")] == ["Hola", "Buenas"]
@@ -0,0 +1,39 @@
+import os
+import sys
+import json
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from credit_sales_agent import CreditSalesAgent
+from loan_engine import MAX_OFFERS, MAX_TERM_MONTHS, MAX_GRID_SCENARIOS
+
+# Pruebas para las herramientas del agente de ventas de créditos
+
+def loan_offer_grid(**params):
+    # La herramienta no usa el estado del agente
+    return CreditSalesAgent._loan_offer_grid(None, json.dumps(params))
+
+def test_loan_offer_grid_returns_best_offers():
+    """Prueba que la herramienta devuelve las mejores opciones con el límite pedido"""
+    result = json.loads(loan_offer_grid(amounts=[50000], limit=3))
+
+    assert result["scenarios"] > 3
+    assert len(result["offers"]) == 3
+
+def test_loan_offer_grid_rejects_invalid_limit():
+    """Prueba que un límite negativo o excesivo devuelve un error en lugar de recortar las opciones"""
+    for limit in (-1, 0, MAX_OFFERS + 1):
+        assert loan_offer_grid(amounts=[50000], limit=limit).startswith("Error:")
+
+def test_loan_offer_grid_rejects_invalid_terms_and_rates():
+    """Prueba que la herramienta aplica los mismos límites de plazo y tasa que el endpoint"""
+    for params in ({"terms": [0]}, {"terms": [-6]}, {"terms": [MAX_TERM_MONTHS + 1]}, {"rates": [150]}, {"rates": [-1]}):
+        result = loan_offer_grid(amounts=[50000], **params)
+        assert result.startswith("Error:"), params
+        assert "inf" not in result and "NaN" not in result
+
+def test_loan_offer_grid_rejects_oversized_grid():
+    """Prueba que una lista de montos enorme generada por el modelo no reserva una rejilla sin límite"""
+    result = loan_offer_grid(amounts=list(range(1, MAX_GRID_SCENARIOS + 2)), terms=[12], rates=[12])
+
+    assert result.startswith("Error:") and str(MAX_GRID_SCENARIOS) in result
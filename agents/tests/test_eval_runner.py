@@ -0,0 +1,79 @@
+import os
+import sys
+import asyncio
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from eval_runner import LLMResponseCache, build_agent, check_turn, run_case, _count_checks
+
+# Pruebas para la evaluación offline de los agentes
+
+OPTIONS = {"fake_latency": 0, "timeout": 5, "price_prompt": 0.001, "price_completion": 0.002}
+
+class FailingAgent:
+    """Agente falso cuyo segundo turno termina en error"""
+
+    def conversation_memory(self, client_id):
+        return None
+
+    async def aprocess_message(self, message, memory=None, timeout=None):
+        if message == "falla":
+            return {"success": False, "error": "timeout"}
+        return {"success": True, "response": "Hola, te ayudo con tu crédito"}
+
+def test_check_turn_reports_each_failed_expectation():
+    """Prueba cada expectativa de turno, sin distinguir mayúsculas ni acentos"""
+    expect = {
+        "contains_any": ["crédito", "préstamo"],
+        "contains_all": ["tasa", "plazo"],
+        "not_contains": ["garantizado"],
+        "tool": "calculate_loan",
+        "max_chars": 40
+    }
+
+    assert check_turn("Tu CREDITO: tasa y plazo", ["calculate_loan"], expect) == []
+    failures = check_turn("Aprobado garantizado con tasa fija y muchos beneficios", [], expect)
+    assert failures == [
+        "no menciona ninguno de ['crédito', 'préstamo']",
+        "no menciona 'plazo'",
+        "menciona 'garantizado'",
+        "no llama a calculate_loan",
+        "respuesta de 54 caracteres (máx. 40)"
+    ]
+
+def test_count_checks():
+    """Prueba que cada texto de contains_all y not_contains cuenta como una comprobación"""
+    assert _count_checks({}) == 0
+    assert _count_checks({"contains_any": ["a", "b"], "contains_all": ["c", "d"], "not_contains": ["e"],
+                          "tool": "calculate_loan", "max_chars": 100}) == 6
+
+def test_turn_errors_are_reported_apart_from_checks():
+    """Prueba que un turno con error no cuenta como comprobación fallida"""
+    case = {"case_id": "error", "turns": [
+        {"message": "hola", "expect": {"contains_any": ["crédito"], "not_contains": ["garantizado"]}},
+        {"message": "falla", "expect": {"contains_any": ["plazo"]}}
+    ]}
+
+    result = asyncio.run(run_case(FailingAgent(), case, "run", OPTIONS))
+
+    assert result["passed"] is False
+    assert result["checks"] == 2 and result["failed_checks"] == 0 and result["failures"] == []
+    assert result["errors"] == 1 and result["error_messages"] == ["turno 2: timeout"]
+
+def test_rerun_is_served_from_response_cache(tmp_path):
+    """Prueba que repetir un caso acierta en la caché de respuestas y no tiene coste facturado"""
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"))
+    agent = build_agent("customer_support", OPTIONS, cache)
+    case = {"case_id": "soporte", "turns": [
+        {"message": "hola buenos dias"},
+        {"message": "quiero saber el estado de mi solicitud"}
+    ]}
+
+    first = asyncio.run(run_case(agent, case, "primera", OPTIONS))
+    second = asyncio.run(run_case(agent, case, "segunda", OPTIONS))
+
+    assert first["llm_calls"] > 0 and first["cache_hits"] == 0 and first["billed_cost_usd"] > 0
+    assert second["llm_calls"] == first["llm_calls"]
+    assert second["cache_hits"] == second["llm_calls"]
+    assert second["billed_cost_usd"] == 0
+    assert second["cost_usd"] == first["cost_usd"]
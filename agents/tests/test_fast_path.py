@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+from fast_path import FastPathRouter, extract_loan_parameters, needs_agent
+
+# Pruebas para la ruta rápida sin LLM
+
+class FakeAgent:
+    """Agente con las herramientas que usa la ruta rápida"""
+
+    def _calculate_loan(self, params):
+        data = json.loads(params)
+        return json.dumps({
+            "loan_amount": data["amount"],
+            "term_months": data["term"],
+            "annual_interest_rate": data["rate"],
+            "monthly_payment": 1.0,
+            "total_payment": 2.0,
+            "total_interest": 1.0
+        })
+
+    def _credit_policy_lookup(self, query):
+        return f"Políticas: {query}"
+
+class FakeCreditAPI:
+    def get_application_status(self, application_id):
+        return {"success": True, "data": {"status": "aprobada"}}
+
+@pytest.fixture
+def router():
+    router = FastPathRouter()
+    router._credit_api = FakeCreditAPI()
+    return router
+
+def test_fast_path_is_disabled_by_default():
+    """Prueba que la ruta rápida no se activa sin configurarla"""
+    if "FAST_PATH_ENABLED" not in os.environ:
+        assert config.FAST_PATH_ENABLED is False
+
+@pytest.mark.parametrize("message", [
+    "no quiero pagar una tasa del 30%, que otra opcion hay a 24 meses con 100 mil?",
+    "quiero cancelar mi credito, cuales son los requisitos",
+    "necesito el documento de mi contrato firmado",
+    "no me interesa a 12 meses al 20% con 50000",
+    "quiero liquidar mi prestamo, cual es la tasa"
+])
+def test_negations_and_out_of_scope_messages_go_to_agent(router, message):
+    """Prueba que los mensajes con negaciones o fuera de alcance no reciben una respuesta fija"""
+    assert needs_agent(message)
+    assert router.route(message, FakeAgent()) is None
+
+@pytest.mark.parametrize("message, intent", [
+    ("cuanto pagaria al mes por 50000 a 24 meses con tasa de 18%", "loan_calculation"),
+    ("Cuáles son los requisitos para un crédito", "policy_faq"),
+    ("como va mi solicitud APP123456", "application_status")
+])
+def test_deterministic_intents_are_answered(router, message, intent):
+    """Prueba que las intenciones deterministas se responden sin LLM"""
+    result = router.route(message, FakeAgent())
+
+    assert result is not None
+    assert result["intent"] == intent
+    assert router.stats()["fast_path_turns"] == 1
+
+def test_low_confidence_goes_to_agent():
+    """Prueba que una intención por debajo del umbral sigue al agente completo"""
+    router = FastPathRouter(min_confidence=1.01)
+
+    assert router.route("cuanto pagaria al mes por 50000 a 24 meses con tasa de 18%", FakeAgent()) is None
+
+def test_extract_loan_parameters():
+    """Prueba la extracción de monto, plazo y tasa"""
+    assert extract_loan_parameters("Cuánto pagaría por 80 mil a 3 años al 19,5%?") == {"amount": 80000.0, "term": 36, "rate": 19.5}
+    assert extract_loan_parameters("cuanto pago por 80 mil al 19%") is None
+
+def test_credit_api_is_importable():
+    """Prueba que el cliente de la API de créditos se importa desde integrations/"""
+    assert FastPathRouter()._get_credit_api() is not None
@@ -0,0 +1,154 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from llm_failover import CircuitBreaker, FailoverLLMClient
+
+# Pruebas para el circuit breaker y el failover entre backends LLM
+
+class FakeClient:
+    """Cliente LLM con la interfaz de LLMClient que puede fallar a demanda"""
+
+    def __init__(self, backend, fail=False):
+        self.backend = backend
+        self.requested_model = backend
+        self.model_name = backend
+        self.fail = fail
+        self.calls = 0
+
+    def health_check(self):
+        return not self.fail
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.backend} no disponible")
+        return {"text": f"{self.backend}: {prompt}", "model": self.backend}
+
+    def stream(self, prompt, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.backend} no disponible")
+        for word in ("uno", "dos", "tres"):
+            yield f"{self.backend}:{word}"
+
+    async def astream(self, prompt, **kwargs):
+        for chunk in self.stream(prompt, **kwargs):
+            yield chunk
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record_failure(0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def half_open_breaker(breaker):
+    open_breaker(breaker)
+    breaker._opened_at -= breaker.open_seconds
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test", window_size=10, min_calls=4, error_threshold=0.5, latency_threshold=1.0, open_seconds=30)
+
+@pytest.fixture
+def client():
+    client = FailoverLLMClient(primary=FakeClient("primary"), fallback=FakeClient("fallback"), hedge=False)
+    for backend in client.breakers.values():
+        backend.min_calls = 2
+    return client
+
+def test_breaker_opens_on_error_rate(breaker):
+    """Prueba que el circuito se abre al superar la tasa de errores con suficientes llamadas"""
+    breaker.record_success(0.01)
+    breaker.record_failure(0.01)
+    breaker.record_failure(0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure(0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+def test_breaker_opens_on_latency(breaker):
+    """Prueba que el circuito se abre cuando el p95 de latencia supera el umbral"""
+    for _ in range(4):
+        breaker.record_success(2.0)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_allows_a_single_trial(breaker):
+    """Prueba que el circuito semiabierto deja pasar una sola llamada de prueba"""
+    half_open_breaker(breaker)
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+def test_half_open_trial_success_closes(breaker):
+    """Prueba que una llamada de prueba exitosa cierra el circuito"""
+    half_open_breaker(breaker)
+    breaker.allow_request()
+    breaker.record_success(0.01)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+def test_half_open_trial_failure_reopens(breaker):
+    """Prueba que una llamada de prueba fallida vuelve a abrir el circuito"""
+    half_open_breaker(breaker)
+    breaker.allow_request()
+    breaker.record_failure(0.01)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+def test_generate_fails_over_and_bypasses_open_primary(client):
+    """Prueba que los errores del principal van al fallback y, con el circuito abierto, se omite el principal"""
+    client.primary.fail = True
+    for _ in range(2):
+        assert client.generate("hola")["model"] == "fallback"
+    assert client.breakers["primary"].state == CircuitBreaker.OPEN
+
+    calls = client.primary.calls
+    assert client.generate("hola")["model"] == "fallback"
+    assert client.primary.calls == calls
+    assert client.stats()["breaker_bypasses"] == 1
+
+def test_abandoned_stream_releases_half_open_trial(client):
+    """Prueba que abandonar el stream de prueba no deja el circuito semiabierto bloqueado"""
+    breaker = client.breakers["primary"]
+    half_open_breaker(breaker)
+
+    stream = client.stream("hola")
+    assert next(stream) == "primary:uno"
+    stream.close()  # GeneratorExit en el generador
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert list(client.stream("hola")) == ["primary:uno", "primary:dos", "primary:tres"]
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_abandoned_async_stream_releases_half_open_trial(client):
+    """Prueba que abandonar el stream asíncrono de prueba libera la llamada de prueba"""
+    breaker = client.breakers["primary"]
+    half_open_breaker(breaker)
+
+    async def run():
+        stream = client.astream("hola")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first, [chunk async for chunk in client.astream("hola")]
+
+    first, chunks = asyncio.run(run())
+
+    assert first == "primary:uno"
+    assert chunks == ["primary:uno", "primary:dos", "primary:tres"]
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_stream_fails_over_before_first_chunk(client):
+    """Prueba que un stream que falla antes del primer fragmento se repite en el fallback"""
+    client.primary.fail = True
+
+    assert list(client.stream("hola")) == ["fallback:uno", "fallback:dos", "fallback:tres"]
+    assert client.stats()["failovers"] == 1
@@ -0,0 +1,107 @@
+import os
+import sys
+import logging
+
+import numpy as np
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from project_paths import KNOWLEDGE_DIR
+from policy_index import PolicyHotIndex
+
+# Pruebas para el índice en memoria de políticas activas
+
+VECTORS = {
+    "requisitos": [1.0, 0.0, 0.0],
+    "tasas": [0.0, 1.0, 0.0],
+    "plazos": [0.0, 0.0, 1.0]
+}
+
+class FakeKnowledgeBase:
+    """Base de conocimiento con chunks y embeddings fijos"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.loads = 0
+
+    def get_chunks(self, policy_ids=None):
+        self.loads += 1
+        return self.chunks
+
+def make_chunk(topic, policy_id="1"):
+    return {
+        "text": f"Política de {topic}",
+        "metadata": {"policy_id": policy_id, "policy_name": f"Política {topic}"},
+        "embedding": VECTORS[topic]
+    }
+
+def make_index(chunks, **kwargs):
+    knowledge_base = FakeKnowledgeBase(chunks)
+    index = PolicyHotIndex(
+        knowledge_base_factory=lambda: knowledge_base,
+        embed_fn=lambda query: VECTORS[query.split()[0]],
+        database_url=None,
+        refresh_interval=0,
+        **kwargs
+    )
+    return index, knowledge_base
+
+def test_search_returns_most_similar_chunk():
+    """Prueba que la búsqueda devuelve el chunk más similar por encima del umbral"""
+    index, knowledge_base = make_index([make_chunk("requisitos"), make_chunk("tasas", "2")])
+
+    results = index.search("tasas vigentes")
+
+    assert [result["policy_id"] for result in results] == ["2"]
+    assert results[0]["score"] == 1.0
+    assert index.search("requisitos") and knowledge_base.loads == 1
+
+def test_query_embeddings_are_cached():
+    """Prueba que una consulta repetida no vuelve a calcular el embedding"""
+    index, _ = make_index([make_chunk("plazos")])
+
+    index.search("plazos disponibles")
+    index.search("  Plazos   disponibles ")
+
+    assert index.stats()["query_cache_hits"] == 1
+
+def test_start_preloads_index():
+    """Prueba que start carga el índice sin esperar a la primera búsqueda"""
+    index, knowledge_base = make_index([make_chunk("requisitos")])
+
+    index.start()
+
+    assert knowledge_base.loads == 1
+    assert index.stats()["chunks"] == 1
+
+def test_empty_index_is_logged_as_error(caplog):
+    """Prueba que un índice sin chunks se registra como error"""
+    index, _ = make_index([])
+
+    with caplog.at_level(logging.ERROR, logger="policy_index"):
+        index.start()
+
+    assert index.search("requisitos") == []
+    assert any("vacío" in record.getMessage() for record in caplog.records)
+
+def test_load_failure_is_logged_as_error(caplog):
+    """Prueba que un fallo al cargar la base de conocimiento se registra como error"""
+    def failing_factory():
+        raise RuntimeError("sin ChromaDB")
+    index = PolicyHotIndex(knowledge_base_factory=failing_factory, embed_fn=lambda query: [1.0], database_url=None, refresh_interval=0)
+
+    with caplog.at_level(logging.ERROR, logger="policy_index"):
+        assert index.search("requisitos") == []
+
+    assert any("sin ChromaDB" in record.getMessage() for record in caplog.records)
+
+def test_default_knowledge_base_is_importable():
+    """Prueba que la base de conocimiento por defecto se importa desde knowledge/"""
+    try:
+        PolicyHotIndex._default_knowledge_base()
+    except Exception:
+        # Sin OpenAI/ChromaDB configurados la creación puede fallar, pero el módulo debe importarse
+        pass
+
+    assert KNOWLEDGE_DIR in sys.path
+    assert "policy_knowledge_base" in sys.modules
@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from base_agent import BaseAgent
+from context_memory import count_tokens
+from prompt_registry import PromptRegistry
+from replay_benchmark import FakeChatModel
+
+# Pruebas para el registro de plantillas de prompt compiladas
+
+RECEIVED_PROMPTS = []
+
+class RecordingChatModel(FakeChatModel):
+    """Modelo falso que guarda los mensajes que recibe"""
+
+    def _result(self, messages, functions):
+        RECEIVED_PROMPTS.append(messages)
+        return super()._result(messages, functions)
+
+def test_same_system_prompt_is_compiled_once():
+    """Prueba que el mismo system prompt reutiliza la plantilla compilada"""
+    registry = PromptRegistry(max_size=2)
+
+    first = registry.get("Eres un asesor de {company}")
+    second = registry.get("Eres un asesor de {company}")
+
+    assert first is second
+    assert registry.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+def test_system_prompt_variables_are_interpolated():
+    """Prueba que las variables del system prompt se sustituyen con el contexto del turno"""
+    compiled = PromptRegistry().get("Atiende a {client_name} de {company}.")
+
+    messages = compiled.template.format_messages(input="Hola", chat_history=[], client_name="Ana", company="Financiera")
+
+    assert compiled.system_variables == ["client_name", "company"]
+    assert messages[0].content == "Atiende a Ana de Financiera."
+
+def test_token_count_includes_context_variables():
+    """Prueba que el recuento usa la parte fija cacheada más los valores de las variables"""
+    compiled = PromptRegistry().get("Atiende a {client_name} con amabilidad.")
+
+    without_context = compiled.count_tokens("Hola")
+    with_context = compiled.count_tokens("Hola", context={"client_name": "Ana María Pérez"})
+
+    assert with_context - without_context == count_tokens("Ana María Pérez")
+
+def test_agent_renders_context_into_system_prompt():
+    """Prueba que process_message sustituye el contexto en el system prompt del agente"""
+    RECEIVED_PROMPTS.clear()
+    agent_class = type("RecordingAgent", (BaseAgent,), {"_create_llm": lambda self: RecordingChatModel(latency=0)})
+    agent = agent_class(agent_id="prompt-test", name="Prueba", description="Agente de prueba", system_prompt="Atiende a {client_name}.")
+
+    result = agent.process_message("Hola", context={"client_name": "Ana"}, memory=agent._create_memory())
+
+    assert result["success"]
+    assert RECEIVED_PROMPTS[-1][0].content == "Atiende a Ana."
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gpt_oss_client
+from gpt_oss_client import LLMClient
+from request_coalescer import RequestCoalescer, request_coalescer
+
+# Pruebas para la coalescencia de solicitudes LLM idénticas en curso
+
+class SlowLLMClient(LLMClient):
+    """Cliente LLM sin backend real cuya llamada upstream tarda y se cuenta"""
+
+    def _initialize_client(self):
+        self.client = object()
+        self.upstream_calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _generate(self, prompt, **kwargs):
+        with self._calls_lock:
+            self.upstream_calls += 1
+        time.sleep(0.1)
+        return {"text": f"respuesta a {prompt}", "usage": {"total_tokens": 10}}
+
+def run_concurrently(func, count):
+    barrier = threading.Barrier(count)
+
+    def call(_):
+        barrier.wait()
+        return func()
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return list(executor.map(call, range(count)))
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    """Prueba que las llamadas concurrentes con la misma clave ejecutan la función una sola vez"""
+    coalescer = RequestCoalescer()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"text": "hola"}
+
+    results = run_concurrently(lambda: coalescer.run("clave", upstream), 5)
+
+    assert len(calls) == 1
+    assert all(result["text"] == "hola" for result in results)
+    assert sum(1 for result in results if result.get("coalesced")) == 4
+    assert coalescer.stats()["upstream_calls"] == 1
+    assert coalescer.stats()["dedup_ratio"] == 0.8
+    assert coalescer.stats()["in_flight"] == 0
+
+def test_followers_receive_the_leader_error():
+    """Prueba que la excepción del líder se propaga a los seguidores y la clave se libera"""
+    coalescer = RequestCoalescer()
+
+    def upstream():
+        time.sleep(0.1)
+        raise RuntimeError("backend caído")
+
+    def call():
+        try:
+            coalescer.run("clave", upstream)
+        except RuntimeError as e:
+            return str(e)
+
+    assert run_concurrently(call, 3) == ["backend caído"] * 3
+    assert coalescer.run("clave", lambda: {"text": "ok"}) == {"text": "ok"}
+
+def test_sequential_calls_are_not_coalesced():
+    """Prueba que una llamada que empieza después de terminar la anterior va upstream"""
+    coalescer = RequestCoalescer()
+
+    coalescer.run("clave", lambda: {"text": "uno"})
+    second = coalescer.run("clave", lambda: {"text": "dos"})
+
+    assert second == {"text": "dos"}
+    assert coalescer.stats()["upstream_calls"] == 2
+
+def test_key_normalizes_prompt_and_includes_params():
+    """Prueba que la clave ignora variaciones triviales del prompt pero no los parámetros"""
+    key = RequestCoalescer.make_key("¿Cuáles son  los requisitos?\n", model="gpt-oss-20b", temperature=0.7)
+
+    assert RequestCoalescer.make_key("¿cuáles son los REQUISITOS?", temperature=0.7, model="gpt-oss-20b") == key
+    assert RequestCoalescer.make_key("¿Cuáles son los requisitos?", model="gpt-oss-20b", temperature=0.2) != key
+
+def test_llm_client_coalesces_identical_prompts(monkeypatch):
+    """Prueba que LLMClient.generate agrupa prompts idénticos concurrentes"""
+    monkeypatch.setattr(gpt_oss_client, "LLM_COALESCING_ENABLED", True)
+    monkeypatch.setattr(gpt_oss_client, "SEMANTIC_CACHE_ENABLED", False)
+    request_coalescer.reset_stats()
+    client = SlowLLMClient("gpt-oss-20b")
+
+    results = run_concurrently(lambda: client.generate("Hola  mundo", temperature=0.2), 4)
+
+    assert client.upstream_calls == 1
+    assert {result["text"] for result in results} == {"respuesta a Hola  mundo"}
+    assert request_coalescer.stats()["coalesced_calls"] == 3
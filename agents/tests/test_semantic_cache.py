@@ -0,0 +1,140 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base_agent
+from base_agent import BaseAgent
+from policy_index import PolicyHotIndex
+from semantic_cache import SemanticCache
+from replay_benchmark import FakeChatModel, build_agent
+
+# Pruebas para la caché semántica de respuestas
+
+VECTORS = {
+    "requisitos": [1.0, 0.0, 0.0],
+    "documentos": [0.0, 1.0, 0.0],
+    "tasas": [0.0, 0.0, 1.0]
+}
+
+class CountingEmbeddings:
+    """Embeddings fijos por primera palabra que cuentan las llamadas"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return VECTORS[text.lower().split()[0].strip("¿?")]
+
+class FakeKnowledgeBase:
+    def get_chunks(self, policy_ids=None):
+        return [{"text": "Política", "metadata": {"policy_id": "1", "policy_name": "General"}, "embedding": [1.0, 0.0, 0.0]}]
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings()
+
+@pytest.fixture
+def cache(embeddings):
+    return SemanticCache(embed_fn=embeddings, threshold=0.9, ttl=60, max_entries=10)
+
+@pytest.fixture
+def wired_cache(monkeypatch, cache):
+    """Caché e índice de políticas conectados a los agentes como lo hace _response_cache"""
+    index = PolicyHotIndex(knowledge_base_factory=FakeKnowledgeBase, database_url=None, refresh_interval=0)
+    index.add_listener(lambda version: cache.invalidate())
+    index.start()
+    monkeypatch.setattr(base_agent, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(base_agent, "_response_cache", lambda: (cache, index))
+    return cache, index
+
+@pytest.fixture
+def agent():
+    return build_agent(BaseAgent, lambda: FakeChatModel(latency=0))
+
+def test_lookup_returns_similar_answer_for_same_agent_and_version(cache):
+    """Prueba que una pregunta similar reutiliza la respuesta del mismo agente y versión"""
+    cache.store("requisitos para un crédito", {"text": "Necesitas tu INE"}, agent_id=1, policy_version="v1")
+
+    assert cache.lookup("requisitos del préstamo", agent_id=1, policy_version="v1") == {"text": "Necesitas tu INE"}
+    assert cache.lookup("documentos necesarios", agent_id=1, policy_version="v1") is None
+    assert cache.lookup("requisitos del préstamo", agent_id=2, policy_version="v1") is None
+    assert cache.stats()["hits"] == 1
+
+def test_generation_params_are_part_of_the_key(cache):
+    """Prueba que una respuesta generada con otros parámetros no se reutiliza"""
+    cache.store("requisitos", {"text": "A"}, agent_id=1, params={"model": "gpt-oss-20b", "temperature": 0.2})
+
+    assert cache.lookup("requisitos", agent_id=1, params={"temperature": 0.2, "model": "gpt-oss-20b"}) == {"text": "A"}
+    assert cache.lookup("requisitos", agent_id=1, params={"model": "gpt-oss-20b", "temperature": 0.9}) is None
+    assert cache.lookup("requisitos", agent_id=1) is None
+
+def test_lookup_embedding_is_reused_by_store(cache, embeddings):
+    """Prueba que un fallo seguido de store calcula un único embedding"""
+    vector = cache.embed("tasas vigentes")
+    assert cache.lookup("tasas vigentes", agent_id=1, vector=vector) is None
+    cache.store("tasas vigentes", {"text": "12%"}, agent_id=1, vector=vector)
+
+    assert embeddings.calls == 1
+    assert cache.lookup("tasas vigentes", agent_id=1, vector=vector) == {"text": "12%"}
+
+def test_new_policy_version_discards_previous_answers(cache):
+    """Prueba que al observar una nueva versión de políticas se descartan las respuestas anteriores"""
+    cache.store("requisitos", {"text": "viejo"}, agent_id=1, policy_version="v1")
+
+    assert cache.lookup("requisitos", agent_id=1, policy_version="v2") is None
+    assert cache.stats()["entries"] == 0
+
+def test_policy_index_change_invalidates_cache(wired_cache):
+    """Prueba que un cambio de versión en el índice de políticas vacía la caché"""
+    cache, index = wired_cache
+    cache.store("requisitos", {"text": "viejo"}, agent_id=1, policy_version=index.version)
+
+    index.database_url = "sqlite://"
+    index._policy_state = lambda: (("1", "2"), ["1", "2"])
+    assert index.refresh()
+
+    assert index.version == ("1", "2")
+    assert cache.stats()["entries"] == 0
+
+def test_agent_serves_repeated_first_question_from_cache(wired_cache, agent):
+    """Prueba que el agente responde desde la caché la misma pregunta de otra conversación"""
+    cache, index = wired_cache
+
+    first = agent.process_message("requisitos para un crédito", memory=agent._create_memory())
+    second = agent.process_message("requisitos de un préstamo", memory=agent._create_memory())
+
+    assert first["success"] and "semantic_cache" not in first
+    assert second["semantic_cache"] is True
+    assert second["response"] == first["response"]
+    assert cache.stats()["hits"] == 1
+
+def test_agent_does_not_cache_follow_ups_or_amounts(wired_cache, agent):
+    """Prueba que no se cachean mensajes con historial, con contexto o con cifras"""
+    cache, index = wired_cache
+    memory = agent._create_memory()
+
+    agent.process_message("requisitos para un crédito", memory=memory)
+    follow_up = agent.process_message("requisitos adicionales", memory=memory)
+    with_context = agent.process_message("requisitos", context={"client_name": "Ana"}, memory=agent._create_memory())
+    with_amount = agent.process_message("tasas para 100000 a 24 meses", memory=agent._create_memory())
+
+    assert not any(result.get("semantic_cache") for result in (follow_up, with_context, with_amount))
+    assert cache.stats()["entries"] == 1
+
+def test_async_agent_uses_cache(wired_cache, agent):
+    """Prueba que la versión asíncrona también consulta y alimenta la caché"""
+    cache, index = wired_cache
+
+    async def run():
+        first = await agent.aprocess_message("documentos necesarios", memory=agent._create_memory())
+        second = await agent.aprocess_message("documentos que piden", memory=agent._create_memory())
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert second["semantic_cache"] is True and second["response"] == first["response"]
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gpt_oss_client import GPTOSSClient, LLMClient, LLMChunk, _iterate_in_thread
+
+# Pruebas para la generación en streaming del cliente LLM
+
+class FakeModel:
+    """Modelo local sin generación incremental"""
+
+    def generate(self, prompt, **kwargs):
+        return SimpleNamespace(text="respuesta completa", usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5))
+
+class FakeStreamingModel(FakeModel):
+    """Modelo local que entrega la respuesta por piezas"""
+
+    def stream(self, prompt, **kwargs):
+        for text in ("Hola", ", ", "Ana"):
+            yield SimpleNamespace(text=text)
+
+class FakeOpenAI:
+    """Cliente de OpenAI que devuelve fragmentos como la API con stream=True"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        chunks = [SimpleNamespace(choices=[])]  # fragmento sin choices (por ejemplo, solo usage)
+        for i, piece in enumerate(self.pieces):
+            finish_reason = "stop" if i == len(self.pieces) - 1 else None
+            chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece), finish_reason=finish_reason)]))
+        return iter(chunks)
+
+def local_client(model):
+    client = GPTOSSClient()
+    client.model = model
+    return client
+
+def llm_client(client, model_name="gpt-oss-20b"):
+    llm = LLMClient.__new__(LLMClient)
+    llm.requested_model = model_name
+    llm.model_name = model_name
+    llm.client = client
+    return llm
+
+def test_local_model_streams_pieces_and_final_chunk():
+    """Prueba que el modelo local entrega cada pieza y un último fragmento con finish_reason"""
+    chunks = list(llm_client(local_client(FakeStreamingModel())).stream("hola"))
+
+    assert "".join(chunk.text for chunk in chunks) == "Hola, Ana"
+    assert [chunk.finish_reason for chunk in chunks] == [None, None, None, "stop"]
+    assert all(chunk.model == "gpt-oss-20b" for chunk in chunks)
+
+def test_local_model_without_stream_yields_single_chunk():
+    """Prueba que sin generación incremental se entrega la respuesta completa en un solo fragmento"""
+    chunks = list(local_client(FakeModel()).stream("hola"))
+
+    assert chunks == [LLMChunk(text="respuesta completa", model="gpt-oss-20b", finish_reason="stop", usage={"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5})]
+
+def test_openai_stream_skips_empty_chunks():
+    """Prueba que el streaming de OpenAI se pide con stream=True y omite los fragmentos sin choices"""
+    openai = FakeOpenAI(["Ho", "la", None])
+    chunks = list(llm_client(openai, "gpt-3.5-turbo").stream("hola", max_tokens=20))
+
+    assert openai.requests[0]["stream"] is True
+    assert openai.requests[0]["max_tokens"] == 20
+    assert [chunk.text for chunk in chunks] == ["Ho", "la", ""]
+    assert chunks[-1].finish_reason == "stop"
+
+def test_stream_without_client_raises():
+    """Prueba que el streaming sin cliente inicializado falla al empezar a iterar"""
+    with pytest.raises(ValueError):
+        list(llm_client(None).stream("hola"))
+
+def test_astream_matches_stream():
+    """Prueba que la versión asíncrona entrega los mismos fragmentos"""
+    client = llm_client(local_client(FakeStreamingModel()))
+
+    async def run():
+        return [chunk async for chunk in client.astream("hola")]
+
+    assert asyncio.run(run()) == list(client.stream("hola"))
+
+def test_iterate_in_thread_propagates_errors():
+    """Prueba que un error del iterador bloqueante llega al consumidor asíncrono"""
+    def failing():
+        yield LLMChunk(text="uno", model="test")
+        raise RuntimeError("conexión perdida")
+
+    async def run():
+        received = []
+        with pytest.raises(RuntimeError, match="conexión perdida"):
+            async for chunk in _iterate_in_thread(failing):
+                received.append(chunk.text)
+        return received
+
+    assert asyncio.run(run()) == ["uno"]
+
+def test_abandoned_astream_stops_producer():
+    """Prueba que al abandonar la iteración asíncrona el hilo productor deja de generar"""
+    produced = []
+    finished = threading.Event()
+
+    def endless():
+        try:
+            for i in range(1000):
+                produced.append(i)
+                time.sleep(0.005)
+                yield LLMChunk(text=str(i), model="test")
+        finally:
+            finished.set()
+
+    async def run():
+        stream = _iterate_in_thread(endless)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(run()).text == "0"
+    assert finished.wait(timeout=2)
+    assert len(produced) < 1000
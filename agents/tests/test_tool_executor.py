@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import threading
+from typing import Any, List, Tuple, Union
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tool_executor import (
+    ParallelToolAgentExecutor,
+    ToolMetrics,
+    ToolResultCache,
+    instrument_tool,
+    tool_conversation
+)
+
+from langchain.agents import BaseMultiActionAgent
+from langchain.schema import AgentAction, AgentFinish
+
+# Pruebas para la capa de ejecución de herramientas
+
+class TwoToolsAgent(BaseMultiActionAgent):
+    """Agente que pide dos herramientas en el primer paso y termina en el segundo"""
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["input"]
+
+    def plan(self, intermediate_steps: List[Tuple[AgentAction, str]], callbacks=None, **kwargs: Any) -> Union[List[AgentAction], AgentFinish]:
+        if intermediate_steps:
+            return AgentFinish({"output": " | ".join(str(observation) for _, observation in intermediate_steps)}, "")
+        return [AgentAction("first", "a", ""), AgentAction("second", "b", "")]
+
+    async def aplan(self, intermediate_steps, callbacks=None, **kwargs):
+        return self.plan(intermediate_steps, callbacks, **kwargs)
+
+def test_actions_of_one_step_run_concurrently():
+    """Prueba que las dos acciones de un paso se ejecutan a la vez y conservan su orden"""
+    # Cada herramienta espera a la otra: en secuencia, la barrera vencería
+    barrier = threading.Barrier(2, timeout=2)
+    threads = {}
+
+    def make_tool(name, delay):
+        def run(tool_input):
+            barrier.wait()
+            time.sleep(delay)
+            threads[name] = threading.current_thread().name
+            return f"{name}:{tool_input}"
+        return instrument_tool(name=name, func=run, description=name, cache=ToolResultCache(), metrics=ToolMetrics())
+
+    executor = ParallelToolAgentExecutor(agent=TwoToolsAgent(), tools=[make_tool("first", 0.05), make_tool("second", 0.0)])
+
+    assert executor.run(input="hola") == "first:a | second:b"
+    assert threads["first"] != threads["second"]
+
+def test_single_action_runs_in_calling_thread():
+    """Prueba que una sola acción no pasa por el pool de hilos"""
+    class OneToolAgent(TwoToolsAgent):
+        def plan(self, intermediate_steps, callbacks=None, **kwargs):
+            if intermediate_steps:
+                return AgentFinish({"output": intermediate_steps[0][1]}, "")
+            return AgentAction("echo", "x", "")
+
+    caller = threading.current_thread().name
+    tool = instrument_tool(name="echo", func=lambda tool_input: threading.current_thread().name, description="echo",
+                           cache=ToolResultCache(), metrics=ToolMetrics())
+
+    assert ParallelToolAgentExecutor(agent=OneToolAgent(), tools=[tool]).run(input="hola") == caller
+
+def test_cacheable_tool_is_memoized_per_conversation():
+    """Prueba que una herramienta pura se ejecuta una vez por conversación y entrada"""
+    calls = []
+    cache, metrics = ToolResultCache(), ToolMetrics()
+    tool = instrument_tool(name="quote", func=lambda tool_input: calls.append(tool_input) or len(calls),
+                           description="quote", cacheable=True, cache=cache, metrics=metrics)
+
+    with tool_conversation(("cliente-1", "agente")):
+        assert tool.run('{"amount": 1000, "term": 12}') == 1
+        # La misma entrada con otro orden de claves acierta en la caché
+        assert tool.run('{"term": 12, "amount": 1000}') == 1
+    with tool_conversation(("cliente-2", "agente")):
+        assert tool.run('{"amount": 1000, "term": 12}') == 2
+
+    assert metrics.stats()["quote"]["calls"] == 3
+    assert metrics.stats()["quote"]["cache_hits"] == 1
+
+def test_tool_cache_expires_and_clears():
+    """Prueba el TTL y la limpieza por conversación de la caché de resultados"""
+    cache = ToolResultCache(ttl=0.01)
+    cache.set(("c1", "tool", "x"), 1)
+    time.sleep(0.02)
+    assert cache.get(("c1", "tool", "x")) == (False, None)
+
+    cache = ToolResultCache(ttl=60, max_entries=2)
+    cache.set(("c1", "tool", "x"), 1)
+    cache.set(("c2", "tool", "x"), 2)
+    cache.set(("c2", "tool", "y"), 3)
+    assert len(cache) == 2
+    cache.clear("c2")
+    assert len(cache) == 0
+
+def test_side_effect_tools_are_not_cached():
+    """Prueba que las herramientas no puras se ejecutan siempre"""
+    calls = []
+    tool = instrument_tool(name="apply", func=lambda tool_input: calls.append(tool_input), description="apply",
+                           cache=ToolResultCache(), metrics=ToolMetrics())
+
+    with tool_conversation("cliente-1"):
+        tool.run("{}")
+        tool.run("{}")
+
+    assert len(calls) == 2
+
+def test_upstream_step_signature_is_unchanged():
+    """Prueba que `_take_next_step` de LangChain mantiene la firma que envuelve el ejecutor paralelo"""
+    import inspect
+    from langchain.agents import AgentExecutor
+
+    parameters = list(inspect.signature(AgentExecutor._take_next_step).parameters)
+    assert parameters == ["self", "name_to_tool_map", "color_mapping", "inputs", "intermediate_steps", "run_manager"]
+
+def test_parsing_errors_and_unknown_tools_use_upstream_handling():
+    """Prueba que los errores de formato y las herramientas desconocidas siguen el manejo de LangChain"""
+    from langchain.schema import OutputParserException
+
+    class FlakyAgent(TwoToolsAgent):
+        def plan(self, intermediate_steps, callbacks=None, **kwargs):
+            if not intermediate_steps:
+                raise OutputParserException("bad format")
+            if len(intermediate_steps) == 1:
+                return [AgentAction("missing", "x", ""), AgentAction("echo", "y", "")]
+            return AgentFinish({"output": [observation for _, observation in intermediate_steps]}, "")
+
+    tool = instrument_tool(name="echo", func=lambda tool_input: f"echo:{tool_input}", description="echo",
+                           cache=ToolResultCache(), metrics=ToolMetrics())
+    executor = ParallelToolAgentExecutor(agent=FlakyAgent(), tools=[tool], handle_parsing_errors="retry")
+
+    observations = executor({"input": "hola"})["output"]
+    assert observations[0] == "retry"
+    assert "missing is not a valid tool" in observations[1]
+    assert observations[2] == "echo:y"
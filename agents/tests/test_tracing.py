@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+from uuid import uuid4
+
+import pytest
+
+# Importar los módulos desde el directorio padre
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+from tracing import FileSpanExporter, Tracer, trace_callbacks
+
+# Pruebas para las trazas por etapa
+
+class RecordingExporter:
+    """Exportador que guarda las trazas en memoria"""
+
+    def __init__(self):
+        self.traces = []
+        self.dropped = 0
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+def make_tracer(**kwargs):
+    options = {"sample_rate": 0.0, "slow_threshold": 60.0, "enabled": True, **kwargs}
+    exporter = RecordingExporter()
+    return Tracer(exporter=exporter, **options), exporter
+
+def test_tracing_is_off_by_default_and_writes_outside_the_tree():
+    """Prueba que el trazado no escribe en el directorio de trabajo por defecto"""
+    if "TRACING_ENABLED" not in os.environ:
+        assert config.TRACING_ENABLED is False
+    if "TRACING_EXPORT_PATH" not in os.environ:
+        assert os.path.isabs(config.TRACING_EXPORT_PATH)
+
+def test_nested_spans_share_the_trace():
+    """Prueba que los intervalos anidados forman una traza con sus padres"""
+    tracer, exporter = make_tracer(sample_rate=1.0)
+
+    with tracer.span("agent.process_message", agent_id="a1") as root:
+        with tracer.span("memory.load") as child:
+            assert tracer.current_span() is child
+
+    spans = exporter.traces[0]
+    assert [span.name for span in spans] == ["memory.load", "agent.process_message"]
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert root.attributes == {"agent_id": "a1"}
+
+def test_fast_traces_are_sampled():
+    """Prueba que las trazas rápidas y sin error se descartan según la tasa de muestreo"""
+    tracer, exporter = make_tracer(sample_rate=0.0)
+
+    with tracer.span("agent.process_message"):
+        pass
+
+    assert exporter.traces == []
+    assert tracer.stats()["discarded_traces"] == 1
+    assert tracer.stats()["open_traces"] == 0
+
+def test_failed_and_slow_traces_are_always_exported():
+    """Prueba que las trazas con error o lentas se exportan aunque no se muestreen"""
+    tracer, exporter = make_tracer(sample_rate=0.0, slow_threshold=0.0)
+    with tracer.span("agent.process_message"):
+        pass
+    assert len(exporter.traces) == 1
+
+    tracer, exporter = make_tracer(sample_rate=0.0)
+    with pytest.raises(ValueError):
+        with tracer.span("agent.process_message"):
+            with tracer.span("llm.call"):
+                raise ValueError("timeout del modelo")
+    assert len(exporter.traces) == 1
+    assert all(span.error == "timeout del modelo" for span in exporter.traces[0])
+
+def test_disabled_tracer_creates_no_spans():
+    """Prueba que el trazado desactivado no acumula trazas"""
+    tracer, exporter = make_tracer(enabled=False, sample_rate=1.0)
+
+    with tracer.span("agent.process_message") as span:
+        assert trace_callbacks(span) is None
+
+    assert exporter.traces == []
+    assert tracer.stats()["open_traces"] == 0
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    """Prueba que el exportador escribe una línea OTLP/JSON por traza"""
+    path = tmp_path / "traces" / "agent_traces.jsonl"
+    exporter = FileSpanExporter(path=str(path), service_name="pruebas")
+    tracer = Tracer(exporter=exporter, sample_rate=1.0, enabled=True)
+
+    with tracer.span("agent.process_message", turns=3):
+        pass
+    exporter.shutdown()
+
+    request = json.loads(path.read_text(encoding="utf-8").strip())
+    resource = request["resourceSpans"][0]
+    span = resource["scopeSpans"][0]["spans"][0]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "pruebas"}
+    assert span["name"] == "agent.process_message"
+    assert span["attributes"] == [{"key": "turns", "value": {"intValue": "3"}}]
+    assert span["status"] == {"code": 1}
+
+def test_callback_handler_records_llm_and_tool_spans():
+    """Prueba que los eventos de LangChain se registran como intervalos hijos del turno"""
+    from langchain.schema import LLMResult
+
+    tracer, exporter = make_tracer(sample_rate=1.0)
+    with tracer.span("agent.process_message") as root:
+        handler = trace_callbacks(root)[0]
+        llm_run, tool_run = uuid4(), uuid4()
+        handler.on_chat_model_start({}, [[object(), object()]], run_id=llm_run, invocation_params={"model_name": "gpt-oss-20b"})
+        handler.on_llm_end(LLMResult(generations=[], llm_output={"token_usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}}), run_id=llm_run)
+        handler.on_tool_start({"name": "calculate_loan"}, '{"amount": 1000}', run_id=tool_run, parent_run_id=llm_run)
+        handler.on_tool_error(RuntimeError("API caída"), run_id=tool_run)
+
+    spans = {span.name: span for span in exporter.traces[0]}
+    llm = spans["llm.call"]
+    assert llm.parent_id == root.span_id
+    assert llm.attributes["llm.model"] == "gpt-oss-20b"
+    assert llm.attributes["llm.messages"] == 2
+    assert llm.attributes["llm.total_tokens"] == 15
+    tool = spans["tool:calculate_loan"]
+    assert tool.parent_id == root.span_id
+    assert tool.error == "API caída"
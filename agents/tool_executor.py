@@ -0,0 +1,289 @@
+"""Capa de ejecución de herramientas de los agentes: caché por conversación, paralelismo y latencias."""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Callable, Iterator, Optional, Tuple
+
+from config import TOOL_CACHE_ENABLED, TOOL_CACHE_TTL, TOOL_CACHE_MAX_ENTRIES, TOOL_PARALLEL_MAX_WORKERS
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Conversación del turno en curso; las herramientas la leen para no compartir resultados entre clientes
+_current_conversation: contextvars.ContextVar = contextvars.ContextVar("tool_conversation", default=None)
+
+_LATENCY_WINDOW = 200  # llamadas recientes por herramienta para los percentiles
+
+
+@contextmanager
+def tool_conversation(conversation_key: Any) -> Iterator[None]:
+    """Asocia las llamadas a herramientas del bloque a una conversación
+
+    Args:
+        conversation_key: Clave de la conversación (por ejemplo, (cliente, agente))
+    """
+    token = _current_conversation.set(conversation_key)
+    try:
+        yield
+    finally:
+        _current_conversation.reset(token)
+
+
+def current_conversation() -> Any:
+    """Clave de la conversación del turno en curso (None fuera de `tool_conversation`)."""
+    return _current_conversation.get()
+
+
+def conversation_key_for(memory) -> Any:
+    """Clave de conversación de una memoria de agente
+
+    Usa la clave de la memoria con resumen o el (cliente, agente) del almacén de
+    conversaciones; para otras memorias, la identidad de su historial.
+    """
+    key = getattr(memory, "conversation_key", None)
+    if key is not None:
+        return key
+    chat_memory = getattr(memory, "chat_memory", None)
+    if getattr(chat_memory, "client_id", None) is not None:
+        return (chat_memory.client_id, chat_memory.agent_id)
+    return ("memory", id(chat_memory if chat_memory is not None else memory))
+
+
+def _normalize_input(tool_input: Any) -> str:
+    """Representación canónica de la entrada de una herramienta (JSON con claves ordenadas si es posible)."""
+    if isinstance(tool_input, str):
+        try:
+            return json.dumps(json.loads(tool_input), sort_keys=True)
+        except (ValueError, TypeError):
+            return " ".join(tool_input.split())
+    return json.dumps(tool_input, sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """Resultados de herramientas puras por (conversación, herramienta, entrada), con TTL y límite LRU."""
+
+    def __init__(self, ttl: float = TOOL_CACHE_TTL, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Any, str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Any, str, str]) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, resultado) para una clave, descartando la entrada si expiró."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, result
+
+    def set(self, key: Tuple[Any, str, str], result: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, conversation_key: Any = None) -> None:
+        """Elimina los resultados de una conversación (o todos)."""
+        with self._lock:
+            if conversation_key is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == conversation_key]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ToolMetrics:
+    """Latencia, errores y aciertos de caché por herramienta."""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, tool_name: str, seconds: float, cached: bool = False, error: bool = False) -> None:
+        with self._lock:
+            tool = self._tools.get(tool_name)
+            if tool is None:
+                tool = {"calls": 0, "cache_hits": 0, "errors": 0, "total_seconds": 0.0, "latencies": deque(maxlen=self.window)}
+                self._tools[tool_name] = tool
+            tool["calls"] += 1
+            if cached:
+                tool["cache_hits"] += 1
+                return
+            if error:
+                tool["errors"] += 1
+            tool["total_seconds"] += seconds
+            tool["latencies"].append(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas por herramienta; las latencias (ms) excluyen los aciertos de caché."""
+        with self._lock:
+            result = {}
+            for name, tool in self._tools.items():
+                executed = tool["calls"] - tool["cache_hits"]
+                latencies = sorted(tool["latencies"])
+                result[name] = {
+                    "calls": tool["calls"],
+                    "cache_hits": tool["cache_hits"],
+                    "errors": tool["errors"],
+                    "avg_ms": round(tool["total_seconds"] / executed * 1000, 3) if executed else 0.0,
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else 0.0,
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3) if latencies else 0.0
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+
+
+# Caché, métricas y pool de hilos compartidos por el proceso
+tool_result_cache = ToolResultCache()
+tool_metrics = ToolMetrics()
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_PARALLEL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
+
+def instrument_tool(
+    name: str,
+    func: Callable[[str], Any],
+    description: str,
+    cacheable: bool = False,
+    cache: Optional[ToolResultCache] = None,
+    metrics: Optional[ToolMetrics] = None
+) -> Any:
+    """Crea una herramienta de LangChain que mide su latencia y, si es pura, memoriza sus resultados
+
+    Args:
+        name: Nombre de la herramienta
+        func: Función de la herramienta
+        description: Descripción para el modelo
+        cacheable: Si la herramienta es pura (mismo resultado para la misma entrada) y se puede memorizar
+        cache: Caché de resultados (por defecto, la del proceso)
+        metrics: Registro de latencias (por defecto, el del proceso)
+
+    Returns:
+        Tool con versión síncrona y asíncrona
+    """
+    from langchain.tools import Tool
+
+    cache = cache if cache is not None else tool_result_cache
+    metrics = metrics if metrics is not None else tool_metrics
+
+    def run(tool_input: str) -> Any:
+        conversation_key = _current_conversation.get()
+        key = None
+        if cacheable and TOOL_CACHE_ENABLED and conversation_key is not None:
+            key = (conversation_key, name, _normalize_input(tool_input))
+            found, result = cache.get(key)
+            if found:
+                metrics.record(name, 0.0, cached=True)
+                return result
+
+        start = time.perf_counter()
+        try:
+            result = func(tool_input)
+        except Exception:
+            metrics.record(name, time.perf_counter() - start, error=True)
+            raise
+        metrics.record(name, time.perf_counter() - start)
+
+        if key is not None:
+            cache.set(key, result)
+        return result
+
+    async def arun(tool_input: str) -> Any:
+        # Copiar el contexto para que el hilo vea la conversación del turno
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(_tool_pool, context.run, run, tool_input)
+
+    return Tool(name=name, func=run, coroutine=arun, description=description)
+
+
+class _DeferredTool:
+    """Sustituto de una herramienta que aplaza su ejecución.
+
+    `run` no ejecuta la herramienta: devuelve un `_DeferredRun` con los mismos
+    argumentos para que el ejecutor lo lance después, junto con las demás
+    acciones del paso.
+    """
+
+    def __init__(self, tool: Any):
+        self.tool = tool
+        self.return_direct = tool.return_direct
+
+    def run(self, tool_input: Any, **kwargs: Any) -> "_DeferredRun":
+        return _DeferredRun(self.tool, tool_input, kwargs)
+
+
+class _DeferredRun:
+    """Llamada pendiente a una herramienta (la observación que ve `_take_next_step` de LangChain)."""
+
+    def __init__(self, tool: Any, tool_input: Any, kwargs: Dict[str, Any]):
+        self.tool = tool
+        self.tool_input = tool_input
+        self.kwargs = kwargs
+
+    def __call__(self) -> Any:
+        return self.tool.run(self.tool_input, **self.kwargs)
+
+
+class _ParallelToolExecution:
+    """Ejecuta en paralelo las llamadas a herramientas de un mismo paso del modelo.
+
+    En la ruta asíncrona LangChain ya ejecuta con `asyncio.gather` las acciones de
+    un paso. En la síncrona las ejecuta una a una: aquí `_take_next_step` delega
+    el paso completo (planificación, errores de formato, callbacks) en el de
+    `AgentExecutor`, pero con herramientas que aplazan su ejecución, y después
+    lanza todas las llamadas del paso juntas en el pool de hilos, conservando el
+    orden de las observaciones. Con una sola acción no se usa el pool. La clase
+    del ejecutor (`ParallelToolAgentExecutor`) añade `AgentExecutor` en el
+    primer uso, para que importar este módulo no cargue LangChain.
+    """
+
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        deferred_tools = {name: _DeferredTool(tool) for name, tool in name_to_tool_map.items()}
+        output = super()._take_next_step(deferred_tools, color_mapping, inputs, intermediate_steps, run_manager)
+        if not isinstance(output, list):
+            return output
+
+        pending = [observation for _, observation in output if isinstance(observation, _DeferredRun)]
+        if len(pending) <= 1:
+            return [(action, observation() if isinstance(observation, _DeferredRun) else observation)
+                    for action, observation in output]
+
+        # Copiar el contexto para que cada hilo vea la conversación del turno
+        futures = {id(run): _tool_pool.submit(contextvars.copy_context().run, run) for run in pending}
+        return [(action, futures[id(observation)].result() if isinstance(observation, _DeferredRun) else observation)
+                for action, observation in output]
+
+
+@lru_cache(maxsize=None)
+def _executor_class() -> type:
+    """Clase `ParallelToolAgentExecutor`: `_ParallelToolExecution` sobre el `AgentExecutor` de LangChain."""
+    from langchain.agents import AgentExecutor
+    return type("ParallelToolAgentExecutor", (_ParallelToolExecution, AgentExecutor), {"__module__": __name__})
+
+
+def __getattr__(name: str) -> Any:
+    # ParallelToolAgentExecutor depende de LangChain y se crea al pedirlo por primera vez
+    if name == "ParallelToolAgentExecutor":
+        return _executor_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,397 @@
+"""Trazas por etapa del pipeline de los agentes, exportadas en formato OTLP/JSON a un archivo local."""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional
+from uuid import UUID
+
+from config import (
+    TRACING_ENABLED,
+    TRACING_SAMPLE_RATE,
+    TRACING_SLOW_THRESHOLD,
+    TRACING_EXPORT_PATH,
+    TRACING_SERVICE_NAME
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+_SPAN_KIND_INTERNAL = 1
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Intervalo de tiempo de una etapa, con atributos y estado."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id is None
+
+    @property
+    def duration(self) -> float:
+        """Duración en segundos (hasta ahora, si el intervalo no ha terminado)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, error: Any) -> None:
+        self.error = str(error) or type(error).__name__
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._tracer._finish(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Representación del intervalo en OTLP/JSON."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK}
+        }
+
+
+class _NoopSpan:
+    """Intervalo vacío para cuando el trazado está desactivado."""
+
+    name = trace_id = span_id = parent_id = None
+    is_root = False
+    duration = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, error: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class FileSpanExporter:
+    """Escribe cada traza como una línea OTLP/JSON (ExportTraceServiceRequest) en un archivo.
+
+    La escritura se hace en un hilo en segundo plano; el formato es el del exportador
+    de archivos del OpenTelemetry Collector, así que el archivo se puede reenviar a
+    cualquier backend compatible (Jaeger, Tempo, etc.) con el receptor `otlpjsonfile`.
+    """
+
+    def __init__(self, path: str = TRACING_EXPORT_PATH, service_name: str = TRACING_SERVICE_NAME, max_queue: int = 10000):
+        self.path = path
+        self.service_name = service_name
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, spans: List[Span]) -> None:
+        """Encola los intervalos de una traza para escribirlos (se descartan si la cola está llena)."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        """Escribe lo pendiente y detiene el hilo."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _write_loop(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(self._request(spans), ensure_ascii=False) + "\n")
+            except Exception as e:
+                logger.error(f"Error al exportar trazas a {self.path}: {str(e)}")
+
+    def _request(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "agents.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+
+
+class Tracer:
+    """Crea intervalos anidados y exporta las trazas muestreadas.
+
+    Los intervalos de una traza se acumulan en memoria hasta que termina el
+    intervalo raíz; entonces se decide si se exporta: siempre si la traza tuvo un
+    error o superó `slow_threshold` segundos, y si no con probabilidad
+    `sample_rate`. Así las trazas lentas o fallidas nunca se pierden y el costo
+    en producción es solo el de medir los tiempos.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[FileSpanExporter] = None,
+        sample_rate: float = TRACING_SAMPLE_RATE,
+        slow_threshold: float = TRACING_SLOW_THRESHOLD,
+        enabled: bool = TRACING_ENABLED
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._traces: Dict[str, List[Span]] = {}
+        self._errors: Dict[str, bool] = {}
+        self._exported = 0
+        self._discarded = 0
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """Inicia un intervalo sin activarlo en el contexto (hay que llamar a `end`)
+
+        Args:
+            name: Nombre de la etapa
+            parent: Intervalo padre (por defecto, el activo en el contexto; sin padre inicia una traza)
+            **attributes: Atributos del intervalo
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        parent = parent if parent is not None else _current_span.get()
+        if parent is None or parent is _NOOP_SPAN:
+            span = Span(self, name, "%032x" % random.getrandbits(128), None, attributes)
+            with self._lock:
+                self._traces[span.trace_id] = []
+        else:
+            span = Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Mide un bloque como intervalo hijo del intervalo activo
+
+        Args:
+            name: Nombre de la etapa
+            **attributes: Atributos del intervalo
+        """
+        span = self.start_span(name, **attributes)
+        if span is _NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def current_span(self) -> Optional[Span]:
+        """Intervalo activo en el contexto actual."""
+        return _current_span.get()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_traces": len(self._traces),
+                "exported_traces": self._exported,
+                "discarded_traces": self._discarded,
+                "dropped_by_exporter": self.exporter.dropped if self.exporter else 0
+            }
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                return
+            spans.append(span)
+            if span.error:
+                self._errors[span.trace_id] = True
+            if not span.is_root:
+                return
+            del self._traces[span.trace_id]
+            failed = self._errors.pop(span.trace_id, False)
+
+        keep = failed or span.duration >= self.slow_threshold or random.random() < self.sample_rate
+        with self._lock:
+            if keep and self.exporter is not None:
+                self._exported += 1
+            else:
+                self._discarded += 1
+        if keep and self.exporter is not None:
+            self.exporter.export(spans)
+
+
+class _TracingCallbacks:
+    """Convierte los eventos de LangChain de un turno en intervalos hijos de `parent`.
+
+    Registra las plantillas de prompt, cada llamada al LLM (con modelo y tokens) y
+    cada herramienta. Se crea un handler por turno. La clase del handler
+    (`TracingCallbackHandler`) añade `BaseCallbackHandler` en el primer uso, para
+    que importar este módulo no cargue LangChain.
+    """
+
+    def __init__(self, tracer: "Tracer", parent: Span):
+        self.tracer = tracer
+        self.parent = parent
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes) -> None:
+        with self._lock:
+            parent = self._spans.get(parent_run_id, self.parent) if parent_run_id else self.parent
+            self._spans[run_id] = self.tracer.start_span(name, parent=parent, **attributes)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> Optional[Span]:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return None
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        if error is not None:
+            span.set_error(error)
+        span.end()
+        return span
+
+    # Cadenas (incluye las plantillas de prompt cuando LangChain las ejecuta como runnables)
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or ((serialized or {}).get("id") or ["chain"])[-1]
+        self._start(run_id, parent_run_id, "prompt.render" if "PromptTemplate" in name else f"chain:{name}")
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    # Llamadas al LLM
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        self._start(run_id, parent_run_id, "llm.call", **self._model_attributes(serialized, kwargs))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        attributes = self._model_attributes(serialized, kwargs)
+        attributes["llm.messages"] = sum(len(batch) for batch in messages)
+        self._start(run_id, parent_run_id, "llm.call", **attributes)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(
+            run_id,
+            **{
+                "llm.prompt_tokens": usage.get("prompt_tokens"),
+                "llm.completion_tokens": usage.get("completion_tokens"),
+                "llm.total_tokens": usage.get("total_tokens")
+            }
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    # Herramientas
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        name = (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool:{name}", **{"tool.name": name, "tool.input_chars": len(input_str or "")})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, **{"tool.output_chars": len(str(output))})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    @staticmethod
+    def _model_attributes(serialized: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or ((serialized or {}).get("kwargs") or {}).get("model_name")
+        return {"llm.model": model} if model else {}
+
+
+@lru_cache(maxsize=None)
+def _callback_handler_class() -> type:
+    """Clase `TracingCallbackHandler`: `_TracingCallbacks` sobre el `BaseCallbackHandler` de LangChain."""
+    from langchain.callbacks.base import BaseCallbackHandler
+    return type("TracingCallbackHandler", (_TracingCallbacks, BaseCallbackHandler), {"__module__": __name__})
+
+
+def __getattr__(name: str) -> Any:
+    # TracingCallbackHandler depende de LangChain y se crea al pedirlo por primera vez
+    if name == "TracingCallbackHandler":
+        return _callback_handler_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def trace_callbacks(span: Span) -> Optional[List[Any]]:
+    """Callbacks de LangChain que registran las etapas internas bajo `span` (None si no se traza)."""
+    if span is _NOOP_SPAN:
+        return None
+    return [_callback_handler_class()(span._tracer, span)]
+
+
+# Trazador compartido por el proceso
+tracer = Tracer(exporter=FileSpanExporter() if TRACING_ENABLED else None)
@@ -0,0 +1,60 @@
+"""Token usage accounting and budgets
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Presupuestos de tokens
+    op.add_column('agents', sa.Column('token_budget', sa.Integer(), nullable=True))
+    op.add_column('campaigns', sa.Column('token_budget', sa.Integer(), nullable=True))
+    
+    # Consumo de tokens agregado por día
+    op.create_table(
+        'token_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('agent_id', sa.Integer(), nullable=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('requests', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('total_tokens', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_token_usage_agent_id', 'token_usage', ['agent_id'])
+    op.create_index('ix_token_usage_campaign_id', 'token_usage', ['campaign_id'])
+    op.create_index('ix_token_usage_date', 'token_usage', ['date'])
+    # Una fila por periodo para que los volcados concurrentes sumen sobre ella (upsert atómico)
+    op.create_index(
+        'uq_token_usage_period',
+        'token_usage',
+        [sa.text('COALESCE(agent_id, 0)'), sa.text('COALESCE(campaign_id, 0)'), sa.text("COALESCE(model, '')"), 'date'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_token_usage_period', table_name='token_usage')
+    op.drop_index('ix_token_usage_date', table_name='token_usage')
+    op.drop_index('ix_token_usage_campaign_id', table_name='token_usage')
+    op.drop_index('ix_token_usage_agent_id', table_name='token_usage')
+    op.drop_table('token_usage')
+    op.drop_column('campaigns', 'token_budget')
+    op.drop_column('agents', 'token_budget')
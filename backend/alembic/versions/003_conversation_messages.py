@@ -0,0 +1,38 @@
+"""Shared conversation history for agents
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Historial de conversación de los agentes, leído por ventanas (cliente, agente)
+    op.create_table(
+        'conversation_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.String(length=32), nullable=False),
+        sa.Column('client_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=False),
+        sa.Column('role', sa.String(length=16), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id')
+    )
+    op.create_index('ix_conversation_messages_conversation', 'conversation_messages', ['client_id', 'agent_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_messages_conversation', table_name='conversation_messages')
+    op.drop_table('conversation_messages')
@@ -0,0 +1,50 @@
+"""Asynchronous credit application submissions
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Cola de envíos de solicitudes a la API externa, con reintentos y clave de idempotencia
+    op.create_table(
+        'credit_application_submissions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tracking_id', sa.String(length=32), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+        sa.Column('application_id', sa.Integer(), nullable=True),
+        sa.Column('client_ref', sa.String(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('external_application_id', sa.String(), nullable=True),
+        sa.Column('notified', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['application_id'], ['credit_applications.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tracking_id'),
+        sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index('ix_credit_application_submissions_status', 'credit_application_submissions', ['status'])
+    op.create_index('ix_credit_application_submissions_next_attempt_at', 'credit_application_submissions', ['next_attempt_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_credit_application_submissions_next_attempt_at', table_name='credit_application_submissions')
+    op.drop_index('ix_credit_application_submissions_status', table_name='credit_application_submissions')
+    op.drop_table('credit_application_submissions')
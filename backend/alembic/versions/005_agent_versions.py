@@ -0,0 +1,25 @@
+"""Agent configuration versions
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Versión de la configuración de cada agente; los workers la consultan para recargar los agentes modificados
+    op.add_column('agents', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('agents', 'version')
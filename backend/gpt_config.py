@@ -1,6 +1,7 @@
 """Configuración para la integración con gpt-oss-20b."""
 
 import os
+import threading
 from dotenv import load_dotenv
 import logging
 
@@ -23,6 +24,16 @@ USE_OPENAI_FALLBACK = os.getenv("USE_OPENAI_FALLBACK", "false").lower() == "true
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 
+# Intervalo (segundos) de los health checks en segundo plano del cliente LLM (0 = desactivado)
+LLM_HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "30"))
+
+# Cliente LLM compartido por el proceso (se inicializa de forma perezosa)
+_client_lock = threading.Lock()
+_llm_client = None
+_llm_backend = None
+_health_thread = None
+_health_stop = None
+
 
 def get_gpt_oss_config():
     """Retorna la configuración para gpt-oss-20b."""
@@ -53,45 +64,174 @@ def is_gpt_oss_available():
         return False
 
 
-def get_llm_client():
-    """Retorna el cliente LLM apropiado (gpt-oss-20b o OpenAI)."""
+def _create_llm_client():
+    """Crea el cliente LLM apropiado (gpt-oss-20b o OpenAI).
+    
+    Returns:
+        Tupla (cliente, backend) donde backend es "gpt-oss-20b" u "openai".
+    """
     if is_gpt_oss_available():
         try:
             import gpt_oss_20b
             logger.info("Usando gpt-oss-20b como modelo LLM")
-            return gpt_oss_20b.GPTOSSClient(**get_gpt_oss_config())
+            return gpt_oss_20b.GPTOSSClient(**get_gpt_oss_config()), "gpt-oss-20b"
         except Exception as e:
             logger.error(f"Error al inicializar gpt-oss-20b: {e}")
             if USE_OPENAI_FALLBACK and OPENAI_API_KEY:
                 logger.info("Fallback a OpenAI")
                 from openai import OpenAI
-                return OpenAI(api_key=OPENAI_API_KEY)
+                return OpenAI(api_key=OPENAI_API_KEY), "openai"
             else:
                 raise
     else:
         if USE_OPENAI_FALLBACK and OPENAI_API_KEY:
             logger.info("Usando OpenAI como modelo LLM (fallback)")
             from openai import OpenAI
-            return OpenAI(api_key=OPENAI_API_KEY)
+            return OpenAI(api_key=OPENAI_API_KEY), "openai"
         else:
             raise ValueError("No se encontró un modelo LLM disponible")
 
 
-def generate_text(prompt, max_tokens=None, temperature=None):
-    """Genera texto usando el modelo LLM disponible."""
+def get_llm_client():
+    """Retorna el cliente LLM apropiado (gpt-oss-20b o OpenAI).
+    
+    El cliente se crea una sola vez por proceso y se reutiliza en las llamadas
+    siguientes, por lo que el camino crítico no realiza trabajo de inicialización.
+    """
+    global _llm_client, _llm_backend
+    
+    client = _llm_client
+    if client is not None:
+        return client
+    
+    with _client_lock:
+        if _llm_client is None:
+            _llm_client, _llm_backend = _create_llm_client()
+            _start_health_checks()
+        return _llm_client
+
+
+def get_selected_backend():
+    """Retorna el backend seleccionado ("gpt-oss-20b" u "openai"), o None si aún no se ha inicializado."""
+    return _llm_backend
+
+
+def run_health_check():
+    """Revisa la salud del cliente LLM compartido y lo reemplaza solo si es necesario.
+    
+    Con gpt-oss-20b, el health check del cliente consulta /health en cada réplica:
+    actualiza la profundidad de cola y reincorpora las réplicas expulsadas que
+    vuelven a responder. El cliente se vuelve a crear solo si no está sano o si está
+    en fallback a OpenAI (degradado) y gpt-oss-20b vuelve a estar disponible.
+    """
+    global _llm_client, _llm_backend
+    
+    client, backend = _llm_client, _llm_backend
+    if client is None:
+        return
+    
+    try:
+        healthy = client.health_check() if backend == "gpt-oss-20b" else True
+        degraded = backend != "gpt-oss-20b"
+        if healthy and not (degraded and is_gpt_oss_available()):
+            return
+        
+        replacement, replacement_backend = _create_llm_client()
+        if replacement_backend == backend and healthy:
+            return
+        
+        with _client_lock:
+            if _llm_client is not client:
+                # El cliente se reinició mientras tanto
+                return
+            _llm_client, _llm_backend = replacement, replacement_backend
+        logger.info(f"Cliente LLM reemplazado: {backend} -> {replacement_backend}")
+    except Exception as e:
+        logger.error(f"Error en el health check del cliente LLM: {e}")
+
+
+def reset_llm_client():
+    """Descarta el cliente LLM compartido y detiene sus health checks; se volverá a crear en la próxima llamada."""
+    global _llm_client, _llm_backend, _health_thread, _health_stop
+    
+    with _client_lock:
+        _llm_client = None
+        _llm_backend = None
+        if _health_stop is not None:
+            _health_stop.set()
+        _health_thread = None
+        _health_stop = None
+
+
+def _start_health_checks():
+    """Inicia el hilo de health checks en segundo plano si está habilitado."""
+    global _health_thread, _health_stop
+    
+    if LLM_HEALTH_CHECK_INTERVAL <= 0 or _health_thread is not None:
+        return
+    
+    # Cada hilo tiene su propio evento, de modo que reset_llm_client lo detiene aunque se inicie otro
+    stop_event = threading.Event()
+    
+    def _health_loop():
+        while not stop_event.wait(LLM_HEALTH_CHECK_INTERVAL):
+            run_health_check()
+    
+    _health_stop = stop_event
+    _health_thread = threading.Thread(target=_health_loop, name="llm-health-checks", daemon=True)
+    _health_thread.start()
+
+
+def _usage_to_dict(usage, prompt, text, prompt_tokens=None):
+    """Normaliza el consumo de tokens reportado por el cliente LLM."""
+    if usage is None:
+        # Estimación aproximada cuando el backend no reporta consumo (salvo los tokens del prompt, si ya se contaron)
+        if prompt_tokens is None:
+            prompt_tokens = len(prompt.split())
+        completion_tokens = len(text.split())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "estimated": True
+        }
+    
+    if isinstance(usage, dict):
+        values = {key: usage.get(key, 0) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    else:
+        values = {key: getattr(usage, key, 0) for key in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    
+    try:
+        return {key: int(value or 0) for key, value in values.items()}
+    except (TypeError, ValueError):
+        return _usage_to_dict(None, prompt, text, prompt_tokens)
+
+
+def generate_text_with_usage(prompt, max_tokens=None, temperature=None, prompt_tokens=None, conversation_id=None):
+    """Genera texto usando el modelo LLM disponible y retorna también el consumo de tokens.
+    
+    Args:
+        prompt_tokens: Tokens del prompt ya contados (por ejemplo, por prompt_registry); se usan si el backend no informa del consumo.
+        conversation_id: ID de la conversación; con gpt-oss-20b sus solicitudes van a la misma réplica (caché de prefijos).
+    
+    Returns:
+        Tupla (texto, usage) donde usage contiene prompt_tokens, completion_tokens y total_tokens.
+    """
     client = get_llm_client()
     
     # Determinar si estamos usando gpt-oss-20b u OpenAI
     if hasattr(client, "generate"):  # gpt-oss-20b
         # Usar la API de gpt-oss-20b
+        affinity = {"conversation_id": conversation_id} if conversation_id else {}
         response = client.generate(
             prompt=prompt,
             max_tokens=max_tokens or GPT_OSS_MAX_TOKENS,
             temperature=temperature or GPT_OSS_TEMPERATURE,
             top_p=GPT_OSS_TOP_P,
-            top_k=GPT_OSS_TOP_K
+            top_k=GPT_OSS_TOP_K,
+            **affinity
         )
-        return response.text
+        text = response.text
     else:  # OpenAI
         # Usar la API de OpenAI
         response = client.chat.completions.create(
@@ -103,4 +243,12 @@ def generate_text(prompt, max_tokens=None, temperature=None):
             max_tokens=max_tokens or GPT_OSS_MAX_TOKENS,
             temperature=temperature or GPT_OSS_TEMPERATURE,
         )
-        return response.choices[0].message.content
\ No newline at end of file
+        text = response.choices[0].message.content
+    
+    return text, _usage_to_dict(getattr(response, "usage", None), prompt, text, prompt_tokens)
+
+
+def generate_text(prompt, max_tokens=None, temperature=None):
+    """Genera texto usando el modelo LLM disponible."""
+    text, _ = generate_text_with_usage(prompt, max_tokens=max_tokens, temperature=temperature)
+    return text
@@ -0,0 +1,417 @@
+"""Motor vectorizado de cálculo de préstamos (cuotas, intereses y tablas de amortización).
+
+Calcula rejillas completas de escenarios (monto x plazo x tasa) en una sola
+llamada con NumPy, en lugar de un escenario por vez. Lo usan el endpoint
+/api/loans/offer-grid y la herramienta loan_offer_grid del agente de ventas,
+que lo importa desde agents/ (ver agents/project_paths.py).
+"""
+
+import time
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Plazos (meses) y rango de tasas anuales (%) de las políticas de crédito vigentes
+STANDARD_TERMS = (6, 12, 18, 24, 36, 48, 60)
+MIN_ANNUAL_RATE = 12.0
+MAX_ANNUAL_RATE = 35.0
+
+GRID_FIELDS = ("amount", "term_months", "annual_interest_rate", "monthly_payment", "total_payment", "total_interest")
+SCHEDULE_FIELDS = ("month", "payment", "principal", "interest", "remaining_balance")
+
+# Número máximo de opciones que devuelve best_offers
+MAX_OFFERS = 100
+
+# Límites de los escenarios que se aceptan (los aplican tanto el endpoint como la herramienta del agente)
+MAX_TERM_MONTHS = 600
+MAX_VALID_ANNUAL_RATE = 100.0
+MAX_GRID_SCENARIOS = 200000
+
+# Meses calculados por bloque al generar una tabla de amortización fila a fila
+SCHEDULE_CHUNK_SIZE = 120
+
+
+def rate_range(step: float = 1.0, minimum: float = MIN_ANNUAL_RATE, maximum: float = MAX_ANNUAL_RATE) -> np.ndarray:
+    """Tasas anuales (%) entre `minimum` y `maximum`, ambas incluidas, cada `step` puntos."""
+    if step <= 0:
+        raise ValueError("El paso entre tasas debe ser mayor que cero")
+    count = int(round((maximum - minimum) / step)) + 1
+    if count > MAX_GRID_SCENARIOS:
+        raise ValueError(f"Demasiadas tasas ({count}, máximo {MAX_GRID_SCENARIOS})")
+    return np.round(minimum + step * np.arange(count), 6)
+
+
+def validate_grid(amounts: Sequence[float], terms: Sequence[int], annual_rates: Sequence[float]) -> int:
+    """Valida los ejes de una rejilla antes de reservar memoria para ella
+
+    Args:
+        amounts: Montos del préstamo (mayores que cero)
+        terms: Plazos en meses (entre 1 y MAX_TERM_MONTHS)
+        annual_rates: Tasas anuales en porcentaje (entre 0 y MAX_VALID_ANNUAL_RATE)
+
+    Returns:
+        Número de escenarios de la rejilla
+
+    Raises:
+        ValueError: Si algún eje está vacío, tiene valores fuera de rango o la rejilla supera MAX_GRID_SCENARIOS
+    """
+    if len(amounts) == 0 or len(terms) == 0 or len(annual_rates) == 0:
+        raise ValueError("Los montos, plazos y tasas no pueden estar vacíos")
+    if any(not amount > 0 or amount == float("inf") for amount in amounts):
+        raise ValueError("Los montos deben ser mayores que cero")
+    if any(not 1 <= term <= MAX_TERM_MONTHS or int(term) != term for term in terms):
+        raise ValueError(f"Los plazos deben ser meses enteros entre 1 y {MAX_TERM_MONTHS}")
+    if any(not 0 <= rate <= MAX_VALID_ANNUAL_RATE for rate in annual_rates):
+        raise ValueError(f"Las tasas deben estar entre 0 y {MAX_VALID_ANNUAL_RATE:g}")
+
+    scenarios = len(amounts) * len(terms) * len(annual_rates)
+    if scenarios > MAX_GRID_SCENARIOS:
+        raise ValueError(f"Rejilla demasiado grande ({scenarios} escenarios, máximo {MAX_GRID_SCENARIOS})")
+    return scenarios
+
+
+def monthly_payments(amounts, terms, annual_rates) -> np.ndarray:
+    """Cuota mensual (sistema francés) de uno o varios escenarios
+
+    Los argumentos se combinan con las reglas de broadcasting de NumPy.
+
+    Args:
+        amounts: Monto(s) del préstamo
+        terms: Plazo(s) en meses
+        annual_rates: Tasa(s) de interés anual en porcentaje
+
+    Returns:
+        Array con la cuota mensual de cada escenario
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    terms = np.asarray(terms, dtype=np.float64)
+    monthly_rates = np.asarray(annual_rates, dtype=np.float64) / 12 / 100
+
+    growth = np.power(1 + monthly_rates, terms)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payments = amounts * monthly_rates * growth / (growth - 1)
+    # Tasa cero: el monto se reparte en partes iguales
+    return np.where(monthly_rates == 0, amounts / terms, payments)
+
+
+def offer_grid(amounts: Iterable[float], terms: Iterable[int] = STANDARD_TERMS, annual_rates: Optional[Iterable[float]] = None) -> Dict[str, np.ndarray]:
+    """Calcula todos los escenarios de una rejilla monto x plazo x tasa
+
+    Args:
+        amounts: Montos del préstamo
+        terms: Plazos en meses
+        annual_rates: Tasas anuales en porcentaje (por defecto, de 12% a 35% en pasos de 1 punto)
+
+    Returns:
+        Dict de arrays con forma (montos, plazos, tasas) para cada campo de GRID_FIELDS
+
+    Raises:
+        ValueError: Si la rejilla no pasa validate_grid
+    """
+    amounts = [float(amount) for amount in amounts]
+    terms = [float(term) for term in terms]
+    rates = [float(rate) for rate in (annual_rates if annual_rates is not None else rate_range())]
+    validate_grid(amounts, terms, rates)
+
+    amounts = np.asarray(amounts, dtype=np.float64)[:, None, None]
+    terms = np.asarray(terms, dtype=np.int64)[None, :, None]
+    rates = np.asarray(rates, dtype=np.float64)[None, None, :]
+
+    payment = monthly_payments(amounts, terms, rates)
+    total_payment = payment * terms
+    shape = payment.shape
+    return {
+        "amount": np.broadcast_to(amounts, shape),
+        "term_months": np.broadcast_to(terms, shape),
+        "annual_interest_rate": np.broadcast_to(rates, shape),
+        "monthly_payment": payment,
+        "total_payment": total_payment,
+        "total_interest": total_payment - amounts
+    }
+
+
+def best_offers(
+    grid: Dict[str, np.ndarray],
+    max_monthly_payment: Optional[float] = None,
+    sort_by: str = "total_interest",
+    limit: int = 5
+) -> List[Dict[str, Any]]:
+    """Selecciona las mejores opciones de una rejilla
+
+    Args:
+        grid: Resultado de offer_grid
+        max_monthly_payment: Cuota máxima que puede pagar el cliente (opcional)
+        sort_by: Campo por el que se ordena de menor a mayor ("total_interest" o "monthly_payment")
+        limit: Número máximo de opciones (entre 1 y MAX_OFFERS)
+
+    Returns:
+        Lista de escenarios, cada uno como dict con los campos de GRID_FIELDS redondeados
+    """
+    if sort_by not in GRID_FIELDS:
+        raise ValueError(f"Campo de ordenación no válido: {sort_by}")
+    if not 1 <= limit <= MAX_OFFERS:
+        # Un límite negativo recortaría la lista desde el final en lugar de limitarla
+        raise ValueError(f"El límite de opciones debe estar entre 1 y {MAX_OFFERS}")
+
+    columns = {field: np.ravel(grid[field]) for field in GRID_FIELDS}
+    candidates = np.arange(columns["monthly_payment"].size)
+    if max_monthly_payment is not None:
+        candidates = candidates[columns["monthly_payment"] <= max_monthly_payment]
+
+    order = candidates[np.argsort(columns[sort_by][candidates], kind="stable")][:limit]
+    return [
+        {
+            "amount": round(float(columns["amount"][i]), 2),
+            "term_months": int(columns["term_months"][i]),
+            "annual_interest_rate": round(float(columns["annual_interest_rate"][i]), 4),
+            "monthly_payment": round(float(columns["monthly_payment"][i]), 2),
+            "total_payment": round(float(columns["total_payment"][i]), 2),
+            "total_interest": round(float(columns["total_interest"][i]), 2)
+        }
+        for i in order
+    ]
+
+
+def amortization_schedules(amounts: Sequence[float], terms: Sequence[int], annual_rates: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Tablas de amortización completas de varios préstamos a la vez
+
+    El saldo tras k pagos se obtiene en forma cerrada a partir del factor de
+    crecimiento (1 + r)^k, calculado como producto acumulado por filas.
+
+    Args:
+        amounts: Monto de cada préstamo
+        terms: Plazo en meses de cada préstamo
+        annual_rates: Tasa anual en porcentaje de cada préstamo
+
+    Returns:
+        Dict con "month" (1..plazo máximo) y arrays (préstamos, plazo máximo) de
+        "payment", "principal", "interest" y "remaining_balance"; los meses
+        posteriores al plazo de cada préstamo valen NaN.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)[:, None]
+    terms = np.asarray(terms, dtype=np.int64)[:, None]
+    monthly_rates = np.asarray(annual_rates, dtype=np.float64)[:, None] / 12 / 100
+
+    max_term = int(terms.max()) if terms.size else 0
+    months = np.arange(1, max_term + 1)[None, :]
+    payment = monthly_payments(amounts, terms, monthly_rates * 12 * 100)
+
+    growth = np.cumprod(np.broadcast_to(1 + monthly_rates, (amounts.shape[0], max_term)), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        balance = np.where(
+            monthly_rates == 0,
+            amounts - payment * months,
+            amounts * growth - payment * (growth - 1) / monthly_rates
+        )
+    previous_balance = np.concatenate([amounts, balance[:, :-1]], axis=1)
+    interest = previous_balance * monthly_rates
+    principal = payment - interest
+
+    active = months <= terms
+    nan = np.nan
+    return {
+        "month": months[0],
+        "payment": np.where(active, np.broadcast_to(payment, balance.shape), nan),
+        "principal": np.where(active, principal, nan),
+        "interest": np.where(active, interest, nan),
+        "remaining_balance": np.where(active, np.maximum(balance, 0), nan)
+    }
+
+
+def _schedule_chunk(balance: float, payment: float, monthly_rate: float, first_month: int, months: int) -> Dict[str, np.ndarray]:
+    """Calcula un bloque consecutivo de filas de una tabla de amortización
+
+    Args:
+        balance: Saldo antes del primer mes del bloque
+        payment: Cuota mensual
+        monthly_rate: Tasa mensual (fracción)
+        first_month: Número del primer mes del bloque (desde 1)
+        months: Número de meses del bloque
+
+    Returns:
+        Dict con un array por campo de SCHEDULE_FIELDS
+    """
+    steps = np.arange(1, months + 1, dtype=np.float64)
+    if monthly_rate == 0:
+        balances = balance - payment * steps
+    else:
+        growth = np.cumprod(np.full(months, 1 + monthly_rate))
+        balances = balance * growth - payment * (growth - 1) / monthly_rate
+    previous = np.concatenate([[balance], balances[:-1]])
+    interest = previous * monthly_rate
+    return {
+        "month": np.arange(first_month, first_month + months),
+        "payment": np.full(months, payment),
+        "principal": payment - interest,
+        "interest": interest,
+        "remaining_balance": np.maximum(balances, 0)
+    }
+
+
+def _balance_after(amount: float, payment: float, monthly_rate: float, months: int) -> float:
+    """Saldo tras `months` pagos, en forma cerrada."""
+    if monthly_rate == 0:
+        return amount - payment * months
+    growth = (1 + monthly_rate) ** months
+    return amount * growth - payment * (growth - 1) / monthly_rate
+
+
+def _rows(chunk: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Convierte un bloque columnar en filas redondeadas a centavos."""
+    columns = [np.round(chunk[field], 2).tolist() for field in SCHEDULE_FIELDS[1:]]
+    return [
+        {"month": int(month), **dict(zip(SCHEDULE_FIELDS[1:], values))}
+        for month, *values in zip(chunk["month"].tolist(), *columns)
+    ]
+
+
+def iter_schedule_rows(amount: float, term_months: int, annual_rate: float, chunk_size: int = SCHEDULE_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Genera la tabla de amortización completa fila a fila, calculándola por bloques
+
+    Cada bloque se calcula con producto acumulado a partir del saldo con el que
+    terminó el anterior, así que la memoria usada no depende del plazo.
+
+    Args:
+        amount: Monto del préstamo
+        term_months: Plazo en meses
+        annual_rate: Tasa anual en porcentaje
+        chunk_size: Meses calculados por bloque
+
+    Yields:
+        Dicts con month, payment, principal, interest y remaining_balance
+    """
+    monthly_rate = annual_rate / 12 / 100
+    payment = float(monthly_payments(amount, term_months, annual_rate))
+    balance = float(amount)
+    for start in range(0, term_months, chunk_size):
+        months = min(chunk_size, term_months - start)
+        chunk = _schedule_chunk(balance, payment, monthly_rate, start + 1, months)
+        yield from _rows(chunk)
+        balance = float(_balance_after(amount, payment, monthly_rate, start + months))
+
+
+def schedule_page(amount: float, term_months: int, annual_rate: float, page: int = 1, page_size: int = 12) -> Dict[str, Any]:
+    """Obtiene una página de la tabla de amortización sin calcular los meses anteriores fila a fila
+
+    Args:
+        amount: Monto del préstamo
+        term_months: Plazo en meses
+        annual_rate: Tasa anual en porcentaje
+        page: Número de página (desde 1)
+        page_size: Filas por página
+
+    Returns:
+        Dict con page, page_size, total_rows, total_pages y rows
+    """
+    if page < 1 or page_size < 1:
+        raise ValueError("page y page_size deben ser mayores que cero")
+
+    monthly_rate = annual_rate / 12 / 100
+    payment = float(monthly_payments(amount, term_months, annual_rate))
+    start = (page - 1) * page_size
+    months = max(0, min(page_size, term_months - start))
+
+    rows = []
+    if months:
+        balance = _balance_after(float(amount), payment, monthly_rate, start)
+        rows = _rows(_schedule_chunk(balance, payment, monthly_rate, start + 1, months))
+
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total_rows": term_months,
+        "total_pages": -(-term_months // page_size),
+        "rows": rows
+    }
+
+
+def columnar_schedules(amounts: Sequence[float], terms: Sequence[int], annual_rates: Sequence[float], decimals: int = 2) -> Dict[str, List[Any]]:
+    """Tablas de amortización de muchos préstamos en formato columnar compacto
+
+    En lugar de una lista de filas, devuelve una lista por columna con las filas
+    de todos los préstamos concatenadas; la columna "loan" indica el índice del
+    préstamo al que pertenece cada fila.
+
+    Args:
+        amounts: Monto de cada préstamo
+        terms: Plazo en meses de cada préstamo
+        annual_rates: Tasa anual en porcentaje de cada préstamo
+        decimals: Decimales de los importes
+
+    Returns:
+        Dict con las columnas "loan" y SCHEDULE_FIELDS
+    """
+    schedules = amortization_schedules(amounts, terms, annual_rates)
+    active = ~np.isnan(schedules["payment"])
+
+    loans, month_index = np.nonzero(active)
+    columns: Dict[str, List[Any]] = {
+        "loan": loans.tolist(),
+        "month": (month_index + 1).tolist()
+    }
+    for field in SCHEDULE_FIELDS[1:]:
+        columns[field] = np.round(schedules[field][active], decimals).tolist()
+    return columns
+
+
+def simulate_loan_scalar(amount: float, term_months: int, annual_rate: float) -> Dict[str, float]:
+    """Cálculo escalar de un escenario (referencia de la versión vectorizada)."""
+    monthly_rate = annual_rate / 12 / 100
+    if monthly_rate == 0:
+        monthly_payment = amount / term_months
+    else:
+        monthly_payment = amount * monthly_rate * (1 + monthly_rate) ** term_months / ((1 + monthly_rate) ** term_months - 1)
+    total_payment = monthly_payment * term_months
+    return {
+        "monthly_payment": monthly_payment,
+        "total_payment": total_payment,
+        "total_interest": total_payment - amount
+    }
+
+
+def benchmark(amount_count: int = 100, repeat: int = 5) -> Dict[str, Any]:
+    """Compara la rejilla vectorizada con el cálculo escalar escenario por escenario
+
+    Args:
+        amount_count: Número de montos de la rejilla (entre 5,000 y 500,000)
+        repeat: Repeticiones de cada medición (se toma la mejor)
+
+    Returns:
+        Dict con el número de escenarios, los tiempos y la aceleración
+    """
+    amounts = np.linspace(5000, 500000, amount_count)
+    rates = rate_range(step=0.5)
+
+    def run_scalar():
+        return [
+            simulate_loan_scalar(float(a), t, float(r))
+            for a in amounts for t in STANDARD_TERMS for r in rates
+        ]
+
+    def measure(func):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    scalar_seconds = measure(run_scalar)
+    vector_seconds = measure(lambda: offer_grid(amounts, STANDARD_TERMS, rates))
+    return {
+        "scenarios": len(amounts) * len(STANDARD_TERMS) * len(rates),
+        "scalar_seconds": round(scalar_seconds, 6),
+        "vectorized_seconds": round(vector_seconds, 6),
+        "speedup": round(scalar_seconds / vector_seconds, 1) if vector_seconds else None
+    }
+
+
+# Benchmark de la rejilla vectorizada frente al cálculo escalar
+if __name__ == "__main__":
+    for count in (10, 100, 1000):
+        print(benchmark(amount_count=count))
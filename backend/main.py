@@ -10,7 +10,8 @@ from dotenv import load_dotenv
 # Importaciones internas
 from database import get_db, engine
 import models
-from routes import agents, campaigns, users, dashboard, credit_policies, applications, chat
+from routes import agents, campaigns, users, dashboard, credit_policies, applications, chat, loans
+from usage_recorder import usage_recorder
 
 # Cargar variables de entorno
 load_dotenv()
@@ -41,8 +42,19 @@ app.include_router(campaigns.router, prefix="/api/campaigns", tags=["campaigns"]
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
 app.include_router(credit_policies.router, prefix="/api/policies", tags=["policies"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+app.include_router(loans.router, prefix="/api/loans", tags=["loans"])
 app.include_router(applications.router)
 
+@app.on_event("startup")
+async def startup_event():
+    # Iniciar el volcado periódico del consumo de tokens
+    usage_recorder.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Persistir el consumo de tokens pendiente
+    usage_recorder.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Bienvenido al API del Sistema de Agentes Vendedores de Créditos"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Text, Enum, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Text, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -52,6 +52,8 @@ class Agent(Base):
     description = Column(Text)
     status = Column(Enum(AgentStatus), default=AgentStatus.INACTIVE)
     configuration = Column(JSON)  # Configuración específica del agente
+    token_budget = Column(Integer, nullable=True)  # Máximo de tokens por mes (None = sin límite)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Se incrementa en cada cambio (ETag)
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -74,6 +76,7 @@ class Campaign(Base):
     end_date = Column(DateTime(timezone=True))
     target_audience = Column(JSON)  # Criterios de segmentación
     message_template = Column(Text)  # Plantilla del mensaje
+    token_budget = Column(Integer, nullable=True)  # Máximo de tokens de la campaña (None = sin límite)
     agent_id = Column(Integer, ForeignKey("agents.id"))
     creator_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -224,4 +227,67 @@ class AgentPerformance(Base):
     metrics_data = Column(JSON)  # Métricas adicionales
 
     # Relaciones
-    agent = relationship("Agent", back_populates="performance_metrics")
\ No newline at end of file
+    agent = relationship("Agent", back_populates="performance_metrics")
+
+class TokenUsage(Base):
+    __tablename__ = "token_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=True, index=True)
+    model = Column(String)
+    date = Column(DateTime(timezone=True), index=True)  # Día al que corresponde el acumulado
+    requests = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Una fila por agente, campaña, modelo y día (agente, campaña y modelo nulos cuentan como un valor más);
+    # usage_recorder suma sobre ella con un upsert atómico
+    __table_args__ = (
+        Index(
+            "uq_token_usage_period",
+            func.coalesce(agent_id, 0), func.coalesce(campaign_id, 0), func.coalesce(model, ""), date,
+            unique=True
+        ),
+    )
+
+    # Relaciones
+    agent = relationship("Agent")
+    campaign = relationship("Campaign")
+
+class ConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+
+    # Historial de conversación de los agentes, compartido entre workers (ver agents/conversation_store.py)
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(String(32), unique=True, nullable=False)
+    client_id = Column(String, nullable=False)
+    agent_id = Column(String, nullable=False)
+    role = Column(String(16), nullable=False)  # human, ai o system
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CreditApplicationSubmission(Base):
+    __tablename__ = "credit_application_submissions"
+
+    # Envíos pendientes de solicitudes a la API externa de créditos (ver agents/application_submitter.py)
+    id = Column(Integer, primary_key=True, index=True)
+    tracking_id = Column(String(32), unique=True, nullable=False)
+    idempotency_key = Column(String(64), unique=True, nullable=False)
+    application_id = Column(Integer, ForeignKey("credit_applications.id"), nullable=True)
+    client_ref = Column(String, nullable=True)  # Cliente de la conversación que originó la solicitud
+    payload = Column(JSON, nullable=False)
+    status = Column(String(16), nullable=False, index=True)  # queued, submitting, submitted o failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    external_application_id = Column(String, nullable=True)
+    notified = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relaciones
+    application = relationship("CreditApplication")
@@ -0,0 +1,166 @@
+"""Registro de prompts compilados por versión de agente con el recuento de tokens de su parte fija."""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROMPT_REGISTRY_MAX_SIZE = int(os.getenv("PROMPT_REGISTRY_MAX_SIZE", "256"))  # agentes con prompt compilado
+
+CHAT_PROMPT_PREFIX = """Eres un agente virtual de ventas de créditos llamado {name}.
+
+Información del agente:
+{description}
+
+Configuración adicional:
+{configuration}
+
+Mensaje del cliente:
+"""
+
+CHAT_PROMPT_SUFFIX = """
+Responde de manera amable, profesional y concisa. Proporciona información precisa sobre los productos de crédito y ayuda al cliente a resolver sus dudas.
+"""
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Cuenta los tokens de un texto
+
+    Usa tiktoken (cl100k_base) si está instalado; si no, el número de palabras,
+    la misma estimación que gpt_config aplica cuando el backend no informa del
+    consumo.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text.split())
+
+
+def agent_version(agent) -> Any:
+    """Versión de la configuración de un agente (models.Agent.version, se incrementa en cada cambio)."""
+    return agent.version
+
+
+class CompiledPrompt:
+    """Prompt de un agente con la parte fija ya renderizada y tokenizada.
+
+    La parte fija (nombre, descripción, configuración e instrucciones) se
+    renderiza una vez por versión del agente; en cada turno solo se concatena el
+    mensaje del cliente entre el prefijo y el sufijo y se tokeniza ese mensaje.
+    Las partes fijas terminan y empiezan en un salto de línea, así que la suma de
+    tokens coincide con la del prompt completo.
+    """
+
+    __slots__ = ("version", "prefix", "suffix", "static_tokens")
+
+    def __init__(self, version: Any, prefix: str, suffix: str):
+        self.version = version
+        self.prefix = prefix
+        self.suffix = suffix
+        self.static_tokens = count_tokens(prefix) + count_tokens(suffix)
+
+    def render(self, message: str) -> Tuple[str, int]:
+        """Renderiza el prompt de un turno
+
+        Args:
+            message: Mensaje del cliente
+
+        Returns:
+            Tupla (prompt, tokens del prompt)
+        """
+        message = message.strip()
+        return self.prefix + message + self.suffix, self.static_tokens + count_tokens(message)
+
+
+def compile_chat_prompt(agent) -> CompiledPrompt:
+    """Compila el prompt del chat de prueba de un agente
+
+    Args:
+        agent: Agente (models.Agent)
+
+    Returns:
+        El prompt compilado para la versión actual del agente
+    """
+    configuration = json.dumps(agent.configuration or {}, ensure_ascii=False, sort_keys=True)
+    prefix = CHAT_PROMPT_PREFIX.format(name=agent.name, description=agent.description or "", configuration=configuration)
+    return CompiledPrompt(agent_version(agent), prefix, CHAT_PROMPT_SUFFIX)
+
+
+class PromptRegistry:
+    """Caché LRU de prompts compilados por agente.
+
+    Cada agente conserva solo el prompt de su última versión: cuando su
+    `version` cambia, el prompt se vuelve a compilar y sustituye al anterior.
+    """
+
+    def __init__(self, max_size: int = PROMPT_REGISTRY_MAX_SIZE, compiler=compile_chat_prompt):
+        """Inicializa el registro
+
+        Args:
+            max_size: Número máximo de agentes con prompt compilado
+            compiler: Función que compila el prompt de un agente
+        """
+        self.max_size = max_size
+        self.compiler = compiler
+        self._entries: "OrderedDict[int, CompiledPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, agent) -> CompiledPrompt:
+        """Obtiene el prompt compilado de un agente, compilándolo si su versión cambió."""
+        version = agent_version(agent)
+        with self._lock:
+            compiled = self._entries.get(agent.id)
+            if compiled is not None and compiled.version == version:
+                self._entries.move_to_end(agent.id)
+                self._hits += 1
+                return compiled
+            self._misses += 1
+
+        compiled = self.compiler(agent)
+        with self._lock:
+            self._entries[agent.id] = compiled
+            self._entries.move_to_end(agent.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        logger.info(f"Prompt del agente {agent.id} compilado ({compiled.static_tokens} tokens fijos)")
+        return compiled
+
+    def render(self, agent, message: str) -> Tuple[str, int]:
+        """Renderiza el prompt de un turno para un agente
+
+        Returns:
+            Tupla (prompt, tokens del prompt)
+        """
+        return self.get(agent).render(message)
+
+    def invalidate(self, agent_id: int) -> None:
+        """Descarta el prompt compilado de un agente."""
+        with self._lock:
+            self._entries.pop(agent_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del registro: aciertos, compilaciones y tamaño."""
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+
+# Registro compartido por el proceso
+prompt_registry = PromptRegistry()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
@@ -16,6 +16,7 @@ class AgentBase(BaseModel):
     name: str
     description: str
     configuration: Dict[str, Any] = {}
+    token_budget: Optional[int] = None
 
 class AgentCreate(AgentBase):
     pass
@@ -25,17 +26,58 @@ class AgentUpdate(BaseModel):
     description: Optional[str] = None
     status: Optional[str] = None
     configuration: Optional[Dict[str, Any]] = None
+    token_budget: Optional[int] = None
 
 class AgentResponse(AgentBase):
     id: int
     status: str
     owner_id: int
+    version: int = 1
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
+def agent_etag(agent: models.Agent) -> str:
+    """ETag de la configuración de un agente (cambia con cada versión)."""
+    return f'"{agent.id}-{agent.version}"'
+
+def bump_version(db: Session, agent: models.Agent) -> None:
+    """Incrementa la versión del agente en la base de datos (sin perder incrementos concurrentes)."""
+    agent.version = models.Agent.version + 1
+    db.commit()
+    db.refresh(agent)
+
+def etag_version(etag: str, agent_id: int) -> Optional[int]:
+    """Versión del agente contenida en un ETag, o None si el ETag no es de ese agente."""
+    prefix = f'"{agent_id}-'
+    if not (etag.startswith(prefix) and etag.endswith('"')):
+        return None
+    try:
+        return int(etag[len(prefix):-1])
+    except ValueError:
+        return None
+
+def update_agent_if_version(db: Session, agent_id: int, values: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+    """Actualiza un agente e incrementa su versión en una única sentencia UPDATE
+    
+    Con expected_version, la actualización solo se aplica si el agente sigue en
+    esa versión, de modo que la comprobación y la escritura son atómicas.
+    
+    Returns:
+        True si se actualizó el agente, False si su versión ya no era expected_version
+    """
+    query = db.query(models.Agent).filter(models.Agent.id == agent_id)
+    if expected_version is not None:
+        query = query.filter(models.Agent.version == expected_version)
+    updated = query.update({**values, models.Agent.version: models.Agent.version + 1}, synchronize_session=False)
+    if updated == 0:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
 # Rutas
 @router.post("/", response_model=AgentResponse, status_code=status.HTTP_201_CREATED)
 async def create_agent(agent: AgentCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -44,6 +86,7 @@ async def create_agent(agent: AgentCreate, db: Session = Depends(get_db), curren
         name=agent.name,
         description=agent.description,
         configuration=agent.configuration,
+        token_budget=agent.token_budget,
         owner_id=current_user.id
     )
     db.add(db_agent)
@@ -61,7 +104,7 @@ async def read_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get
     return agents
 
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def read_agent(agent_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+async def read_agent(agent_id: int, response: Response, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     db_agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent not found")
@@ -70,10 +113,16 @@ async def read_agent(agent_id: int, db: Session = Depends(get_db), current_user:
     if not current_user.is_admin and db_agent.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    # Si el cliente ya tiene esta versión, no reenviar la configuración
+    etag = agent_etag(db_agent)
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
     return db_agent
 
 @router.put("/{agent_id}", response_model=AgentResponse)
-async def update_agent(agent_id: int, agent: AgentUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+async def update_agent(agent_id: int, agent: AgentUpdate, response: Response, if_match: Optional[str] = Header(None), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     db_agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent not found")
@@ -82,6 +131,13 @@ async def update_agent(agent_id: int, agent: AgentUpdate, db: Session = Depends(
     if not current_user.is_admin and db_agent.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    # Con If-Match, la actualización solo se aplica si el agente sigue en la versión que leyó el cliente
+    expected_version = None
+    if if_match is not None and if_match != "*":
+        expected_version = etag_version(if_match, agent_id)
+        if expected_version is None:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Agent was modified by another request")
+    
     # Actualizar campos si están presentes en la solicitud
     update_data = agent.dict(exclude_unset=True)
     
@@ -92,11 +148,11 @@ async def update_agent(agent_id: int, agent: AgentUpdate, db: Session = Depends(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid status value")
     
-    for key, value in update_data.items():
-        setattr(db_agent, key, value)
-    
-    db.commit()
+    # Nueva versión: los workers de agentes recargan la configuración al detectarla
+    if not update_agent_if_version(db, agent_id, update_data, expected_version):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Agent was modified by another request")
     db.refresh(db_agent)
+    response.headers["ETag"] = agent_etag(db_agent)
     return db_agent
 
 @router.delete("/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -124,8 +180,7 @@ async def activate_agent(agent_id: int, db: Session = Depends(get_db), current_u
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     db_agent.status = models.AgentStatus.ACTIVE
-    db.commit()
-    db.refresh(db_agent)
+    bump_version(db, db_agent)
     return db_agent
 
 @router.post("/{agent_id}/deactivate", response_model=AgentResponse)
@@ -139,8 +194,7 @@ async def deactivate_agent(agent_id: int, db: Session = Depends(get_db), current
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     db_agent.status = models.AgentStatus.INACTIVE
-    db.commit()
-    db.refresh(db_agent)
+    bump_version(db, db_agent)
     return db_agent
 
 @router.get("/{agent_id}/performance", response_model=List[Dict[str, Any]])
@@ -21,6 +21,7 @@ class CampaignBase(BaseModel):
     target_audience: Dict[str, Any] = {}
     message_template: str
     agent_id: int
+    token_budget: Optional[int] = None
 
 class CampaignCreate(CampaignBase):
     pass
@@ -35,6 +36,7 @@ class CampaignUpdate(BaseModel):
     target_audience: Optional[Dict[str, Any]] = None
     message_template: Optional[str] = None
     agent_id: Optional[int] = None
+    token_budget: Optional[int] = None
 
 class CampaignResponse(CampaignBase):
     id: int
@@ -84,6 +86,7 @@ async def create_campaign(campaign: CampaignCreate, db: Session = Depends(get_db
         target_audience=campaign.target_audience,
         message_template=campaign.message_template,
         agent_id=campaign.agent_id,
+        token_budget=campaign.token_budget,
         creator_id=current_user.id,
         status=models.CampaignStatus.DRAFT
     )
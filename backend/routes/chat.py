@@ -8,7 +8,9 @@ import logging
 from database import get_db
 import models
 from routes.users import get_current_active_user
-from gpt_config import generate_text
+from gpt_config import generate_text_with_usage, get_selected_backend
+from usage_recorder import usage_recorder, BUDGET_DEGRADED_MAX_TOKENS
+from prompt_registry import prompt_registry
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +22,9 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     agent_id: int
     message: str
+    campaign_id: Optional[int] = None
     context: Optional[Dict[str, Any]] = None
+    conversation_id: Optional[str] = None  # Por defecto, una conversación por usuario y agente
 
 class ChatResponse(BaseModel):
     response: str
@@ -45,23 +49,32 @@ async def test_chat(
     if not current_user.is_admin and agent.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    # Verificar la campaña asociada, si se indica
+    campaign = None
+    if request.campaign_id is not None:
+        campaign = db.query(models.Campaign).filter(models.Campaign.id == request.campaign_id).first()
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+    
     try:
-        # Construir el prompt para el modelo
-        prompt = f"""Eres un agente virtual de ventas de créditos llamado {agent.name}.
-        
-        Información del agente:
-        {agent.description}
-        
-        Configuración adicional:
-        {agent.configuration}
+        # Verificar presupuestos de tokens; si están agotados, el mismo backend responde con menos tokens
+        budget = usage_recorder.check_budget(db, agent, campaign)
+        max_tokens = BUDGET_DEGRADED_MAX_TOKENS if budget["exhausted"] else None
         
-        Mensaje del cliente: {request.message}
-        
-        Responde de manera amable, profesional y concisa. Proporciona información precisa sobre los productos de crédito y ayuda al cliente a resolver sus dudas.
-        """
+        # Renderizar el prompt (la parte fija se compila una vez por versión del agente)
+        prompt, prompt_tokens = prompt_registry.render(agent, request.message)
         
         # Generar respuesta usando el modelo
-        response_text = generate_text(prompt)
+        conversation_id = request.conversation_id or f"{agent.id}:{current_user.id}"
+        response_text, usage = generate_text_with_usage(
+            prompt,
+            max_tokens=max_tokens,
+            prompt_tokens=prompt_tokens,
+            conversation_id=conversation_id
+        )
+        
+        # Registrar el consumo de tokens (se persiste por lotes)
+        usage_recorder.record(agent.id, usage, campaign_id=request.campaign_id, model=get_selected_backend())
         
         # Registrar la interacción para análisis (opcional)
         # Esto podría usarse para mejorar el modelo en el futuro
@@ -71,8 +84,9 @@ async def test_chat(
             metadata={
                 "agent_id": agent.id,
                 "agent_name": agent.name,
-                "prompt_tokens": len(prompt.split()),
-                "response_tokens": len(response_text.split()),
+                "prompt_tokens": usage["prompt_tokens"],
+                "response_tokens": usage["completion_tokens"],
+                "budget_exhausted": budget["exhausted"],
             }
         )
     
@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, Union
+from pydantic import BaseModel, conint
+import json
+import numpy as np
+
+# Importaciones internas
+import models
+from routes.users import get_current_active_user
+from loan_engine import (
+    STANDARD_TERMS,
+    GRID_FIELDS,
+    MAX_OFFERS,
+    MAX_TERM_MONTHS,
+    MAX_VALID_ANNUAL_RATE,
+    offer_grid,
+    best_offers,
+    rate_range,
+    monthly_payments,
+    iter_schedule_rows,
+    schedule_page,
+    columnar_schedules
+)
+
+router = APIRouter()
+
+# Filas máximas por lote columnar (los límites de plazo, tasa y escenarios están en loan_engine)
+MAX_BATCH_SCHEDULE_ROWS = 500000
+
+# Modelos Pydantic para validación de datos
+class OfferGridRequest(BaseModel):
+    amounts: List[float]
+    terms: List[int] = list(STANDARD_TERMS)
+    rates: Optional[List[float]] = None  # Por defecto, de 12% a 35% en pasos de rate_step
+    rate_step: float = 1.0
+    max_monthly_payment: Optional[float] = None
+    sort_by: str = "total_interest"
+    limit: conint(ge=1, le=MAX_OFFERS) = 10
+    include_grid: bool = False
+
+class OfferGridResponse(BaseModel):
+    scenarios: int
+    offers: List[Dict[str, Any]]
+    grid: Optional[Dict[str, List[float]]] = None
+
+class LoanScenario(BaseModel):
+    amount: float
+    term_months: int
+    annual_rate: float
+
+class ScheduleBatchRequest(BaseModel):
+    loans: List[LoanScenario]
+
+class SchedulePageResponse(BaseModel):
+    loan_details: Dict[str, Any]
+    page: int
+    page_size: int
+    total_rows: int
+    total_pages: int
+    rows: List[Dict[str, Any]]
+
+def _validate_loan(amount: float, term_months: int, annual_rate: float) -> None:
+    """Valida un escenario de préstamo para las tablas de amortización"""
+    if amount <= 0 or term_months <= 0 or term_months > MAX_TERM_MONTHS or annual_rate < 0 or annual_rate > MAX_VALID_ANNUAL_RATE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"amount must be positive, term_months between 1 and {MAX_TERM_MONTHS} and annual_rate between 0 and {MAX_VALID_ANNUAL_RATE:g}"
+        )
+
+# Rutas
+@router.post("/offer-grid", response_model=OfferGridResponse)
+async def calculate_offer_grid(request: OfferGridRequest, current_user: models.User = Depends(get_current_active_user)):
+    """
+    Calcula en una sola llamada todos los escenarios monto x plazo x tasa y devuelve las mejores opciones.
+    Con include_grid=true también devuelve la rejilla completa en formato columnar (una lista por campo).
+    """
+    try:
+        rates = request.rates if request.rates is not None else rate_range(step=request.rate_step)
+        # offer_grid valida montos, plazos, tasas y tamaño (loan_engine.validate_grid) antes de reservar memoria
+        grid = offer_grid(request.amounts, request.terms, rates)
+        offers = best_offers(grid, max_monthly_payment=request.max_monthly_payment, sort_by=request.sort_by, limit=request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    scenarios = int(grid["monthly_payment"].size)
+
+    columnar = None
+    if request.include_grid:
+        columnar = {field: np.round(np.ravel(grid[field]), 2).tolist() for field in GRID_FIELDS}
+
+    return {"scenarios": scenarios, "offers": offers, "grid": columnar}
+
+@router.get("/schedule", response_model=SchedulePageResponse)
+async def get_amortization_schedule(
+    amount: float,
+    term_months: int,
+    annual_rate: float,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(60, ge=1, le=MAX_TERM_MONTHS),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Devuelve una página de la tabla de amortización completa de un préstamo.
+    """
+    _validate_loan(amount, term_months, annual_rate)
+    payment = float(monthly_payments(amount, term_months, annual_rate))
+    try:
+        page_data = schedule_page(amount, term_months, annual_rate, page=page, page_size=page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "loan_details": {
+            "amount": amount,
+            "term_months": term_months,
+            "interest_rate": annual_rate,
+            "monthly_payment": round(payment, 2),
+            "total_payment": round(payment * term_months, 2),
+            "total_interest": round(payment * term_months - amount, 2)
+        },
+        **page_data
+    }
+
+@router.get("/schedule/stream")
+async def stream_amortization_schedule(
+    amount: float,
+    term_months: int,
+    annual_rate: float,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Transmite la tabla de amortización completa como NDJSON (una fila JSON por línea), calculada por bloques.
+    """
+    _validate_loan(amount, term_months, annual_rate)
+    rows = (json.dumps(row) + "\n" for row in iter_schedule_rows(amount, term_months, annual_rate))
+    return StreamingResponse(rows, media_type="application/x-ndjson")
+
+@router.post("/schedules/columnar", response_model=Dict[str, List[Union[int, float]]])
+async def batch_amortization_schedules(request: ScheduleBatchRequest, current_user: models.User = Depends(get_current_active_user)):
+    """
+    Calcula las tablas de amortización de muchos préstamos y las devuelve en formato columnar:
+    una lista por columna (loan, month, payment, principal, interest, remaining_balance);
+    loan y month son enteros.
+    """
+    if not request.loans:
+        raise HTTPException(status_code=400, detail="loans must not be empty")
+    for loan in request.loans:
+        _validate_loan(loan.amount, loan.term_months, loan.annual_rate)
+
+    total_rows = sum(loan.term_months for loan in request.loans)
+    if total_rows > MAX_BATCH_SCHEDULE_ROWS:
+        raise HTTPException(status_code=400, detail=f"Batch too large ({total_rows} rows, max {MAX_BATCH_SCHEDULE_ROWS})")
+
+    return columnar_schedules(
+        [loan.amount for loan in request.loans],
+        [loan.term_months for loan in request.loans],
+        [loan.annual_rate for loan in request.loans]
+    )
@@ -104,6 +104,72 @@ def test_update_agent(client, auth_headers, test_agent):
     assert data["temperature"] == update_data["temperature"]
     assert data["description"] == test_agent["description"]  # No debe cambiar
 
+def test_update_agent_bumps_version(client, auth_headers, test_agent):
+    """Prueba que cada actualización incrementa la versión y el ETag del agente"""
+    response = client.get(f"/api/agents/{test_agent['id']}", headers=auth_headers)
+    etag = response.headers["ETag"]
+    version = response.json()["version"]
+    
+    # Sin cambios, el cliente puede revalidar su copia con If-None-Match
+    response = client.get(f"/api/agents/{test_agent['id']}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    response = client.put(
+        f"/api/agents/{test_agent['id']}",
+        json={"configuration": {"template": "customer_support"}},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    
+    # Verificar respuesta
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["version"] == version + 1
+    assert response.headers["ETag"] != etag
+
+def test_update_agent_with_stale_etag(client, auth_headers, test_agent):
+    """Prueba que una actualización con un ETag antiguo se rechaza"""
+    etag = client.get(f"/api/agents/{test_agent['id']}", headers=auth_headers).headers["ETag"]
+    client.put(f"/api/agents/{test_agent['id']}", json={"name": "First Writer"}, headers=auth_headers)
+    
+    response = client.put(
+        f"/api/agents/{test_agent['id']}",
+        json={"name": "Second Writer"},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    
+    # Verificar respuesta
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    data = client.get(f"/api/agents/{test_agent['id']}", headers=auth_headers).json()
+    assert data["name"] == "First Writer"
+
+def test_update_agent_if_version_is_atomic(db, test_user):
+    """Prueba que la actualización condicional no sobrescribe un cambio concurrente"""
+    from models import Agent
+    from routes.agents import update_agent_if_version
+    
+    agent = Agent(name="Agent", description="Agent", owner_id=test_user.id)
+    db.add(agent)
+    db.commit()
+    db.refresh(agent)
+    version = agent.version
+    
+    # Otro escritor actualiza el agente después de que el cliente leyera la versión
+    assert update_agent_if_version(db, agent.id, {"name": "First Writer"}, expected_version=version)
+    assert not update_agent_if_version(db, agent.id, {"name": "Second Writer"}, expected_version=version)
+    
+    db.refresh(agent)
+    assert agent.name == "First Writer"
+    assert agent.version == version + 1
+
+def test_update_agent_with_foreign_etag(client, auth_headers, test_agent):
+    """Prueba que un ETag que no corresponde al agente se rechaza"""
+    response = client.put(
+        f"/api/agents/{test_agent['id']}",
+        json={"name": "Writer"},
+        headers={**auth_headers, "If-Match": '"999-1"'}
+    )
+    
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
 def test_delete_agent(client, auth_headers, test_agent):
     """Prueba la eliminación de un agente"""
     # Enviar solicitud para eliminar agente
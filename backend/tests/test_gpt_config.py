@@ -234,4 +234,179 @@ def test_generate_text_openai(mock_get_client):
     assert kwargs["messages"][1]["content"] == "Hola, ¿cómo estás?"
     
     # Verificar el resultado
-    assert result == "Esta es una respuesta de OpenAI."
\ No newline at end of file
+    assert result == "Esta es una respuesta de OpenAI."
+
+
+# Pruebas para el cliente LLM compartido
+def test_get_llm_client_is_cached():
+    """Prueba que get_llm_client reutiliza el cliente entre llamadas."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    mock_client = MagicMock()
+    with patch.object(gpt_config, "_create_llm_client", return_value=(mock_client, "openai")) as mock_create, \
+         patch.object(gpt_config, "_start_health_checks"):
+        first = gpt_config.get_llm_client()
+        second = gpt_config.get_llm_client()
+    
+    # Verificar que el cliente se creó una sola vez
+    assert first is mock_client
+    assert second is mock_client
+    mock_create.assert_called_once()
+    assert gpt_config.get_selected_backend() == "openai"
+
+
+def test_reset_llm_client():
+    """Prueba que reset_llm_client fuerza la creación de un nuevo cliente."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    first_client = MagicMock()
+    second_client = MagicMock()
+    with patch.object(gpt_config, "_create_llm_client", side_effect=[(first_client, "openai"), (second_client, "gpt-oss-20b")]), \
+         patch.object(gpt_config, "_start_health_checks"):
+        assert gpt_config.get_llm_client() is first_client
+        gpt_config.reset_llm_client()
+        assert gpt_config.get_selected_backend() is None
+        assert gpt_config.get_llm_client() is second_client
+    
+    assert gpt_config.get_selected_backend() == "gpt-oss-20b"
+
+
+def test_health_check_keeps_healthy_client():
+    """Prueba que el health check no vuelve a crear un cliente sano."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    gpt_oss_client = MagicMock()
+    gpt_oss_client.health_check.return_value = True
+    with patch.object(gpt_config, "_create_llm_client", return_value=(gpt_oss_client, "gpt-oss-20b")) as mock_create, \
+         patch.object(gpt_config, "_start_health_checks"):
+        assert gpt_config.get_llm_client() is gpt_oss_client
+        gpt_config.run_health_check()
+    
+    gpt_oss_client.health_check.assert_called_once()
+    mock_create.assert_called_once()
+    assert gpt_config.get_llm_client() is gpt_oss_client
+
+
+def test_health_check_replaces_unhealthy_client():
+    """Prueba que el health check reemplaza el cliente de gpt-oss-20b cuando ninguna réplica responde."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    unhealthy_client = MagicMock()
+    unhealthy_client.health_check.return_value = False
+    openai_client = MagicMock()
+    with patch.object(gpt_config, "_create_llm_client", side_effect=[(unhealthy_client, "gpt-oss-20b"), (openai_client, "openai")]), \
+         patch.object(gpt_config, "_start_health_checks"):
+        assert gpt_config.get_llm_client() is unhealthy_client
+        gpt_config.run_health_check()
+    
+    assert gpt_config.get_llm_client() is openai_client
+    assert gpt_config.get_selected_backend() == "openai"
+
+
+def test_health_check_leaves_fallback_when_gpt_oss_returns():
+    """Prueba que un cliente en fallback a OpenAI vuelve a gpt-oss-20b solo cuando está disponible."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    openai_client = MagicMock()
+    gpt_oss_client = MagicMock()
+    with patch.object(gpt_config, "_create_llm_client", side_effect=[(openai_client, "openai"), (gpt_oss_client, "gpt-oss-20b")]) as mock_create, \
+         patch.object(gpt_config, "is_gpt_oss_available", side_effect=[False, True]), \
+         patch.object(gpt_config, "_start_health_checks"):
+        assert gpt_config.get_llm_client() is openai_client
+        gpt_config.run_health_check()
+        assert mock_create.call_count == 1
+        gpt_config.run_health_check()
+    
+    assert gpt_config.get_llm_client() is gpt_oss_client
+    assert gpt_config.get_selected_backend() == "gpt-oss-20b"
+
+
+def test_reset_llm_client_stops_health_checks():
+    """Prueba que reset_llm_client detiene el hilo de health checks."""
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    with patch.object(gpt_config, "LLM_HEALTH_CHECK_INTERVAL", 0.01), \
+         patch.object(gpt_config, "_create_llm_client", return_value=(MagicMock(), "gpt-oss-20b")):
+        gpt_config.get_llm_client()
+        thread = gpt_config._health_thread
+        assert thread.is_alive()
+        gpt_config.reset_llm_client()
+        thread.join(timeout=1)
+    
+    assert not thread.is_alive()
+    assert gpt_config._health_thread is None
+
+
+def test_health_loop_reinstates_ejected_replica():
+    """Prueba que el hilo de health checks reincorpora una réplica expulsada del cliente en uso y lee su cola de /health."""
+    import sys
+    import time
+    import importlib
+    import gpt_config
+    importlib.reload(gpt_config)
+    
+    # Cliente de réplicas del servicio gpt-oss-20b de este repositorio
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "gpt-oss-20b")))
+    from gpt_oss_client import GPTOSSClient
+    
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"], max_failures=1, eject_seconds=3600)
+    ejected = client.replicas[0]
+    client._release_replica(client._select_replica(), success=False)
+    assert not ejected.healthy
+    
+    health_response = MagicMock(status_code=200)
+    health_response.json.return_value = {"status": "ok", "queue_depth": 2}
+    with patch.object(gpt_config, "LLM_HEALTH_CHECK_INTERVAL", 0.01), \
+         patch.object(gpt_config, "_create_llm_client", return_value=(client, "gpt-oss-20b")) as mock_create, \
+         patch("requests.get", return_value=health_response):
+        assert gpt_config.get_llm_client() is client
+        deadline = time.monotonic() + 2
+        while not ejected.healthy and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gpt_config.reset_llm_client()
+    
+    assert ejected.healthy
+    assert ejected.queue_depth == 2
+    mock_create.assert_called_once()
+
+
+@patch('gpt_config.get_llm_client')
+def test_generate_text_with_usage(mock_get_client):
+    """Prueba que generate_text_with_usage retorna el consumo de tokens reportado."""
+    mock_client = MagicMock()
+    mock_response = MagicMock()
+    mock_response.text = "Respuesta con consumo."
+    mock_response.usage = {"prompt_tokens": 12, "completion_tokens": 4, "total_tokens": 16}
+    mock_client.generate.return_value = mock_response
+    mock_get_client.return_value = mock_client
+    
+    from gpt_config import generate_text_with_usage
+    text, usage = generate_text_with_usage("Hola")
+    
+    assert text == "Respuesta con consumo."
+    assert usage == {"prompt_tokens": 12, "completion_tokens": 4, "total_tokens": 16}
+
+
+@patch('gpt_config.get_llm_client')
+def test_generate_text_with_usage_passes_conversation_id(mock_get_client):
+    """Prueba que el ID de conversación llega al cliente de gpt-oss-20b para la afinidad de réplica."""
+    mock_client = MagicMock()
+    mock_client.generate.return_value = MagicMock(text="Hola", usage=None)
+    mock_get_client.return_value = mock_client
+    
+    from gpt_config import generate_text_with_usage
+    generate_text_with_usage("Hola", conversation_id="7:1")
+    
+    assert mock_client.generate.call_args.kwargs["conversation_id"] == "7:1"
@@ -0,0 +1,220 @@
+import pytest
+import numpy as np
+from fastapi import status
+
+from loan_engine import (
+    STANDARD_TERMS,
+    MAX_OFFERS,
+    MAX_TERM_MONTHS,
+    MAX_GRID_SCENARIOS,
+    offer_grid,
+    best_offers,
+    amortization_schedules,
+    monthly_payments,
+    rate_range,
+    simulate_loan_scalar,
+    iter_schedule_rows,
+    schedule_page,
+    columnar_schedules
+)
+
+# Pruebas para el motor vectorizado de préstamos
+
+def test_offer_grid_matches_scalar_calculation():
+    """Prueba que cada escenario de la rejilla coincide con el cálculo escalar"""
+    amounts = [5000, 50000, 500000]
+    rates = [0, 12, 18.5, 35]
+    grid = offer_grid(amounts, STANDARD_TERMS, rates)
+
+    assert grid["monthly_payment"].shape == (3, len(STANDARD_TERMS), 4)
+    for i, amount in enumerate(amounts):
+        for j, term in enumerate(STANDARD_TERMS):
+            for k, rate in enumerate(rates):
+                expected = simulate_loan_scalar(amount, term, rate)
+                assert grid["monthly_payment"][i, j, k] == pytest.approx(expected["monthly_payment"])
+                assert grid["total_interest"][i, j, k] == pytest.approx(expected["total_interest"], abs=1e-6)
+
+def test_rate_range_covers_policy_rates():
+    """Prueba el rango de tasas por defecto (12% a 35%)"""
+    rates = rate_range(step=0.5)
+    assert rates[0] == 12.0
+    assert rates[-1] == 35.0
+    assert len(rates) == 47
+
+def test_best_offers_respects_max_payment():
+    """Prueba que las mejores opciones respetan la cuota máxima y el orden"""
+    grid = offer_grid([50000], STANDARD_TERMS)
+    offers = best_offers(grid, max_monthly_payment=3000, sort_by="total_interest", limit=3)
+
+    assert len(offers) == 3
+    assert all(offer["monthly_payment"] <= 3000 for offer in offers)
+    interests = [offer["total_interest"] for offer in offers]
+    assert interests == sorted(interests)
+
+    with pytest.raises(ValueError):
+        best_offers(grid, sort_by="unknown")
+
+def test_best_offers_rejects_invalid_limit():
+    """Prueba que un límite fuera de rango no recorta la lista desde el final"""
+    grid = offer_grid([50000], STANDARD_TERMS)
+
+    for limit in (-1, 0, MAX_OFFERS + 1):
+        with pytest.raises(ValueError):
+            best_offers(grid, limit=limit)
+    assert len(best_offers(grid, limit=MAX_OFFERS)) == MAX_OFFERS
+
+def test_offer_grid_rejects_out_of_range_axes():
+    """Prueba que la rejilla rechaza plazos, tasas y montos fuera de rango en lugar de calcular inf o NaN"""
+    invalid = [
+        ([50000], [0], [12]),
+        ([50000], [-12], [12]),
+        ([50000], [MAX_TERM_MONTHS + 1], [12]),
+        ([50000], [12.5], [12]),
+        ([50000], [12], [-1]),
+        ([50000], [12], [101]),
+        ([50000], [12], [float("nan")]),
+        ([0], [12], [12]),
+        ([], [12], [12])
+    ]
+    for amounts, terms, rates in invalid:
+        with pytest.raises(ValueError):
+            offer_grid(amounts, terms, rates)
+
+def test_offer_grid_rejects_oversized_grid():
+    """Prueba que una rejilla mayor que MAX_GRID_SCENARIOS se rechaza antes de reservar memoria"""
+    amounts = list(range(1, MAX_GRID_SCENARIOS // len(STANDARD_TERMS) + 2))
+
+    with pytest.raises(ValueError, match=str(MAX_GRID_SCENARIOS)):
+        offer_grid(amounts, STANDARD_TERMS, [12])
+    with pytest.raises(ValueError):
+        rate_range(step=1e-9)
+    with pytest.raises(ValueError):
+        rate_range(step=0)
+
+def test_amortization_schedules_full_term():
+    """Prueba que las tablas de amortización cubren todo el plazo y saldan el préstamo"""
+    schedules = amortization_schedules([10000, 5000], [60, 6], [12.5, 0])
+
+    assert schedules["payment"].shape == (2, 60)
+    # El saldo llega a cero en el último mes de cada préstamo
+    assert schedules["remaining_balance"][0, 59] == pytest.approx(0, abs=1e-6)
+    assert schedules["remaining_balance"][1, 5] == pytest.approx(0, abs=1e-6)
+    # Los meses posteriores al plazo no tienen valores
+    assert np.isnan(schedules["payment"][1, 6:]).all()
+    # Capital pagado = monto; intereses = costo total del escalar
+    assert np.nansum(schedules["principal"][0]) == pytest.approx(10000)
+    assert np.nansum(schedules["interest"][0]) == pytest.approx(simulate_loan_scalar(10000, 60, 12.5)["total_interest"])
+    assert schedules["payment"][0, 0] == pytest.approx(monthly_payments(10000, 60, 12.5))
+
+def test_iter_schedule_rows_matches_batch_schedule():
+    """Prueba que la tabla calculada por bloques coincide con la tabla completa"""
+    rows = list(iter_schedule_rows(250000, 360, 14, chunk_size=50))
+    full = amortization_schedules([250000], [360], [14])
+
+    assert len(rows) == 360
+    assert [row["month"] for row in rows] == list(range(1, 361))
+    assert rows[199]["principal"] == pytest.approx(full["principal"][0, 199], abs=0.01)
+    assert rows[-1]["remaining_balance"] == pytest.approx(0, abs=0.01)
+
+def test_schedule_page():
+    """Prueba la paginación de la tabla de amortización"""
+    rows = list(iter_schedule_rows(10000, 60, 12.5))
+    page = schedule_page(10000, 60, 12.5, page=3, page_size=25)
+
+    assert page["total_rows"] == 60
+    assert page["total_pages"] == 3
+    assert page["rows"] == rows[50:]
+    assert schedule_page(10000, 60, 12.5, page=4, page_size=25)["rows"] == []
+
+    with pytest.raises(ValueError):
+        schedule_page(10000, 60, 12.5, page=0)
+
+def test_columnar_schedules():
+    """Prueba la salida columnar de tablas de varios préstamos"""
+    columns = columnar_schedules([1000, 5000], [3, 60], [12, 0])
+
+    assert set(columns) == {"loan", "month", "payment", "principal", "interest", "remaining_balance"}
+    assert len(columns["month"]) == 63
+    assert columns["loan"][:4] == [0, 0, 0, 1]
+    assert columns["month"][3] == 1
+    assert columns["interest"][3:] == [0.0] * 60
+
+def test_offer_grid_endpoint(client, auth_headers):
+    """Prueba el endpoint de rejilla de ofertas"""
+    response = client.post(
+        "/api/loans/offer-grid",
+        json={"amounts": [50000, 100000], "max_monthly_payment": 5000, "limit": 5, "include_grid": True},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["scenarios"] == 2 * len(STANDARD_TERMS) * 24
+    assert len(data["offers"]) == 5
+    assert all(offer["monthly_payment"] <= 5000 for offer in data["offers"])
+    assert len(data["grid"]["monthly_payment"]) == data["scenarios"]
+
+def test_offer_grid_endpoint_rejects_large_grid(client, auth_headers):
+    """Prueba que se rechazan rejillas demasiado grandes"""
+    response = client.post(
+        "/api/loans/offer-grid",
+        json={"amounts": list(range(1000, 101000, 10)), "rate_step": 0.1},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_schedule_endpoint_returns_full_term(client, auth_headers):
+    """Prueba que el endpoint de tabla de amortización pagina todo el plazo"""
+    response = client.get(
+        "/api/loans/schedule",
+        params={"amount": 10000, "term_months": 60, "annual_rate": 12.5, "page": 2, "page_size": 36},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total_pages"] == 2
+    assert len(data["rows"]) == 24
+    assert data["rows"][-1]["month"] == 60
+
+def test_offer_grid_endpoint_rejects_terms_above_max(client, auth_headers):
+    """Prueba que el plazo máximo de la rejilla de ofertas es MAX_TERM_MONTHS"""
+    from routes.loans import MAX_TERM_MONTHS
+
+    response = client.post(
+        "/api/loans/offer-grid",
+        json={"amounts": [10000], "terms": [MAX_TERM_MONTHS + 1], "rates": [12]},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert str(MAX_TERM_MONTHS) in response.json()["detail"]
+
+def test_offer_grid_endpoint_rejects_negative_limit(client, auth_headers):
+    """Prueba que el endpoint de ofertas valida el límite"""
+    response = client.post(
+        "/api/loans/offer-grid",
+        json={"amounts": [10000], "limit": -1},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_columnar_schedules_endpoint_keeps_integer_columns(client, auth_headers):
+    """Prueba que las columnas loan y month del lote columnar se devuelven como enteros"""
+    response = client.post(
+        "/api/loans/schedules/columnar",
+        json={"loans": [
+            {"amount": 10000, "term_months": 2, "annual_rate": 12},
+            {"amount": 5000, "term_months": 3, "annual_rate": 0}
+        ]},
+        headers=auth_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["loan"] == [0, 0, 1, 1, 1]
+    assert data["month"] == [1, 2, 1, 2, 3]
+    assert all(isinstance(value, int) for value in data["loan"] + data["month"])
+    assert isinstance(data["payment"][0], float)
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from prompt_registry import PromptRegistry, compile_chat_prompt, count_tokens
+
+# Pruebas para el registro de prompts compilados
+
+def make_agent(agent_id=1, version=1, **configuration):
+    """Crea un agente mínimo con los atributos que usa el registro"""
+    return SimpleNamespace(
+        id=agent_id,
+        name="Agente Prueba",
+        description="Agente de créditos personales",
+        configuration=configuration or {"producto": "personal", "tasa": 12.5},
+        version=version
+    )
+
+def test_render_matches_full_prompt_tokens():
+    """Prueba que el recuento cacheado coincide con tokenizar el prompt completo"""
+    compiled = compile_chat_prompt(make_agent())
+    prompt, tokens = compiled.render("  Quiero un préstamo de 5000 a 12 meses  ")
+
+    assert "Agente Prueba" in prompt
+    assert '"producto": "personal"' in prompt
+    assert "Quiero un préstamo de 5000 a 12 meses\n" in prompt
+    assert tokens == count_tokens(prompt)
+
+def test_registry_compiles_once_per_version():
+    """Prueba que el prompt se compila una vez por versión del agente"""
+    calls = []
+    def compiler(agent):
+        calls.append(agent.id)
+        return compile_chat_prompt(agent)
+    registry = PromptRegistry(compiler=compiler)
+    agent = make_agent()
+
+    registry.render(agent, "Hola")
+    registry.render(agent, "¿Qué tasa tienen?")
+    assert calls == [1]
+
+    # Una actualización del agente cambia su versión y recompila el prompt
+    agent.version = 2
+    agent.configuration = {"producto": "vehicular"}
+    prompt, _ = registry.render(agent, "Hola")
+    assert calls == [1, 1]
+    assert "vehicular" in prompt
+    assert registry.stats() == {"size": 1, "hits": 1, "misses": 2}
+
+def test_registry_evicts_least_recently_used():
+    """Prueba el límite de agentes con prompt compilado"""
+    registry = PromptRegistry(max_size=2)
+    first, second, third = make_agent(1), make_agent(2), make_agent(3)
+
+    registry.get(first)
+    registry.get(second)
+    registry.get(first)
+    registry.get(third)
+
+    assert registry.stats()["size"] == 2
+    registry.get(first)
+    registry.get(second)
+    assert registry.stats()["misses"] == 4
@@ -0,0 +1,179 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+import models
+from usage_recorder import UsageRecorder
+
+# Pruebas para el registro de consumo de tokens
+
+@pytest.fixture
+def usage_agent(db):
+    """Fixture para crear un agente con presupuesto de tokens"""
+    agent = models.Agent(name="Budget Agent", description="Agent with budget", configuration={}, token_budget=100)
+    db.add(agent)
+    db.commit()
+    db.refresh(agent)
+    return agent
+
+@pytest.fixture
+def recorder(db):
+    """Fixture para crear un registro que usa la sesión de prueba"""
+    return UsageRecorder(session_factory=sessionmaker(bind=db.get_bind()), flush_interval=0, max_pending=1000)
+
+def test_record_buffers_until_flush(db, usage_agent, recorder):
+    """Prueba que el consumo se acumula en memoria y se persiste agregado"""
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    recorder.record(usage_agent.id, usage, model="gpt-oss-20b")
+    recorder.record(usage_agent.id, usage, model="gpt-oss-20b")
+    
+    # Nada se persiste antes del volcado
+    assert db.query(models.TokenUsage).count() == 0
+    
+    assert recorder.flush() == 1
+    row = db.query(models.TokenUsage).one()
+    assert row.agent_id == usage_agent.id
+    assert row.requests == 2
+    assert row.prompt_tokens == 20
+    assert row.completion_tokens == 10
+    assert row.total_tokens == 30
+    
+    # Un segundo volcado acumula sobre la misma fila
+    recorder.record(usage_agent.id, usage, model="gpt-oss-20b")
+    recorder.flush()
+    db.expire_all()
+    row = db.query(models.TokenUsage).one()
+    assert row.requests == 3
+    assert row.total_tokens == 45
+
+def test_record_flushes_when_buffer_is_full(db, usage_agent):
+    """Prueba el volcado automático al superar el máximo de llamadas pendientes"""
+    recorder = UsageRecorder(session_factory=sessionmaker(bind=db.get_bind()), flush_interval=0, max_pending=2)
+    usage = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    
+    recorder.record(usage_agent.id, usage)
+    assert db.query(models.TokenUsage).count() == 0
+    recorder.record(usage_agent.id, usage)
+    assert db.query(models.TokenUsage).count() == 1
+
+def test_check_budget(db, usage_agent, recorder):
+    """Prueba el control de presupuesto con consumo persistido y pendiente"""
+    assert recorder.check_budget(db, usage_agent)["exhausted"] == False
+    
+    recorder.record(usage_agent.id, {"prompt_tokens": 40, "completion_tokens": 20, "total_tokens": 60})
+    recorder.flush()
+    budget = recorder.check_budget(db, usage_agent)
+    assert budget["agent_tokens"] == 60
+    assert budget["exhausted"] == False
+    
+    # El consumo pendiente de volcar también cuenta
+    recorder.record(usage_agent.id, {"prompt_tokens": 30, "completion_tokens": 10, "total_tokens": 40})
+    budget = recorder.check_budget(db, usage_agent)
+    assert budget["agent_tokens"] == 100
+    assert budget["exhausted"] == True
+
+def test_check_budget_campaign(db, usage_agent, recorder):
+    """Prueba el presupuesto de tokens de una campaña"""
+    campaign = models.Campaign(
+        name="Budget Campaign",
+        description="Campaign with budget",
+        campaign_type=models.CampaignType.WHATSAPP,
+        message_template="Hola",
+        agent_id=usage_agent.id,
+        token_budget=50
+    )
+    db.add(campaign)
+    db.commit()
+    db.refresh(campaign)
+    usage_agent.token_budget = None
+    
+    recorder.record(usage_agent.id, {"prompt_tokens": 30, "completion_tokens": 30, "total_tokens": 60}, campaign_id=campaign.id)
+    budget = recorder.check_budget(db, usage_agent, campaign)
+    assert budget["campaign_tokens"] == 60
+    assert budget["exhausted"] == True
+
+def test_flush_error_keeps_usage_in_memory(db, usage_agent, recorder):
+    """Prueba que un error al persistir no pierde el consumo acumulado"""
+    recorder.record(usage_agent.id, {"prompt_tokens": 5, "completion_tokens": 5, "total_tokens": 10})
+    
+    with patch("sqlalchemy.orm.Session.commit", side_effect=Exception("Base de datos no disponible")):
+        assert recorder.flush() == 0
+    
+    assert recorder.flush() == 1
+    assert db.query(models.TokenUsage).one().total_tokens == 10
+
+def test_flushes_from_several_workers_add_up(db, usage_agent):
+    """Prueba que los volcados de varios workers suman sobre la misma fila del periodo"""
+    session_factory = sessionmaker(bind=db.get_bind())
+    workers = [UsageRecorder(session_factory=session_factory, flush_interval=0, max_pending=1000) for _ in range(3)]
+    usage = {"prompt_tokens": 4, "completion_tokens": 1, "total_tokens": 5}
+
+    # Sin campaña ni modelo: los nulos también identifican un único periodo
+    for recorder in workers:
+        recorder.record(usage_agent.id, usage)
+        recorder.record(usage_agent.id, usage)
+    for recorder in workers:
+        assert recorder.flush() == 1
+
+    row = db.query(models.TokenUsage).one()
+    assert row.requests == 6
+    assert row.total_tokens == 30
+    assert row.campaign_id is None and row.model is None
+
+def test_period_rows_are_unique(db, usage_agent):
+    """Prueba que la tabla no admite dos filas para el mismo periodo"""
+    from datetime import datetime
+    from sqlalchemy.exc import IntegrityError
+
+    day = datetime(2026, 10, 19)
+    db.add(models.TokenUsage(agent_id=usage_agent.id, date=day, total_tokens=1))
+    db.commit()
+    db.add(models.TokenUsage(agent_id=usage_agent.id, date=day, total_tokens=1))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_usage_without_agent_shares_one_period_row(db, usage_agent):
+    """Prueba que el consumo sin agente también suma sobre una única fila del periodo"""
+    session_factory = sessionmaker(bind=db.get_bind())
+    usage = {"prompt_tokens": 2, "completion_tokens": 1, "total_tokens": 3}
+
+    for _ in range(2):
+        recorder = UsageRecorder(session_factory=session_factory, flush_interval=0, max_pending=1000)
+        recorder.record(None, usage)
+        assert recorder.flush() == 1
+
+    row = db.query(models.TokenUsage).one()
+    assert row.agent_id is None
+    assert row.requests == 2
+    assert row.total_tokens == 6
+
+
+def test_get_usage_counts_batch_being_flushed(db, usage_agent, recorder):
+    """Prueba que el lote que se está volcando sigue contando para el presupuesto hasta confirmarse"""
+    import threading
+    import usage_recorder
+
+    assert recorder.get_usage(db, "agent", usage_agent.id) == 0
+    recorder.record(usage_agent.id, {"prompt_tokens": 30, "completion_tokens": 10, "total_tokens": 40})
+
+    writing, release = threading.Event(), threading.Event()
+    increment_usage = usage_recorder._increment_usage
+
+    def slow_increment(*args, **kwargs):
+        writing.set()
+        release.wait(5)
+        increment_usage(*args, **kwargs)
+
+    with patch("usage_recorder._increment_usage", side_effect=slow_increment):
+        flusher = threading.Thread(target=recorder.flush)
+        flusher.start()
+        assert writing.wait(5)
+        assert recorder.get_usage(db, "agent", usage_agent.id) == 40
+        release.set()
+        flusher.join(5)
+
+    assert recorder.get_usage(db, "agent", usage_agent.id) == 40
+    db.expire_all()
+    assert db.query(models.TokenUsage).one().total_tokens == 40
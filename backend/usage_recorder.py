@@ -0,0 +1,296 @@
+"""Registro del consumo de tokens del LLM y control de presupuestos."""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import func, and_, literal_column
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configuración del registro de consumo
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))  # segundos
+USAGE_FLUSH_MAX_PENDING = int(os.getenv("USAGE_FLUSH_MAX_PENDING", "500"))  # llamadas en memoria
+BUDGET_CACHE_TTL = float(os.getenv("BUDGET_CACHE_TTL", "60"))  # segundos
+# Degradación con el presupuesto agotado: el mismo backend responde con un máximo de tokens reducido
+# (no hay un modelo más barato al que desviar la llamada)
+BUDGET_DEGRADED_MAX_TOKENS = int(os.getenv("BUDGET_DEGRADED_MAX_TOKENS", "256"))
+
+
+def _start_of_day(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _start_of_month(now: datetime) -> datetime:
+    return _start_of_day(now).replace(day=1)
+
+
+_COUNTERS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _increment_usage(db: Session, agent_id: Optional[int], campaign_id: Optional[int], model: Optional[str], day: datetime, aggregate: Dict[str, int]) -> None:
+    """Suma un acumulado a la fila de su periodo en la base de datos, sin leerla antes
+
+    Varios workers vuelcan a la vez sobre las mismas filas, así que la suma se
+    hace en la base de datos: INSERT ... ON CONFLICT DO UPDATE sobre el índice
+    único uq_token_usage_period en PostgreSQL y SQLite, y UPDATE ... SET
+    total_tokens = total_tokens + :n (con INSERT si no hay fila) en los demás.
+    """
+    table = models.TokenUsage.__table__
+    values = {"agent_id": agent_id, "campaign_id": campaign_id, "model": model, "date": day, **aggregate}
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(**values)
+        db.execute(statement.on_conflict_do_update(
+            # Mismas expresiones que el índice (como literales: el destino del conflicto no admite parámetros)
+            index_elements=[func.coalesce(table.c.agent_id, literal_column("0")), func.coalesce(table.c.campaign_id, literal_column("0")),
+                            func.coalesce(table.c.model, literal_column("''")), table.c.date],
+            set_={**{field: table.c[field] + statement.excluded[field] for field in _COUNTERS}, "updated_at": func.now()}
+        ))
+        return
+
+    period = and_(
+        table.c.agent_id.is_(None) if agent_id is None else table.c.agent_id == agent_id,
+        table.c.campaign_id.is_(None) if campaign_id is None else table.c.campaign_id == campaign_id,
+        table.c.model.is_(None) if model is None else table.c.model == model,
+        table.c.date == day
+    )
+    increment = {field: table.c[field] + aggregate[field] for field in _COUNTERS}
+    if db.execute(table.update().where(period).values(**increment, updated_at=func.now())).rowcount == 0:
+        from sqlalchemy.exc import IntegrityError
+
+        try:
+            with db.begin_nested():
+                db.execute(table.insert().values(**values))
+        except IntegrityError:
+            # Otro worker creó la fila del periodo entre el UPDATE y el INSERT
+            db.execute(table.update().where(period).values(**increment, updated_at=func.now()))
+
+
+class UsageRecorder:
+    """Acumula el consumo de tokens en memoria y lo persiste por lotes.
+
+    Cada llamada al LLM se suma a un acumulador en memoria por (agente, campaña,
+    modelo, día); un hilo en segundo plano (o el propio registro, al superar
+    USAGE_FLUSH_MAX_PENDING llamadas) vuelca los acumulados a la tabla
+    `token_usage` sumándolos en la base de datos, así que los volcados de
+    varios workers no pierden incrementos. Los presupuestos se comprueban contra el consumo persistido,
+    cacheado durante BUDGET_CACHE_TTL segundos, más el consumo aún en memoria
+    (incluido el del lote que se está volcando y todavía no se ha confirmado).
+
+    El presupuesto de un agente se aplica al mes en curso y el de una campaña a
+    toda su duración. Un presupuesto agotado no bloquea la llamada: la ruta de
+    chat la atiende con el mismo backend y como máximo BUDGET_DEGRADED_MAX_TOKENS
+    tokens de respuesta.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        max_pending: int = USAGE_FLUSH_MAX_PENDING,
+        budget_cache_ttl: float = BUDGET_CACHE_TTL
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.budget_cache_ttl = budget_cache_ttl
+
+        self._buffer: Dict[Tuple[Any, ...], Dict[str, int]] = {}
+        self._pending_calls = 0
+        self._pending_tokens: Dict[Tuple[str, int], int] = {}
+        self._inflight_tokens: Dict[Tuple[str, int], int] = {}
+        self._persisted_tokens: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def record(self, agent_id: int, usage: Dict[str, int], campaign_id: Optional[int] = None, model: Optional[str] = None) -> None:
+        """Registra el consumo de una llamada al LLM
+
+        Args:
+            agent_id: ID del agente
+            usage: Dict con prompt_tokens, completion_tokens y total_tokens
+            campaign_id: ID de la campaña (opcional)
+            model: Modelo o backend que atendió la llamada
+        """
+        prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
+        completion_tokens = int(usage.get("completion_tokens", 0) or 0)
+        total_tokens = int(usage.get("total_tokens", 0) or prompt_tokens + completion_tokens)
+        key = (agent_id, campaign_id, model, _start_of_day(datetime.now(timezone.utc)))
+
+        with self._lock:
+            aggregate = self._buffer.setdefault(
+                key, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            )
+            aggregate["requests"] += 1
+            aggregate["prompt_tokens"] += prompt_tokens
+            aggregate["completion_tokens"] += completion_tokens
+            aggregate["total_tokens"] += total_tokens
+
+            self._pending_tokens[("agent", agent_id)] = self._pending_tokens.get(("agent", agent_id), 0) + total_tokens
+            if campaign_id is not None:
+                self._pending_tokens[("campaign", campaign_id)] = self._pending_tokens.get(("campaign", campaign_id), 0) + total_tokens
+
+            self._pending_calls += 1
+            should_flush = self._pending_calls >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """Persiste los acumulados en memoria
+
+        Returns:
+            Número de filas de acumulados escritas
+        """
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, {}
+                pending_tokens, self._pending_tokens = self._pending_tokens, {}
+                # El lote sigue contando para los presupuestos hasta que se confirme
+                self._inflight_tokens = pending_tokens
+                self._pending_calls = 0
+
+            if not buffer:
+                return 0
+
+            db = self.session_factory()
+            try:
+                for (agent_id, campaign_id, model, day), aggregate in buffer.items():
+                    _increment_usage(db, agent_id, campaign_id, model, day, aggregate)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error al persistir el consumo de tokens: {str(e)}")
+                self._restore(buffer, pending_tokens)
+                return 0
+            finally:
+                db.close()
+
+            # Pasar el lote confirmado a la caché de consumo persistido
+            with self._lock:
+                self._inflight_tokens = {}
+                for entity, tokens in pending_tokens.items():
+                    if entity in self._persisted_tokens:
+                        persisted, fetched_at = self._persisted_tokens[entity]
+                        self._persisted_tokens[entity] = (persisted + tokens, fetched_at)
+
+            return len(buffer)
+
+    def get_usage(self, db: Session, kind: str, entity_id: int) -> int:
+        """Obtiene el consumo de tokens del periodo vigente de un agente o campaña
+
+        Args:
+            db: Sesión de base de datos
+            kind: "agent" o "campaign"
+            entity_id: ID del agente o de la campaña
+
+        Returns:
+            Tokens consumidos (persistidos más pendientes de persistir o en volcado)
+        """
+        entity = (kind, entity_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._persisted_tokens.get(entity)
+
+        if cached is None or now - cached[1] > self.budget_cache_ttl:
+            # Sin volcados en curso, para que la consulta no cuente un lote a medias ni dos veces
+            with self._flush_lock:
+                persisted = self._query_usage(db, kind, entity_id)
+                with self._lock:
+                    self._persisted_tokens[entity] = (persisted, now)
+
+        with self._lock:
+            persisted = self._persisted_tokens[entity][0]
+            return persisted + self._pending_tokens.get(entity, 0) + self._inflight_tokens.get(entity, 0)
+
+    def _query_usage(self, db: Session, kind: str, entity_id: int) -> int:
+        """Consumo persistido del periodo vigente de un agente o campaña."""
+        query = db.query(func.coalesce(func.sum(models.TokenUsage.total_tokens), 0))
+        if kind == "agent":
+            query = query.filter(
+                models.TokenUsage.agent_id == entity_id,
+                models.TokenUsage.date >= _start_of_month(datetime.now(timezone.utc))
+            )
+        else:
+            query = query.filter(models.TokenUsage.campaign_id == entity_id)
+        return int(query.scalar() or 0)
+
+    def check_budget(self, db: Session, agent: models.Agent, campaign: Optional[models.Campaign] = None) -> Dict[str, Any]:
+        """Comprueba los presupuestos de tokens de un agente y, opcionalmente, de una campaña
+
+        Args:
+            db: Sesión de base de datos
+            agent: Agente que atenderá la llamada
+            campaign: Campaña asociada (opcional)
+
+        Returns:
+            Dict con el consumo, los presupuestos y si alguno está agotado
+        """
+        result = {"exhausted": False, "agent_tokens": None, "agent_budget": agent.token_budget}
+        if agent.token_budget is not None:
+            result["agent_tokens"] = self.get_usage(db, "agent", agent.id)
+            result["exhausted"] = result["agent_tokens"] >= agent.token_budget
+
+        if campaign is not None:
+            result["campaign_budget"] = campaign.token_budget
+            result["campaign_tokens"] = None
+            if campaign.token_budget is not None:
+                result["campaign_tokens"] = self.get_usage(db, "campaign", campaign.id)
+                result["exhausted"] = result["exhausted"] or result["campaign_tokens"] >= campaign.token_budget
+
+        return result
+
+    def start(self) -> None:
+        """Inicia el volcado periódico en segundo plano."""
+        if self.flush_interval <= 0 or self._flush_thread is not None:
+            return
+        self._stop_event.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="usage-flush", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self) -> None:
+        """Detiene el volcado periódico y persiste lo pendiente."""
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=self.flush_interval)
+            self._flush_thread = None
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _restore(self, buffer: Dict[Tuple[Any, ...], Dict[str, int]], pending_tokens: Dict[Tuple[str, int], int]) -> None:
+        """Devuelve a memoria los acumulados que no se pudieron persistir."""
+        with self._lock:
+            self._inflight_tokens = {}
+            for key, aggregate in buffer.items():
+                current = self._buffer.setdefault(
+                    key, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                )
+                for field, value in aggregate.items():
+                    current[field] += value
+                self._pending_calls += aggregate["requests"]
+            for entity, tokens in pending_tokens.items():
+                self._pending_tokens[entity] = self._pending_tokens.get(entity, 0) + tokens
+
+
+# Registro compartido por el proceso
+usage_recorder = UsageRecorder()
@@ -2,7 +2,10 @@
 
 import os
 import json
+import time
+import hashlib
 import logging
+import threading
 import requests
 from typing import Dict, List, Optional, Union, Any
 from dataclasses import dataclass
@@ -19,8 +22,35 @@ class GPTOSSResponse:
     model: str
     id: str
 
+@dataclass(eq=False)
+class Replica:
+    """Estado de una réplica del servidor gpt-oss-20b."""
+    url: str
+    in_flight: int = 0
+    queue_depth: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    
+    @property
+    def load(self) -> int:
+        """Carga estimada: solicitudes propias en curso más la cola reportada por la réplica."""
+        return self.in_flight + self.queue_depth
+    
+    def is_available(self, now: float) -> bool:
+        """Indica si la réplica puede recibir solicitudes."""
+        return self.healthy or now >= self.ejected_until
+
+
 class GPTOSSClient:
-    """Cliente para interactuar con el servicio gpt-oss-20b."""
+    """Cliente para interactuar con el servicio gpt-oss-20b.
+    
+    Admite varias réplicas del servidor: cada solicitud se envía a la réplica con
+    menos solicitudes pendientes (las propias más la cola reportada por la réplica),
+    las réplicas que fallan repetidamente se expulsan temporalmente y las
+    solicitudes de una misma conversación se envían siempre a la misma réplica
+    mientras esté disponible, para aprovechar su caché de prefijos.
+    """
     
     def __init__(self, 
                  model_path: str = "/models/gpt-oss-20b", 
@@ -28,7 +58,11 @@ class GPTOSSClient:
                  temperature: float = 0.7, 
                  top_p: float = 0.9, 
                  top_k: int = 40,
-                 api_url: Optional[str] = None):
+                 api_url: Optional[str] = None,
+                 api_urls: Optional[List[str]] = None,
+                 max_failures: int = 3,
+                 eject_seconds: float = 30.0,
+                 sticky_max_imbalance: int = 4):
         """Inicializa el cliente de gpt-oss-20b.
         
         Args:
@@ -38,17 +72,110 @@ class GPTOSSClient:
             top_p: Valor de top-p para la generación de texto.
             top_k: Valor de top-k para la generación de texto.
             api_url: URL de la API de gpt-oss-20b. Si no se proporciona, se usa la variable de entorno GPT_OSS_MODEL_URL.
+            api_urls: Lista de URLs de réplicas. Si no se proporciona, se usa la variable de entorno
+                GPT_OSS_MODEL_URLS (separadas por comas) o, en su defecto, api_url.
+            max_failures: Fallos consecutivos tras los cuales una réplica se expulsa.
+            eject_seconds: Tiempo que una réplica expulsada permanece fuera de la rotación.
+            sticky_max_imbalance: Diferencia máxima de carga tolerada antes de romper la afinidad de una conversación.
         """
         self.model_path = model_path
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.top_p = top_p
         self.top_k = top_k
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.sticky_max_imbalance = sticky_max_imbalance
+        
+        # Obtener las URLs de las réplicas desde los parámetros o las variables de entorno
+        if not api_urls:
+            env_urls = os.getenv("GPT_OSS_MODEL_URLS", "")
+            api_urls = [url.strip() for url in env_urls.split(",") if url.strip()] if not api_url else []
+        if not api_urls:
+            api_urls = [api_url or os.getenv("GPT_OSS_MODEL_URL", "http://localhost:8080")]
+        
+        self.replicas = [Replica(url=url.rstrip("/")) for url in api_urls]
+        self._lock = threading.Lock()
         
-        # Obtener la URL de la API desde las variables de entorno o usar el valor predeterminado
-        self.api_url = api_url or os.getenv("GPT_OSS_MODEL_URL", "http://localhost:8080")
+        # URL principal (compatibilidad con el cliente de una sola réplica)
+        self.api_url = self.replicas[0].url
         
-        logger.info(f"Cliente gpt-oss-20b inicializado con URL: {self.api_url}")
+        logger.info(f"Cliente gpt-oss-20b inicializado con URLs: {', '.join(r.url for r in self.replicas)}")
+    
+    def _select_replica(self, conversation_id: Optional[str] = None, exclude: Optional[List[Replica]] = None) -> Replica:
+        """Selecciona la réplica para una solicitud y la marca como ocupada.
+        
+        Args:
+            conversation_id: ID de la conversación para la afinidad de réplica.
+            exclude: Réplicas que no deben usarse (por ejemplo, tras un fallo).
+            
+        Returns:
+            La réplica seleccionada.
+        """
+        exclude = exclude or []
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude and r.is_available(now)]
+            if not candidates:
+                # Todas expulsadas: usar la que antes vuelve a estar disponible
+                candidates = sorted(
+                    (r for r in self.replicas if r not in exclude),
+                    key=lambda r: r.ejected_until
+                )[:1] or self.replicas[:1]
+            
+            least_loaded = min(candidates, key=lambda r: r.load)
+            replica = least_loaded
+            if conversation_id:
+                sticky = max(candidates, key=lambda r: self._affinity_score(conversation_id, r.url))
+                if sticky.load - least_loaded.load <= self.sticky_max_imbalance:
+                    replica = sticky
+            
+            replica.in_flight += 1
+            return replica
+    
+    @staticmethod
+    def _affinity_score(conversation_id: str, url: str) -> int:
+        """Puntaje de rendezvous hashing entre una conversación y una réplica."""
+        digest = hashlib.md5(f"{conversation_id}|{url}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+    
+    def _release_replica(self, replica: Replica, success: bool, queue_depth: Optional[int] = None) -> None:
+        """Libera una réplica tras una solicitud y actualiza su estado de salud."""
+        with self._lock:
+            replica.in_flight = max(0, replica.in_flight - 1)
+            if queue_depth is not None:
+                replica.queue_depth = queue_depth
+            if success:
+                replica.consecutive_failures = 0
+                replica.healthy = True
+                return
+            
+            replica.consecutive_failures += 1
+            if replica.consecutive_failures >= self.max_failures:
+                if replica.healthy:
+                    logger.warning(f"Réplica gpt-oss-20b expulsada: {replica.url}")
+                replica.healthy = False
+                replica.ejected_until = time.monotonic() + self.eject_seconds
+    
+    @staticmethod
+    def _is_replica_failure(error: requests.exceptions.RequestException) -> bool:
+        """Indica si un error se debe a la réplica (conexión, timeout, 5xx o 429) y no a la solicitud."""
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        response = getattr(error, "response", None)
+        if not isinstance(error, requests.exceptions.HTTPError) or response is None:
+            return False
+        return response.status_code >= 500 or response.status_code == 429
+    
+    @staticmethod
+    def _parse_queue_depth(value: Any) -> Optional[int]:
+        """Convierte la profundidad de cola reportada por una réplica a entero."""
+        if value is None:
+            return None
+        try:
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            return None
     
     def _format_messages(self, prompt: str) -> List[Dict[str, str]]:
         """Formatea el prompt como una lista de mensajes para la API de chat.
@@ -70,7 +197,8 @@ class GPTOSSClient:
                 temperature: Optional[float] = None,
                 top_p: Optional[float] = None,
                 top_k: Optional[int] = None,
-                stream: bool = False) -> GPTOSSResponse:
+                stream: bool = False,
+                conversation_id: Optional[str] = None) -> GPTOSSResponse:
         """Genera texto usando el modelo gpt-oss-20b.
         
         Args:
@@ -80,6 +208,7 @@ class GPTOSSClient:
             top_p: Valor de top-p para la generación de texto. Si es None, se usa el valor predeterminado.
             top_k: Valor de top-k para la generación de texto. Si es None, se usa el valor predeterminado.
             stream: Si es True, la respuesta se transmite en tiempo real.
+            conversation_id: ID de la conversación; sus solicitudes se envían a la misma réplica.
             
         Returns:
             Objeto GPTOSSResponse con el texto generado y metadatos.
@@ -99,15 +228,41 @@ class GPTOSSClient:
                 "stream": stream
             }
             
-            # Realizar la solicitud a la API
-            response = requests.post(
-                f"{self.api_url}/v1/chat/completions",
-                json=request_data,
-                timeout=60  # Timeout de 60 segundos
-            )
-            
-            # Verificar si la solicitud fue exitosa
-            response.raise_for_status()
+            # Realizar la solicitud a la API, reintentando una vez en otra réplica ante fallos de la réplica
+            attempts = min(2, len(self.replicas))
+            tried: List[Replica] = []
+            for attempt in range(attempts):
+                replica = self._select_replica(conversation_id, exclude=tried)
+                tried.append(replica)
+                try:
+                    response = requests.post(
+                        f"{replica.url}/v1/chat/completions",
+                        json=request_data,
+                        timeout=60  # Timeout de 60 segundos
+                    )
+                    
+                    # Verificar si la solicitud fue exitosa
+                    response.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    if not self._is_replica_failure(e):
+                        # Error de la solicitud (4xx): la réplica está sana y otra réplica respondería lo mismo
+                        self._release_replica(replica, success=True)
+                        raise
+                    self._release_replica(replica, success=False)
+                    if attempt + 1 < attempts:
+                        logger.warning(f"Error en la réplica {replica.url}, reintentando en otra réplica")
+                        continue
+                    raise
+                except Exception:
+                    self._release_replica(replica, success=False)
+                    raise
+                
+                self._release_replica(
+                    replica,
+                    success=True,
+                    queue_depth=self._parse_queue_depth(response.headers.get("X-Queue-Depth"))
+                )
+                break
             
             # Parsear la respuesta
             data = response.json()
@@ -133,12 +288,36 @@ class GPTOSSClient:
     def health_check(self) -> bool:
         """Verifica si el servicio gpt-oss-20b está disponible.
         
+        Consulta todas las réplicas, actualiza la profundidad de cola reportada y
+        reincorpora las réplicas expulsadas que vuelven a responder.
+        
         Returns:
-            True si el servicio está disponible, False en caso contrario.
+            True si al menos una réplica está disponible, False en caso contrario.
         """
-        try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
-            return response.status_code == 200 and response.json().get("status") == "ok"
-        except Exception as e:
-            logger.error(f"Error al verificar la salud del servicio: {e}")
-            return False
\ No newline at end of file
+        any_healthy = False
+        for replica in self.replicas:
+            healthy = False
+            queue_depth = None
+            try:
+                response = requests.get(f"{replica.url}/health", timeout=5)
+                if response.status_code == 200:
+                    data = response.json()
+                    healthy = data.get("status") == "ok"
+                    queue_depth = self._parse_queue_depth(data.get("queue_depth"))
+            except Exception as e:
+                logger.error(f"Error al verificar la salud del servicio: {e}")
+            
+            with self._lock:
+                if healthy:
+                    if not replica.healthy:
+                        logger.info(f"Réplica gpt-oss-20b reincorporada: {replica.url}")
+                    replica.healthy = True
+                    replica.consecutive_failures = 0
+                    if queue_depth is not None:
+                        replica.queue_depth = queue_depth
+                else:
+                    replica.healthy = False
+                    replica.ejected_until = time.monotonic() + self.eject_seconds
+            any_healthy = any_healthy or healthy
+        
+        return any_healthy
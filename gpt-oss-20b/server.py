@@ -1,8 +1,10 @@
 import os
 import json
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Response, BackgroundTasks
 from pydantic import BaseModel, Field
 import uvicorn
 import torch
@@ -20,6 +22,8 @@ MAX_OUTPUT_TOKENS = int(os.environ.get("MAX_OUTPUT_TOKENS", "1024"))
 DEFAULT_TEMPERATURE = float(os.environ.get("DEFAULT_TEMPERATURE", "0.7"))
 DEFAULT_TOP_P = float(os.environ.get("DEFAULT_TOP_P", "0.9"))
 DEFAULT_TOP_K = int(os.environ.get("DEFAULT_TOP_K", "50"))
+# Generaciones simultáneas en el modelo; el resto de solicitudes espera en cola
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "1"))
 
 app = FastAPI(title="GPT-OSS-20B API", description="API para el modelo GPT-OSS-20B")
 
@@ -48,6 +52,18 @@ class GenerationResponse(BaseModel):
 model = None
 tokenizer = None
 
+# Solicitudes de generación en curso o en cola (reportadas a los clientes para el balanceo de carga)
+queue_depth = 0
+
+# La generación es bloqueante: se ejecuta fuera del event loop para que el servidor
+# siga aceptando solicitudes (y contándolas en queue_depth) mientras el modelo trabaja
+generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+
+def run_generation(gen_kwargs: Dict[str, Any]):
+    """Ejecuta model.generate sin gradientes (en un hilo del generation_executor)."""
+    with torch.no_grad():
+        return model.generate(**gen_kwargs)
+
 @app.on_event("startup")
 async def startup_event():
     global model, tokenizer
@@ -80,12 +96,13 @@ def format_chat_prompt(messages: List[Message]) -> str:
     return formatted_prompt
 
 @app.post("/v1/chat/completions", response_model=GenerationResponse)
-async def generate_text(request: GenerationRequest, background_tasks: BackgroundTasks):
-    global model, tokenizer
+async def generate_text(request: GenerationRequest, background_tasks: BackgroundTasks, http_response: Response):
+    global model, tokenizer, queue_depth
     
     if model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail="Modelo no disponible")
     
+    queue_depth += 1
     try:
         # Formatear el prompt
         prompt = format_chat_prompt(request.messages)
@@ -109,8 +126,7 @@ async def generate_text(request: GenerationRequest, background_tasks: Background
         }
         
         # Generar texto
-        with torch.no_grad():
-            output = model.generate(**gen_kwargs)
+        output = await asyncio.get_running_loop().run_in_executor(generation_executor, run_generation, gen_kwargs)
         
         # Decodificar la salida (excluyendo el prompt)
         generated_text = tokenizer.decode(output[0][input_ids.shape[1]:], skip_special_tokens=True)
@@ -144,15 +160,20 @@ async def generate_text(request: GenerationRequest, background_tasks: Background
         
         return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en la generación: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        queue_depth -= 1
+        http_response.headers["X-Queue-Depth"] = str(queue_depth)
 
 @app.get("/health")
 async def health_check():
     if model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail="Modelo no disponible")
-    return {"status": "ok", "model": "gpt-oss-20b"}
+    return {"status": "ok", "model": "gpt-oss-20b", "queue_depth": queue_depth}
 
 def import_time():
     import time
@@ -176,4 +176,119 @@ def test_health_check_error(mock_get):
     
     # Verificar que el método retorna False en caso de error
     result = client.health_check()
-    assert result == False
\ No newline at end of file
+    assert result == False
+
+
+def test_init_multiple_replicas():
+    """Prueba la inicialización con varias réplicas."""
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080/"])
+    assert [r.url for r in client.replicas] == ["http://replica-1:8080", "http://replica-2:8080"]
+    assert client.api_url == "http://replica-1:8080"
+    
+    # Probar con la variable de entorno
+    with patch.dict(os.environ, {"GPT_OSS_MODEL_URLS": "http://a:8080, http://b:8080"}):
+        client = GPTOSSClient()
+    assert [r.url for r in client.replicas] == ["http://a:8080", "http://b:8080"]
+
+
+def test_select_replica_least_outstanding():
+    """Prueba que se elige la réplica con menos solicitudes pendientes."""
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"])
+    client.replicas[0].queue_depth = 5
+    
+    replica = client._select_replica()
+    assert replica.url == "http://replica-2:8080"
+    assert replica.in_flight == 1
+
+
+def test_select_replica_sticky_conversation():
+    """Prueba que una conversación se envía siempre a la misma réplica."""
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080", "http://replica-3:8080"])
+    
+    first = client._select_replica("conversation-123")
+    client._release_replica(first, success=True)
+    for _ in range(5):
+        replica = client._select_replica("conversation-123")
+        client._release_replica(replica, success=True)
+        assert replica is first
+    
+    # Si la réplica asignada está sobrecargada se rompe la afinidad
+    first.queue_depth = 100
+    replica = client._select_replica("conversation-123")
+    assert replica is not first
+
+
+def test_replica_ejection_and_reinstatement(mock_health_response):
+    """Prueba la expulsión de réplicas con fallos y su reincorporación por health check."""
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"], max_failures=2)
+    failing = client.replicas[0]
+    
+    for _ in range(2):
+        client._select_replica()
+        client._release_replica(failing, success=False)
+    assert failing.healthy == False
+    
+    # La réplica expulsada no recibe solicitudes
+    for _ in range(3):
+        replica = client._select_replica()
+        client._release_replica(replica, success=True)
+        assert replica.url == "http://replica-2:8080"
+    
+    # Un health check exitoso la reincorpora
+    with patch('requests.get', return_value=mock_health_response):
+        assert client.health_check() == True
+    assert failing.healthy == True
+
+
+@patch('requests.post')
+def test_generate_retries_on_other_replica(mock_post, mock_response):
+    """Prueba que un error de conexión se reintenta en otra réplica."""
+    import requests
+    mock_post.side_effect = [requests.exceptions.ConnectionError("Conexión rechazada"), mock_response]
+    mock_response.headers = {"X-Queue-Depth": "3"}
+    
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"])
+    response = client.generate("Hola, ¿cómo estás?")
+    
+    assert response.text == "Esta es una respuesta de prueba."
+    urls = [call.args[0] for call in mock_post.call_args_list]
+    assert urls[0] != urls[1]
+    assert sum(r.queue_depth for r in client.replicas) == 3
+
+
+def _http_error(status_code):
+    """Respuesta mock cuyo raise_for_status lanza un HTTPError con el código indicado."""
+    import requests
+    response = MagicMock()
+    response.status_code = status_code
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code}", response=response)
+    return response
+
+
+@patch('requests.post')
+def test_generate_client_error_is_not_retried(mock_post):
+    """Prueba que un error 4xx no se reintenta ni penaliza a la réplica."""
+    mock_post.return_value = _http_error(400)
+    
+    client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"], max_failures=1)
+    with pytest.raises(Exception):
+        client.generate("Hola, ¿cómo estás?")
+    
+    assert mock_post.call_count == 1
+    assert all(r.healthy and r.consecutive_failures == 0 and r.in_flight == 0 for r in client.replicas)
+
+
+@patch('requests.post')
+def test_generate_server_error_is_retried(mock_post, mock_response):
+    """Prueba que un error 5xx o 429 se reintenta en otra réplica y penaliza a la que falló."""
+    for status_code in (503, 429):
+        mock_post.reset_mock()
+        mock_post.side_effect = [_http_error(status_code), mock_response]
+        mock_response.headers = {}
+        
+        client = GPTOSSClient(api_urls=["http://replica-1:8080", "http://replica-2:8080"])
+        response = client.generate("Hola, ¿cómo estás?")
+        
+        assert response.text == "Esta es una respuesta de prueba."
+        assert mock_post.call_count == 2
+        assert sorted(r.consecutive_failures for r in client.replicas) == [0, 1]
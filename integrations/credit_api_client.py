@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 from typing import Dict, Any, Optional, List, Union
 import json
@@ -13,6 +14,16 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# backend/ contiene loan_engine, el cálculo de amortización compartido con la API
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+def _loan_engine():
+    """Importa loan_engine de backend/ en el primer uso (carga numpy solo al simular)"""
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    import loan_engine
+    return loan_engine
+
 class CreditAPIClient:
     """Cliente para interactuar con la API externa de créditos"""
     
@@ -21,6 +32,7 @@ class CreditAPIClient:
         self.api_base_url = os.getenv("CREDIT_API_BASE_URL")
         self.api_key = os.getenv("CREDIT_API_KEY")
         self.api_secret = os.getenv("CREDIT_API_SECRET")
+        self.timeout = float(os.getenv("CREDIT_API_TIMEOUT", "10"))  # segundos por petición
         
         # Verificar configuración
         if not self.api_base_url:
@@ -97,11 +109,12 @@ class CreditAPIClient:
                 "message": str(e)
             }
     
-    def submit_credit_application(self, application_data: Dict[str, Any]) -> Dict[str, Any]:
+    def submit_credit_application(self, application_data: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Envía una solicitud de crédito
         
         Args:
             application_data: Datos de la solicitud
+            idempotency_key: Clave de idempotencia; los reintentos con la misma clave no crean solicitudes duplicadas
             
         Returns:
             Diccionario con la respuesta de la API
@@ -111,10 +124,14 @@ class CreditAPIClient:
         
         try:
             url = f"{self.api_base_url}/credit-applications"
+            headers = self._get_headers()
+            if idempotency_key:
+                headers["Idempotency-Key"] = idempotency_key
             response = requests.post(
                 url,
-                headers=self._get_headers(),
-                json=application_data
+                headers=headers,
+                json=application_data,
+                timeout=self.timeout
             )
             return self._handle_response(response)
         except Exception as e:
@@ -211,49 +228,37 @@ class CreditAPIClient:
                 "message": str(e)
             }
     
-    def simulate_loan_payment(self, amount: float, term_months: int, interest_rate: float) -> Dict[str, Any]:
+    def simulate_loan_payment(
+        self,
+        amount: float,
+        term_months: int,
+        interest_rate: float,
+        page: int = 1,
+        page_size: Optional[int] = None
+    ) -> Dict[str, Any]:
         """Simula el pago de un préstamo (cálculo local)
         
         Args:
             amount: Monto del préstamo
             term_months: Plazo en meses
             interest_rate: Tasa de interés anual (porcentaje)
+            page: Página de la tabla de amortización (desde 1)
+            page_size: Filas por página (None para la tabla completa)
             
         Returns:
             Diccionario con la simulación del préstamo
         """
         try:
-            # Convertir tasa anual a mensual
-            monthly_rate = interest_rate / 100 / 12
-            
-            # Calcular cuota mensual
-            if monthly_rate == 0:
-                monthly_payment = amount / term_months
-            else:
-                monthly_payment = amount * (monthly_rate * (1 + monthly_rate) ** term_months) / ((1 + monthly_rate) ** term_months - 1)
+            # La tabla la calcula loan_engine, igual que el endpoint /api/loans/schedule
+            loan_engine = _loan_engine()
+            page_size = page_size if page_size is not None else term_months
+            schedule = loan_engine.schedule_page(amount, term_months, interest_rate, page=page, page_size=page_size)
+            monthly_payment = float(loan_engine.monthly_payments(amount, term_months, interest_rate))
             
             # Calcular total a pagar
             total_payment = monthly_payment * term_months
             total_interest = total_payment - amount
             
-            # Generar tabla de amortización
-            amortization_table = []
-            remaining_balance = amount
-            
-            for month in range(1, term_months + 1):
-                interest_payment = remaining_balance * monthly_rate
-                principal_payment = monthly_payment - interest_payment
-                remaining_balance -= principal_payment
-                
-                if month <= 12:  # Limitar la tabla a 12 meses para no hacerla muy grande
-                    amortization_table.append({
-                        "month": month,
-                        "payment": round(monthly_payment, 2),
-                        "principal": round(principal_payment, 2),
-                        "interest": round(interest_payment, 2),
-                        "remaining_balance": round(max(0, remaining_balance), 2)
-                    })
-            
             return {
                 "success": True,
                 "loan_details": {
@@ -264,7 +269,13 @@ class CreditAPIClient:
                     "total_payment": round(total_payment, 2),
                     "total_interest": round(total_interest, 2)
                 },
-                "amortization_table": amortization_table
+                "amortization_table": schedule["rows"],
+                "pagination": {
+                    "page": schedule["page"],
+                    "page_size": schedule["page_size"],
+                    "total_rows": schedule["total_rows"],
+                    "total_pages": schedule["total_pages"]
+                }
             }
         except Exception as e:
             logger.error(f"Error al simular pago de préstamo: {str(e)}")
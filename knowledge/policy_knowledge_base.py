@@ -1,13 +1,17 @@
+"""Base de conocimiento de políticas de crédito sobre ChromaDB.
+
+Chroma, los embeddings de OpenAI y los cargadores de documentos se importan al
+crear la base de conocimiento o al agregar un documento, no al importar el módulo.
+"""
+
 import os
 import logging
-from typing import List, Dict, Any, Optional
-from langchain.vectorstores import Chroma
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader, TextLoader
-from langchain.schema import Document
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -30,6 +34,8 @@ class PolicyKnowledgeBase:
         # Crear directorio si no existe
         os.makedirs(persist_directory, exist_ok=True)
         
+        from langchain.embeddings.openai import OpenAIEmbeddings
+        
         # Inicializar embeddings
         self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
         
@@ -38,6 +44,8 @@ class PolicyKnowledgeBase:
     
     def _initialize_vectorstore(self):
         """Inicializa o carga la base de datos vectorial"""
+        from langchain.vectorstores import Chroma
+        
         try:
             # Intentar cargar la base de datos existente
             self.vectorstore = Chroma(
@@ -65,6 +73,9 @@ class PolicyKnowledgeBase:
         Returns:
             Número de chunks agregados
         """
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from langchain.document_loaders import PyPDFLoader, TextLoader
+        
         try:
             # Cargar el documento según su extensión
             if file_path.endswith(".pdf"):
@@ -102,7 +113,7 @@ class PolicyKnowledgeBase:
             logger.error(f"Error al agregar documento a la base de conocimiento: {str(e)}")
             raise
     
-    def search(self, query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+    def search(self, query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List["Document"]:
         """Busca documentos relevantes en la base de conocimiento
         
         Args:
@@ -182,4 +193,43 @@ class PolicyKnowledgeBase:
             return content
         except Exception as e:
             logger.error(f"Error al obtener contenido de la política: {str(e)}")
-            return ""
\ No newline at end of file
+            return ""
+    
+    def get_chunks(self, policy_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Obtiene los chunks almacenados con sus embeddings, sin volver a calcularlos
+        
+        Args:
+            policy_ids: IDs de las políticas a incluir (None para todas)
+            
+        Returns:
+            Lista de dicts con text, metadata y embedding
+        """
+        try:
+            where = None
+            if policy_ids is not None:
+                if not policy_ids:
+                    return []
+                where = {"policy_id": {"$in": [str(policy_id) for policy_id in policy_ids]}}
+            
+            data = self.vectorstore._collection.get(
+                where=where,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            return [
+                {"text": text, "metadata": metadata or {}, "embedding": embedding}
+                for text, metadata, embedding in zip(data["documents"], data["metadatas"], data["embeddings"])
+            ]
+        except Exception as e:
+            logger.error(f"Error al obtener los chunks de la base de conocimiento: {str(e)}")
+            return []
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Calcula el embedding de una consulta con el mismo modelo que los documentos
+        
+        Args:
+            query: Consulta de búsqueda
+            
+        Returns:
+            Embedding de la consulta
+        """
+        return self.embeddings.embed_query(query)